@@ -3,58 +3,132 @@ Sistema de Gestión de Biblioteca
 Archivo principal del programa
 Autor: [Tu Nombre]
 Fecha: 2026-01-07
+
+Sin argumentos muestra el menú. Con argumentos ejecuta un comando sin
+menús (ver utils/comandos.py), por ejemplo:
+    python main.py prestamo crear --usuario 5 --libro 9
+    python main.py --batch comandos.jsonl
+
+Los módulos de cada menú se importan la primera vez que se eligen. Para
+medir el inicio (importaciones con el formato de -X importtime y primer uso
+de cada menú):
+    python main.py --startup-profile
 """
 
-from modelos.libro import menu_libros
-from modelos.usuario import menu_usuarios
-from modelos.prestamo import menu_prestamos
-from modelos.multa import menu_multas
-from modelos.categoria import menu_categorias
-from modelos.autor import menu_autores
+import time
+
+# Antes de las demás importaciones, para medir cuánto tardan
+_INICIO = time.perf_counter()
+
+import importlib
+import os
+import sys
+from contextlib import contextmanager
+
 from utils.validaciones import limpiar_pantalla
+from utils.errores import ErrorBiblioteca
+from utils.manejo_archivos import obtener_modo_almacenamiento, forzar_escritura
+
+# Opción, título, módulo, función del menú y colecciones que carga primero
+MENUS = (
+    ("1", "Gestión de Libros", "modelos.libro", "menu_libros", ('libros',)),
+    ("2", "Gestión de Usuarios", "modelos.usuario", "menu_usuarios", ('usuarios',)),
+    ("3", "Gestión de Préstamos", "modelos.prestamo", "menu_prestamos", ('prestamos',)),
+    ("4", "Gestión de Multas", "modelos.multa", "menu_multas", ('multas',)),
+    ("5", "Gestión de Categorías", "modelos.categoria", "menu_categorias", ('categorias',)),
+    ("6", "Gestión de Autores", "modelos.autor", "menu_autores", ('autores',)),
+)
+
+def abrir_menu(modulo, funcion):
+    """
+    Muestra un menú, importando su módulo la primera vez
+    Args:
+        modulo (str): Módulo del menú, por ejemplo 'modelos.libro'
+        funcion (str): Función del menú dentro del módulo
+    """
+    getattr(importlib.import_module(modulo), funcion)()
 
 def menu_principal():
     """
     Función principal que muestra el menú del sistema
     Permite navegar entre los diferentes módulos
     """
+    menus = {opcion: (modulo, funcion) for opcion, _, modulo, funcion, _ in MENUS}
     while True:
         limpiar_pantalla()
         print("=" * 50)
         print("  SISTEMA DE GESTIÓN DE BIBLIOTECA".center(50))
         print("=" * 50)
-        print("  [Almacenamiento: JSON Local]".center(50))
+        print(f"  [Almacenamiento: {obtener_modo_almacenamiento()}]".center(50))
         print("=" * 50)
 
-        print("\n1. Gestión de Libros")
-        print("2. Gestión de Usuarios")
-        print("3. Gestión de Préstamos")
-        print("4. Gestión de Multas")
-        print("5. Gestión de Categorías")
-        print("6. Gestión de Autores")
+        print()
+        for opcion, titulo, _, _, _ in MENUS:
+            print(f"{opcion}. {titulo}")
         print("0. Salir del Sistema")
         print("=" * 50)
 
         opcion = input("\nSeleccione una opción: ").strip()
 
-        if opcion == "1":
-            menu_libros()
-        elif opcion == "2":
-            menu_usuarios()
-        elif opcion == "3":
-            menu_prestamos()
-        elif opcion == "4":
-            menu_multas()
-        elif opcion == "5":
-            menu_categorias()
-        elif opcion == "6":
-            menu_autores()
+        if opcion in menus:
+            abrir_menu(*menus[opcion])
         elif opcion == "0":
+            try:
+                forzar_escritura()
+            except ErrorBiblioteca as e:
+                print(f"\nERROR: {e}")
             print("\n¡Gracias por usar el sistema! Hasta pronto.")
             break
         else:
             print("\nERROR: Opción inválida. Intente nuevamente.")
             input("\nPresione Enter para continuar...")
 
+def perfil_inicio():
+    """
+    Mide el inicio del sistema sin mostrar el menú
+    Las importaciones se informan en la salida de errores con el formato de
+    python -X importtime (para eso el programa se vuelve a ejecutar con esa
+    opción). Después se mide el primer uso de cada menú: importar su módulo
+    y cargar su colección, indicando si la caché de la instantánea estaba
+    vigente
+    Returns:
+        int: Código de salida
+    """
+    if not sys._xoptions.get('importtime'):
+        # Las importaciones solo se pueden medir desde el arranque del intérprete
+        import subprocess
+        return subprocess.call([sys.executable, '-X', 'importtime', *sys.argv])
+
+    from utils import manejo_archivos
+
+    pasos = [("importaciones del inicio (hasta el menú)", time.perf_counter() - _INICIO)]
+
+    @contextmanager
+    def medir(nombre):
+        inicio = time.perf_counter()
+        yield
+        pasos.append((nombre, time.perf_counter() - inicio))
+
+    for _, titulo, modulo, _, colecciones in MENUS:
+        with medir(f"{titulo}: importar {modulo}"):
+            importlib.import_module(modulo)
+        for nombre in colecciones:
+            estado = manejo_archivos.estado_cache_instantanea(nombre)
+            with medir(f"{titulo}: cargar {nombre} (caché: {estado})"):
+                manejo_archivos.cargar_datos(nombre)
+
+    sys.stderr.flush()
+    print(f"\nInicio del sistema ({obtener_modo_almacenamiento()}, datos en {os.path.abspath(manejo_archivos.RUTA_DATOS)})")
+    print(f"  {'Paso':<62} {'ms':>9}")
+    for nombre, segundos in pasos:
+        print(f"  {nombre:<62} {segundos * 1000:>9.1f}")
+    print(f"  {'Total':<62} {sum(segundos for _, segundos in pasos) * 1000:>9.1f}")
+    return 0
+
 if __name__ == "__main__":
+    if sys.argv[1:] == ['--startup-profile']:
+        sys.exit(perfil_inicio())
+    if len(sys.argv) > 1:
+        from utils import comandos
+        sys.exit(comandos.main(sys.argv[1:]))
     menu_principal()
@@ -3,8 +3,12 @@ Módulo de gestión de Autores
 Maneja el CRUD de autores de libros
 """
 
-from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, eliminar_por_id
+from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, buscar_registro, eliminar_por_id
 from utils.validaciones import validar_texto, validar_numero_entero, limpiar_pantalla, pausar
+from utils.transacciones import con_reintentos
+from utils.errores import ErrorBiblioteca
+from utils.instrumentacion import medido
+from utils import busqueda
 
 # Nombre del archivo para autores
 ARCHIVO_AUTORES = "autores"
@@ -22,6 +26,27 @@ def crear_autor():
     apellido = validar_texto("Apellido del autor: ", 2, 50)
     nacionalidad = validar_texto("Nacionalidad: ", 2, 30)
 
+    try:
+        autor = registrar_autor(nombre, apellido, nacionalidad)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return None
+
+    print(f"\nAutor registrado exitosamente con ID: {autor['id']}")
+    return autor
+
+@medido('modelo')
+@con_reintentos
+def registrar_autor(nombre, apellido, nacionalidad):
+    """
+    Registra un autor con datos ya validados (sin pedir datos por consola)
+    Args:
+        nombre (str): Nombre del autor
+        apellido (str): Apellido del autor
+        nacionalidad (str): Nacionalidad
+    Returns:
+        dict: Diccionario con los datos del autor
+    """
     autor = {
         'id': obtener_siguiente_id(CONTADOR_AUTORES),
         'nombre': nombre,
@@ -32,8 +57,7 @@ def crear_autor():
     autores = cargar_datos(ARCHIVO_AUTORES)
     autores.append(autor)
     guardar_datos(ARCHIVO_AUTORES, autores)
-
-    print(f"\nAutor registrado exitosamente con ID: {autor['id']}")
+    busqueda.marcar_desactualizado()
     return autor
 
 def listar_autores():
@@ -61,8 +85,7 @@ def buscar_autor():
     print("\n--- BUSCAR AUTOR ---\n")
 
     id_autor = validar_numero_entero("Ingrese el ID del autor: ", 1)
-    autores = cargar_datos(ARCHIVO_AUTORES)
-    autor = buscar_por_id(autores, id_autor)
+    autor = buscar_registro(ARCHIVO_AUTORES, id_autor)
 
     if autor:
         print("\nAutor encontrado:")
@@ -79,12 +102,12 @@ def actualizar_autor():
     print("\n--- ACTUALIZAR AUTOR ---\n")
 
     id_autor = validar_numero_entero("Ingrese el ID del autor a actualizar: ", 1)
-    autores = cargar_datos(ARCHIVO_AUTORES)
-    autor = buscar_por_id(autores, id_autor)
+    autor = buscar_registro(ARCHIVO_AUTORES, id_autor)
 
     if autor:
         print(f"\nAutor actual: {autor['nombre']} {autor['apellido']}")
         print("\nIngrese los nuevos datos (Enter para mantener el actual):")
+        cambios = {}
 
         nuevo_nombre = input(f"Nombre [{autor['nombre']}]: ").strip()
         if nuevo_nombre:
@@ -93,7 +116,7 @@ def actualizar_autor():
             elif not nuevo_nombre.replace(" ", "").isalpha():
                 print("ERROR: El nombre solo debe contener letras y espacios.")
             else:
-                autor['nombre'] = nuevo_nombre
+                cambios['nombre'] = nuevo_nombre
 
         nuevo_apellido = input(f"Apellido [{autor['apellido']}]: ").strip()
         if nuevo_apellido:
@@ -102,7 +125,7 @@ def actualizar_autor():
             elif not nuevo_apellido.replace(" ", "").isalpha():
                 print("ERROR: El apellido solo debe contener letras y espacios.")
             else:
-                autor['apellido'] = nuevo_apellido
+                cambios['apellido'] = nuevo_apellido
 
         nueva_nacionalidad = input(f"Nacionalidad [{autor['nacionalidad']}]: ").strip()
         if nueva_nacionalidad:
@@ -111,13 +134,38 @@ def actualizar_autor():
             elif not nueva_nacionalidad.replace(" ", "").isalpha():
                 print("ERROR: La nacionalidad solo debe contener letras y espacios.")
             else:
-                autor['nacionalidad'] = nueva_nacionalidad
+                cambios['nacionalidad'] = nueva_nacionalidad
 
-        guardar_datos(ARCHIVO_AUTORES, autores)
+        try:
+            modificar_autor(id_autor, cambios)
+        except ErrorBiblioteca as e:
+            print(f"\nERROR: {e}")
+            return
         print("\nAutor actualizado exitosamente.")
     else:
         print(f"\nERROR: No se encontró un autor con ID {id_autor}")
 
+@medido('modelo')
+@con_reintentos
+def modificar_autor(id_autor, cambios):
+    """
+    Aplica cambios ya validados a un autor
+    Args:
+        id_autor (int): ID del autor
+        cambios (dict): Campos a modificar y sus nuevos valores
+    Returns:
+        dict: Autor actualizado
+    """
+    autores = cargar_datos(ARCHIVO_AUTORES)
+    autor = buscar_por_id(autores, id_autor)
+    if not autor:
+        raise ErrorBiblioteca(f"No se encontró un autor con ID {id_autor}")
+
+    autor.update(cambios)
+    guardar_datos(ARCHIVO_AUTORES, autores)
+    busqueda.marcar_desactualizado()
+    return autor
+
 def eliminar_autor():
     """
     Elimina un autor del sistema
@@ -125,13 +173,27 @@ def eliminar_autor():
     print("\n--- ELIMINAR AUTOR ---\n")
 
     id_autor = validar_numero_entero("Ingrese el ID del autor a eliminar: ", 1)
-    autores = cargar_datos(ARCHIVO_AUTORES)
 
-    if eliminar_por_id(autores, id_autor):
-        guardar_datos(ARCHIVO_AUTORES, autores)
-        print(f"\nAutor con ID {id_autor} eliminado exitosamente.")
-    else:
-        print(f"\nERROR: No se encontró un autor con ID {id_autor}")
+    try:
+        borrar_autor(id_autor)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return
+    print(f"\nAutor con ID {id_autor} eliminado exitosamente.")
+
+@medido('modelo')
+@con_reintentos
+def borrar_autor(id_autor):
+    """
+    Elimina un autor por su ID
+    Args:
+        id_autor (int): ID del autor
+    """
+    autores = cargar_datos(ARCHIVO_AUTORES)
+    if not eliminar_por_id(autores, id_autor):
+        raise ErrorBiblioteca(f"No se encontró un autor con ID {id_autor}")
+    guardar_datos(ARCHIVO_AUTORES, autores)
+    busqueda.marcar_desactualizado()
 
 def menu_autores():
     """
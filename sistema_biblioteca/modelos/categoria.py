@@ -3,8 +3,12 @@ Módulo de gestión de Categorías
 Maneja el CRUD de categorías de libros
 """
 
-from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, eliminar_por_id
+from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, buscar_registro, eliminar_por_id
 from utils.validaciones import validar_texto, validar_numero_entero, limpiar_pantalla, pausar
+from utils.transacciones import con_reintentos
+from utils.errores import ErrorBiblioteca
+from utils.instrumentacion import medido
+from utils import busqueda
 
 # Nombre del archivo para categorías
 ARCHIVO_CATEGORIAS = "categorias"
@@ -21,6 +25,26 @@ def crear_categoria():
     nombre = validar_texto("Nombre de la categoría: ", 3, 50)
     descripcion = validar_texto("Descripción: ", 5, 200)
 
+    try:
+        categoria = registrar_categoria(nombre, descripcion)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return None
+
+    print(f"\nCategoría registrada exitosamente con ID: {categoria['id']}")
+    return categoria
+
+@medido('modelo')
+@con_reintentos
+def registrar_categoria(nombre, descripcion):
+    """
+    Registra una categoría con datos ya validados (sin pedir datos por consola)
+    Args:
+        nombre (str): Nombre de la categoría
+        descripcion (str): Descripción
+    Returns:
+        dict: Diccionario con los datos de la categoría
+    """
     categoria = {
         'id': obtener_siguiente_id(CONTADOR_CATEGORIAS),
         'nombre': nombre,
@@ -30,8 +54,7 @@ def crear_categoria():
     categorias = cargar_datos(ARCHIVO_CATEGORIAS)
     categorias.append(categoria)
     guardar_datos(ARCHIVO_CATEGORIAS, categorias)
-
-    print(f"\nCategoría registrada exitosamente con ID: {categoria['id']}")
+    busqueda.marcar_desactualizado()
     return categoria
 
 def listar_categorias():
@@ -60,8 +83,7 @@ def buscar_categoria():
     print("\n--- BUSCAR CATEGORÍA ---\n")
 
     id_categoria = validar_numero_entero("Ingrese el ID de la categoría: ", 1)
-    categorias = cargar_datos(ARCHIVO_CATEGORIAS)
-    categoria = buscar_por_id(categorias, id_categoria)
+    categoria = buscar_registro(ARCHIVO_CATEGORIAS, id_categoria)
 
     if categoria:
         print("\nCategoría encontrada:")
@@ -78,12 +100,12 @@ def actualizar_categoria():
     print("\n--- ACTUALIZAR CATEGORÍA ---\n")
 
     id_categoria = validar_numero_entero("Ingrese el ID de la categoría a actualizar: ", 1)
-    categorias = cargar_datos(ARCHIVO_CATEGORIAS)
-    categoria = buscar_por_id(categorias, id_categoria)
+    categoria = buscar_registro(ARCHIVO_CATEGORIAS, id_categoria)
 
     if categoria:
         print(f"\nCategoría actual: {categoria['nombre']}")
         print("\nIngrese los nuevos datos (Enter para mantener el actual):")
+        cambios = {}
 
         nuevo_nombre = input(f"Nombre [{categoria['nombre']}]: ").strip()
         if nuevo_nombre:
@@ -92,20 +114,45 @@ def actualizar_categoria():
             elif not nuevo_nombre.replace(" ", "").isalpha():
                 print("ERROR: El nombre solo debe contener letras y espacios.")
             else:
-                categoria['nombre'] = nuevo_nombre
+                cambios['nombre'] = nuevo_nombre
 
         nueva_descripcion = input(f"Descripción [{categoria['descripcion']}]: ").strip()
         if nueva_descripcion:
             if len(nueva_descripcion) < 5 or len(nueva_descripcion) > 200:
                 print("ERROR: La descripción debe tener entre 5 y 200 caracteres.")
             else:
-                categoria['descripcion'] = nueva_descripcion
+                cambios['descripcion'] = nueva_descripcion
 
-        guardar_datos(ARCHIVO_CATEGORIAS, categorias)
+        try:
+            modificar_categoria(id_categoria, cambios)
+        except ErrorBiblioteca as e:
+            print(f"\nERROR: {e}")
+            return
         print("\nCategoría actualizada exitosamente.")
     else:
         print(f"\nERROR: No se encontró una categoría con ID {id_categoria}")
 
+@medido('modelo')
+@con_reintentos
+def modificar_categoria(id_categoria, cambios):
+    """
+    Aplica cambios ya validados a una categoría
+    Args:
+        id_categoria (int): ID de la categoría
+        cambios (dict): Campos a modificar y sus nuevos valores
+    Returns:
+        dict: Categoría actualizada
+    """
+    categorias = cargar_datos(ARCHIVO_CATEGORIAS)
+    categoria = buscar_por_id(categorias, id_categoria)
+    if not categoria:
+        raise ErrorBiblioteca(f"No se encontró una categoría con ID {id_categoria}")
+
+    categoria.update(cambios)
+    guardar_datos(ARCHIVO_CATEGORIAS, categorias)
+    busqueda.marcar_desactualizado()
+    return categoria
+
 def eliminar_categoria():
     """
     Elimina una categoría del sistema
@@ -113,13 +160,27 @@ def eliminar_categoria():
     print("\n--- ELIMINAR CATEGORÍA ---\n")
 
     id_categoria = validar_numero_entero("Ingrese el ID de la categoría a eliminar: ", 1)
-    categorias = cargar_datos(ARCHIVO_CATEGORIAS)
 
-    if eliminar_por_id(categorias, id_categoria):
-        guardar_datos(ARCHIVO_CATEGORIAS, categorias)
-        print(f"\nCategoría con ID {id_categoria} eliminada exitosamente.")
-    else:
-        print(f"\nERROR: No se encontró una categoría con ID {id_categoria}")
+    try:
+        borrar_categoria(id_categoria)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return
+    print(f"\nCategoría con ID {id_categoria} eliminada exitosamente.")
+
+@medido('modelo')
+@con_reintentos
+def borrar_categoria(id_categoria):
+    """
+    Elimina una categoría por su ID
+    Args:
+        id_categoria (int): ID de la categoría
+    """
+    categorias = cargar_datos(ARCHIVO_CATEGORIAS)
+    if not eliminar_por_id(categorias, id_categoria):
+        raise ErrorBiblioteca(f"No se encontró una categoría con ID {id_categoria}")
+    guardar_datos(ARCHIVO_CATEGORIAS, categorias)
+    busqueda.marcar_desactualizado()
 
 def menu_categorias():
     """
@@ -3,8 +3,13 @@ Módulo de gestión de Libros
 Maneja el CRUD de libros en la biblioteca
 """
 
-from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, eliminar_por_id
-from utils.validaciones import validar_texto, validar_numero_entero, validar_isbn, validar_booleano, limpiar_pantalla, pausar
+from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, buscar_registro, buscar_registros, eliminar_por_id
+from utils.validaciones import validar_texto, validar_numero_entero, validar_isbn, validar_booleano, limpiar_pantalla, pausar, comprobar_isbn, normalizar_isbn
+from utils.transacciones import con_reintentos
+from utils.errores import ErrorBiblioteca
+from utils.instrumentacion import medido
+from utils.paginacion import mostrar_paginado
+from utils import busqueda
 
 # Nombre del archivo para libros
 ARCHIVO_LIBROS = "libros"
@@ -25,6 +30,58 @@ def crear_libro():
     año_publicacion = validar_numero_entero("Año de publicación: ", 1500, 2026)
     cantidad_copias = validar_numero_entero("Cantidad de copias: ", 1, 1000)
 
+    try:
+        libro = registrar_libro(titulo, isbn, id_autor, id_categoria, año_publicacion, cantidad_copias)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return None
+
+    print(f"\nLibro registrado exitosamente con ID: {libro['id']}")
+    return libro
+
+@medido('modelo')
+def comprobar_isbn_libre(libros, isbn, id_libro=None):
+    """
+    Valida un ISBN y comprueba que ningún otro libro lo tenga
+    Los libros desactivados conservan su ISBN
+    Args:
+        libros (Coleccion): Libros cargados
+        isbn (str): ISBN a comprobar
+        id_libro (int): ID del libro que se modifica (None si es nuevo)
+    Returns:
+        str: ISBN-13 normalizado
+    Raises:
+        ErrorBiblioteca: Si el ISBN es inválido o ya está registrado
+    """
+    try:
+        isbn = comprobar_isbn(isbn)
+    except ValueError as e:
+        raise ErrorBiblioteca(str(e)) from None
+    for otro in libros.buscar_por_campo('isbn', isbn):
+        if otro['id'] != id_libro:
+            raise ErrorBiblioteca(f"El ISBN {isbn} ya está registrado en el libro con ID {otro['id']}")
+    return isbn
+
+@medido('modelo')
+@con_reintentos
+def registrar_libro(titulo, isbn, id_autor, id_categoria, año_publicacion, cantidad_copias):
+    """
+    Registra un libro con datos ya validados (sin pedir datos por consola)
+    Args:
+        titulo (str): Título del libro
+        isbn (str): ISBN del libro
+        id_autor (int): ID del autor
+        id_categoria (int): ID de la categoría
+        año_publicacion (int): Año de publicación
+        cantidad_copias (int): Cantidad de copias
+    Returns:
+        dict: Diccionario con los datos del libro
+    Raises:
+        ErrorBiblioteca: Si el ISBN es inválido o ya está registrado
+    """
+    libros = cargar_datos(ARCHIVO_LIBROS)
+    isbn = comprobar_isbn_libre(libros, isbn)
+
     libro = {
         'id': obtener_siguiente_id(CONTADOR_LIBROS),
         'titulo': titulo,
@@ -37,31 +94,26 @@ def crear_libro():
         'activo': True
     }
 
-    libros = cargar_datos(ARCHIVO_LIBROS)
     libros.append(libro)
     guardar_datos(ARCHIVO_LIBROS, libros)
-
-    print(f"\nLibro registrado exitosamente con ID: {libro['id']}")
+    busqueda.actualizar_libros([libro])
     return libro
 
+ENCABEZADO_LIBROS = [
+    f"{'ID':<5} {'Título':<30} {'ISBN':<15} {'Año':<6} {'Disponibles':<12}",
+    "-" * 73,
+]
+
+def _fila_libro(libro):
+    titulo = libro['titulo'][:27] + "..." if len(libro['titulo']) > 30 else libro['titulo']
+    return f"{libro['id']:<5} {titulo:<30} {libro['isbn']:<15} {libro['año_publicacion']:<6} {libro['copias_disponibles']}/{libro['cantidad_copias']}"
+
 def listar_libros():
     """
-    Muestra todos los libros registrados
+    Muestra los libros registrados por páginas
     """
-    libros = cargar_datos(ARCHIVO_LIBROS)
-
-    print("\n--- LISTA DE LIBROS ---\n")
-
-    if not libros:
-        print("No hay libros registrados.")
-    else:
-        print(f"{'ID':<5} {'Título':<30} {'ISBN':<15} {'Año':<6} {'Disponibles':<12}")
-        print("-" * 73)
-        for libro in libros:
-            titulo = libro['titulo'][:27] + "..." if len(libro['titulo']) > 30 else libro['titulo']
-            print(f"{libro['id']:<5} {titulo:<30} {libro['isbn']:<15} {libro['año_publicacion']:<6} {libro['copias_disponibles']}/{libro['cantidad_copias']}")
-
-    print(f"\nTotal de libros: {len(libros)}")
+    print("\n--- LISTA DE LIBROS ---")
+    mostrar_paginado(ARCHIVO_LIBROS, ENCABEZADO_LIBROS, _fila_libro, "\nNo hay libros registrados.")
 
 def buscar_libro():
     """
@@ -70,8 +122,7 @@ def buscar_libro():
     print("\n--- BUSCAR LIBRO ---\n")
 
     id_libro = validar_numero_entero("Ingrese el ID del libro: ", 1)
-    libros = cargar_datos(ARCHIVO_LIBROS)
-    libro = buscar_por_id(libros, id_libro)
+    libro = buscar_registro(ARCHIVO_LIBROS, id_libro)
 
     if libro:
         print("\nLibro encontrado:")
@@ -87,6 +138,67 @@ def buscar_libro():
     else:
         print(f"\nERROR: No se encontró un libro con ID {id_libro}")
 
+@medido('modelo')
+def obtener_libro_por_isbn(isbn):
+    """
+    Busca un libro por su ISBN usando el índice de ISBN
+    Acepta el ISBN-10 o el ISBN-13, con o sin guiones, tal como lo entrega
+    un lector de códigos de barras
+    Args:
+        isbn (str): ISBN leído
+    Returns:
+        dict or None: Libro encontrado o None
+    """
+    limpio = str(isbn).strip().replace("-", "").replace(" ", "").upper()
+    # Los libros cargados antes de normalizar pueden tener el ISBN-10 original
+    for clave in dict.fromkeys((normalizar_isbn(limpio), limpio)):
+        encontrados = buscar_registros(ARCHIVO_LIBROS, 'isbn', clave)
+        if encontrados:
+            return encontrados[0]
+    return None
+
+def buscar_libro_isbn():
+    """
+    Busca un libro por su ISBN (ingresado o escaneado)
+    """
+    print("\n--- BUSCAR LIBRO POR ISBN ---\n")
+
+    isbn = input("ISBN: ").strip()
+    if not isbn:
+        print("\nERROR: Debe ingresar un ISBN.")
+        return
+
+    libro = obtener_libro_por_isbn(isbn)
+    if libro:
+        print(f"\nLibro encontrado: {libro['titulo']} (ID {libro['id']})")
+        print(f"ISBN: {libro['isbn']}")
+        print(f"Copias disponibles: {libro['copias_disponibles']}/{libro['cantidad_copias']}")
+        print(f"Estado: {'Activo' if libro['activo'] else 'Inactivo'}")
+    else:
+        print(f"\nERROR: No se encontró un libro con ISBN {isbn}")
+
+def buscar_libros_por_texto():
+    """
+    Busca libros por palabras del título, del autor o de la categoría
+    """
+    print("\n--- BUSCAR LIBROS POR TEXTO ---\n")
+    print("Escriba palabras del título, autor o categoría (use O para alternativas).")
+
+    consulta = input("Buscar: ").strip()
+    if not consulta:
+        print("\nERROR: Debe ingresar al menos una palabra.")
+        return
+
+    resultados = busqueda.buscar_libros(consulta)
+    if not resultados:
+        print("\nNo se encontraron libros.")
+        return
+
+    print()
+    print("\n".join(ENCABEZADO_LIBROS + [_fila_libro(libro) for libro, _ in resultados]))
+
+    print(f"\nResultados: {len(resultados)}")
+
 def actualizar_libro():
     """
     Actualiza los datos de un libro existente
@@ -94,20 +206,23 @@ def actualizar_libro():
     print("\n--- ACTUALIZAR LIBRO ---\n")
 
     id_libro = validar_numero_entero("Ingrese el ID del libro a actualizar: ", 1)
-    libros = cargar_datos(ARCHIVO_LIBROS)
-    libro = buscar_por_id(libros, id_libro)
+    libro = buscar_registro(ARCHIVO_LIBROS, id_libro)
 
     if libro:
         print(f"\nLibro actual: {libro['titulo']}")
         print("\nIngrese los nuevos datos (Enter para mantener el actual):")
+        cambios = {}
 
         nuevo_titulo = input(f"Título [{libro['titulo']}]: ").strip()
         if nuevo_titulo:
-            libro['titulo'] = nuevo_titulo
+            cambios['titulo'] = nuevo_titulo
 
         nuevo_isbn = input(f"ISBN [{libro['isbn']}]: ").strip()
         if nuevo_isbn:
-            libro['isbn'] = nuevo_isbn
+            try:
+                cambios['isbn'] = comprobar_isbn(nuevo_isbn)
+            except ValueError as e:
+                print(f"ERROR: {e}")
 
         nuevo_año = input(f"Año [{libro['año_publicacion']}]: ").strip()
         if nuevo_año:
@@ -116,7 +231,7 @@ def actualizar_libro():
                 if año_validado < 1500 or año_validado > 2026:
                     print("ERROR: El año debe estar entre 1500 y 2026.")
                 else:
-                    libro['año_publicacion'] = año_validado
+                    cambios['año_publicacion'] = año_validado
             except ValueError:
                 print("ERROR: Debe ingresar un año válido (solo números).")
 
@@ -127,17 +242,59 @@ def actualizar_libro():
                 if cantidad_validada < 1 or cantidad_validada > 1000:
                     print("ERROR: La cantidad debe estar entre 1 y 1000.")
                 else:
-                    diferencia = cantidad_validada - libro['cantidad_copias']
-                    libro['cantidad_copias'] = cantidad_validada
-                    libro['copias_disponibles'] += diferencia
+                    cambios['cantidad_copias'] = cantidad_validada
             except ValueError:
                 print("ERROR: Debe ingresar un número válido (solo números).")
 
-        guardar_datos(ARCHIVO_LIBROS, libros)
+        try:
+            modificar_libro(id_libro, cambios)
+        except ErrorBiblioteca as e:
+            print(f"\nERROR: {e}")
+            return
         print("\nLibro actualizado exitosamente.")
     else:
         print(f"\nERROR: No se encontró un libro con ID {id_libro}")
 
+@medido('modelo')
+@con_reintentos
+def modificar_libro(id_libro, cambios):
+    """
+    Aplica cambios ya validados a un libro
+    Si cambia la cantidad de copias, las disponibles se ajustan en la
+    misma diferencia
+    Args:
+        id_libro (int): ID del libro
+        cambios (dict): Campos a modificar y sus nuevos valores
+    Returns:
+        dict: Libro actualizado
+    Raises:
+        ErrorBiblioteca: Si el libro no existe, el nuevo ISBN es inválido
+            o ya está registrado, o quedarían menos copias que las prestadas
+    """
+    libros = cargar_datos(ARCHIVO_LIBROS)
+    libro = buscar_por_id(libros, id_libro)
+    if not libro:
+        raise ErrorBiblioteca(f"No se encontró un libro con ID {id_libro}")
+    if 'isbn' in cambios and cambios['isbn'] != libro['isbn']:
+        cambios = {**cambios, 'isbn': comprobar_isbn_libre(libros, cambios['isbn'], id_libro)}
+
+    if 'cantidad_copias' in cambios:
+        prestadas = libro['cantidad_copias'] - libro['copias_disponibles']
+        if cambios['cantidad_copias'] < prestadas:
+            raise ErrorBiblioteca(f"No se puede reducir a {cambios['cantidad_copias']} copias: hay {prestadas} copias prestadas.")
+
+    for campo, valor in cambios.items():
+        if campo == 'cantidad_copias':
+            diferencia = valor - libro['cantidad_copias']
+            libro['cantidad_copias'] = valor
+            libro['copias_disponibles'] += diferencia
+        else:
+            libro[campo] = valor
+
+    guardar_datos(ARCHIVO_LIBROS, libros)
+    busqueda.actualizar_libros([libro])
+    return libro
+
 def eliminar_libro():
     """
     Elimina (desactiva) un libro del sistema
@@ -145,15 +302,33 @@ def eliminar_libro():
     print("\n--- ELIMINAR LIBRO ---\n")
 
     id_libro = validar_numero_entero("Ingrese el ID del libro a eliminar: ", 1)
+
+    try:
+        desactivar_libro(id_libro)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return
+    print(f"\nLibro con ID {id_libro} desactivado exitosamente.")
+
+@medido('modelo')
+@con_reintentos
+def desactivar_libro(id_libro):
+    """
+    Desactiva un libro
+    Args:
+        id_libro (int): ID del libro
+    Returns:
+        dict: Libro desactivado
+    """
     libros = cargar_datos(ARCHIVO_LIBROS)
     libro = buscar_por_id(libros, id_libro)
+    if not libro:
+        raise ErrorBiblioteca(f"No se encontró un libro con ID {id_libro}")
 
-    if libro:
-        libro['activo'] = False
-        guardar_datos(ARCHIVO_LIBROS, libros)
-        print(f"\nLibro con ID {id_libro} desactivado exitosamente.")
-    else:
-        print(f"\nERROR: No se encontró un libro con ID {id_libro}")
+    libro['activo'] = False
+    guardar_datos(ARCHIVO_LIBROS, libros)
+    busqueda.actualizar_libros([libro])
+    return libro
 
 def menu_libros():
     """
@@ -169,6 +344,8 @@ def menu_libros():
         print("3. Buscar libro")
         print("4. Actualizar libro")
         print("5. Eliminar libro")
+        print("6. Buscar libros por texto")
+        print("7. Buscar libro por ISBN")
         print("0. Volver al menú principal")
         print("=" * 50)
 
@@ -189,6 +366,12 @@ def menu_libros():
         elif opcion == "5":
             eliminar_libro()
             pausar()
+        elif opcion == "6":
+            buscar_libros_por_texto()
+            pausar()
+        elif opcion == "7":
+            buscar_libro_isbn()
+            pausar()
         elif opcion == "0":
             break
         else:
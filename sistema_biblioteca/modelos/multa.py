@@ -3,14 +3,75 @@ Módulo de gestión de Multas
 Maneja las transacciones de multas por retrasos
 """
 
-from datetime import datetime
-from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id
+from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, buscar_registro, buscar_registros
 from utils.validaciones import validar_numero_entero, validar_numero_decimal, limpiar_pantalla, pausar
+from utils.transacciones import transaccion, con_reintentos
+from utils.errores import ErrorBiblioteca
+from utils.instrumentacion import medido
+from utils.paginacion import mostrar_paginado
+from utils import fechas
 
 # Nombre del archivo para multas
 ARCHIVO_MULTAS = "multas"
 CONTADOR_MULTAS = "multas"
 
+# Totales globales de multas: un único registro que se actualiza junto con
+# cada multa, para no recorrer la colección al consultarlos
+ARCHIVO_RESUMEN_MULTAS = "resumen_multas"
+ID_RESUMEN_MULTAS = 1
+CAMPOS_CUENTA = ('multas_pendientes', 'monto_pendiente', 'total_pagado')
+
+def _calcular_cuenta(multas):
+    """
+    Calcula los saldos de un conjunto de multas recorriéndolas
+    Args:
+        multas (iterable): Multas a sumar
+    Returns:
+        dict: multas_pendientes, monto_pendiente y total_pagado
+    """
+    cuenta = {'multas_pendientes': 0, 'monto_pendiente': 0.0, 'total_pagado': 0.0}
+    for multa in multas:
+        if multa['estado'] == 'pendiente':
+            cuenta['multas_pendientes'] += 1
+            cuenta['monto_pendiente'] += multa['monto']
+        elif multa['estado'] == 'pagada':
+            cuenta['total_pagado'] += multa['monto']
+    cuenta['monto_pendiente'] = round(cuenta['monto_pendiente'], 2)
+    cuenta['total_pagado'] = round(cuenta['total_pagado'], 2)
+    return cuenta
+
+def _preparar_cuenta(usuario, multas):
+    """
+    Completa la cuenta de multas de un usuario creado antes de que el
+    registro guardara los montos, calculándola desde sus multas
+    """
+    if 'monto_pendiente' not in usuario or 'total_pagado' not in usuario:
+        usuario.update(_calcular_cuenta(multas.buscar_por_campo('id_usuario', usuario['id'])))
+
+def _cargar_resumen(multas):
+    """
+    Carga el registro de totales globales, creándolo desde las multas si
+    todavía no existe
+    Returns:
+        tuple: (colección de resumen, registro de totales)
+    """
+    resumenes = cargar_datos(ARCHIVO_RESUMEN_MULTAS)
+    resumen = buscar_por_id(resumenes, ID_RESUMEN_MULTAS)
+    if resumen is None:
+        resumen = {'id': ID_RESUMEN_MULTAS, **_calcular_cuenta(multas)}
+        resumenes.append(resumen)
+    return resumenes, resumen
+
+def _sumar_a_cuenta(cuenta, pendientes, monto_pendiente, pagado):
+    """
+    Aplica una variación a una cuenta (de un usuario o la global)
+    """
+    cuenta['multas_pendientes'] = max(0, cuenta.get('multas_pendientes', 0) + pendientes)
+    cuenta['monto_pendiente'] = max(0.0, round(cuenta.get('monto_pendiente', 0.0) + monto_pendiente, 2))
+    cuenta['total_pagado'] = round(cuenta.get('total_pagado', 0.0) + pagado, 2)
+
+@medido('modelo')
+@con_reintentos
 def crear_multa_automatica(id_usuario, monto, concepto):
     """
     Crea una multa automáticamente (llamada desde préstamos)
@@ -26,23 +87,33 @@ def crear_multa_automatica(id_usuario, monto, concepto):
         'id_usuario': id_usuario,
         'monto': round(monto, 2),
         'concepto': concepto,
-        'fecha_generacion': datetime.now().strftime("%d/%m/%Y"),
+        'fecha_generacion': fechas.hoy(),
         'fecha_pago': None,
         'estado': 'pendiente'  # pendiente, pagada
     }
 
-    # Guardar multa
-    multas = cargar_datos(ARCHIVO_MULTAS)
-    multas.append(multa)
-    guardar_datos(ARCHIVO_MULTAS, multas)
-
-    # Actualizar contador de multas del usuario
-    from modelos.usuario import ARCHIVO_USUARIOS
-    usuarios = cargar_datos(ARCHIVO_USUARIOS)
-    usuario = buscar_por_id(usuarios, id_usuario)
-    if usuario:
-        usuario['multas_pendientes'] = usuario.get('multas_pendientes', 0) + 1
-        guardar_datos(ARCHIVO_USUARIOS, usuarios)
+    # Multa, cuenta del usuario y totales se guardan juntos (si se llama
+    # desde una devolución, se suman a la transacción de la devolución)
+    with transaccion():
+        multas = cargar_datos(ARCHIVO_MULTAS)
+        from modelos.usuario import ARCHIVO_USUARIOS
+        usuarios = cargar_datos(ARCHIVO_USUARIOS)
+        usuario = buscar_por_id(usuarios, id_usuario)
+        # Las cuentas que faltan se calculan antes de agregar la multa
+        if usuario:
+            _preparar_cuenta(usuario, multas)
+        resumenes, resumen = _cargar_resumen(multas)
+
+        # Guardar multa
+        multas.append(multa)
+        guardar_datos(ARCHIVO_MULTAS, multas)
+
+        # Actualizar la cuenta de multas del usuario y los totales
+        if usuario:
+            _sumar_a_cuenta(usuario, 1, multa['monto'], 0.0)
+            guardar_datos(ARCHIVO_USUARIOS, usuarios)
+        _sumar_a_cuenta(resumen, 1, multa['monto'], 0.0)
+        guardar_datos(ARCHIVO_RESUMEN_MULTAS, resumenes)
 
     return multa
 
@@ -77,57 +148,123 @@ def pagar_multa():
     print("\n--- PAGAR MULTA ---\n")
 
     id_multa = validar_numero_entero("ID de la multa: ", 1)
+
+    try:
+        multa = registrar_pago_multa(id_multa)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return
+
+    print(f"\n Multa pagada exitosamente. Monto: ${multa['monto']:.2f}")
+
+@medido('modelo')
+@con_reintentos
+def registrar_pago_multa(id_multa):
+    """
+    Registra el pago de una multa sin pedir datos por consola
+    Args:
+        id_multa (int): ID de la multa
+    Returns:
+        dict: Multa pagada
+    Raises:
+        ErrorBiblioteca: Si la multa no existe o ya fue pagada
+    """
     multas = cargar_datos(ARCHIVO_MULTAS)
     multa = buscar_por_id(multas, id_multa)
 
     if not multa:
-        print(f"\nERROR: No se encontró una multa con ID {id_multa}")
-        return
+        raise ErrorBiblioteca(f"No se encontró una multa con ID {id_multa}")
 
     if multa['estado'] == 'pagada':
-        print("\nERROR: Esta multa ya fue pagada.")
-        return
+        raise ErrorBiblioteca("Esta multa ya fue pagada.")
+
+    # Multa, cuenta del usuario y totales se guardan en una sola transacción
+    with transaccion():
+        from modelos.usuario import ARCHIVO_USUARIOS
+        usuarios = cargar_datos(ARCHIVO_USUARIOS)
+        usuario = buscar_por_id(usuarios, multa['id_usuario'])
+        if usuario:
+            _preparar_cuenta(usuario, multas)
+        resumenes, resumen = _cargar_resumen(multas)
+
+        # Registrar pago
+        multa['fecha_pago'] = fechas.hoy()
+        multa['estado'] = 'pagada'
+        guardar_datos(ARCHIVO_MULTAS, multas)
+
+        # Pasar el monto de pendiente a pagado en la cuenta y en los totales
+        if usuario:
+            _sumar_a_cuenta(usuario, -1, -multa['monto'], multa['monto'])
+            guardar_datos(ARCHIVO_USUARIOS, usuarios)
+        _sumar_a_cuenta(resumen, -1, -multa['monto'], multa['monto'])
+        guardar_datos(ARCHIVO_RESUMEN_MULTAS, resumenes)
 
-    # Registrar pago
-    multa['fecha_pago'] = datetime.now().strftime("%d/%m/%Y")
-    multa['estado'] = 'pagada'
-    guardar_datos(ARCHIVO_MULTAS, multas)
+    return multa
 
-    # Actualizar contador de multas del usuario
+@medido('modelo')
+def obtener_cuenta_multas(id_usuario):
+    """
+    Obtiene la cuenta de multas de un usuario desde su registro, sin
+    recorrer las multas
+    Args:
+        id_usuario (int): ID del usuario
+    Returns:
+        dict or None: multas_pendientes, monto_pendiente y total_pagado, o
+            None si el usuario no existe
+    """
     from modelos.usuario import ARCHIVO_USUARIOS
-    usuarios = cargar_datos(ARCHIVO_USUARIOS)
-    usuario = buscar_por_id(usuarios, multa['id_usuario'])
-    if usuario:
-        usuario['multas_pendientes'] = max(0, usuario.get('multas_pendientes', 0) - 1)
-        guardar_datos(ARCHIVO_USUARIOS, usuarios)
+    usuario = buscar_registro(ARCHIVO_USUARIOS, id_usuario)
+    if not usuario:
+        return None
+    if 'monto_pendiente' not in usuario or 'total_pagado' not in usuario:
+        return _calcular_cuenta(buscar_registros(ARCHIVO_MULTAS, 'id_usuario', id_usuario))
+    return {campo: usuario[campo] for campo in CAMPOS_CUENTA}
 
-    print(f"\n Multa pagada exitosamente. Monto: ${multa['monto']:.2f}")
+@medido('modelo')
+def obtener_resumen_multas():
+    """
+    Obtiene los totales globales de multas en O(1)
+    Returns:
+        dict: multas_pendientes, monto_pendiente y total_pagado
+    """
+    resumen = buscar_registro(ARCHIVO_RESUMEN_MULTAS, ID_RESUMEN_MULTAS)
+    if resumen is None:
+        # Todavía no se creó ni pagó ninguna multa con el resumen activo
+        return _calcular_cuenta(cargar_datos(ARCHIVO_MULTAS))
+    return {campo: resumen[campo] for campo in CAMPOS_CUENTA}
 
-def listar_multas():
+def mostrar_resumen_multas():
     """
-    Muestra todas las multas registradas
+    Muestra los totales globales de multas
     """
-    multas = cargar_datos(ARCHIVO_MULTAS)
+    resumen = obtener_resumen_multas()
 
-    print("\n--- LISTA DE MULTAS ---\n")
+    print("\n--- RESUMEN DE MULTAS ---\n")
+    print(f"Multas pendientes: {resumen['multas_pendientes']}")
+    print(f"Monto pendiente: ${resumen['monto_pendiente']:.2f}")
+    print(f"Total cobrado: ${resumen['total_pagado']:.2f}")
 
-    if not multas:
-        print("No hay multas registradas.")
-    else:
-        print(f"{'ID':<5} {'Usuario':<10} {'Monto':<10} {'Fecha Gen.':<15} {'Estado':<10}")
-        print("-" * 55)
-        for multa in multas:
-            monto = f"${multa['monto']:.2f}"
-            print(f"{multa['id']:<5} {multa['id_usuario']:<10} {monto:<10} {multa['fecha_generacion']:<15} {multa['estado']:<10}")
+ENCABEZADO_MULTAS = [
+    f"{'ID':<5} {'Usuario':<10} {'Monto':<10} {'Fecha Gen.':<15} {'Estado':<10}",
+    "-" * 55,
+]
 
-    print(f"\nTotal de multas: {len(multas)}")
+def _fila_multa(multa):
+    monto = f"${multa['monto']:.2f}"
+    return f"{multa['id']:<5} {multa['id_usuario']:<10} {monto:<10} {fechas.formatear(multa['fecha_generacion']):<15} {multa['estado']:<10}"
+
+def listar_multas():
+    """
+    Muestra las multas registradas por páginas
+    """
+    print("\n--- LISTA DE MULTAS ---")
+    mostrar_paginado(ARCHIVO_MULTAS, ENCABEZADO_MULTAS, _fila_multa, "\nNo hay multas registradas.")
 
 def listar_multas_pendientes():
     """
     Muestra solo las multas pendientes
     """
-    multas = cargar_datos(ARCHIVO_MULTAS)
-    pendientes = [m for m in multas if m['estado'] == 'pendiente']
+    pendientes = buscar_registros(ARCHIVO_MULTAS, 'estado', 'pendiente')
 
     print("\n--- MULTAS PENDIENTES ---\n")
 
@@ -141,8 +278,30 @@ def listar_multas_pendientes():
             concepto = multa['concepto'][:27] + "..." if len(multa['concepto']) > 30 else multa['concepto']
             print(f"{multa['id']:<5} {multa['id_usuario']:<10} {monto:<10} {concepto:<30}")
 
-    total = sum(m['monto'] for m in pendientes)
-    print(f"\nTotal de multas pendientes: {len(pendientes)} - Monto total: ${total:.2f}")
+    resumen = obtener_resumen_multas()
+    print(f"\nTotal de multas pendientes: {resumen['multas_pendientes']} - Monto total: ${resumen['monto_pendiente']:.2f}")
+
+def listar_multas_usuario():
+    """
+    Muestra las multas de un usuario
+    """
+    print("\n--- MULTAS DE UN USUARIO ---\n")
+
+    id_usuario = validar_numero_entero("ID del usuario: ", 1)
+    multas = buscar_registros(ARCHIVO_MULTAS, 'id_usuario', id_usuario)
+
+    if not multas:
+        print(f"\nEl usuario {id_usuario} no tiene multas registradas.")
+        return
+
+    print(f"\n{'ID':<5} {'Monto':<10} {'Fecha Gen.':<15} {'Estado':<10}")
+    print("-" * 45)
+    for multa in multas:
+        monto = f"${multa['monto']:.2f}"
+        print(f"{multa['id']:<5} {monto:<10} {fechas.formatear(multa['fecha_generacion']):<15} {multa['estado']:<10}")
+
+    cuenta = obtener_cuenta_multas(id_usuario) or _calcular_cuenta(multas)
+    print(f"\nTotal de multas: {len(multas)} - Monto pendiente: ${cuenta['monto_pendiente']:.2f} - Total pagado: ${cuenta['total_pagado']:.2f}")
 
 def buscar_multa():
     """
@@ -151,8 +310,7 @@ def buscar_multa():
     print("\n--- BUSCAR MULTA ---\n")
 
     id_multa = validar_numero_entero("Ingrese el ID de la multa: ", 1)
-    multas = cargar_datos(ARCHIVO_MULTAS)
-    multa = buscar_por_id(multas, id_multa)
+    multa = buscar_registro(ARCHIVO_MULTAS, id_multa)
 
     if multa:
         print("\n Multa encontrada:")
@@ -160,8 +318,8 @@ def buscar_multa():
         print(f"ID Usuario: {multa['id_usuario']}")
         print(f"Monto: ${multa['monto']:.2f}")
         print(f"Concepto: {multa['concepto']}")
-        print(f"Fecha de generación: {multa['fecha_generacion']}")
-        print(f"Fecha de pago: {multa['fecha_pago'] or 'No pagada'}")
+        print(f"Fecha de generación: {fechas.formatear(multa['fecha_generacion'])}")
+        print(f"Fecha de pago: {fechas.formatear(multa['fecha_pago']) or 'No pagada'}")
         print(f"Estado: {multa['estado']}")
     else:
         print(f"\nERROR: No se encontró una multa con ID {id_multa}")
@@ -180,6 +338,8 @@ def menu_multas():
         print("3. Listar todas las multas")
         print("4. Listar multas pendientes")
         print("5. Buscar multa")
+        print("6. Multas de un usuario")
+        print("7. Resumen de multas")
         print("0. Volver al menú principal")
         print("=" * 50)
 
@@ -200,6 +360,12 @@ def menu_multas():
         elif opcion == "5":
             buscar_multa()
             pausar()
+        elif opcion == "6":
+            listar_multas_usuario()
+            pausar()
+        elif opcion == "7":
+            mostrar_resumen_multas()
+            pausar()
         elif opcion == "0":
             break
         else:
@@ -3,14 +3,25 @@ Módulo de gestión de Préstamos
 Maneja las transacciones de préstamos de libros
 """
 
-from datetime import datetime, timedelta
-from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, eliminar_por_id
-from utils.validaciones import validar_numero_entero, validar_fecha, limpiar_pantalla, pausar
+from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, buscar_registro, buscar_registros, eliminar_por_id, actualizar_menores
+from utils.validaciones import validar_numero_entero, validar_fecha, validar_fecha_opcional, limpiar_pantalla, pausar
+from utils.transacciones import transaccion, con_reintentos
+from utils.errores import ErrorBiblioteca
+from utils.instrumentacion import medido
+from utils.paginacion import mostrar_paginado
+from utils import fechas
 
 # Nombre del archivo para préstamos
 ARCHIVO_PRESTAMOS = "prestamos"
 CONTADOR_PRESTAMOS = "prestamos"
 
+# Días de préstamo y monto de la multa por cada día de retraso
+DIAS_PRESTAMO = 14
+MULTA_POR_DIA = 1.0
+
+# Filas por grupo del reporte de circulación en la consola
+FILAS_REPORTE_CIRCULACION = 10
+
 def crear_prestamo():
     """
     Registra un nuevo préstamo de libro
@@ -22,19 +33,43 @@ def crear_prestamo():
     id_usuario = validar_numero_entero("ID del usuario: ", 1)
     id_libro = validar_numero_entero("ID del libro: ", 1)
 
+    try:
+        prestamo = registrar_prestamo(id_usuario, id_libro)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return None
+
+    print(f"\n Préstamo registrado exitosamente con ID: {prestamo['id']}")
+    print(f"Fecha de devolución esperada: {fechas.formatear(prestamo['fecha_devolucion_esperada'])}")
+    return prestamo
+
+@medido('modelo')
+@con_reintentos
+def registrar_prestamo(id_usuario, id_libro):
+    """
+    Registra un préstamo sin pedir datos por consola
+    Args:
+        id_usuario (int): ID del usuario
+        id_libro (int): ID del libro
+    Returns:
+        dict: Diccionario con los datos del préstamo
+    Raises:
+        ErrorBiblioteca: Si el usuario o el libro no permiten el préstamo
+    """
     # Verificar que el usuario existe y está activo
     from modelos.usuario import ARCHIVO_USUARIOS
     usuarios = cargar_datos(ARCHIVO_USUARIOS)
     usuario = buscar_por_id(usuarios, id_usuario)
 
     if not usuario or not usuario.get('activo', False):
-        print("\nERROR: Usuario no encontrado o inactivo.")
-        return None
+        raise ErrorBiblioteca("Usuario no encontrado o inactivo.")
 
-    # Verificar que el usuario no tenga multas pendientes
+    # Verificar que el usuario no tenga multas pendientes (la cuenta está
+    # en el registro del usuario, sin recorrer las multas)
     if usuario.get('multas_pendientes', 0) > 0:
-        print(f"\nERROR: El usuario tiene {usuario['multas_pendientes']} multas pendientes. Debe pagarlas primero.")
-        return None
+        monto = usuario.get('monto_pendiente')
+        detalle = f" por ${monto:.2f}" if monto is not None else ""
+        raise ErrorBiblioteca(f"El usuario tiene {usuario['multas_pendientes']} multas pendientes{detalle}. Debe pagarlas primero.")
 
     # Verificar que el libro existe y tiene copias disponibles
     from modelos.libro import ARCHIVO_LIBROS
@@ -42,16 +77,14 @@ def crear_prestamo():
     libro = buscar_por_id(libros, id_libro)
 
     if not libro or not libro.get('activo', False):
-        print("\nERROR: Libro no encontrado o inactivo.")
-        return None
+        raise ErrorBiblioteca("Libro no encontrado o inactivo.")
 
     if libro.get('copias_disponibles', 0) <= 0:
-        print("\nERROR: No hay copias disponibles de este libro.")
-        return None
+        raise ErrorBiblioteca("No hay copias disponibles de este libro.")
 
-    # Calcular fechas
-    fecha_prestamo = datetime.now().strftime("%d/%m/%Y")
-    fecha_devolucion = (datetime.now() + timedelta(days=14)).strftime("%d/%m/%Y")
+    # Calcular fechas (números de día)
+    fecha_prestamo = fechas.hoy()
+    fecha_devolucion = fecha_prestamo + DIAS_PRESTAMO
 
     prestamo = {
         'id': obtener_siguiente_id(CONTADOR_PRESTAMOS),
@@ -64,17 +97,17 @@ def crear_prestamo():
         'multa_generada': False
     }
 
-    # Actualizar libro (reducir copias disponibles)
-    libro['copias_disponibles'] -= 1
-    guardar_datos(ARCHIVO_LIBROS, libros)
+    # Libro y préstamo se guardan juntos en una sola transacción
+    with transaccion():
+        # Actualizar libro (reducir copias disponibles)
+        libro['copias_disponibles'] -= 1
+        guardar_datos(ARCHIVO_LIBROS, libros)
 
-    # Guardar préstamo
-    prestamos = cargar_datos(ARCHIVO_PRESTAMOS)
-    prestamos.append(prestamo)
-    guardar_datos(ARCHIVO_PRESTAMOS, prestamos)
+        # Guardar préstamo
+        prestamos = cargar_datos(ARCHIVO_PRESTAMOS)
+        prestamos.append(prestamo)
+        guardar_datos(ARCHIVO_PRESTAMOS, prestamos)
 
-    print(f"\n Préstamo registrado exitosamente con ID: {prestamo['id']}")
-    print(f"Fecha de devolución esperada: {fecha_devolucion}")
     return prestamo
 
 def devolver_libro():
@@ -84,72 +117,197 @@ def devolver_libro():
     print("\n--- DEVOLVER LIBRO ---\n")
 
     id_prestamo = validar_numero_entero("ID del préstamo: ", 1)
+
+    try:
+        resultado = registrar_devolucion(id_prestamo)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return
+
+    if resultado['dias_retraso'] > 0:
+        print(f"\nADVERTENCIA: Devolución con {resultado['dias_retraso']} días de retraso.")
+        print(f"Se generó una multa de ${resultado['monto_multa']:.2f}")
+
+    print(f"\n Libro devuelto exitosamente.")
+
+@medido('modelo')
+@con_reintentos
+def registrar_devolucion(id_prestamo):
+    """
+    Registra la devolución de un préstamo sin pedir datos por consola
+    Args:
+        id_prestamo (int): ID del préstamo
+    Returns:
+        dict: Préstamo actualizado, días de retraso y monto de la multa
+    Raises:
+        ErrorBiblioteca: Si el préstamo no existe o ya fue devuelto
+    """
     prestamos = cargar_datos(ARCHIVO_PRESTAMOS)
     prestamo = buscar_por_id(prestamos, id_prestamo)
 
     if not prestamo:
-        print(f"\nERROR: No se encontró un préstamo con ID {id_prestamo}")
-        return
+        raise ErrorBiblioteca(f"No se encontró un préstamo con ID {id_prestamo}")
 
     if prestamo['estado'] == 'devuelto':
-        print("\nERROR: Este préstamo ya fue devuelto.")
+        raise ErrorBiblioteca("Este préstamo ya fue devuelto.")
+
+    monto_multa = 0.0
+
+    # Multa, usuario, libro y préstamo se guardan juntos en una sola transacción
+    with transaccion():
+        # Registrar fecha de devolución
+        fecha_devolucion = fechas.hoy()
+        prestamo['fecha_devolucion_real'] = fecha_devolucion
+        prestamo['estado'] = 'devuelto'
+
+        # Verificar si hay multa por retraso
+        dias_retraso = fecha_devolucion - fechas.a_ordinal(prestamo['fecha_devolucion_esperada'])
+
+        if dias_retraso > 0:
+            # Generar multa
+            from modelos.multa import crear_multa_automatica
+            monto_multa = dias_retraso * MULTA_POR_DIA
+            crear_multa_automatica(prestamo['id_usuario'], monto_multa, f"Retraso de {dias_retraso} días en préstamo #{id_prestamo}")
+            prestamo['multa_generada'] = True
+
+        # Actualizar libro (aumentar copias disponibles)
+        from modelos.libro import ARCHIVO_LIBROS
+        libros = cargar_datos(ARCHIVO_LIBROS)
+        libro = buscar_por_id(libros, prestamo['id_libro'])
+        if libro:
+            libro['copias_disponibles'] += 1
+            guardar_datos(ARCHIVO_LIBROS, libros)
+
+        # Guardar cambios
+        guardar_datos(ARCHIVO_PRESTAMOS, prestamos)
+
+    return {'prestamo': prestamo, 'dias_retraso': max(dias_retraso, 0), 'monto_multa': monto_multa}
+
+@medido('modelo')
+@con_reintentos
+def marcar_prestamos_vencidos(fecha_corte=None):
+    """
+    Marca como 'vencido' cada préstamo activo cuya fecha de devolución
+    esperada ya pasó, con un único guardado
+    Usa el índice ordenado por vencimiento de los préstamos activos, que se
+    actualiza con cada préstamo y devolución: solo se leen los préstamos ya
+    vencidos, sin recorrer los activos al día ni el historial
+    Args:
+        fecha_corte (int or date): Día de referencia (por defecto, hoy)
+    Returns:
+        list: Tuplas (préstamo, días de atraso) ordenadas por vencimiento
+    Raises:
+        ErrorBiblioteca: Si la fecha de corte es posterior a hoy (el cambio
+            de estado no se puede deshacer; para estimar atrasos a una fecha
+            futura está calcular_atrasos)
+    """
+    hoy = fechas.a_ordinal(fecha_corte) if fecha_corte is not None else fechas.hoy()
+    if hoy > fechas.hoy():
+        raise ErrorBiblioteca("La fecha de corte no puede ser posterior a hoy.")
+    vencidos = actualizar_menores(ARCHIVO_PRESTAMOS, 'vencimiento_activos', hoy, {'estado': 'vencido'})
+    return [(prestamo, hoy - dia_vencimiento) for dia_vencimiento, prestamo in vencidos]
+
+@medido('modelo')
+def calcular_atrasos(prestamos, fecha_corte=None):
+    """
+    Calcula los días de atraso y la multa que correspondería a cada préstamo
+    de un lote, con una sola operación sobre arreglos de días
+    Args:
+        prestamos (list): Préstamos a evaluar
+        fecha_corte (int or date): Día de referencia (por defecto, hoy)
+    Returns:
+        tuple: (días de atraso, montos) en el mismo orden que los préstamos
+    """
+    hoy = fechas.a_ordinal(fecha_corte) if fecha_corte is not None else fechas.hoy()
+    vencimientos = fechas.arreglo_de_dias(prestamo['fecha_devolucion_esperada'] for prestamo in prestamos)
+    dias = fechas.dias_de_atraso(vencimientos, hoy)
+    return dias, fechas.montos_por_dias(dias, MULTA_POR_DIA)
+
+def _mostrar_atrasos(prestamos, fecha_corte=None):
+    """
+    Muestra una tabla de préstamos con sus días de atraso y multa estimada
+    Args:
+        prestamos (list): Préstamos a mostrar
+        fecha_corte (int or date): Día de referencia (por defecto, hoy)
+    """
+    dias, montos = calcular_atrasos(prestamos, fecha_corte)
+    print(f"{'ID':<5} {'Usuario':<10} {'Libro':<10} {'Devolución':<15} {'Días atraso':<12} {'Multa est.':<10}")
+    print("-" * 65)
+    for prestamo, dias_atraso, monto in zip(prestamos, dias, montos):
+        monto = f"${monto:.2f}"
+        print(f"{prestamo['id']:<5} {prestamo['id_usuario']:<10} {prestamo['id_libro']:<10} {fechas.formatear(prestamo['fecha_devolucion_esperada']):<15} {int(dias_atraso):<12} {monto:<10}")
+    print(f"\nMulta estimada total: ${float(sum(montos)):.2f}")
+
+def procesar_vencimientos():
+    """
+    Marca los préstamos vencidos y muestra el reporte
+    """
+    print("\n--- PROCESAR VENCIMIENTOS ---\n")
+
+    try:
+        vencidos = marcar_prestamos_vencidos()
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
         return
 
-    # Registrar fecha de devolución
-    fecha_devolucion = datetime.now().strftime("%d/%m/%Y")
-    prestamo['fecha_devolucion_real'] = fecha_devolucion
-    prestamo['estado'] = 'devuelto'
-
-    # Verificar si hay multa por retraso
-    fecha_esperada = datetime.strptime(prestamo['fecha_devolucion_esperada'], "%d/%m/%Y")
-    fecha_real = datetime.now()
-    dias_retraso = (fecha_real - fecha_esperada).days
-
-    if dias_retraso > 0:
-        # Generar multa
-        from modelos.multa import crear_multa_automatica
-        monto_multa = dias_retraso * 1.0  # $1 por día de retraso
-        crear_multa_automatica(prestamo['id_usuario'], monto_multa, f"Retraso de {dias_retraso} días en préstamo #{id_prestamo}")
-        prestamo['multa_generada'] = True
-        print(f"\nADVERTENCIA: Devolución con {dias_retraso} días de retraso.")
-        print(f"Se generó una multa de ${monto_multa:.2f}")
-
-    # Actualizar libro (aumentar copias disponibles)
-    from modelos.libro import ARCHIVO_LIBROS
-    libros = cargar_datos(ARCHIVO_LIBROS)
-    libro = buscar_por_id(libros, prestamo['id_libro'])
-    if libro:
-        libro['copias_disponibles'] += 1
-        guardar_datos(ARCHIVO_LIBROS, libros)
+    if not vencidos:
+        print("No hay préstamos activos vencidos.")
+        return
 
-    # Guardar cambios
-    guardar_datos(ARCHIVO_PRESTAMOS, prestamos)
-    print(f"\n Libro devuelto exitosamente.")
+    _mostrar_atrasos([prestamo for prestamo, _ in vencidos])
+    print(f"Préstamos marcados como vencidos: {len(vencidos)}")
 
-def listar_prestamos():
+def listar_prestamos_vencidos():
     """
-    Muestra todos los préstamos registrados
+    Muestra los préstamos marcados como vencidos
     """
-    prestamos = cargar_datos(ARCHIVO_PRESTAMOS)
+    vencidos = buscar_registros(ARCHIVO_PRESTAMOS, 'estado', 'vencido')
 
-    print("\n--- LISTA DE PRÉSTAMOS ---\n")
+    print("\n--- PRÉSTAMOS VENCIDOS ---\n")
 
-    if not prestamos:
-        print("No hay préstamos registrados.")
+    if not vencidos:
+        print("No hay préstamos vencidos.")
     else:
-        print(f"{'ID':<5} {'Usuario':<10} {'Libro':<10} {'Fecha Préstamo':<15} {'Estado':<10}")
-        print("-" * 55)
-        for prestamo in prestamos:
-            print(f"{prestamo['id']:<5} {prestamo['id_usuario']:<10} {prestamo['id_libro']:<10} {prestamo['fecha_prestamo']:<15} {prestamo['estado']:<10}")
+        _mostrar_atrasos(vencidos)
+
+    print(f"\nTotal de préstamos vencidos: {len(vencidos)}")
+
+def mostrar_reporte_circulacion():
+    """
+    Muestra los préstamos por categoría, autor y mes de un período
+    (para exportarlo a CSV o JSON: python -m utils.circulacion)
+    """
+    from utils import circulacion
+
+    print("\n--- REPORTE DE CIRCULACIÓN ---\n")
+    print("Período de los préstamos (Enter para todo el historial)")
+    desde = validar_fecha_opcional("Desde (DD/MM/AAAA): ")
+    hasta = validar_fecha_opcional("Hasta (DD/MM/AAAA): ")
 
-    print(f"\nTotal de préstamos: {len(prestamos)}")
+    informe = circulacion.analizar_circulacion(desde, hasta)
+    print()
+    print(circulacion.formatear_tabla(circulacion.recortar(informe, FILAS_REPORTE_CIRCULACION)))
+
+ENCABEZADO_PRESTAMOS = [
+    f"{'ID':<5} {'Usuario':<10} {'Libro':<10} {'Fecha Préstamo':<15} {'Estado':<10}",
+    "-" * 55,
+]
+
+def _fila_prestamo(prestamo):
+    return f"{prestamo['id']:<5} {prestamo['id_usuario']:<10} {prestamo['id_libro']:<10} {fechas.formatear(prestamo['fecha_prestamo']):<15} {prestamo['estado']:<10}"
+
+def listar_prestamos():
+    """
+    Muestra los préstamos registrados por páginas
+    """
+    print("\n--- LISTA DE PRÉSTAMOS ---")
+    mostrar_paginado(ARCHIVO_PRESTAMOS, ENCABEZADO_PRESTAMOS, _fila_prestamo, "\nNo hay préstamos registrados.")
 
 def listar_prestamos_activos():
     """
     Muestra solo los préstamos activos
     """
-    prestamos = cargar_datos(ARCHIVO_PRESTAMOS)
-    activos = [p for p in prestamos if p['estado'] == 'activo']
+    activos = buscar_registros(ARCHIVO_PRESTAMOS, 'estado', 'activo')
 
     print("\n--- PRÉSTAMOS ACTIVOS ---\n")
 
@@ -159,10 +317,57 @@ def listar_prestamos_activos():
         print(f"{'ID':<5} {'Usuario':<10} {'Libro':<10} {'Fecha Préstamo':<15} {'Devolución':<15}")
         print("-" * 60)
         for prestamo in activos:
-            print(f"{prestamo['id']:<5} {prestamo['id_usuario']:<10} {prestamo['id_libro']:<10} {prestamo['fecha_prestamo']:<15} {prestamo['fecha_devolucion_esperada']:<15}")
+            print(f"{prestamo['id']:<5} {prestamo['id_usuario']:<10} {prestamo['id_libro']:<10} {fechas.formatear(prestamo['fecha_prestamo']):<15} {fechas.formatear(prestamo['fecha_devolucion_esperada']):<15}")
 
     print(f"\nTotal de préstamos activos: {len(activos)}")
 
+def _mostrar_prestamos(prestamos):
+    """
+    Muestra una tabla de préstamos
+    Args:
+        prestamos (list): Préstamos a mostrar
+    """
+    print(f"{'ID':<5} {'Usuario':<10} {'Libro':<10} {'Fecha Préstamo':<15} {'Devolución':<15} {'Estado':<10}")
+    print("-" * 70)
+    for prestamo in prestamos:
+        print(f"{prestamo['id']:<5} {prestamo['id_usuario']:<10} {prestamo['id_libro']:<10} {fechas.formatear(prestamo['fecha_prestamo']):<15} {fechas.formatear(prestamo['fecha_devolucion_esperada']):<15} {prestamo['estado']:<10}")
+
+def listar_prestamos_usuario():
+    """
+    Muestra los préstamos de un usuario
+    """
+    print("\n--- PRÉSTAMOS DE UN USUARIO ---\n")
+
+    id_usuario = validar_numero_entero("ID del usuario: ", 1)
+    prestamos = buscar_registros(ARCHIVO_PRESTAMOS, 'id_usuario', id_usuario)
+
+    if not prestamos:
+        print(f"\nEl usuario {id_usuario} no tiene préstamos registrados.")
+        return
+
+    print()
+    _mostrar_prestamos(prestamos)
+    activos = sum(1 for prestamo in prestamos if prestamo['estado'] != 'devuelto')
+    print(f"\nTotal de préstamos: {len(prestamos)} - Sin devolver: {activos}")
+
+def listar_prestamos_libro():
+    """
+    Muestra los préstamos de un libro
+    """
+    print("\n--- PRÉSTAMOS DE UN LIBRO ---\n")
+
+    id_libro = validar_numero_entero("ID del libro: ", 1)
+    prestamos = buscar_registros(ARCHIVO_PRESTAMOS, 'id_libro', id_libro)
+
+    if not prestamos:
+        print(f"\nEl libro {id_libro} no tiene préstamos registrados.")
+        return
+
+    print()
+    _mostrar_prestamos(prestamos)
+    activos = sum(1 for prestamo in prestamos if prestamo['estado'] != 'devuelto')
+    print(f"\nTotal de préstamos: {len(prestamos)} - Sin devolver: {activos}")
+
 def buscar_prestamo():
     """
     Busca un préstamo por su ID
@@ -170,17 +375,16 @@ def buscar_prestamo():
     print("\n--- BUSCAR PRÉSTAMO ---\n")
 
     id_prestamo = validar_numero_entero("Ingrese el ID del préstamo: ", 1)
-    prestamos = cargar_datos(ARCHIVO_PRESTAMOS)
-    prestamo = buscar_por_id(prestamos, id_prestamo)
+    prestamo = buscar_registro(ARCHIVO_PRESTAMOS, id_prestamo)
 
     if prestamo:
         print("\n Préstamo encontrado:")
         print(f"ID: {prestamo['id']}")
         print(f"ID Usuario: {prestamo['id_usuario']}")
         print(f"ID Libro: {prestamo['id_libro']}")
-        print(f"Fecha de préstamo: {prestamo['fecha_prestamo']}")
-        print(f"Fecha de devolución esperada: {prestamo['fecha_devolucion_esperada']}")
-        print(f"Fecha de devolución real: {prestamo['fecha_devolucion_real'] or 'No devuelto'}")
+        print(f"Fecha de préstamo: {fechas.formatear(prestamo['fecha_prestamo'])}")
+        print(f"Fecha de devolución esperada: {fechas.formatear(prestamo['fecha_devolucion_esperada'])}")
+        print(f"Fecha de devolución real: {fechas.formatear(prestamo['fecha_devolucion_real']) or 'No devuelto'}")
         print(f"Estado: {prestamo['estado']}")
         print(f"Multa generada: {'Sí' if prestamo['multa_generada'] else 'No'}")
     else:
@@ -200,6 +404,11 @@ def menu_prestamos():
         print("3. Listar todos los préstamos")
         print("4. Listar préstamos activos")
         print("5. Buscar préstamo")
+        print("6. Préstamos de un usuario")
+        print("7. Préstamos de un libro")
+        print("8. Procesar vencimientos")
+        print("9. Listar préstamos vencidos")
+        print("10. Reporte de circulación")
         print("0. Volver al menú principal")
         print("=" * 50)
 
@@ -220,8 +429,27 @@ def menu_prestamos():
         elif opcion == "5":
             buscar_prestamo()
             pausar()
+        elif opcion == "6":
+            listar_prestamos_usuario()
+            pausar()
+        elif opcion == "7":
+            listar_prestamos_libro()
+            pausar()
+        elif opcion == "8":
+            procesar_vencimientos()
+            pausar()
+        elif opcion == "9":
+            listar_prestamos_vencidos()
+            pausar()
+        elif opcion == "10":
+            mostrar_reporte_circulacion()
+            pausar()
         elif opcion == "0":
             break
         else:
             print("\nERROR: Opción inválida.")
             pausar()
+
+if __name__ == "__main__":
+    # Proceso nocturno: python -m modelos.prestamo
+    procesar_vencimientos()
@@ -3,8 +3,12 @@ Módulo de gestión de Usuarios
 Maneja el CRUD de usuarios de la biblioteca
 """
 
-from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, eliminar_por_id
+from utils.manejo_archivos import guardar_datos, cargar_datos, obtener_siguiente_id, buscar_por_id, buscar_registro, eliminar_por_id
 from utils.validaciones import validar_texto, validar_numero_entero, validar_email, validar_telefono, limpiar_pantalla, pausar
+from utils.transacciones import con_reintentos
+from utils.errores import ErrorBiblioteca
+from utils.instrumentacion import medido
+from utils.paginacion import mostrar_paginado
 
 # Nombre del archivo para usuarios
 ARCHIVO_USUARIOS = "usuarios"
@@ -24,6 +28,29 @@ def crear_usuario():
     telefono = validar_telefono("Teléfono: ")
     direccion = validar_texto("Dirección: ", 5, 100)
 
+    try:
+        usuario = registrar_usuario(nombre, apellido, email, telefono, direccion)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return None
+
+    print(f"\n Usuario registrado exitosamente con ID: {usuario['id']}")
+    return usuario
+
+@medido('modelo')
+@con_reintentos
+def registrar_usuario(nombre, apellido, email, telefono, direccion):
+    """
+    Registra un usuario con datos ya validados (sin pedir datos por consola)
+    Args:
+        nombre (str): Nombre
+        apellido (str): Apellido
+        email (str): Correo electrónico
+        telefono (str): Teléfono
+        direccion (str): Dirección
+    Returns:
+        dict: Diccionario con los datos del usuario
+    """
     usuario = {
         'id': obtener_siguiente_id(CONTADOR_USUARIOS),
         'nombre': nombre,
@@ -32,35 +59,32 @@ def crear_usuario():
         'telefono': telefono,
         'direccion': direccion,
         'activo': True,
-        'multas_pendientes': 0
+        'multas_pendientes': 0,
+        'monto_pendiente': 0.0,
+        'total_pagado': 0.0
     }
 
     usuarios = cargar_datos(ARCHIVO_USUARIOS)
     usuarios.append(usuario)
     guardar_datos(ARCHIVO_USUARIOS, usuarios)
-
-    print(f"\n Usuario registrado exitosamente con ID: {usuario['id']}")
     return usuario
 
+ENCABEZADO_USUARIOS = [
+    f"{'ID':<5} {'Nombre':<25} {'Email':<30} {'Teléfono':<15}",
+    "-" * 80,
+]
+
+def _fila_usuario(usuario):
+    nombre_completo = f"{usuario['nombre']} {usuario['apellido']}"
+    nombre = nombre_completo[:22] + "..." if len(nombre_completo) > 25 else nombre_completo
+    return f"{usuario['id']:<5} {nombre:<25} {usuario['email']:<30} {usuario['telefono']:<15}"
+
 def listar_usuarios():
     """
-    Muestra todos los usuarios registrados
+    Muestra los usuarios registrados por páginas
     """
-    usuarios = cargar_datos(ARCHIVO_USUARIOS)
-
-    print("\n--- LISTA DE USUARIOS ---\n")
-
-    if not usuarios:
-        print("No hay usuarios registrados.")
-    else:
-        print(f"{'ID':<5} {'Nombre':<25} {'Email':<30} {'Teléfono':<15}")
-        print("-" * 80)
-        for usuario in usuarios:
-            nombre_completo = f"{usuario['nombre']} {usuario['apellido']}"
-            nombre = nombre_completo[:22] + "..." if len(nombre_completo) > 25 else nombre_completo
-            print(f"{usuario['id']:<5} {nombre:<25} {usuario['email']:<30} {usuario['telefono']:<15}")
-
-    print(f"\nTotal de usuarios: {len(usuarios)}")
+    print("\n--- LISTA DE USUARIOS ---")
+    mostrar_paginado(ARCHIVO_USUARIOS, ENCABEZADO_USUARIOS, _fila_usuario, "\nNo hay usuarios registrados.")
 
 def buscar_usuario():
     """
@@ -69,8 +93,7 @@ def buscar_usuario():
     print("\n--- BUSCAR USUARIO ---\n")
 
     id_usuario = validar_numero_entero("Ingrese el ID del usuario: ", 1)
-    usuarios = cargar_datos(ARCHIVO_USUARIOS)
-    usuario = buscar_por_id(usuarios, id_usuario)
+    usuario = buscar_registro(ARCHIVO_USUARIOS, id_usuario)
 
     if usuario:
         print("\n Usuario encontrado:")
@@ -81,6 +104,8 @@ def buscar_usuario():
         print(f"Dirección: {usuario['direccion']}")
         print(f"Estado: {'Activo' if usuario['activo'] else 'Inactivo'}")
         print(f"Multas pendientes: {usuario['multas_pendientes']}")
+        if 'monto_pendiente' in usuario:
+            print(f"Monto pendiente: ${usuario['monto_pendiente']:.2f}")
     else:
         print(f"\nERROR: No se encontró un usuario con ID {id_usuario}")
 
@@ -91,12 +116,12 @@ def actualizar_usuario():
     print("\n--- ACTUALIZAR USUARIO ---\n")
 
     id_usuario = validar_numero_entero("Ingrese el ID del usuario a actualizar: ", 1)
-    usuarios = cargar_datos(ARCHIVO_USUARIOS)
-    usuario = buscar_por_id(usuarios, id_usuario)
+    usuario = buscar_registro(ARCHIVO_USUARIOS, id_usuario)
 
     if usuario:
         print(f"\nUsuario actual: {usuario['nombre']} {usuario['apellido']}")
         print("\nIngrese los nuevos datos (Enter para mantener el actual):")
+        cambios = {}
 
         nuevo_nombre = input(f"Nombre [{usuario['nombre']}]: ").strip()
         if nuevo_nombre:
@@ -105,7 +130,7 @@ def actualizar_usuario():
             elif not nuevo_nombre.replace(" ", "").isalpha():
                 print("ERROR: El nombre solo debe contener letras y espacios.")
             else:
-                usuario['nombre'] = nuevo_nombre
+                cambios['nombre'] = nuevo_nombre
 
         nuevo_apellido = input(f"Apellido [{usuario['apellido']}]: ").strip()
         if nuevo_apellido:
@@ -114,21 +139,21 @@ def actualizar_usuario():
             elif not nuevo_apellido.replace(" ", "").isalpha():
                 print("ERROR: El apellido solo debe contener letras y espacios.")
             else:
-                usuario['apellido'] = nuevo_apellido
+                cambios['apellido'] = nuevo_apellido
 
         nuevo_email = input(f"Email [{usuario['email']}]: ").strip()
         if nuevo_email:
             import re
             patron = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
             if re.match(patron, nuevo_email):
-                usuario['email'] = nuevo_email
+                cambios['email'] = nuevo_email
             else:
                 print("ERROR: Correo electrónico inválido. Ejemplo: usuario@dominio.com")
 
         nuevo_telefono = input(f"Teléfono [{usuario['telefono']}]: ").strip()
         if nuevo_telefono:
             if nuevo_telefono.isdigit() and len(nuevo_telefono) >= 8 and len(nuevo_telefono) <= 15:
-                usuario['telefono'] = nuevo_telefono
+                cambios['telefono'] = nuevo_telefono
             else:
                 print("ERROR: Teléfono inválido. Debe contener entre 8 y 15 dígitos.")
 
@@ -137,13 +162,37 @@ def actualizar_usuario():
             if len(nueva_direccion) < 5 or len(nueva_direccion) > 100:
                 print("ERROR: La dirección debe tener entre 5 y 100 caracteres.")
             else:
-                usuario['direccion'] = nueva_direccion
+                cambios['direccion'] = nueva_direccion
 
-        guardar_datos(ARCHIVO_USUARIOS, usuarios)
+        try:
+            modificar_usuario(id_usuario, cambios)
+        except ErrorBiblioteca as e:
+            print(f"\nERROR: {e}")
+            return
         print("\n Usuario actualizado exitosamente.")
     else:
         print(f"\nERROR: No se encontró un usuario con ID {id_usuario}")
 
+@medido('modelo')
+@con_reintentos
+def modificar_usuario(id_usuario, cambios):
+    """
+    Aplica cambios ya validados a un usuario
+    Args:
+        id_usuario (int): ID del usuario
+        cambios (dict): Campos a modificar y sus nuevos valores
+    Returns:
+        dict: Usuario actualizado
+    """
+    usuarios = cargar_datos(ARCHIVO_USUARIOS)
+    usuario = buscar_por_id(usuarios, id_usuario)
+    if not usuario:
+        raise ErrorBiblioteca(f"No se encontró un usuario con ID {id_usuario}")
+
+    usuario.update(cambios)
+    guardar_datos(ARCHIVO_USUARIOS, usuarios)
+    return usuario
+
 def eliminar_usuario():
     """
     Elimina (desactiva) un usuario del sistema
@@ -151,15 +200,32 @@ def eliminar_usuario():
     print("\n--- ELIMINAR USUARIO ---\n")
 
     id_usuario = validar_numero_entero("Ingrese el ID del usuario a eliminar: ", 1)
+
+    try:
+        desactivar_usuario(id_usuario)
+    except ErrorBiblioteca as e:
+        print(f"\nERROR: {e}")
+        return
+    print(f"\n Usuario con ID {id_usuario} desactivado exitosamente.")
+
+@medido('modelo')
+@con_reintentos
+def desactivar_usuario(id_usuario):
+    """
+    Desactiva un usuario
+    Args:
+        id_usuario (int): ID del usuario
+    Returns:
+        dict: Usuario desactivado
+    """
     usuarios = cargar_datos(ARCHIVO_USUARIOS)
     usuario = buscar_por_id(usuarios, id_usuario)
+    if not usuario:
+        raise ErrorBiblioteca(f"No se encontró un usuario con ID {id_usuario}")
 
-    if usuario:
-        usuario['activo'] = False
-        guardar_datos(ARCHIVO_USUARIOS, usuarios)
-        print(f"\n Usuario con ID {id_usuario} desactivado exitosamente.")
-    else:
-        print(f"\nERROR: No se encontró un usuario con ID {id_usuario}")
+    usuario['activo'] = False
+    guardar_datos(ARCHIVO_USUARIOS, usuarios)
+    return usuario
 
 def menu_usuarios():
     """
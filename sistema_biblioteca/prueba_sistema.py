@@ -1,8 +1,14 @@
 """
 Script de prueba para verificar que el sistema funciona correctamente
 Este script crea datos de prueba en el sistema
+
+Uso:
+    python prueba_sistema.py                      (datos de ejemplo)
+    python prueba_sistema.py --escala 100k --semilla 7   (biblioteca generada)
 """
 
+import argparse
+
 from modelos.autor import crear_autor, listar_autores
 from modelos.categoria import crear_categoria, listar_categorias
 from modelos.libro import crear_libro, listar_libros
@@ -88,7 +94,9 @@ def crear_datos_prueba():
             'telefono': '12345678',
             'direccion': 'Calle Principal 123',
             'activo': True,
-            'multas_pendientes': 0
+            'multas_pendientes': 0,
+            'monto_pendiente': 0.0,
+            'total_pagado': 0.0
         },
         {
             'id': obtener_siguiente_id('usuarios'),
@@ -98,7 +106,9 @@ def crear_datos_prueba():
             'telefono': '87654321',
             'direccion': 'Avenida Central 456',
             'activo': True,
-            'multas_pendientes': 0
+            'multas_pendientes': 0,
+            'monto_pendiente': 0.0,
+            'total_pagado': 0.0
         }
     ]
     guardar_datos('usuarios', usuarios)
@@ -119,4 +129,12 @@ def crear_datos_prueba():
     print("\nAhora puedes ejecutar el sistema con: python main.py")
 
 if __name__ == "__main__":
-    crear_datos_prueba()
+    parser = argparse.ArgumentParser(description="Crea datos de prueba")
+    parser.add_argument('--escala', help="Genera una biblioteca de este tamaño (ver utils/generador.py)")
+    parser.add_argument('--semilla', type=int)
+    opciones = parser.parse_args()
+    if opciones.escala:
+        from utils import generador
+        generador.main(['--escala', opciones.escala] + (['--semilla', str(opciones.semilla)] if opciones.semilla is not None else []))
+    else:
+        crear_datos_prueba()
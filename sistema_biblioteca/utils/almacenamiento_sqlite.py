@@ -0,0 +1,539 @@
+"""
+Módulo de almacenamiento SQLite
+Motor alternativo para el modo 'sqlite': cada colección es una tabla real
+con índices en las columnas de búsqueda, el archivo usa journaling WAL y
+cada guardado actualiza solo las filas que cambiaron.
+Incluye la migración única desde los archivos datos/*.json:
+    python -m utils.almacenamiento_sqlite
+"""
+
+import json
+import os
+import threading
+
+from utils.coleccion import Coleccion
+from utils.errores import ConflictoVersion
+
+NOMBRE_BASE_DATOS = "biblioteca.db"
+
+# Tamaño aproximado en memoria de un registro, usado para el límite de la caché
+TAMAÑO_ESTIMADO_REGISTRO = 256
+
+# Columnas de cada colección conocida: (nombre, tipo SQL)
+# El tipo 'BOOLEAN' se guarda como entero y se convierte al leer.
+# Las fechas no llevan tipo para conservar el valor tal como se guardó.
+# Los campos que no figuran aquí se guardan en la columna 'extra' (JSON).
+ESQUEMAS = {
+    'libros': [
+        ('titulo', 'TEXT'), ('isbn', 'TEXT'), ('id_autor', 'INTEGER'),
+        ('id_categoria', 'INTEGER'), ('año_publicacion', 'INTEGER'),
+        ('cantidad_copias', 'INTEGER'), ('copias_disponibles', 'INTEGER'),
+        ('activo', 'BOOLEAN'),
+    ],
+    'usuarios': [
+        ('nombre', 'TEXT'), ('apellido', 'TEXT'), ('email', 'TEXT'),
+        ('telefono', 'TEXT'), ('direccion', 'TEXT'), ('activo', 'BOOLEAN'),
+        ('multas_pendientes', 'INTEGER'),
+    ],
+    'prestamos': [
+        ('id_usuario', 'INTEGER'), ('id_libro', 'INTEGER'), ('fecha_prestamo', ''),
+        ('fecha_devolucion_esperada', ''), ('fecha_devolucion_real', ''),
+        ('estado', 'TEXT'), ('multa_generada', 'BOOLEAN'),
+    ],
+    'multas': [
+        ('id_usuario', 'INTEGER'), ('monto', 'REAL'), ('concepto', 'TEXT'),
+        ('fecha_generacion', ''), ('fecha_pago', ''), ('estado', 'TEXT'),
+    ],
+    'autores': [
+        ('nombre', 'TEXT'), ('apellido', 'TEXT'), ('nacionalidad', 'TEXT'),
+    ],
+    'categorias': [
+        ('nombre', 'TEXT'), ('descripcion', 'TEXT'),
+    ],
+}
+
+# Índices secundarios por colección (la columna id ya es clave primaria).
+# Una tupla es un índice compuesto: (estado, fecha_devolucion_esperada)
+# permite buscar por rango de fechas los préstamos de un estado
+INDICES = {
+    'libros': ['isbn'],
+    'prestamos': ['id_usuario', 'id_libro', 'estado', ('estado', 'fecha_devolucion_esperada')],
+    'multas': ['id_usuario', 'estado'],
+}
+
+_local = threading.local()
+_tablas_creadas = set()
+_candado = threading.Lock()
+
+def ruta_base_datos():
+    from utils.manejo_archivos import RUTA_DATOS
+    return os.path.join(RUTA_DATOS, NOMBRE_BASE_DATOS)
+
+def _conexion():
+    """
+    Retorna la conexión del hilo actual, abriéndola si hace falta
+    Returns:
+        sqlite3.Connection: Conexión en modo WAL
+    """
+    ruta = ruta_base_datos()
+    conexion = getattr(_local, 'conexion', None)
+    if conexion is None or _local.ruta != ruta:
+        # Se importa al conectar: en los modos JSON no se usa
+        import sqlite3
+        conexion = sqlite3.connect(ruta, isolation_level=None)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.execute(
+            "CREATE TABLE IF NOT EXISTS versiones ("
+            "coleccion TEXT PRIMARY KEY, version INTEGER NOT NULL, registros INTEGER NOT NULL)"
+        )
+        _local.conexion = conexion
+        _local.ruta = ruta
+    return conexion
+
+def cerrar():
+    """
+    Cierra la conexión del hilo actual
+    """
+    conexion = getattr(_local, 'conexion', None)
+    if conexion is not None:
+        conexion.close()
+        _local.conexion = None
+
+def _columnas(nombre):
+    return ESQUEMAS.get(nombre)
+
+def _citar(identificador):
+    return '"' + identificador.replace('"', '""') + '"'
+
+def _crear_tabla(conexion, nombre):
+    """
+    Crea la tabla y sus índices si todavía no existen
+    """
+    clave = (ruta_base_datos(), nombre)
+    if clave in _tablas_creadas:
+        return
+    columnas = _columnas(nombre)
+    if columnas is None:
+        # Colección sin esquema conocido: el registro completo va en 'datos'
+        conexion.execute(f"CREATE TABLE IF NOT EXISTS {_citar(nombre)} (id INTEGER PRIMARY KEY, datos TEXT NOT NULL)")
+    else:
+        definiciones = ", ".join(f"{_citar(columna)} {tipo}".strip() for columna, tipo in columnas)
+        conexion.execute(f"CREATE TABLE IF NOT EXISTS {_citar(nombre)} (id INTEGER PRIMARY KEY, {definiciones}, extra TEXT)")
+        for columnas in INDICES.get(nombre, []):
+            conexion.execute(_sql_crear_indice(nombre, columnas, si_no_existe=True))
+    with _candado:
+        _tablas_creadas.add(clave)
+
+def _nombre_indice(nombre, columnas):
+    columnas = (columnas,) if isinstance(columnas, str) else columnas
+    return _citar(f"idx_{nombre}_{'_'.join(columnas)}")
+
+def _sql_crear_indice(nombre, columnas, si_no_existe=False):
+    columnas = (columnas,) if isinstance(columnas, str) else columnas
+    return (
+        f"CREATE INDEX {'IF NOT EXISTS ' if si_no_existe else ''}{_nombre_indice(nombre, columnas)} "
+        f"ON {_citar(nombre)} ({', '.join(_citar(columna) for columna in columnas)})"
+    )
+
+def _tabla_existe(conexion, nombre):
+    fila = conexion.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (nombre,)).fetchone()
+    return fila is not None
+
+def _a_fila(nombre, registro):
+    """
+    Convierte un registro (dict) en la tupla de valores de su tabla
+    """
+    columnas = _columnas(nombre)
+    if columnas is None:
+        return (registro.get('id'), json.dumps(registro, ensure_ascii=False))
+    valores = [registro.get('id')]
+    for columna, tipo in columnas:
+        valor = registro.get(columna)
+        valores.append(int(valor) if tipo == 'BOOLEAN' and valor is not None else valor)
+    conocidas = {'id'}.union(columna for columna, _ in columnas)
+    extra = {campo: valor for campo, valor in registro.items() if campo not in conocidas}
+    valores.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+    return tuple(valores)
+
+def _a_registro(nombre, fila):
+    """
+    Convierte una fila de la tabla en el dict que usan los modelos
+    """
+    columnas = _columnas(nombre)
+    if columnas is None:
+        return json.loads(fila[1])
+    registro = {'id': fila[0]}
+    for (columna, tipo), valor in zip(columnas, fila[1:]):
+        registro[columna] = bool(valor) if tipo == 'BOOLEAN' and valor is not None else valor
+    if fila[-1]:
+        registro.update(json.loads(fila[-1]))
+    return registro
+
+def _sql_insertar(nombre):
+    columnas = _columnas(nombre)
+    cantidad = 2 if columnas is None else len(columnas) + 2
+    return f"INSERT OR REPLACE INTO {_citar(nombre)} VALUES ({', '.join('?' * cantidad)})"
+
+def obtener_version(nombre):
+    """
+    Obtiene la versión de una colección (cambia con cada guardado)
+    Args:
+        nombre (str): Nombre de la colección
+    Returns:
+        tuple or None: (versión, cantidad de registros) o None si no existe
+    """
+    fila = _conexion().execute(
+        "SELECT version, registros FROM versiones WHERE coleccion=?", (nombre,)
+    ).fetchone()
+    return tuple(fila) if fila else None
+
+def listar():
+    """
+    Returns:
+        list: Nombres de las colecciones guardadas, en orden alfabético
+    """
+    return [fila[0] for fila in _conexion().execute("SELECT coleccion FROM versiones ORDER BY coleccion")]
+
+def cargar(nombre, fabrica=Coleccion):
+    """
+    Carga todas las filas de una colección
+    La versión y las filas se leen en la misma transacción de lectura, que
+    en modo WAL no bloquea a otros lectores ni escritores
+    Args:
+        nombre (str): Nombre de la colección
+        fabrica (callable): Recibe los registros y crea la colección
+    Returns:
+        Coleccion: Registros ordenados por ID, con su versión
+    """
+    conexion = _conexion()
+    conexion.execute("BEGIN")
+    try:
+        version = obtener_version(nombre)
+        if _tabla_existe(conexion, nombre):
+            cursor = conexion.execute(f"SELECT * FROM {_citar(nombre)} ORDER BY id")
+            coleccion = fabrica(_a_registro(nombre, fila) for fila in cursor)
+        else:
+            coleccion = fabrica(())
+    finally:
+        conexion.execute("COMMIT")
+    coleccion.version = version[0] if version else 0
+    return coleccion
+
+def guardar(nombre, coleccion):
+    """
+    Guarda los cambios de una colección en una sola transacción
+    Solo se escriben las filas modificadas y eliminadas, salvo que la
+    colección esté marcada como reemplazo completo
+    Args:
+        nombre (str): Nombre de la colección
+        coleccion (Coleccion): Colección con sus cambios pendientes
+    """
+    guardar_varias({nombre: coleccion})
+
+def guardar_varias(colecciones, antes_de_confirmar=None):
+    """
+    Guarda los cambios de varias colecciones en una única transacción SQL
+    Antes de escribir comprueba que ninguna colección haya cambiado de
+    versión desde que se cargó
+    Args:
+        colecciones (dict): Nombre de la colección -> Coleccion
+        antes_de_confirmar (callable): Recibe nombre -> versión nueva de cada
+            colección dentro de la transacción, antes de confirmarla (opcional)
+    Raises:
+        ConflictoVersion: Si otra terminal guardó alguna de las colecciones
+    """
+    conexion = _conexion()
+    for nombre in colecciones:
+        _crear_tabla(conexion, nombre)
+    conexion.execute("BEGIN IMMEDIATE")
+    try:
+        versiones = {}
+        for nombre, coleccion in colecciones.items():
+            actual = obtener_version(nombre)
+            versiones[nombre] = actual[0] if actual else 0
+            if not coleccion.reemplazo and coleccion.version is not None and coleccion.version != versiones[nombre]:
+                raise ConflictoVersion(f"Otra terminal modificó {nombre}")
+        if antes_de_confirmar is not None:
+            antes_de_confirmar({nombre: version + 1 for nombre, version in versiones.items()})
+        for nombre, coleccion in colecciones.items():
+            _escribir_cambios(conexion, nombre, coleccion)
+        conexion.execute("COMMIT")
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+    for nombre, coleccion in colecciones.items():
+        coleccion.version = versiones[nombre] + 1
+
+def _escribir_cambios(conexion, nombre, coleccion):
+    """
+    Escribe las filas de una colección dentro de la transacción abierta
+    """
+    tabla = _citar(nombre)
+    if coleccion.reemplazo or coleccion.tiene_claves_internas():
+        conexion.execute(f"DELETE FROM {tabla}")
+        conexion.executemany(_sql_insertar(nombre), (_a_fila(nombre, registro) for registro in coleccion))
+    else:
+        eliminados, modificados = coleccion.extraer_cambios()
+        if eliminados:
+            conexion.executemany(f"DELETE FROM {tabla} WHERE id=?", ((id_registro,) for id_registro in eliminados))
+        if modificados:
+            conexion.executemany(_sql_insertar(nombre), (_a_fila(nombre, registro) for registro in modificados))
+    conexion.execute(
+        "INSERT INTO versiones (coleccion, version, registros) VALUES (?, 1, ?) "
+        "ON CONFLICT(coleccion) DO UPDATE SET version = version + 1, registros = excluded.registros",
+        (nombre, len(coleccion)),
+    )
+
+def agregar(nombre, registros, antes_de_confirmar=None):
+    """
+    Agrega filas nuevas a una colección en una sola transacción, sin leer
+    las que ya estaban
+    Args:
+        nombre (str): Nombre de la colección
+        registros (list): Registros nuevos, con su ID
+        antes_de_confirmar (callable): Recibe la versión nueva de la
+            colección antes de confirmar la transacción (opcional)
+    """
+    conexion = _conexion()
+    _crear_tabla(conexion, nombre)
+    conexion.execute("BEGIN IMMEDIATE")
+    try:
+        conexion.executemany(_sql_insertar(nombre), (_a_fila(nombre, registro) for registro in registros))
+        conexion.execute(
+            "INSERT INTO versiones (coleccion, version, registros) VALUES (?, 1, ?) "
+            "ON CONFLICT(coleccion) DO UPDATE SET version = version + 1, registros = registros + excluded.registros",
+            (nombre, len(registros)),
+        )
+        if antes_de_confirmar is not None:
+            antes_de_confirmar(obtener_version(nombre)[0])
+        conexion.execute("COMMIT")
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+
+def reemplazar(nombre, registros, antes_de_confirmar=None):
+    """
+    Reemplaza todas las filas de una colección en una sola transacción,
+    insertando los registros a medida que llegan
+    Los índices de la tabla se quitan durante la carga y se vuelven a crear
+    al final, que es mucho más rápido que mantenerlos fila por fila
+    Args:
+        nombre (str): Nombre de la colección
+        registros (iterable): Registros completos, con su ID
+        antes_de_confirmar (callable): Recibe la versión nueva de la
+            colección antes de confirmar la transacción (opcional)
+    Returns:
+        int: Cantidad de filas escritas
+    """
+    conexion = _conexion()
+    _crear_tabla(conexion, nombre)
+    tabla = _citar(nombre)
+    indices = INDICES.get(nombre, []) if _columnas(nombre) is not None else []
+    cantidad = 0
+
+    def filas():
+        nonlocal cantidad
+        for registro in registros:
+            cantidad += 1
+            yield _a_fila(nombre, registro)
+
+    conexion.execute("BEGIN IMMEDIATE")
+    try:
+        for columnas in indices:
+            conexion.execute(f"DROP INDEX IF EXISTS {_nombre_indice(nombre, columnas)}")
+        conexion.execute(f"DELETE FROM {tabla}")
+        conexion.executemany(_sql_insertar(nombre), filas())
+        for columnas in indices:
+            conexion.execute(_sql_crear_indice(nombre, columnas))
+        conexion.execute(
+            "INSERT INTO versiones (coleccion, version, registros) VALUES (?, 1, ?) "
+            "ON CONFLICT(coleccion) DO UPDATE SET version = version + 1, registros = excluded.registros",
+            (nombre, cantidad),
+        )
+        if antes_de_confirmar is not None:
+            antes_de_confirmar(obtener_version(nombre)[0])
+        conexion.execute("COMMIT")
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+    return cantidad
+
+def buscar_por_id(nombre, id_buscar):
+    """
+    Busca un registro por su ID con una consulta puntual
+    Args:
+        nombre (str): Nombre de la colección
+        id_buscar (int): ID a buscar
+    Returns:
+        dict or None: Registro encontrado o None
+    """
+    conexion = _conexion()
+    if not _tabla_existe(conexion, nombre):
+        return None
+    fila = conexion.execute(f"SELECT * FROM {_citar(nombre)} WHERE id=?", (id_buscar,)).fetchone()
+    return _a_registro(nombre, fila) if fila else None
+
+def buscar_por_campo(nombre, campo, valor):
+    """
+    Busca los registros cuyo campo tiene el valor indicado
+    Usa los índices de la tabla cuando el campo está indexado
+    Args:
+        nombre (str): Nombre de la colección
+        campo (str): Nombre del campo (columna)
+        valor: Valor a buscar
+    Returns:
+        list: Registros encontrados, ordenados por ID
+    """
+    conexion = _conexion()
+    if not _tabla_existe(conexion, nombre):
+        return []
+    columnas = _columnas(nombre)
+    if columnas is None or campo not in {'id'}.union(columna for columna, _ in columnas):
+        # Campo sin columna propia: se filtra en Python
+        return [registro for registro in cargar(nombre) if registro.get(campo) == valor]
+    if isinstance(valor, bool):
+        valor = int(valor)
+    cursor = conexion.execute(f"SELECT * FROM {_citar(nombre)} WHERE {_citar(campo)}=? ORDER BY id", (valor,))
+    return [_a_registro(nombre, fila) for fila in cursor]
+
+def actualizar_menores(nombre, campo, limite, filtro, cambios, antes_de_escribir=None):
+    """
+    Modifica en una sola transacción las filas que cumplen un filtro y cuyo
+    campo es menor a un límite, con una consulta por rango sobre el índice
+    compuesto (columna del filtro, campo)
+    Args:
+        nombre (str): Nombre de la colección
+        campo (str): Columna ordenada (por ejemplo, una fecha)
+        limite: Valor límite (excluido)
+        filtro (tuple): (columna, valor) que deben cumplir las filas
+        cambios (dict): Columna -> valor nuevo
+        antes_de_escribir (callable): Recibe los registros leídos, ya
+            modificados, antes de escribirlos (opcional)
+    Returns:
+        list or None: Registros modificados, en orden de campo y de ID (None,
+            sin modificar nada, si alguna fila del filtro tiene el campo en
+            texto: SQLite ordena el texto después de los números y la
+            consulta por rango no la incluiría)
+    """
+    conexion = _conexion()
+    if not _tabla_existe(conexion, nombre):
+        return []
+    tabla = _citar(nombre)
+    columna_filtro, valor_filtro = filtro
+    condicion = f"{_citar(columna_filtro)}=? AND {_citar(campo)}<?"
+    conexion.execute("BEGIN IMMEDIATE")
+    try:
+        # Todo texto es mayor o igual que '', así que también es un rango del índice
+        en_texto = conexion.execute(
+            f"SELECT 1 FROM {tabla} WHERE {_citar(columna_filtro)}=? AND {_citar(campo)}>='' LIMIT 1",
+            (valor_filtro,),
+        ).fetchone()
+        if en_texto:
+            conexion.execute("ROLLBACK")
+            return None
+        cursor = conexion.execute(
+            f"SELECT * FROM {tabla} WHERE {condicion} ORDER BY {_citar(campo)}, id", (valor_filtro, limite)
+        )
+        registros = [_a_registro(nombre, fila) for fila in cursor]
+        if registros:
+            for registro in registros:
+                registro.update(cambios)
+            if antes_de_escribir is not None:
+                antes_de_escribir(registros)
+            asignaciones = ", ".join(f"{_citar(columna)}=?" for columna in cambios)
+            conexion.execute(
+                f"UPDATE {tabla} SET {asignaciones} WHERE {condicion}",
+                (*cambios.values(), valor_filtro, limite),
+            )
+            conexion.execute("UPDATE versiones SET version = version + 1 WHERE coleccion=?", (nombre,))
+        conexion.execute("COMMIT")
+    except Exception:
+        conexion.execute("ROLLBACK")
+        raise
+    return registros
+
+def recorrer(nombre, desde_id=None, tamaño_lote=500):
+    """
+    Recorre una colección en orden de ID leyendo de a un lote por consulta
+    Cada lote continúa después del último ID leído (paginación por clave),
+    así la memoria usada depende del lote y no del tamaño de la tabla
+    Args:
+        nombre (str): Nombre de la colección
+        desde_id (int): Primer ID a incluir (None para empezar por el primero)
+        tamaño_lote (int): Filas por consulta
+    Yields:
+        dict: Registros ordenados por ID
+    """
+    conexion = _conexion()
+    if not _tabla_existe(conexion, nombre):
+        return
+    tabla = _citar(nombre)
+    filas = conexion.execute(
+        f"SELECT * FROM {tabla} WHERE id >= ? ORDER BY id LIMIT ?",
+        (desde_id if desde_id is not None else -2 ** 63, tamaño_lote),
+    ).fetchall()
+    while filas:
+        for fila in filas:
+            yield _a_registro(nombre, fila)
+        if len(filas) < tamaño_lote:
+            return
+        filas = conexion.execute(
+            f"SELECT * FROM {tabla} WHERE id > ? ORDER BY id LIMIT ?", (filas[-1][0], tamaño_lote)
+        ).fetchall()
+
+def ids_anteriores(nombre, antes_de_id, cantidad):
+    """
+    Obtiene los IDs que preceden a uno dado
+    Args:
+        nombre (str): Nombre de la colección
+        antes_de_id (int): ID de referencia (excluido)
+        cantidad (int): Cantidad máxima de IDs
+    Returns:
+        list: IDs en orden ascendente
+    """
+    conexion = _conexion()
+    if not _tabla_existe(conexion, nombre):
+        return []
+    filas = conexion.execute(
+        f"SELECT id FROM {_citar(nombre)} WHERE id < ? ORDER BY id DESC LIMIT ?", (antes_de_id, cantidad)
+    ).fetchall()
+    return [fila[0] for fila in reversed(filas)]
+
+def migrar_desde_json():
+    """
+    Copia todas las colecciones de datos/*.json a la base SQLite
+    Las fechas en texto DD/MM/AAAA se copian como número de día (ver
+    utils/fechas), para que las consultas por rango de fechas las incluyan
+    Los contadores (contador_*.json) siguen en sus archivos
+    Returns:
+        dict: Colección -> cantidad de registros migrados
+    """
+    from utils import fechas, manejo_archivos
+
+    ruta_datos = manejo_archivos.RUTA_DATOS
+    modo_anterior = manejo_archivos.MODO_ALMACENAMIENTO
+    migrados = {}
+    try:
+        for archivo in sorted(os.listdir(ruta_datos)):
+            if not archivo.endswith(".json") or archivo.startswith("contador_"):
+                continue
+            nombre = archivo[:-len(".json")]
+            # Se lee con el modo journal para incluir cambios no compactados
+            manejo_archivos.MODO_ALMACENAMIENTO = 'journal'
+            manejo_archivos.cache.invalidar(nombre)
+            registros = list(manejo_archivos.cargar_datos(nombre))
+            for registro in registros:
+                registro.update(fechas.fechas_a_migrar(nombre, registro))
+            guardar(nombre, Coleccion(registros, reemplazo=True))
+            migrados[nombre] = len(registros)
+    finally:
+        manejo_archivos.MODO_ALMACENAMIENTO = modo_anterior
+        manejo_archivos.cache.invalidar()
+    return migrados
+
+if __name__ == "__main__":
+    print(f"Migrando datos JSON a {ruta_base_datos()} ...")
+    for nombre, cantidad in migrar_desde_json().items():
+        print(f"    {nombre}: {cantidad} registros")
+    print("\nMigración completada. Ejecute el sistema con BIBLIOTECA_ALMACENAMIENTO=sqlite")
@@ -0,0 +1,82 @@
+"""
+Módulo de bloqueos de archivos
+Bloqueos del sistema operativo para coordinar varios procesos (varias
+terminales ejecutando main.py) que comparten la misma carpeta de datos.
+Usa fcntl en Linux/Mac y msvcrt en Windows
+"""
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+def _bloquear(archivo, exclusivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+    else:
+        # msvcrt no tiene bloqueos compartidos: todos son exclusivos
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+
+def _desbloquear(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+    else:
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def bloqueo(ruta_bloqueo, exclusivo=True):
+    """
+    Mantiene un bloqueo sobre un archivo mientras dura el bloque with
+    El archivo de bloqueo se crea si no existe y nunca se reemplaza, para
+    que todos los procesos bloqueen el mismo inodo
+    Args:
+        ruta_bloqueo (str): Ruta del archivo de bloqueo
+        exclusivo (bool): True para escritura, False para lectura compartida
+    Yields:
+        file: Archivo de bloqueo abierto en modo lectura/escritura
+    """
+    descriptor = os.open(ruta_bloqueo, os.O_RDWR | os.O_CREAT, 0o644)
+    with os.fdopen(descriptor, 'r+b') as archivo:
+        _bloquear(archivo, exclusivo)
+        try:
+            yield archivo
+        finally:
+            _desbloquear(archivo)
+
+def escribir_durable(ruta_archivo, contenido):
+    """
+    Escribe un archivo completo de forma atómica y durable
+    Escribe en un temporal, fuerza los datos a disco y lo renombra sobre el
+    original, de modo que nunca queda un archivo a medio escribir
+    Args:
+        ruta_archivo (str): Ruta final del archivo
+        contenido (bytes): Contenido a escribir
+    """
+    ruta_temporal = f"{ruta_archivo}.{os.getpid()}.tmp"
+    with open(ruta_temporal, 'wb') as archivo:
+        archivo.write(contenido)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(ruta_temporal, ruta_archivo)
+    sincronizar_directorio(os.path.dirname(ruta_archivo))
+
+def sincronizar_directorio(ruta_directorio):
+    """
+    Fuerza a disco las entradas de un directorio (renombres y borrados)
+    En Windows no es posible abrir un directorio y no hace nada
+    Args:
+        ruta_directorio (str): Ruta del directorio
+    """
+    if os.name == 'nt':
+        return
+    descriptor = os.open(ruta_directorio or ".", os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
@@ -0,0 +1,605 @@
+"""
+Módulo de búsqueda de libros por texto
+Mantiene un índice invertido (palabra -> libros) sobre el título de cada
+libro activo y los nombres de su autor y su categoría. Las palabras se
+normalizan sin mayúsculas ni tildes, de modo que "cancion" encuentra
+"Canción". Las consultas combinan palabras con Y (por defecto) u O
+("amor O guerra") y los resultados se ordenan por relevancia.
+
+El índice se guarda en datos/libros.busqueda junto con una firma corta de
+cada libro (título, autor y categoría) y no se reconstruye al iniciar.
+Cada guardado de libros, autores o categorías anota antes de confirmarse
+qué IDs cambian y con qué versión de la colección queda (anotar_cambios)
+en datos/libros.busqueda.cambios; cada terminal aplica solo las marcas
+nuevas, y recién cuando la colección llega a esa versión, volviendo a
+indexar esos libros. La copia en disco se reescribe cada tantas marcas y
+entonces el registro de cambios vuelve a empezar
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from operator import itemgetter
+
+from utils import bloqueos, manejo_archivos
+from utils.instrumentacion import medido
+
+ARCHIVO_INDICE = "libros.busqueda"
+ARCHIVO_CAMBIOS = "libros.busqueda.cambios"
+
+# Colecciones cuyos guardados cambian el índice
+COLECCIONES_INDEXADAS = ('libros', 'autores', 'categorias')
+
+# Peso de cada palabra según dónde aparece
+PESO_TITULO = 3
+PESO_AUTOR = 2
+PESO_CATEGORIA = 1
+
+# Palabras demasiado frecuentes para distinguir un libro de otro
+PALABRAS_VACIAS = frozenset({
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los',
+    'para', 'por', 'se', 'su', 'un', 'una', 'y', 'the', 'of', 'and',
+})
+
+# Separadores de alternativas en una consulta
+_PATRON_O = re.compile(r'\s+(?:O|OR)\s+|\|')
+_PATRON_PALABRA = re.compile(r'[0-9a-zñ]+')
+
+# Marcas aplicadas desde la última copia en disco a partir de las cuales el
+# índice se vuelve a guardar, y tamaño del registro de cambios a partir del
+# cual, al guardarlo, el registro vuelve a empezar vacío
+MINIMO_CAMBIOS_PARA_GUARDAR = 1000
+TAMAÑO_PARA_ROTAR_CAMBIOS = 1024 * 1024
+
+# Libros marcados que en SQLite se leen de a uno en lugar de cargar la tabla
+MAXIMO_CONSULTAS_PUNTUALES = 1000
+
+_indice = None
+# (dispositivo, inodo) del registro de cambios y posición hasta la que el
+# índice lo tiene aplicado (None: se desconoce, hay que sincronizar todo)
+_leidos = None
+# Marcas leídas cuya colección todavía no llegó a su versión
+_en_espera = []
+_aplicados_sin_guardar = 0
+_desactualizado = False
+_candado = threading.RLock()
+
+def normalizar(texto):
+    """
+    Separa un texto en palabras en minúsculas y sin tildes
+    La ñ se conserva porque distingue palabras ("año" y "ano")
+    Args:
+        texto (str): Texto a separar
+    Returns:
+        list: Palabras normalizadas
+    """
+    texto = str(texto or "").lower().replace("ñ", "\x00")
+    texto = unicodedata.normalize('NFKD', texto)
+    texto = "".join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    return _PATRON_PALABRA.findall(texto.replace("\x00", "ñ"))
+
+def _nombre_autor(autor):
+    return f"{autor.get('nombre', '')} {autor.get('apellido', '')}"
+
+def _firma_libro(libro):
+    return (libro.get('titulo', ""), libro.get('id_autor'), libro.get('id_categoria'))
+
+def _pesos(titulo, autor, categoria):
+    pesos = {}
+    for texto, peso in ((titulo, PESO_TITULO), (autor, PESO_AUTOR), (categoria, PESO_CATEGORIA)):
+        for palabra in normalizar(texto):
+            if palabra not in PALABRAS_VACIAS:
+                pesos[palabra] = pesos.get(palabra, 0) + peso
+    return pesos
+
+class IndiceInvertido:
+    """
+    Índice palabra -> {ID de libro: peso}
+    Para poder quitar un libro sin guardar sus palabras se recuerda la
+    firma con la que se indexó y los nombres de autores y categorías usados
+    """
+
+    def __init__(self):
+        self.palabras = {}
+        # id_libro -> (titulo, id_autor, id_categoria)
+        self.firmas = {}
+        self.autores = {}
+        self.categorias = {}
+
+    def _pesos_de(self, firma, autores, categorias):
+        titulo, id_autor, id_categoria = firma
+        return _pesos(titulo, autores.get(id_autor, ""), categorias.get(id_categoria, ""))
+
+    def agregar(self, id_libro, firma, autores=None, categorias=None):
+        """
+        Indexa un libro (quitando antes su versión anterior, si la hay)
+        Args:
+            id_libro (int): ID del libro
+            firma (tuple): (titulo, id_autor, id_categoria)
+            autores (dict): id_autor -> nombre (por defecto, los del índice)
+            categorias (dict): id_categoria -> nombre (idem)
+        """
+        self.quitar(id_libro)
+        pesos = self._pesos_de(firma, autores or self.autores, categorias or self.categorias)
+        for palabra, peso in pesos.items():
+            self.palabras.setdefault(palabra, {})[id_libro] = peso
+        self.firmas[id_libro] = firma
+
+    def quitar(self, id_libro):
+        """
+        Quita un libro del índice
+        Args:
+            id_libro (int): ID del libro
+        """
+        firma = self.firmas.pop(id_libro, None)
+        if firma is None:
+            return
+        for palabra in self._pesos_de(firma, self.autores, self.categorias):
+            libros = self.palabras.get(palabra)
+            if libros is not None:
+                libros.pop(id_libro, None)
+                if not libros:
+                    del self.palabras[palabra]
+
+    def sincronizar(self, libros, autores, categorias):
+        """
+        Pone el índice al día con los datos, procesando solo lo que cambió
+        Args:
+            libros (iterable): Libros
+            autores (iterable): Autores
+            categorias (iterable): Categorías
+        Returns:
+            int: Cantidad de libros agregados, modificados o quitados
+        """
+        nombres_autores = {autor.get('id'): _nombre_autor(autor) for autor in autores}
+        nombres_categorias = {categoria.get('id'): categoria.get('nombre', '') for categoria in categorias}
+        autores_cambiados = {
+            id_autor for id_autor in nombres_autores.keys() | self.autores.keys()
+            if nombres_autores.get(id_autor) != self.autores.get(id_autor)
+        }
+        categorias_cambiadas = {
+            id_categoria for id_categoria in nombres_categorias.keys() | self.categorias.keys()
+            if nombres_categorias.get(id_categoria) != self.categorias.get(id_categoria)
+        }
+
+        cambios = 0
+        vigentes = set()
+        for libro in libros:
+            id_libro = libro.get('id')
+            if not libro.get('activo', True):
+                continue
+            vigentes.add(id_libro)
+            firma = _firma_libro(libro)
+            if (self.firmas.get(id_libro) != firma or firma[1] in autores_cambiados
+                    or firma[2] in categorias_cambiadas):
+                # Se quita con los nombres viejos y se agrega con los nuevos
+                self.agregar(id_libro, firma, nombres_autores, nombres_categorias)
+                cambios += 1
+        for id_libro in [id_libro for id_libro in self.firmas if id_libro not in vigentes]:
+            self.quitar(id_libro)
+            cambios += 1
+
+        self.autores = nombres_autores
+        self.categorias = nombres_categorias
+        return cambios
+
+    def renombrar(self, autores=None, categorias=None):
+        """
+        Cambia nombres de autores o categorías y vuelve a indexar sus libros
+        Args:
+            autores (dict): id_autor -> nombre nuevo (None si ya no existe)
+            categorias (dict): id_categoria -> nombre nuevo (idem)
+        Returns:
+            int: Cantidad de libros indexados de nuevo
+        """
+        nombres_autores = dict(self.autores)
+        nombres_categorias = dict(self.categorias)
+        for nombres, nuevos in ((nombres_autores, autores or {}), (nombres_categorias, categorias or {})):
+            for clave, nombre in nuevos.items():
+                if nombre is None:
+                    nombres.pop(clave, None)
+                else:
+                    nombres[clave] = nombre
+        autores_cambiados = {
+            id_autor for id_autor in autores or {} if nombres_autores.get(id_autor) != self.autores.get(id_autor)
+        }
+        categorias_cambiadas = {
+            id_categoria for id_categoria in categorias or {}
+            if nombres_categorias.get(id_categoria) != self.categorias.get(id_categoria)
+        }
+        afectados = [
+            (id_libro, firma) for id_libro, firma in self.firmas.items()
+            if firma[1] in autores_cambiados or firma[2] in categorias_cambiadas
+        ]
+        # Se quitan con los nombres viejos y se agregan con los nuevos
+        for id_libro, _ in afectados:
+            self.quitar(id_libro)
+        self.autores = nombres_autores
+        self.categorias = nombres_categorias
+        for id_libro, firma in afectados:
+            self.agregar(id_libro, firma)
+        return len(afectados)
+
+    def buscar(self, consulta, limite=20):
+        """
+        Busca libros por palabras
+        Las palabras de cada alternativa deben aparecer todas (Y); las
+        alternativas se separan con " O ", " OR " o "|"
+        El puntaje suma, por cada palabra encontrada, su peso en el libro
+        por la rareza de la palabra (log(1 + libros / libros con la palabra))
+        Args:
+            consulta (str): Texto de la consulta
+            limite (int): Cantidad máxima de resultados
+        Returns:
+            list: Tuplas (id_libro, puntaje) de mayor a menor puntaje
+        """
+        total = max(len(self.firmas), 1)
+        alternativas = []
+        for alternativa in _PATRON_O.split(consulta):
+            palabras = normalizar(alternativa)
+            # Las palabras vacías solo se buscan si no hay otras
+            palabras = [palabra for palabra in palabras if palabra not in PALABRAS_VACIAS] or palabras
+            listas = [self.palabras.get(palabra) for palabra in dict.fromkeys(palabras)]
+            if listas and all(lista is not None for lista in listas):
+                alternativas.append(listas)
+
+        if len(alternativas) == 1 and len(alternativas[0]) == 1:
+            # Una sola palabra: el orden es el de su peso en cada libro y no
+            # hace falta calcular un puntaje por libro
+            lista = alternativas[0][0]
+            rareza = math.log(1 + total / len(lista))
+            return [(id_libro, peso * rareza) for id_libro, peso in heapq.nlargest(limite, lista.items(), key=itemgetter(1))]
+
+        puntajes = {}
+        for listas in alternativas:
+            # Se recorre la lista más corta y se verifica en las demás
+            listas.sort(key=len)
+            rarezas = [math.log(1 + total / len(lista)) for lista in listas]
+            for id_libro, peso in listas[0].items():
+                puntaje = peso * rarezas[0]
+                for lista, rareza in zip(listas[1:], rarezas[1:]):
+                    peso_otra = lista.get(id_libro)
+                    if peso_otra is None:
+                        break
+                    puntaje += peso_otra * rareza
+                else:
+                    if puntaje > puntajes.get(id_libro, 0):
+                        puntajes[id_libro] = puntaje
+        return heapq.nlargest(limite, puntajes.items(), key=lambda par: (par[1], -par[0]))
+
+    def exportar(self):
+        """
+        Returns:
+            dict: Índice en un formato serializable a JSON
+        """
+        return {
+            'palabras': {palabra: [list(libros), list(libros.values())] for palabra, libros in self.palabras.items()},
+            'firmas': [[id_libro, *firma] for id_libro, firma in self.firmas.items()],
+            'autores': [[id_autor, nombre] for id_autor, nombre in self.autores.items()],
+            'categorias': [[id_categoria, nombre] for id_categoria, nombre in self.categorias.items()],
+        }
+
+    @classmethod
+    def importar(cls, datos):
+        """
+        Args:
+            datos (dict): Índice exportado con exportar()
+        Returns:
+            IndiceInvertido: Índice reconstruido
+        """
+        indice = cls()
+        indice.palabras = {palabra: dict(zip(ids, pesos)) for palabra, (ids, pesos) in datos['palabras'].items()}
+        indice.firmas = {id_libro: (titulo, id_autor, id_categoria) for id_libro, titulo, id_autor, id_categoria in datos['firmas']}
+        indice.autores = dict(map(tuple, datos['autores']))
+        indice.categorias = dict(map(tuple, datos['categorias']))
+        return indice
+
+def _ruta_indice():
+    return os.path.join(manejo_archivos.RUTA_DATOS, ARCHIVO_INDICE)
+
+def _ruta_cambios():
+    return os.path.join(manejo_archivos.RUTA_DATOS, ARCHIVO_CAMBIOS)
+
+def anotar(nombre_archivo, version, ids):
+    """
+    Anota en el registro de cambios que un guardado modifica registros de
+    una colección indexada
+    Se llama antes de que el guardado sea visible para las demás terminales:
+    si el proceso se corta, la marca sobra pero nunca falta
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        version (int): Versión que tendrá la colección al confirmarse
+        ids (iterable or None): IDs agregados, modificados o eliminados
+            (None: toda la colección)
+    """
+    if nombre_archivo not in COLECCIONES_INDEXADAS:
+        return
+    if ids is not None:
+        ids = sorted(set(ids))
+        if not ids:
+            return
+    linea = json.dumps({'coleccion': nombre_archivo, 'version': version, 'ids': ids}, separators=(',', ':'))
+    ruta_cambios = _ruta_cambios()
+    # Bloqueo compartido entre las terminales que anotan; se toma exclusivo
+    # para hacer empezar de nuevo el registro
+    with bloqueos.bloqueo(ruta_cambios + ".lock", exclusivo=False):
+        with open(ruta_cambios, 'a', encoding='utf-8') as archivo:
+            archivo.write(linea + "\n")
+
+def anotar_cambios(colecciones, versiones):
+    """
+    Anota los cambios de un grupo de colecciones a punto de guardarse
+    Args:
+        colecciones (dict): Nombre de la colección -> Coleccion a guardar
+        versiones (dict): Nombre de la colección -> versión al confirmarse
+    """
+    for nombre_archivo, coleccion in colecciones.items():
+        if nombre_archivo not in COLECCIONES_INDEXADAS:
+            continue
+        if coleccion.reemplazo or coleccion.tiene_claves_internas():
+            ids = None
+        else:
+            eliminados, modificados = coleccion.extraer_cambios()
+            ids = [*eliminados, *(registro.get('id') for registro in modificados)]
+        anotar(nombre_archivo, versiones[nombre_archivo], ids)
+
+def _identidad(archivo):
+    info = os.fstat(archivo.fileno())
+    return (info.st_dev, info.st_ino)
+
+def _leer_marcas():
+    """
+    Lee las marcas anotadas desde la última posición aplicada
+    Returns:
+        tuple: ((dispositivo, inodo) del registro de cambios, lista de
+            marcas nuevas o None si el registro no es el que se venía leyendo)
+    """
+    global _leidos
+    with open(_ruta_cambios(), 'a+b') as archivo:
+        identidad = _identidad(archivo)
+        if _leidos is None or tuple(_leidos[0]) != identidad:
+            return identidad, None
+        archivo.seek(_leidos[1])
+        contenido = archivo.read()
+    # Una línea sin terminar se lee en la próxima consulta
+    completo = contenido.rfind(b"\n") + 1
+    _leidos = (identidad, _leidos[1] + completo)
+    marcas = []
+    for linea in contenido[:completo].splitlines():
+        try:
+            marcas.append(json.loads(linea))
+        except ValueError:
+            print("ERROR: Marca dañada en el registro de cambios de la búsqueda, se sincroniza todo el índice.")
+            marcas.append({'coleccion': 'libros', 'version': 0, 'ids': None})
+    return identidad, marcas
+
+def _leer_indice():
+    """
+    Returns:
+        tuple or None: (IndiceInvertido, posición aplicada del registro de
+            cambios, marcas en espera) o None si no hay copia en disco
+    """
+    try:
+        with open(_ruta_indice(), 'r', encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+        leidos = datos.get('cambios')
+        return IndiceInvertido.importar(datos), tuple(leidos) if leidos else None, datos.get('en_espera', [])
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"ERROR: Índice de búsqueda dañado, se reconstruye: {e}")
+        return None
+
+def guardar_indice():
+    """
+    Guarda en disco el índice de búsqueda cargado en memoria, con la
+    posición del registro de cambios que tiene aplicada
+    Si el registro de cambios ya es grande y está todo aplicado, lo hace
+    empezar vacío: las terminales que lo venían leyendo toman esta copia
+    """
+    global _leidos, _aplicados_sin_guardar
+    with _candado:
+        if _indice is None or _leidos is None:
+            return
+        ruta = _ruta_indice()
+        ruta_temporal = f"{ruta}.{os.getpid()}.tmp"
+        ruta_cambios = _ruta_cambios()
+        # El índice se codifica fuera del bloqueo, que demora a los guardados
+        datos = json.dumps(_indice.exportar(), ensure_ascii=False, separators=(',', ':'))
+        try:
+            with bloqueos.bloqueo(ruta_cambios + ".lock"):
+                with open(ruta_cambios, 'a+b') as archivo:
+                    identidad = _identidad(archivo)
+                    tamaño = os.fstat(archivo.fileno()).st_size
+                if identidad != tuple(_leidos[0]):
+                    # Otra terminal hizo empezar el registro: su copia es más nueva
+                    return
+                leidos = _leidos
+                ruta_cambios_nuevo = None
+                if _leidos[1] >= TAMAÑO_PARA_ROTAR_CAMBIOS and tamaño == _leidos[1]:
+                    ruta_cambios_nuevo = f"{ruta_cambios}.{os.getpid()}.tmp"
+                    with open(ruta_cambios_nuevo, 'wb') as archivo:
+                        leidos = (_identidad(archivo), 0)
+                with open(ruta_temporal, 'w', encoding='utf-8') as archivo:
+                    # La posición se agrega al final del objeto ya codificado
+                    archivo.write(datos[:-1])
+                    archivo.write(f",\"cambios\":{json.dumps([list(leidos[0]), leidos[1]])}")
+                    archivo.write(f",\"en_espera\":{json.dumps(_en_espera, separators=(',', ':'))}}}")
+                os.replace(ruta_temporal, ruta)
+                if ruta_cambios_nuevo is not None:
+                    os.replace(ruta_cambios_nuevo, ruta_cambios)
+                _leidos = leidos
+                _aplicados_sin_guardar = 0
+        except OSError as e:
+            print(f"ERROR: No se pudo guardar el índice de búsqueda: {e}")
+
+def _revisar_libros(ids):
+    """
+    Vuelve a indexar los libros marcados con sus datos actuales
+    En SQLite, si son pocos, se leen con consultas puntuales
+    """
+    if manejo_archivos.MODO_ALMACENAMIENTO == 'sqlite' and len(ids) <= MAXIMO_CONSULTAS_PUNTUALES:
+        def buscar(id_libro):
+            return manejo_archivos.buscar_registro("libros", id_libro)
+    else:
+        libros = manejo_archivos.cargar_datos("libros")
+
+        def buscar(id_libro):
+            return manejo_archivos.buscar_por_id(libros, id_libro)
+    for id_libro in ids:
+        libro = buscar(id_libro)
+        if libro is not None and libro.get('activo', True):
+            firma = _firma_libro(libro)
+            if _indice.firmas.get(id_libro) != firma:
+                _indice.agregar(id_libro, firma)
+        else:
+            _indice.quitar(id_libro)
+
+def _revisar_nombres(ids_autores, ids_categorias):
+    """
+    Actualiza los nombres marcados de autores y categorías
+    """
+    autores = categorias = None
+    if ids_autores:
+        coleccion = manejo_archivos.cargar_datos("autores")
+        autores = {}
+        for id_autor in ids_autores:
+            autor = manejo_archivos.buscar_por_id(coleccion, id_autor)
+            autores[id_autor] = _nombre_autor(autor) if autor is not None else None
+    if ids_categorias:
+        coleccion = manejo_archivos.cargar_datos("categorias")
+        categorias = {}
+        for id_categoria in ids_categorias:
+            categoria = manejo_archivos.buscar_por_id(coleccion, id_categoria)
+            categorias[id_categoria] = categoria.get('nombre', '') if categoria is not None else None
+    _indice.renombrar(autores, categorias)
+
+def _sincronizar_todo():
+    global _desactualizado
+    _indice.sincronizar(
+        manejo_archivos.cargar_datos("libros"),
+        manejo_archivos.cargar_datos("autores"),
+        manejo_archivos.cargar_datos("categorias"),
+    )
+    _desactualizado = False
+
+def _poner_al_dia():
+    """
+    Aplica las marcas nuevas del registro de cambios cuya colección ya
+    llegó a la versión anotada; las demás quedan en espera
+    Returns:
+        bool: True si conviene guardar el índice en disco
+    """
+    global _indice, _leidos, _en_espera, _aplicados_sin_guardar, _desactualizado
+    identidad, marcas = _leer_marcas()
+    if marcas is None:
+        # Otra terminal hizo empezar el registro (su copia en disco lo tiene
+        # todo aplicado) o no se sabe qué parte del registro se aplicó
+        guardado = _leer_indice() if _leidos is not None else None
+        if guardado is not None and guardado[1] is not None and tuple(guardado[1][0]) == identidad:
+            _indice, _leidos, _en_espera = guardado
+            _aplicados_sin_guardar = 0
+        else:
+            _desactualizado = True
+            _leidos = (identidad, 0)
+        identidad, marcas = _leer_marcas()
+        if marcas is None:
+            # El registro volvió a empezar mientras tanto
+            marcas = []
+
+    versiones = {}
+    aplicables = []
+    en_espera = []
+    for marca in _en_espera + marcas:
+        nombre = marca['coleccion']
+        if nombre not in versiones:
+            versiones[nombre] = manejo_archivos.obtener_version(nombre)
+        (aplicables if versiones[nombre] >= marca['version'] else en_espera).append(marca)
+    _en_espera = en_espera
+
+    completa = _desactualizado or any(marca['ids'] is None for marca in aplicables)
+    if completa:
+        _sincronizar_todo()
+    elif aplicables:
+        ids = {nombre: set() for nombre in COLECCIONES_INDEXADAS}
+        for marca in aplicables:
+            ids[marca['coleccion']].update(marca['ids'])
+        if ids['autores'] or ids['categorias']:
+            _revisar_nombres(ids['autores'], ids['categorias'])
+        _revisar_libros(ids['libros'])
+    _aplicados_sin_guardar += len(aplicables)
+    return completa or _aplicados_sin_guardar > MINIMO_CAMBIOS_PARA_GUARDAR
+
+def obtener_indice():
+    """
+    Obtiene el índice de búsqueda al día con los datos
+    La primera vez se lee de disco (o se construye, y se guarda); después
+    solo se aplican las marcas nuevas del registro de cambios
+    Returns:
+        IndiceInvertido: Índice de búsqueda
+    """
+    global _indice, _leidos, _en_espera
+    with _candado:
+        if _indice is None:
+            guardado = _leer_indice()
+            if guardado is not None:
+                _indice, _leidos, _en_espera = guardado
+            else:
+                _indice = IndiceInvertido()
+                _leidos = None
+        if _poner_al_dia():
+            guardar_indice()
+        return _indice
+
+@medido('busqueda')
+def buscar_libros(consulta, limite=20):
+    """
+    Busca libros por palabras del título, del autor o de la categoría
+    Args:
+        consulta (str): Texto de la consulta (ver IndiceInvertido.buscar)
+        limite (int): Cantidad máxima de resultados
+    Returns:
+        list: Tuplas (libro, puntaje) de mayor a menor puntaje
+    """
+    with _candado:
+        resultados = obtener_indice().buscar(consulta, limite)
+    encontrados = []
+    for id_libro, puntaje in resultados:
+        # En SQLite es una consulta puntual, sin cargar todos los libros
+        libro = manejo_archivos.buscar_registro("libros", id_libro)
+        if libro is not None:
+            encontrados.append((libro, puntaje))
+    return encontrados
+
+def actualizar_libros(libros):
+    """
+    Actualiza en el índice los libros recién guardados
+    Si el índice todavía no se cargó en este proceso no hace nada: se
+    pone al día al hacer la primera búsqueda. Las demás terminales los
+    toman del registro de cambios
+    Args:
+        libros (iterable): Libros creados o modificados
+    """
+    with _candado:
+        if _indice is None:
+            return
+        for libro in libros:
+            if libro.get('activo', True):
+                _indice.agregar(libro['id'], _firma_libro(libro))
+            else:
+                _indice.quitar(libro['id'])
+
+def marcar_desactualizado():
+    """
+    Fuerza una sincronización completa en la próxima búsqueda de este
+    proceso
+    Se usa cuando cambian los nombres de autores o categorías, que con la
+    escritura diferida pueden no estar guardados todavía
+    """
+    global _desactualizado
+    with _candado:
+        _desactualizado = True
@@ -0,0 +1,129 @@
+"""
+Módulo de caché de colecciones
+Mantiene en memoria las colecciones ya cargadas para no volver a leer y
+parsear el archivo JSON completo en cada operación
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+# Límite total de la caché, medido con el tamaño en disco de cada colección
+LIMITE_BYTES_CACHE = int(os.environ.get("BIBLIOTECA_CACHE_BYTES", 64 * 1024 * 1024))
+
+# nombre -> (firma, tamaño, datos); el orden refleja el uso (LRU al inicio)
+_entradas = OrderedDict()
+_bytes_totales = 0
+_candado = threading.RLock()
+_estadisticas = {'aciertos': 0, 'fallos': 0, 'desalojos': 0}
+
+def obtener_firma(ruta_archivo):
+    """
+    Obtiene la firma de un archivo para saber si cambió en disco
+    Args:
+        ruta_archivo (str): Ruta del archivo
+    Returns:
+        tuple or None: (mtime en ns, tamaño, inodo) o None si no existe
+    """
+    try:
+        info = os.stat(ruta_archivo)
+    except OSError:
+        return None
+    return (info.st_mtime_ns, info.st_size, info.st_ino)
+
+def obtener(nombre, firma):
+    """
+    Obtiene una colección de la caché si su firma sigue vigente
+    Args:
+        nombre (str): Nombre de la colección
+        firma (tuple): Firma actual del archivo en disco
+    Returns:
+        list or None: Datos en caché o None si no hay o están obsoletos
+    """
+    global _bytes_totales
+    with _candado:
+        entrada = _entradas.get(nombre)
+        if entrada is None:
+            _estadisticas['fallos'] += 1
+            return None
+        if entrada[0] != firma:
+            # El archivo cambió en disco (otro proceso o edición manual)
+            del _entradas[nombre]
+            _bytes_totales -= entrada[1]
+            _estadisticas['fallos'] += 1
+            return None
+        _entradas.move_to_end(nombre)
+        _estadisticas['aciertos'] += 1
+        return entrada[2]
+
+def guardar(nombre, firma, datos):
+    """
+    Guarda una colección en la caché y desaloja las menos usadas si se
+    supera el límite de bytes
+    Args:
+        nombre (str): Nombre de la colección
+        firma (tuple): Firma del origen de los datos; la posición 1 es
+            el tamaño en bytes que se descuenta del límite
+        datos (list): Colección ya parseada
+    """
+    global _bytes_totales
+    if firma is None:
+        invalidar(nombre)
+        return
+    tamaño = firma[1]
+    with _candado:
+        anterior = _entradas.pop(nombre, None)
+        if anterior is not None:
+            _bytes_totales -= anterior[1]
+
+        # Una colección más grande que toda la caché no se guarda
+        if tamaño > LIMITE_BYTES_CACHE:
+            return
+
+        _entradas[nombre] = (firma, tamaño, datos)
+        _bytes_totales += tamaño
+
+        while _bytes_totales > LIMITE_BYTES_CACHE:
+            _, (_, tamaño_desalojado, _) = _entradas.popitem(last=False)
+            _bytes_totales -= tamaño_desalojado
+            _estadisticas['desalojos'] += 1
+
+def invalidar(nombre=None):
+    """
+    Elimina una colección de la caché, o todas si no se indica nombre
+    Args:
+        nombre (str): Nombre de la colección (None para vaciar la caché)
+    """
+    global _bytes_totales
+    with _candado:
+        if nombre is None:
+            _entradas.clear()
+            _bytes_totales = 0
+        else:
+            entrada = _entradas.pop(nombre, None)
+            if entrada is not None:
+                _bytes_totales -= entrada[1]
+
+def descartar_modificadas():
+    """
+    Elimina de la caché las colecciones con cambios sin guardar
+    Se usa al anular una transacción: la próxima carga vuelve a leer disco
+    """
+    global _bytes_totales
+    with _candado:
+        for nombre in list(_entradas):
+            datos = _entradas[nombre][2]
+            if getattr(datos, 'tiene_cambios', None) and datos.tiene_cambios():
+                _bytes_totales -= _entradas.pop(nombre)[1]
+
+def obtener_estadisticas():
+    """
+    Retorna las estadísticas de uso de la caché
+    Returns:
+        dict: Aciertos, fallos, desalojos, bytes ocupados y colecciones
+    """
+    with _candado:
+        estadisticas = dict(_estadisticas)
+        estadisticas['bytes'] = _bytes_totales
+        estadisticas['colecciones'] = list(_entradas.keys())
+        return estadisticas
@@ -0,0 +1,353 @@
+"""
+Módulo de análisis de circulación
+Resume los préstamos por categoría, por autor y por mes: cantidad,
+devueltos, duración media de los devueltos, devoluciones con atraso (y su
+proporción sobre los devueltos) y préstamos sin devolver que pasaron su
+fecha
+
+Los libros, autores y categorías se leen una vez en diccionarios y los
+préstamos se recorren una sola vez de a lotes, sin cargarlos (ver
+manejo_archivos.recorrer_lotes). En el recorrido solo se acumula por
+libro y por día; los grupos por categoría, autor y mes se arman después a
+partir de esos totales, que son pocos. Con NumPy instalado los préstamos se
+pasan a columnas y los totales por libro y por día se calculan de una vez
+con numpy.bincount
+
+Uso:
+    python -m utils.circulacion
+    python -m utils.circulacion --formato csv --salida circulacion.csv
+    python -m utils.circulacion --desde 01/01/2025 --hasta 31/12/2025 --formato json
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from array import array
+from datetime import date
+
+from utils import fechas
+from utils.instrumentacion import medido
+from utils.manejo_archivos import recorrer_lotes
+from utils.validaciones import comprobar_fecha
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+FORMATOS_SALIDA = ('tabla', 'csv', 'json')
+
+# Grupo del informe -> título en la tabla
+GRUPOS = {
+    'por_categoria': "Préstamos por categoría",
+    'por_autor': "Préstamos por autor",
+    'por_mes': "Préstamos por mes",
+}
+
+# Columnas de cada fila del informe, en el orden de la tabla y del CSV
+COLUMNAS = ('clave', 'nombre', 'prestamos', 'devueltos', 'duracion_media', 'atrasados', 'tasa_atraso', 'vencidos')
+
+# Posiciones de los totales que se acumulan por libro, por día y por grupo
+PRESTAMOS, DEVUELTOS, DIAS, ATRASADOS, VENCIDOS = range(5)
+
+def _totales_python(lotes, desde, hasta, referencia):
+    """
+    Acumula los préstamos por libro y por día de préstamo
+    Returns:
+        tuple: (por libro, por día), cada uno clave -> lista de totales
+    """
+    a_ordinal = fechas.a_ordinal
+    por_libro = {}
+    por_dia = {}
+    for lote in lotes:
+        for prestamo in lote:
+            inicio = prestamo['fecha_prestamo']
+            esperada = prestamo['fecha_devolucion_esperada']
+            real = prestamo.get('fecha_devolucion_real')
+            if type(inicio) is not int or type(esperada) is not int or type(real) is str:
+                inicio, esperada, real = a_ordinal(inicio), a_ordinal(esperada), a_ordinal(real)
+            if (desde is not None and inicio < desde) or (hasta is not None and inicio > hasta):
+                continue
+
+            id_libro = prestamo['id_libro']
+            fila_libro = por_libro.get(id_libro)
+            if fila_libro is None:
+                fila_libro = por_libro[id_libro] = [0, 0, 0, 0, 0]
+            fila_dia = por_dia.get(inicio)
+            if fila_dia is None:
+                fila_dia = por_dia[inicio] = [0, 0, 0, 0, 0]
+
+            for fila in (fila_libro, fila_dia):
+                fila[PRESTAMOS] += 1
+                if real is not None:
+                    fila[DEVUELTOS] += 1
+                    fila[DIAS] += real - inicio
+                    if real > esperada:
+                        fila[ATRASADOS] += 1
+                elif esperada < referencia:
+                    fila[VENCIDOS] += 1
+    return por_libro, por_dia
+
+def _columna(lote, campo):
+    """
+    Valores de un campo de un lote de préstamos como enteros de 64 bits
+    (0 si falta, como la fecha de devolución de los que no se devolvieron)
+    """
+    valores = [prestamo.get(campo) or 0 for prestamo in lote]
+    try:
+        return array('q', valores)
+    except TypeError:
+        # Fechas en texto de archivos sin migrar
+        return array('q', [fechas.a_ordinal(valor) or 0 for valor in valores])
+
+def _totales_numpy(lotes, desde, hasta, referencia):
+    """
+    Igual que _totales_python, con los préstamos pasados a columnas
+    Returns:
+        tuple: (por libro, por día), cada uno clave -> lista de totales
+    """
+    libros, inicios, esperadas, reales = array('q'), array('q'), array('q'), array('q')
+    for lote in lotes:
+        libros += _columna(lote, 'id_libro')
+        inicios += _columna(lote, 'fecha_prestamo')
+        esperadas += _columna(lote, 'fecha_devolucion_esperada')
+        # Los números de día empiezan en 1: 0 marca que no se devolvió
+        reales += _columna(lote, 'fecha_devolucion_real')
+
+    libros, inicios, esperadas, reales = (numpy.frombuffer(columna, dtype=numpy.int64)
+                                          for columna in (libros, inicios, esperadas, reales))
+    if desde is not None or hasta is not None:
+        elegidos = numpy.ones(len(inicios), dtype=bool)
+        if desde is not None:
+            elegidos &= inicios >= desde
+        if hasta is not None:
+            elegidos &= inicios <= hasta
+        libros, inicios, esperadas, reales = libros[elegidos], inicios[elegidos], esperadas[elegidos], reales[elegidos]
+    if not len(inicios):
+        return {}, {}
+
+    devueltos = reales > 0
+    pesos = (
+        None,
+        devueltos,
+        numpy.where(devueltos, reales - inicios, 0),
+        devueltos & (reales > esperadas),
+        ~devueltos & (esperadas < referencia),
+    )
+    primer_dia = int(inicios.min())
+    totales = []
+    for claves, desplazamiento in ((libros, 0), (inicios - primer_dia, primer_dia)):
+        columnas = [numpy.bincount(claves, weights=peso) for peso in pesos]
+        presentes = numpy.flatnonzero(columnas[PRESTAMOS])
+        filas = numpy.stack([columna[presentes] for columna in columnas], axis=1).astype(numpy.int64)
+        totales.append(dict(zip((presentes + desplazamiento).tolist(), filas.tolist())))
+    return totales[0], totales[1]
+
+def _sumar(grupos, clave, fila):
+    total = grupos.get(clave)
+    if total is None:
+        grupos[clave] = list(fila)
+    else:
+        for posicion, valor in enumerate(fila):
+            total[posicion] += valor
+
+def _fila(clave, nombre, totales):
+    prestamos, devueltos, dias, atrasados, vencidos = totales
+    return {
+        'clave': clave,
+        'nombre': nombre,
+        'prestamos': prestamos,
+        'devueltos': devueltos,
+        'duracion_media': round(dias / devueltos, 2) if devueltos else None,
+        'atrasados': atrasados,
+        'tasa_atraso': round(atrasados / devueltos, 4) if devueltos else None,
+        'vencidos': vencidos,
+    }
+
+@medido('modelo')
+def analizar_circulacion(desde=None, hasta=None, referencia=None, usar_numpy=None):
+    """
+    Calcula el informe de circulación en un solo recorrido de los préstamos
+    La duración media y la tasa de atraso se calculan sobre los préstamos
+    devueltos; los vencidos son los que siguen sin devolver después de su
+    fecha esperada
+    Args:
+        desde (int, str or date): Primer día de préstamo incluido (None: todo el historial)
+        hasta (int, str or date): Último día de préstamo incluido (None: sin límite)
+        referencia (int, str or date): Día para decidir qué está vencido (por defecto, hoy)
+        usar_numpy (bool): Forzar o evitar NumPy (None: usarlo si está instalado)
+    Returns:
+        dict: 'desde', 'hasta', 'referencia', 'motor', 'segundos', 'total' y
+            las filas de cada grupo ('por_categoria', 'por_autor',
+            'por_mes'); cada fila tiene las columnas de COLUMNAS
+    Raises:
+        ValueError: Si una fecha en texto no tiene el formato DD/MM/AAAA
+    """
+    inicio_analisis = time.perf_counter()
+    desde, hasta = fechas.a_ordinal(desde), fechas.a_ordinal(hasta)
+    referencia = fechas.a_ordinal(referencia) if referencia is not None else fechas.hoy()
+    if usar_numpy is None:
+        usar_numpy = numpy is not None
+    elif usar_numpy and numpy is None:
+        raise ValueError("NumPy no está instalado.")
+
+    libros = {libro['id']: (libro.get('id_autor'), libro.get('id_categoria'))
+              for lote in recorrer_lotes('libros') for libro in lote}
+    autores = {autor['id']: f"{autor.get('nombre', '')} {autor.get('apellido', '')}".strip()
+               for lote in recorrer_lotes('autores') for autor in lote}
+    categorias = {categoria['id']: categoria.get('nombre', '') for lote in recorrer_lotes('categorias') for categoria in lote}
+
+    acumular = _totales_numpy if usar_numpy else _totales_python
+    por_libro, por_dia = acumular(recorrer_lotes('prestamos'), desde, hasta, referencia)
+
+    total = [0, 0, 0, 0, 0]
+    por_categoria = {}
+    por_autor = {}
+    for id_libro, fila in por_libro.items():
+        id_autor, id_categoria = libros.get(id_libro, (None, None))
+        _sumar(por_categoria, id_categoria, fila)
+        _sumar(por_autor, id_autor, fila)
+        for posicion, valor in enumerate(fila):
+            total[posicion] += valor
+    por_mes = {}
+    for dia, fila in por_dia.items():
+        _sumar(por_mes, date.fromordinal(dia).strftime("%Y-%m"), fila)
+
+    def ordenar_por_prestamos(grupos, nombres, desconocido):
+        filas = [_fila(clave, nombres.get(clave) or desconocido(clave), totales) for clave, totales in grupos.items()]
+        return sorted(filas, key=lambda fila: (-fila['prestamos'], str(fila['clave'])))
+
+    return {
+        'desde': fechas.formatear(desde),
+        'hasta': fechas.formatear(hasta),
+        'referencia': fechas.formatear(referencia),
+        'motor': 'numpy' if usar_numpy else 'python',
+        'segundos': round(time.perf_counter() - inicio_analisis, 3),
+        'total': _fila(None, "Total", total),
+        'por_categoria': ordenar_por_prestamos(por_categoria, categorias, lambda clave: "Sin categoría" if clave is None else f"Categoría #{clave}"),
+        'por_autor': ordenar_por_prestamos(por_autor, autores, lambda clave: "Sin autor" if clave is None else f"Autor #{clave}"),
+        'por_mes': [_fila(mes, mes, por_mes[mes]) for mes in sorted(por_mes)],
+    }
+
+def recortar(informe, limite):
+    """
+    Deja las primeras filas de cada grupo del informe (en los meses, los
+    más recientes)
+    Args:
+        informe (dict): Informe de analizar_circulacion
+        limite (int): Filas por grupo (None para no recortar)
+    Returns:
+        dict: Copia del informe con los grupos recortados
+    """
+    if limite is None:
+        return informe
+    recortado = dict(informe, **{grupo: informe[grupo][:limite] for grupo in GRUPOS})
+    recortado['por_mes'] = informe['por_mes'][-limite:]
+    return recortado
+
+def _texto(valor, columna):
+    if valor is None:
+        return "-"
+    if columna == 'tasa_atraso':
+        return f"{valor * 100:.1f}%"
+    if columna == 'duracion_media':
+        return f"{valor:.1f}"
+    return str(valor)
+
+def formatear_tabla(informe):
+    """
+    Da formato de tabla de consola al informe
+    Args:
+        informe (dict): Informe de analizar_circulacion
+    Returns:
+        str: Tabla con el total y una sección por grupo
+    """
+    periodo = f"{informe['desde'] or 'inicio'} - {informe['hasta'] or 'hoy'}"
+    lineas = [f"Circulación ({periodo}, vencidos al {informe['referencia']}, motor {informe['motor']}, {informe['segundos']:.2f} s)"]
+    encabezado = f"{'Grupo':<32} {'Préstamos':>10} {'Devueltos':>10} {'Días medios':>12} {'Atrasados':>10} {'% atraso':>9} {'Vencidos':>9}"
+    secciones = [("Total", [informe['total']])] + [(titulo, informe[grupo]) for grupo, titulo in GRUPOS.items()]
+    for titulo, filas in secciones:
+        lineas += ["", titulo, encabezado, "-" * len(encabezado)]
+        for fila in filas:
+            valores = {columna: _texto(fila[columna], columna) for columna in COLUMNAS}
+            lineas.append(
+                f"{valores['nombre'][:32]:<32} {valores['prestamos']:>10} {valores['devueltos']:>10} {valores['duracion_media']:>12} "
+                f"{valores['atrasados']:>10} {valores['tasa_atraso']:>9} {valores['vencidos']:>9}"
+            )
+        if not filas:
+            lineas.append("(sin préstamos)")
+    return "\n".join(lineas)
+
+def escribir_csv(informe, salida):
+    """
+    Escribe el informe como una sola tabla CSV, con el grupo en la primera columna
+    Args:
+        informe (dict): Informe de analizar_circulacion
+        salida (file): Archivo de texto abierto con newline=''
+    """
+    escritor = csv.writer(salida)
+    escritor.writerow(('grupo',) + COLUMNAS)
+    escritor.writerow(('total',) + tuple(informe['total'][columna] for columna in COLUMNAS))
+    for grupo in GRUPOS:
+        for fila in informe[grupo]:
+            escritor.writerow((grupo,) + tuple(fila[columna] for columna in COLUMNAS))
+
+def escribir_informe(informe, formato, salida):
+    """
+    Escribe el informe en el formato pedido
+    Args:
+        informe (dict): Informe de analizar_circulacion
+        formato (str): 'tabla', 'csv' o 'json'
+        salida (file): Archivo de texto abierto con newline=''
+    """
+    if formato == 'csv':
+        escribir_csv(informe, salida)
+    elif formato == 'json':
+        salida.write(json.dumps(informe, ensure_ascii=False, indent=2) + "\n")
+    else:
+        salida.write(formatear_tabla(informe) + "\n")
+
+def main(argumentos=None):
+    """
+    Punto de entrada de la línea de comandos
+    Args:
+        argumentos (list): Argumentos (None para usar sys.argv)
+    Returns:
+        int: Código de salida
+    """
+    parser = argparse.ArgumentParser(description="Informe de circulación por categoría, autor y mes")
+    parser.add_argument('--desde', help="Primer día de préstamo incluido (DD/MM/AAAA)")
+    parser.add_argument('--hasta', help="Último día de préstamo incluido (DD/MM/AAAA)")
+    parser.add_argument('--referencia', help="Día para decidir qué está vencido (por defecto, hoy)")
+    parser.add_argument('--formato', choices=FORMATOS_SALIDA, default='tabla')
+    parser.add_argument('--salida', metavar="ARCHIVO", help="Archivo de destino (por defecto, la consola)")
+    parser.add_argument('--limite', type=int, help="Filas por grupo (por defecto, todas; en los meses, los más recientes)")
+    parser.add_argument('--sin-numpy', action='store_true', help="Calcula sin NumPy aunque esté instalado")
+    opciones = parser.parse_args(argumentos)
+
+    try:
+        for fecha in (opciones.desde, opciones.hasta, opciones.referencia):
+            if fecha is not None:
+                comprobar_fecha(fecha)
+        informe = analizar_circulacion(opciones.desde, opciones.hasta, opciones.referencia,
+                                       usar_numpy=False if opciones.sin_numpy else None)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 2
+    informe = recortar(informe, opciones.limite)
+    if opciones.salida is None:
+        escribir_informe(informe, opciones.formato, sys.stdout)
+        return 0
+    try:
+        with open(opciones.salida, 'w', encoding='utf-8', newline='') as archivo:
+            escribir_informe(informe, opciones.formato, archivo)
+    except OSError as e:
+        print(f"ERROR: No se pudo escribir {opciones.salida}: {e}")
+        return 1
+    print(f"Informe guardado en {opciones.salida}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,613 @@
+"""
+Módulo de colecciones indexadas
+Define la colección que devuelve cargar_datos: se recorre como una lista
+pero guarda los registros en un diccionario ordenado id -> registro, de modo
+que buscar y eliminar por ID cuestan O(1). Además registra qué registros
+cambiaron desde el último guardado para poder escribir solo esos cambios
+"""
+
+from bisect import bisect_left, insort
+
+# Marca de campo ausente en un registro (distinta de un campo con valor None)
+_SIN_VALOR = object()
+
+class Registro(dict):
+    """
+    Diccionario que avisa a su colección cuando se modifica
+    Permite detectar los cambios hechos directamente sobre el registro, por
+    ejemplo libro['copias_disponibles'] -= 1
+    """
+    __slots__ = ('_coleccion', '_clave')
+
+    def __reduce__(self):
+        # Al copiar o serializar se pierde el vínculo con la colección
+        return (Registro, (dict(self),))
+
+    def _notificar(self, anteriores):
+        """
+        Avisa a la colección del cambio
+        Args:
+            anteriores (dict): Valores que tenían los campos modificados
+        """
+        coleccion = getattr(self, '_coleccion', None)
+        if coleccion is not None:
+            coleccion._modificados[self._clave] = None
+            if coleccion._indices or coleccion._ordenados:
+                coleccion._reindexar(self._clave, self, anteriores)
+
+    def __setitem__(self, campo, valor):
+        anterior = dict.get(self, campo, _SIN_VALOR)
+        dict.__setitem__(self, campo, valor)
+        self._notificar({campo: anterior})
+
+    def __delitem__(self, campo):
+        anterior = dict.get(self, campo, _SIN_VALOR)
+        dict.__delitem__(self, campo)
+        self._notificar({campo: anterior})
+
+    def __ior__(self, otro):
+        anteriores = dict(self)
+        dict.update(self, otro)
+        self._notificar(anteriores)
+        return self
+
+    def update(self, *args, **kwargs):
+        anteriores = dict(self)
+        dict.update(self, *args, **kwargs)
+        self._notificar(anteriores)
+
+    def pop(self, campo, *args):
+        anterior = dict.get(self, campo, _SIN_VALOR)
+        valor = dict.pop(self, campo, *args)
+        self._notificar({campo: anterior})
+        return valor
+
+    def popitem(self):
+        par = dict.popitem(self)
+        self._notificar({par[0]: par[1]})
+        return par
+
+    def setdefault(self, campo, valor=None):
+        if campo not in self:
+            self[campo] = valor
+        return dict.__getitem__(self, campo)
+
+    def clear(self):
+        anteriores = dict(self)
+        dict.clear(self)
+        self._notificar(anteriores)
+
+class IndiceOrdenado:
+    """
+    Índice secundario ordenado por un valor calculado de cada registro
+    Guarda los valores distintos en una lista ordenada y, por cada valor,
+    las claves de sus registros, de modo que buscar los menores a un límite
+    solo recorre los registros que cumplen
+    """
+
+    def __init__(self, calcular, pares=()):
+        """
+        Args:
+            calcular (callable): Recibe un registro y devuelve el valor por el
+                que se ordena (None si el registro no entra en el índice)
+            pares (iterable): Pares [valor, [claves]] ya ordenados por valor
+        """
+        self.calcular = calcular
+        self._valores = []
+        self._grupos = {}
+        # clave -> valor con que está indexado el registro
+        self._por_clave = {}
+        for valor, claves in pares:
+            self._valores.append(valor)
+            self._grupos[valor] = dict.fromkeys(claves)
+            self._por_clave.update(dict.fromkeys(claves, valor))
+
+    def agregar(self, clave, registro):
+        valor = self.calcular(registro)
+        if valor is None:
+            return
+        grupo = self._grupos.get(valor)
+        if grupo is None:
+            grupo = self._grupos[valor] = {}
+            insort(self._valores, valor)
+        grupo[clave] = None
+        self._por_clave[clave] = valor
+
+    def quitar(self, clave):
+        valor = self._por_clave.pop(clave, None)
+        if valor is None:
+            return
+        grupo = self._grupos[valor]
+        del grupo[clave]
+        if not grupo:
+            del self._grupos[valor]
+            del self._valores[bisect_left(self._valores, valor)]
+
+    def actualizar(self, clave, registro):
+        if self.calcular(registro) != self._por_clave.get(clave):
+            self.quitar(clave)
+            self.agregar(clave, registro)
+
+    def menores(self, limite):
+        """
+        Yields:
+            tuple: (valor, clave) de los registros con valor menor a limite,
+                en orden de valor
+        """
+        for valor in self._valores[:bisect_left(self._valores, limite)]:
+            for clave in self._grupos[valor]:
+                yield valor, clave
+
+    def exportar(self):
+        return [[valor, list(self._grupos[valor])] for valor in self._valores]
+
+class Coleccion:
+    """
+    Colección de registros (diccionarios) con índice hash por clave primaria
+    Mantiene el orden de inserción, igual que la lista original
+    Los registros agregados con append conservan su identidad hasta que se
+    confirman los cambios; a partir de ahí la colección guarda un Registro
+    Opcionalmente mantiene índices secundarios campo -> valor -> IDs, que se
+    actualizan con cada alta, baja o modificación de un registro, e índices
+    ordenados (IndiceOrdenado) para buscar por rango
+    """
+
+    def __init__(self, registros=(), campo_id='id', reemplazo=False):
+        """
+        Args:
+            registros (iterable): Registros iniciales (no cuentan como cambios)
+            campo_id (str): Nombre del campo que actúa como clave primaria
+            reemplazo (bool): True si la colección debe escribirse completa
+        """
+        self.campo_id = campo_id
+        self.reemplazo = reemplazo
+        # Versión en disco sobre la que se basan estos datos (None: sin control)
+        self.version = None
+        self._registros = {}
+        self._secuencia = 0
+        # dict y no set: conserva el orden en que se agregaron los registros,
+        # que es el orden en que se escriben en el journal
+        self._modificados = {}
+        self._eliminados = set()
+        # campo -> {valor: {clave: None}}; None mientras no se construye
+        self._indices = {}
+        # nombre -> IndiceOrdenado; (calcular,) mientras no se construye
+        self._ordenados = {}
+        # Registros agregados como dict común, aún no incluidos en los índices
+        self._pendientes_indice = {}
+        for registro in registros:
+            self._adoptar(registro, self._clave(registro))
+
+    def _clave(self, registro):
+        """
+        Calcula la clave interna de un registro
+        Los registros sin ID o con un ID repetido se conservan con una clave
+        interna propia para no perder datos (buscar devuelve el primero)
+        """
+        clave = registro.get(self.campo_id)
+        if clave is None or clave in self._registros:
+            self._secuencia += 1
+            clave = ('_sin_clave', self._secuencia)
+        return clave
+
+    def _adoptar(self, registro, clave):
+        """
+        Guarda un registro bajo la clave indicada como Registro vinculado
+        """
+        vinculo = getattr(registro, '_coleccion', None)
+        if type(registro) is not Registro or (vinculo is not None and vinculo is not self):
+            registro = Registro(registro)
+        registro._coleccion = self
+        registro._clave = clave
+        self._registros[clave] = registro
+        if self._indices or self._ordenados:
+            self._pendientes_indice.pop(clave, None)
+            self._indexar_registro(clave, registro)
+        return registro
+
+    def _desvincular(self, clave, registro):
+        if type(registro) is Registro:
+            registro._coleccion = None
+        if self._indices or self._ordenados:
+            self._quitar_de_indices(clave, registro)
+        self._modificados.pop(clave, None)
+        self._eliminados.add(clave)
+
+    # --- Índices secundarios ---
+
+    def indexar(self, campos, persistidos=None):
+        """
+        Declara índices secundarios sobre campos de los registros
+        Cada índice se construye recién cuando se consulta por primera vez,
+        salvo que se reciba ya construido (por ejemplo, leído de disco)
+        Args:
+            campos (iterable): Campos a indexar
+            persistidos (dict): campo -> lista de [valor, [IDs]] (opcional)
+        """
+        for campo in campos:
+            self._indices.setdefault(campo, None)
+        for campo, pares in (persistidos or {}).items():
+            if campo in self._indices:
+                self._indices[campo] = {valor: self._grupo(claves) for valor, claves in pares}
+
+    def indexar_ordenado(self, nombre, calcular, persistido=None):
+        """
+        Declara un índice ordenado (ver IndiceOrdenado)
+        Se construye recién cuando se consulta por primera vez, salvo que se
+        reciba ya construido
+        Args:
+            nombre (str): Nombre del índice
+            calcular (callable): Valor de cada registro (None: no se indexa)
+            persistido (list): Pares [valor, [IDs]] ordenados (opcional)
+        """
+        if persistido is not None:
+            self._ordenados[nombre] = IndiceOrdenado(calcular, persistido)
+        elif nombre not in self._ordenados:
+            self._ordenados[nombre] = (calcular,)
+
+    def _construir_ordenado(self, nombre):
+        indice = IndiceOrdenado(self._ordenados[nombre][0])
+        for clave, registro in self._registros.items():
+            if clave not in self._pendientes_indice:
+                indice.agregar(clave, registro)
+        self._ordenados[nombre] = indice
+        return indice
+
+    def _construir_indice(self, campo):
+        indice = {}
+        for clave, registro in self._registros.items():
+            if clave in self._pendientes_indice:
+                continue
+            valor = registro.get(campo, _SIN_VALOR)
+            if valor is not _SIN_VALOR:
+                self._agregar_clave(indice, valor, clave)
+        self._indices[campo] = indice
+        return indice
+
+    def _indexar_registro(self, clave, registro):
+        for campo, indice in self._indices.items():
+            if indice is None:
+                continue
+            valor = registro.get(campo, _SIN_VALOR)
+            if valor is not _SIN_VALOR:
+                self._agregar_clave(indice, valor, clave)
+        for indice in self._ordenados.values():
+            if type(indice) is IndiceOrdenado:
+                indice.agregar(clave, registro)
+
+    # Cada índice guarda valor -> grupo de claves. Los grupos se manejan solo
+    # con estos métodos, para que una subclase pueda representarlos distinto
+
+    def _grupo(self, claves):
+        return dict.fromkeys(claves)
+
+    def _claves_de_grupo(self, grupo):
+        return grupo
+
+    def _agregar_clave(self, indice, valor, clave):
+        try:
+            indice.setdefault(valor, {})[clave] = None
+        except TypeError:
+            # Valores no hashables (listas) no se indexan
+            pass
+
+    def _quitar_clave(self, indice, valor, clave):
+        try:
+            claves = indice.get(valor)
+        except TypeError:
+            return
+        if claves is not None:
+            claves.pop(clave, None)
+            if not claves:
+                del indice[valor]
+
+    def _quitar_de_indices(self, clave, registro):
+        if self._pendientes_indice.pop(clave, _SIN_VALOR) is not _SIN_VALOR:
+            return
+        for campo, indice in self._indices.items():
+            if indice is not None:
+                self._quitar_clave(indice, registro.get(campo, _SIN_VALOR), clave)
+        for indice in self._ordenados.values():
+            if type(indice) is IndiceOrdenado:
+                indice.quitar(clave)
+
+    def _reindexar(self, clave, registro, anteriores):
+        """
+        Mueve un registro modificado a los grupos de sus valores nuevos
+        """
+        for campo, anterior in anteriores.items():
+            indice = self._indices.get(campo)
+            if indice is None:
+                continue
+            nuevo = registro.get(campo, _SIN_VALOR)
+            if nuevo is anterior or nuevo == anterior:
+                continue
+            if anterior is not _SIN_VALOR:
+                self._quitar_clave(indice, anterior, clave)
+            if nuevo is not _SIN_VALOR:
+                self._agregar_clave(indice, nuevo, clave)
+        for indice in self._ordenados.values():
+            if type(indice) is IndiceOrdenado:
+                indice.actualizar(clave, registro)
+
+    def buscar_por_campo(self, campo, valor):
+        """
+        Busca los registros cuyo campo tiene un valor
+        Usa el índice secundario del campo si está declarado; si no, recorre
+        la colección
+        Args:
+            campo (str): Nombre del campo
+            valor: Valor buscado
+        Returns:
+            list: Registros encontrados
+        """
+        if campo not in self._indices:
+            return [registro for registro in self._registros.values() if registro.get(campo) == valor]
+        indice = self._indices[campo]
+        if indice is None:
+            indice = self._construir_indice(campo)
+        try:
+            grupo = indice.get(valor)
+        except TypeError:
+            return [registro for registro in self._registros.values() if registro.get(campo) == valor]
+        claves = self._claves_de_grupo(grupo) if grupo is not None else ()
+        encontrados = [self._registros[clave] for clave in claves]
+        for clave in self._pendientes_indice:
+            registro = self._registros[clave]
+            if registro.get(campo) == valor:
+                encontrados.append(registro)
+        return encontrados
+
+    def buscar_menores(self, nombre, limite):
+        """
+        Busca los registros de un índice ordenado con valor menor a un límite
+        Args:
+            nombre (str): Nombre del índice (declarado con indexar_ordenado)
+            limite: Valor límite (excluido)
+        Returns:
+            list: Tuplas (valor, registro) en orden de valor
+        """
+        indice = self._ordenados[nombre]
+        if type(indice) is not IndiceOrdenado:
+            indice = self._construir_ordenado(nombre)
+        encontrados = [(valor, self._registros[clave]) for valor, clave in indice.menores(limite)]
+        pendientes = []
+        for clave in self._pendientes_indice:
+            valor = indice.calcular(self._registros[clave])
+            if valor is not None and valor < limite:
+                pendientes.append((valor, self._registros[clave]))
+        if pendientes:
+            encontrados.extend(pendientes)
+            encontrados.sort(key=lambda par: par[0])
+        return encontrados
+
+    def exportar_ordenados(self):
+        """
+        Obtiene los índices ordenados en un formato serializable a JSON,
+        construyendo los que todavía no se consultaron
+        Returns:
+            dict: nombre -> lista de [valor, [IDs]] en orden de valor
+        """
+        for clave in list(self._pendientes_indice):
+            self._indexar_registro(clave, self._registros[clave])
+        self._pendientes_indice.clear()
+
+        exportados = {}
+        for nombre, indice in self._ordenados.items():
+            if type(indice) is not IndiceOrdenado:
+                indice = self._construir_ordenado(nombre)
+            pares = indice.exportar()
+            if not any(isinstance(clave, tuple) for _, claves in pares for clave in claves):
+                exportados[nombre] = pares
+        return exportados
+
+    def exportar_indices(self):
+        """
+        Obtiene los índices en un formato serializable a JSON, construyendo
+        los que todavía no se consultaron
+        Los índices con registros sin ID propio no se exportan
+        Returns:
+            dict: campo -> lista de [valor, [IDs]]
+        """
+        for clave in list(self._pendientes_indice):
+            self._indexar_registro(clave, self._registros[clave])
+        self._pendientes_indice.clear()
+
+        exportados = {}
+        for campo, indice in self._indices.items():
+            if indice is None:
+                indice = self._construir_indice(campo)
+            pares = [[valor, list(self._claves_de_grupo(grupo))] for valor, grupo in indice.items()]
+            if not any(isinstance(clave, tuple) for _, claves in pares for clave in claves):
+                exportados[campo] = pares
+        return exportados
+
+    # --- Índice por clave primaria ---
+
+    def obtener(self, id_buscar):
+        """
+        Busca un registro por su ID en O(1)
+        Args:
+            id_buscar (int): ID a buscar
+        Returns:
+            dict or None: Registro encontrado o None
+        """
+        try:
+            return self._registros.get(id_buscar)
+        except TypeError:
+            # Claves no hashables nunca están en el índice
+            return None
+
+    def eliminar(self, id_eliminar):
+        """
+        Elimina un registro por su ID en O(1)
+        Args:
+            id_eliminar (int): ID a eliminar
+        Returns:
+            dict or None: Registro eliminado o None si no existía
+        """
+        try:
+            registro = self._registros.pop(id_eliminar, None)
+        except TypeError:
+            return None
+        if registro is not None:
+            self._desvincular(id_eliminar, registro)
+        return registro
+
+    def ids(self):
+        """
+        Returns:
+            list: IDs de los registros en orden de inserción
+        """
+        return [registro.get(self.campo_id) for registro in self._registros.values()]
+
+    # --- Seguimiento de cambios ---
+
+    def marcar_modificado(self, registro):
+        """
+        Marca un registro como modificado
+        Solo hace falta para cambios que Registro no detecta por sí mismo
+        (por ejemplo, mutar una lista guardada dentro del registro)
+        """
+        clave = getattr(registro, '_clave', None)
+        if clave is None:
+            clave = registro.get(self.campo_id)
+        if clave in self._registros:
+            self._modificados[clave] = None
+
+    def tiene_cambios(self):
+        return self.reemplazo or bool(self._modificados) or bool(self._eliminados)
+
+    def tiene_claves_internas(self):
+        """
+        Returns:
+            bool: True si hay cambios en registros sin ID propio
+        """
+        return any(isinstance(clave, tuple) for clave in (*self._modificados, *self._eliminados))
+
+    def extraer_cambios(self):
+        """
+        Obtiene los cambios pendientes desde el último guardado
+        Returns:
+            tuple: (lista de IDs eliminados, lista de registros modificados)
+        """
+        eliminados = [clave for clave in self._eliminados if clave not in self._registros]
+        modificados = [self._registros[clave] for clave in self._modificados if clave in self._registros]
+        return eliminados, modificados
+
+    def confirmar_cambios(self):
+        """
+        Marca los cambios como guardados y vincula los registros agregados
+        """
+        for clave in self._modificados:
+            registro = self._registros.get(clave)
+            if registro is not None and type(registro) is not Registro:
+                self._adoptar(registro, clave)
+        self._modificados.clear()
+        self._eliminados.clear()
+        self.reemplazo = False
+
+    # --- Aplicación de cambios sin marcarlos (reproducción del journal) ---
+
+    def aplicar_registro(self, registro):
+        clave = registro.get(self.campo_id)
+        if clave is None:
+            clave = self._clave(registro)
+        anterior = self._registros.get(clave)
+        if anterior is not None:
+            if type(anterior) is Registro:
+                anterior._coleccion = None
+            if self._indices or self._ordenados:
+                self._quitar_de_indices(clave, anterior)
+        self._adoptar(registro, clave)
+        return clave
+
+    def aplicar_eliminacion(self, id_eliminar):
+        registro = self._registros.pop(id_eliminar, None)
+        if registro is not None:
+            if type(registro) is Registro:
+                registro._coleccion = None
+            if self._indices or self._ordenados:
+                self._quitar_de_indices(id_eliminar, registro)
+
+    def poner(self, registro):
+        """
+        Inserta un registro o reemplaza al que tenga su mismo ID,
+        marcándolo como modificado
+        """
+        clave = self.aplicar_registro(registro)
+        self._eliminados.discard(clave)
+        self._modificados[clave] = None
+
+    # --- Interfaz de lista ---
+
+    def append(self, registro):
+        clave = self._clave(registro)
+        if type(registro) is Registro and getattr(registro, '_coleccion', None) is None:
+            self._adoptar(registro, clave)
+        else:
+            self._registros[clave] = registro
+            if self._indices or self._ordenados:
+                # Un dict común no avisa sus cambios: se indexa al confirmar
+                self._pendientes_indice[clave] = None
+        self._eliminados.discard(clave)
+        self._modificados[clave] = None
+
+    def extend(self, registros):
+        for registro in registros:
+            self.append(registro)
+
+    def remove(self, registro):
+        for clave, actual in self._registros.items():
+            if actual is registro or actual == registro:
+                del self._registros[clave]
+                self._desvincular(clave, actual)
+                return
+        raise ValueError("Coleccion.remove(x): x no está en la colección")
+
+    def pop(self, indice=-1):
+        if not self._registros:
+            raise IndexError("pop de una colección vacía")
+        if indice == -1:
+            clave, registro = self._registros.popitem()
+        else:
+            clave = list(self._registros)[indice]
+            registro = self._registros.pop(clave)
+        self._desvincular(clave, registro)
+        return registro
+
+    def clear(self):
+        for clave, registro in self._registros.items():
+            self._desvincular(clave, registro)
+        self._registros.clear()
+        self.reemplazo = True
+
+    def copy(self):
+        return list(self._registros.values())
+
+    def __iter__(self):
+        return iter(self._registros.values())
+
+    def __reversed__(self):
+        return reversed(self._registros.values())
+
+    def __len__(self):
+        return len(self._registros)
+
+    def __bool__(self):
+        return bool(self._registros)
+
+    def __contains__(self, registro):
+        return any(actual is registro or actual == registro for actual in self._registros.values())
+
+    def __getitem__(self, indice):
+        # El acceso por posición recorre la colección (O(n)); usar obtener()
+        return list(self._registros.values())[indice]
+
+    def __eq__(self, otra):
+        if isinstance(otra, (Coleccion, list)):
+            return list(self) == list(otra)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Coleccion({list(self._registros.values())!r})"
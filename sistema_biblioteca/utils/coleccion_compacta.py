@@ -0,0 +1,648 @@
+"""
+Módulo de colecciones compactas
+Variante de Coleccion que guarda los registros en columnas en lugar de un
+diccionario por registro: los enteros en arreglos (array), los textos
+internados (un título repetido se guarda una sola vez) y los textos de solo
+dígitos, como el ISBN, como enteros de 64 bits. Los valores que no entran en
+su columna (None, otro tipo, campos fuera del esquema) se guardan aparte
+para esa fila, así que ningún registro pierde datos.
+Los registros se entregan como RegistroCompacto, una vista que se usa igual
+que un diccionario y escribe directamente en las columnas. Se activa para
+los libros con BIBLIOTECA_LIBROS_COMPACTOS=1
+
+Uso:
+    python -m utils.coleccion_compacta [cantidad]   (compara la memoria usada)
+"""
+
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import MutableMapping
+
+from utils.coleccion import Coleccion, _SIN_VALOR
+
+# Columnas de cada colección compacta: (campo, tipo). El tipo es un código
+# de array para enteros, '?' para booleanos, 'texto' para textos y
+# 'digitos' para textos de solo dígitos que se guardan como entero
+ESQUEMAS_COMPACTOS = {
+    'libros': (
+        ('id', 'q'), ('titulo', 'texto'), ('isbn', 'digitos'), ('id_autor', 'i'),
+        ('id_categoria', 'i'), ('año_publicacion', 'h'), ('cantidad_copias', 'i'),
+        ('copias_disponibles', 'i'), ('activo', '?'),
+    ),
+}
+
+def _nueva_columna(tipo):
+    if tipo == 'texto':
+        return []
+    if tipo == '?':
+        return array('b')
+    if tipo == 'digitos':
+        return array('q')
+    return array(tipo)
+
+def _a_columna(tipo, valor):
+    """
+    Convierte un valor al formato de su columna
+    Returns:
+        Valor a guardar o _SIN_VALOR si no entra en la columna
+    """
+    if tipo == 'texto':
+        return sys.intern(valor) if type(valor) is str else _SIN_VALOR
+    if tipo == '?':
+        return int(valor) if type(valor) is bool else _SIN_VALOR
+    if tipo == 'digitos':
+        # Sin ceros a la izquierda, para que str(int(valor)) devuelva el mismo texto
+        if type(valor) is str and 0 < len(valor) <= 18 and valor.isascii() and valor.isdigit() and valor[0] != "0":
+            return int(valor)
+        return _SIN_VALOR
+    return valor if type(valor) is int else _SIN_VALOR
+
+def _desde_columna(tipo, valor):
+    if tipo == '?':
+        return bool(valor)
+    if tipo == 'digitos':
+        return str(valor)
+    return valor
+
+class RegistroCompacto(MutableMapping):
+    """
+    Vista de una fila de una ColeccionCompacta que se usa como diccionario
+    Cada escritura va a las columnas y avisa a la colección, igual que
+    Registro. dict(vista) o vista.copy() dan un diccionario común. Los
+    campos salen en el orden del esquema y después los que no tiene
+    """
+    __slots__ = ('_coleccion', '_fila')
+
+    def __init__(self, coleccion, fila):
+        self._coleccion = coleccion
+        self._fila = fila
+
+    @property
+    def _clave(self):
+        return self._coleccion._clave_de_fila(self._fila)
+
+    def __getitem__(self, campo):
+        valor = self._coleccion._leer(self._fila, campo)
+        if valor is _SIN_VALOR:
+            raise KeyError(campo)
+        return valor
+
+    def get(self, campo, defecto=None):
+        valor = self._coleccion._leer(self._fila, campo)
+        return defecto if valor is _SIN_VALOR else valor
+
+    def __contains__(self, campo):
+        return self._coleccion._leer(self._fila, campo) is not _SIN_VALOR
+
+    def __setitem__(self, campo, valor):
+        coleccion = self._coleccion
+        anterior = coleccion._leer(self._fila, campo)
+        coleccion._escribir(self._fila, campo, valor)
+        coleccion._notificar_fila(self._fila, self, {campo: anterior})
+
+    def __delitem__(self, campo):
+        coleccion = self._coleccion
+        anterior = coleccion._leer(self._fila, campo)
+        if anterior is _SIN_VALOR:
+            raise KeyError(campo)
+        coleccion._escribir(self._fila, campo, _SIN_VALOR)
+        coleccion._notificar_fila(self._fila, self, {campo: anterior})
+
+    def update(self, *args, **kwargs):
+        anteriores = dict(self)
+        for campo, valor in dict(*args, **kwargs).items():
+            self._coleccion._escribir(self._fila, campo, valor)
+        self._coleccion._notificar_fila(self._fila, self, anteriores)
+
+    def __iter__(self):
+        return iter(self._coleccion._campos(self._fila))
+
+    def __len__(self):
+        return len(self._coleccion._campos(self._fila))
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        # Al copiar o serializar se obtiene un diccionario común
+        return (dict, (dict(self),))
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class ColeccionCompacta(Coleccion):
+    """
+    Coleccion que guarda sus registros en columnas (ver el módulo)
+    Las filas se agregan al final y una baja solo marca la fila como
+    borrada, así cada vista sigue apuntando a su fila. Mientras los IDs
+    llegan en orden creciente, la fila de un ID se busca por bisección
+    sobre la columna de IDs; si no, se arma un diccionario ID -> fila
+    Los diccionarios agregados con append conservan su identidad hasta que
+    se confirman los cambios, igual que en Coleccion
+    """
+
+    def __init__(self, registros=(), campo_id='id', reemplazo=False, esquema=ESQUEMAS_COMPACTOS['libros']):
+        """
+        Args:
+            registros (iterable): Registros iniciales (no cuentan como cambios)
+            campo_id (str): Campo clave; debe ser una columna entera del esquema
+            reemplazo (bool): True si la colección debe escribirse completa
+            esquema (tuple): Columnas (campo, tipo)
+        """
+        self.campo_id = campo_id
+        self.reemplazo = reemplazo
+        self.version = None
+        self._secuencia = 0
+        self._modificados = {}
+        self._eliminados = set()
+        self._indices = {}
+        # Los libros compactos no declaran índices ordenados
+        self._ordenados = {}
+        self._pendientes_indice = {}
+
+        self._esquema = tuple((campo, tipo, _nueva_columna(tipo)) for campo, tipo in esquema)
+        self._columnas = {campo: (tipo, columna) for campo, tipo, columna in self._esquema}
+        self._ids = self._columnas[campo_id][1]
+        # fila -> {campo: valor} con lo que no entra en las columnas
+        # (_SIN_VALOR marca un campo del esquema ausente en el registro)
+        self._excepciones = {}
+        self._borradas = set()
+        self._vivas = 0
+        # Filas con un ID ausente o repetido: fila -> clave interna y al revés
+        self._claves_especiales = {}
+        self._filas_especiales = {}
+        # ID -> fila; None mientras los IDs estén en orden creciente
+        self._fila_por_id = None
+        # fila -> diccionario agregado con append y aún no confirmado
+        self._pendientes = {}
+        for registro in registros:
+            self._agregar_fila(registro)
+
+    # --- Filas y columnas ---
+
+    def _leer(self, fila, campo):
+        excepciones = self._excepciones.get(fila)
+        if excepciones is not None and campo in excepciones:
+            return excepciones[campo]
+        columna = self._columnas.get(campo)
+        if columna is None:
+            return _SIN_VALOR
+        tipo, valores = columna
+        return _desde_columna(tipo, valores[fila])
+
+    def _escribir(self, fila, campo, valor):
+        """
+        Escribe un valor en una fila existente (_SIN_VALOR quita el campo)
+        """
+        excepciones = self._excepciones.get(fila)
+        columna = self._columnas.get(campo)
+        if columna is not None and valor is not _SIN_VALOR:
+            tipo, valores = columna
+            convertido = _a_columna(tipo, valor)
+            if convertido is not _SIN_VALOR:
+                try:
+                    valores[fila] = convertido
+                except OverflowError:
+                    pass
+                else:
+                    if excepciones is not None:
+                        excepciones.pop(campo, None)
+                        if not excepciones:
+                            del self._excepciones[fila]
+                    return
+        if columna is None and valor is _SIN_VALOR:
+            if excepciones is not None:
+                excepciones.pop(campo, None)
+            return
+        self._excepciones.setdefault(fila, {})[campo] = valor
+
+    def _campos(self, fila):
+        excepciones = self._excepciones.get(fila)
+        if excepciones is None:
+            return [campo for campo, _, _ in self._esquema]
+        campos = [campo for campo, _, _ in self._esquema if excepciones.get(campo, True) is not _SIN_VALOR]
+        campos.extend(campo for campo in excepciones if campo not in self._columnas)
+        return campos
+
+    def _agregar_fila(self, registro):
+        """
+        Agrega un registro al final
+        Returns:
+            tuple: (fila, clave)
+        """
+        fila = len(self._ids)
+        # Se busca antes de agregar la fila, que la bisección encontraría
+        clave = registro.get(self.campo_id)
+        especial = type(clave) is not int or self._fila(clave) is not None
+        excepciones = {}
+        for campo, tipo, valores in self._esquema:
+            valor = registro.get(campo, _SIN_VALOR)
+            convertido = _SIN_VALOR if valor is _SIN_VALOR else _a_columna(tipo, valor)
+            if convertido is not _SIN_VALOR:
+                try:
+                    valores.append(convertido)
+                    continue
+                except OverflowError:
+                    pass
+            valores.append("" if tipo == 'texto' else 0)
+            excepciones[campo] = valor
+        for campo, valor in registro.items():
+            if campo not in self._columnas:
+                excepciones[campo] = valor
+        if excepciones:
+            self._excepciones[fila] = excepciones
+
+        if especial or self.campo_id in excepciones:
+            self._secuencia += 1
+            clave = ('_sin_clave', self._secuencia)
+            self._claves_especiales[fila] = clave
+            self._filas_especiales[clave] = fila
+            if self._fila_por_id is None:
+                self._armar_mapa_ids()
+        elif self._fila_por_id is not None:
+            self._fila_por_id[clave] = fila
+        elif fila > 0 and clave <= self._ids[fila - 1]:
+            self._armar_mapa_ids()
+        self._vivas += 1
+        return fila, clave
+
+    def _armar_mapa_ids(self):
+        self._fila_por_id = {
+            self._ids[fila]: fila for fila in range(len(self._ids))
+            if fila not in self._borradas and fila not in self._claves_especiales
+        }
+
+    def _fila(self, clave):
+        """
+        Returns:
+            int or None: Fila viva con esa clave
+        """
+        if type(clave) is tuple:
+            return self._filas_especiales.get(clave)
+        if type(clave) is not int:
+            return None
+        if self._fila_por_id is not None:
+            return self._fila_por_id.get(clave)
+        fila = bisect_left(self._ids, clave)
+        if fila < len(self._ids) and self._ids[fila] == clave and fila not in self._borradas:
+            return fila
+        return None
+
+    def _clave_de_fila(self, fila):
+        clave = self._claves_especiales.get(fila)
+        return clave if clave is not None else self._ids[fila]
+
+    def _borrar_fila(self, fila):
+        clave = self._claves_especiales.pop(fila, None)
+        if clave is not None:
+            del self._filas_especiales[clave]
+        elif self._fila_por_id is not None:
+            self._fila_por_id.pop(self._ids[fila], None)
+        self._borradas.add(fila)
+        self._pendientes.pop(fila, None)
+        self._vivas -= 1
+
+    def _registro(self, fila):
+        pendiente = self._pendientes.get(fila)
+        return pendiente if pendiente is not None else RegistroCompacto(self, fila)
+
+    def _materializar(self, fila):
+        pendiente = self._pendientes.get(fila)
+        if pendiente is not None:
+            return pendiente
+        return {campo: self._leer(fila, campo) for campo in self._campos(fila)}
+
+    def _filas_vivas(self):
+        borradas = self._borradas
+        return (fila for fila in range(len(self._ids)) if fila not in borradas)
+
+    def _notificar_fila(self, fila, vista, anteriores):
+        if fila in self._borradas:
+            return
+        clave = self._clave_de_fila(fila)
+        self._modificados[clave] = None
+        if self._indices:
+            self._reindexar(clave, vista, anteriores)
+
+    # --- Índices secundarios ---
+    # Un grupo con una sola clave se guarda como la clave misma, así un
+    # índice de valores únicos (como el ISBN) no crea un dict por registro
+
+    def _grupo(self, claves):
+        return claves[0] if len(claves) == 1 else dict.fromkeys(claves)
+
+    def _claves_de_grupo(self, grupo):
+        return grupo if type(grupo) is dict else (grupo,)
+
+    def _agregar_clave(self, indice, valor, clave):
+        try:
+            grupo = indice.get(valor, _SIN_VALOR)
+        except TypeError:
+            return
+        if grupo is _SIN_VALOR:
+            indice[valor] = clave
+        elif type(grupo) is dict:
+            grupo[clave] = None
+        elif grupo != clave:
+            indice[valor] = {grupo: None, clave: None}
+
+    def _quitar_clave(self, indice, valor, clave):
+        try:
+            grupo = indice.get(valor, _SIN_VALOR)
+        except TypeError:
+            return
+        if type(grupo) is dict:
+            grupo.pop(clave, None)
+            if len(grupo) == 1:
+                indice[valor] = next(iter(grupo))
+            elif not grupo:
+                del indice[valor]
+        elif grupo is not _SIN_VALOR and grupo == clave:
+            del indice[valor]
+
+    def _construir_indice(self, campo):
+        indice = {}
+        for fila in self._filas_vivas():
+            clave = self._clave_de_fila(fila)
+            if clave in self._pendientes_indice:
+                continue
+            pendiente = self._pendientes.get(fila)
+            valor = self._leer(fila, campo) if pendiente is None else pendiente.get(campo, _SIN_VALOR)
+            if valor is not _SIN_VALOR:
+                self._agregar_clave(indice, valor, clave)
+        self._indices[campo] = indice
+        return indice
+
+    def buscar_por_campo(self, campo, valor):
+        """
+        Busca los registros cuyo campo tiene un valor
+        Usa el índice secundario del campo si está declarado; si no, recorre
+        la colección
+        Args:
+            campo (str): Nombre del campo
+            valor: Valor buscado
+        Returns:
+            list: Registros encontrados
+        """
+        if campo not in self._indices:
+            return [registro for registro in self if registro.get(campo) == valor]
+        indice = self._indices[campo]
+        if indice is None:
+            indice = self._construir_indice(campo)
+        try:
+            grupo = indice.get(valor)
+        except TypeError:
+            return [registro for registro in self if registro.get(campo) == valor]
+        claves = self._claves_de_grupo(grupo) if grupo is not None else ()
+        encontrados = [self.obtener(clave) for clave in claves]
+        for clave in self._pendientes_indice:
+            registro = self.obtener(clave)
+            if registro.get(campo) == valor:
+                encontrados.append(registro)
+        return encontrados
+
+    def exportar_indices(self):
+        """
+        Obtiene los índices en un formato serializable a JSON, construyendo
+        los que todavía no se consultaron
+        Returns:
+            dict: campo -> lista de [valor, [IDs]]
+        """
+        for clave in list(self._pendientes_indice):
+            self._indexar_registro(clave, self.obtener(clave))
+        self._pendientes_indice.clear()
+
+        exportados = {}
+        for campo, indice in self._indices.items():
+            if indice is None:
+                indice = self._construir_indice(campo)
+            pares = [[valor, list(self._claves_de_grupo(grupo))] for valor, grupo in indice.items()]
+            if not any(isinstance(clave, tuple) for _, claves in pares for clave in claves):
+                exportados[campo] = pares
+        return exportados
+
+    # --- Índice por clave primaria ---
+
+    def obtener(self, id_buscar):
+        """
+        Busca un registro por su ID
+        Args:
+            id_buscar (int): ID a buscar
+        Returns:
+            RegistroCompacto, dict or None: Registro encontrado o None
+        """
+        fila = self._fila(id_buscar)
+        return self._registro(fila) if fila is not None else None
+
+    def eliminar(self, id_eliminar):
+        """
+        Elimina un registro por su ID
+        Args:
+            id_eliminar (int): ID a eliminar
+        Returns:
+            dict or None: Copia del registro eliminado o None si no existía
+        """
+        fila = self._fila(id_eliminar)
+        if fila is None:
+            return None
+        return self._eliminar_fila(fila)
+
+    def _eliminar_fila(self, fila):
+        registro = self._materializar(fila)
+        clave = self._clave_de_fila(fila)
+        self._borrar_fila(fila)
+        self._desvincular(clave, registro)
+        return registro
+
+    def ids(self):
+        """
+        Returns:
+            list: IDs de los registros en orden de inserción
+        """
+        return [self._leer(fila, self.campo_id) for fila in self._filas_vivas()]
+
+    # --- Seguimiento de cambios ---
+
+    def marcar_modificado(self, registro):
+        clave = getattr(registro, '_clave', None)
+        if clave is None:
+            clave = registro.get(self.campo_id)
+        if self._fila(clave) is not None:
+            self._modificados[clave] = None
+
+    def extraer_cambios(self):
+        """
+        Obtiene los cambios pendientes desde el último guardado
+        Returns:
+            tuple: (lista de IDs eliminados, lista de registros modificados
+                como diccionarios comunes)
+        """
+        eliminados = [clave for clave in self._eliminados if self._fila(clave) is None]
+        modificados = []
+        for clave in self._modificados:
+            fila = self._fila(clave)
+            if fila is not None:
+                modificados.append(self._materializar(fila))
+        return eliminados, modificados
+
+    def confirmar_cambios(self):
+        """
+        Marca los cambios como guardados y pasa a columnas los diccionarios
+        agregados con append (con los cambios que hayan recibido)
+        """
+        for fila, registro in self._pendientes.items():
+            for campo in self._campos(fila):
+                if campo not in registro:
+                    self._escribir(fila, campo, _SIN_VALOR)
+            for campo, valor in registro.items():
+                self._escribir(fila, campo, valor)
+        self._pendientes.clear()
+        for clave in list(self._pendientes_indice):
+            fila = self._fila(clave)
+            if fila is not None and self._indices:
+                self._indexar_registro(clave, RegistroCompacto(self, fila))
+        self._pendientes_indice.clear()
+        self._modificados.clear()
+        self._eliminados.clear()
+        self.reemplazo = False
+
+    # --- Aplicación de cambios sin marcarlos (reproducción del journal) ---
+
+    def aplicar_registro(self, registro):
+        clave = registro.get(self.campo_id)
+        fila = self._fila(clave)
+        if fila is None:
+            fila, clave = self._agregar_fila(registro)
+        else:
+            vista = RegistroCompacto(self, fila)
+            if self._indices:
+                self._quitar_de_indices(clave, vista)
+            self._pendientes.pop(fila, None)
+            for campo in self._campos(fila):
+                if campo not in registro:
+                    self._escribir(fila, campo, _SIN_VALOR)
+            for campo, valor in registro.items():
+                self._escribir(fila, campo, valor)
+        if self._indices:
+            self._indexar_registro(clave, RegistroCompacto(self, fila))
+        return clave
+
+    def aplicar_eliminacion(self, id_eliminar):
+        fila = self._fila(id_eliminar)
+        if fila is not None:
+            if self._indices:
+                self._quitar_de_indices(id_eliminar, RegistroCompacto(self, fila))
+            self._borrar_fila(fila)
+
+    # --- Interfaz de lista ---
+
+    def append(self, registro):
+        fila, clave = self._agregar_fila(registro)
+        if isinstance(registro, dict):
+            # Como en Coleccion, el dict agregado sigue siendo el registro
+            # hasta confirmar, por si se modifica después del append
+            self._pendientes[fila] = registro
+            if self._indices:
+                self._pendientes_indice[clave] = None
+        elif self._indices:
+            self._indexar_registro(clave, RegistroCompacto(self, fila))
+        self._eliminados.discard(clave)
+        self._modificados[clave] = None
+
+    def remove(self, registro):
+        for fila in self._filas_vivas():
+            actual = self._registro(fila)
+            if actual is registro or actual == registro:
+                self._eliminar_fila(fila)
+                return
+        raise ValueError("ColeccionCompacta.remove(x): x no está en la colección")
+
+    def pop(self, indice=-1):
+        filas = list(self._filas_vivas())
+        if not filas:
+            raise IndexError("pop de una colección vacía")
+        return self._eliminar_fila(filas[indice])
+
+    def clear(self):
+        for fila in list(self._filas_vivas()):
+            self._eliminar_fila(fila)
+        self.reemplazo = True
+
+    def copy(self):
+        # Diccionarios comunes: la copia se usa para serializar
+        return [self._materializar(fila) for fila in self._filas_vivas()]
+
+    def __iter__(self):
+        return (self._registro(fila) for fila in self._filas_vivas())
+
+    def __reversed__(self):
+        borradas = self._borradas
+        return (self._registro(fila) for fila in range(len(self._ids) - 1, -1, -1) if fila not in borradas)
+
+    def __len__(self):
+        return self._vivas
+
+    def __bool__(self):
+        return self._vivas > 0
+
+    def __contains__(self, registro):
+        return any(actual is registro or actual == registro for actual in self)
+
+    def __getitem__(self, indice):
+        # El acceso por posición recorre la colección (O(n)); usar obtener()
+        return self._registro(list(self._filas_vivas())[indice])
+
+    def __repr__(self):
+        return f"ColeccionCompacta({self.copy()!r})"
+
+def _libros_sinteticos(cantidad):
+    palabras = ["Sombra", "Río", "Ciudad", "Noche", "Viento", "Mar", "Tiempo", "Casa", "Luz", "Camino"]
+    for numero in range(1, cantidad + 1):
+        base = f"978{numero:09d}"
+        control = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(base)) % 10) % 10
+        # Títulos distintos, como en un catálogo real: así no se mide la
+        # reutilización de textos repetidos sino el cambio de formato
+        titulo = f"{palabras[numero % 10]} de {palabras[numero // 10 % 10]} {numero}"
+        yield {
+            'id': numero,
+            'titulo': titulo,
+            'isbn': base + str(control),
+            'id_autor': numero % 5000 + 1,
+            'id_categoria': numero % 40 + 1,
+            'año_publicacion': 1900 + numero % 125,
+            'cantidad_copias': numero % 7 + 1,
+            'copias_disponibles': numero % 7 + 1,
+            'activo': numero % 50 != 0,
+        }
+
+def medir_memoria(cantidad=200000):
+    """
+    Compara la memoria de una Coleccion común y una compacta con libros
+    sintéticos, con y sin el índice de ISBN
+    Args:
+        cantidad (int): Cantidad de libros
+    Returns:
+        dict: Nombre de la variante -> bytes por libro
+    """
+    import tracemalloc
+
+    resultados = {}
+    for nombre, fabrica in (('dict', Coleccion), ('compacta', ColeccionCompacta)):
+        tracemalloc.start()
+        coleccion = fabrica(_libros_sinteticos(cantidad))
+        resultados[nombre] = tracemalloc.get_traced_memory()[0] / cantidad
+        coleccion.indexar(['isbn'])
+        coleccion.buscar_por_campo('isbn', "")
+        resultados[f"{nombre} + índice isbn"] = tracemalloc.get_traced_memory()[0] / cantidad
+        tracemalloc.stop()
+        del coleccion
+    return resultados
+
+if __name__ == "__main__":
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print(f"Memoria por libro con {cantidad} libros:")
+    resultados = medir_memoria(cantidad)
+    for nombre, bytes_por_libro in resultados.items():
+        print(f"    {nombre:<26} {bytes_por_libro:8.1f} bytes")
+    print(f"    Reducción: {1 - resultados['compacta'] / resultados['dict']:.0%}")
@@ -0,0 +1,450 @@
+"""
+Módulo de comandos
+Ejecuta las operaciones de la biblioteca sin menús ni preguntas por
+consola, para scripts y tareas programadas. Cada comando valida sus
+parámetros con las mismas reglas que los formularios y devuelve su
+resultado en JSON
+
+Uso:
+    python main.py prestamo crear --usuario 5 --libro 9
+    python main.py multa resumen
+    python main.py reporte circulacion --desde 01/01/2025 --limite 10
+    python main.py --batch comandos.jsonl
+
+En el modo por lotes cada línea es un objeto JSON con el comando y sus
+parámetros, por ejemplo {"comando": "prestamo devolver", "id": 12}. Todo el
+lote se ejecuta en un proceso y en una única transacción: los datos se
+cargan una vez y se guardan una vez al final. Un comando que falla no
+detiene el lote. La salida es una línea JSON por comando
+"""
+
+import argparse
+import contextlib
+import json
+import random
+import sys
+import time
+
+from utils import busqueda, conciliacion, fechas, formatos, importacion
+from utils.errores import ErrorBiblioteca, ConflictoVersion
+from utils.manejo_archivos import buscar_registro, compactar_coleccion, convertir_coleccion
+from utils.transacciones import transaccion, INTENTOS_POR_CONFLICTO
+from utils.validaciones import comprobar_numero_entero, comprobar_numero_decimal, comprobar_texto, comprobar_fecha, comprobar_isbn
+
+# Campos de fecha de todas las colecciones (se muestran como DD/MM/AAAA)
+_CAMPOS_FECHA = {campo for campos in fechas.CAMPOS_FECHA.values() for campo in campos}
+
+# Nombres de opción sin 'ñ', más cómodos de escribir en la consola
+_ALIAS = {'año_publicacion': 'anio_publicacion'}
+
+def _campos(nombre_coleccion, obligatorios=True):
+    """
+    Parámetros de alta de una colección, con las reglas de los formularios
+    (las mismas que usa la importación masiva)
+    """
+    _, campos, _ = importacion.COLECCIONES_IMPORTABLES[nombre_coleccion]
+    return [(campo, comprobar, argumentos, obligatorios) for campo, comprobar, argumentos in campos]
+
+_ID = ('id', comprobar_numero_entero, (1,), True)
+_USUARIO = ('usuario', comprobar_numero_entero, (1,), True)
+
+def serializar_registro(registro):
+    """
+    Convierte un registro en un dict serializable, con las fechas en texto
+    Args:
+        registro (dict): Registro de cualquier colección (o None)
+    Returns:
+        dict or None: Copia del registro lista para json.dumps
+    """
+    if registro is None:
+        return None
+    return {campo: fechas.formatear(valor) if campo in _CAMPOS_FECHA else valor for campo, valor in registro.items()}
+
+def _requerir(registro, descripcion, id_buscar):
+    if not registro:
+        raise ErrorBiblioteca(f"No se encontró {descripcion} con ID {id_buscar}")
+    return serializar_registro(registro)
+
+def _separar_id(parametros):
+    cambios = dict(parametros)
+    return cambios.pop('id'), cambios
+
+# --- Comandos ---
+
+def _libro_crear(**parametros):
+    from modelos.libro import registrar_libro
+    return serializar_registro(registrar_libro(**parametros))
+
+def _libro_modificar(**parametros):
+    from modelos.libro import modificar_libro
+    return serializar_registro(modificar_libro(*_separar_id(parametros)))
+
+def _libro_desactivar(id):
+    from modelos.libro import desactivar_libro
+    return serializar_registro(desactivar_libro(id))
+
+def _libro_ver(id):
+    from modelos.libro import ARCHIVO_LIBROS
+    return _requerir(buscar_registro(ARCHIVO_LIBROS, id), "un libro", id)
+
+def _libro_isbn(isbn):
+    from modelos.libro import obtener_libro_por_isbn
+    libro = obtener_libro_por_isbn(isbn)
+    if not libro:
+        raise ErrorBiblioteca(f"No se encontró un libro con ISBN {isbn}")
+    return serializar_registro(libro)
+
+def _libro_buscar(texto, limite=20):
+    return [dict(serializar_registro(libro), puntaje=round(puntaje, 4)) for libro, puntaje in busqueda.buscar_libros(texto, limite)]
+
+def _usuario_crear(**parametros):
+    from modelos.usuario import registrar_usuario
+    return serializar_registro(registrar_usuario(**parametros))
+
+def _usuario_modificar(**parametros):
+    from modelos.usuario import modificar_usuario
+    return serializar_registro(modificar_usuario(*_separar_id(parametros)))
+
+def _usuario_desactivar(id):
+    from modelos.usuario import desactivar_usuario
+    return serializar_registro(desactivar_usuario(id))
+
+def _usuario_ver(id):
+    from modelos.usuario import ARCHIVO_USUARIOS
+    return _requerir(buscar_registro(ARCHIVO_USUARIOS, id), "un usuario", id)
+
+def _autor_crear(**parametros):
+    from modelos.autor import registrar_autor
+    return serializar_registro(registrar_autor(**parametros))
+
+def _autor_modificar(**parametros):
+    from modelos.autor import modificar_autor
+    return serializar_registro(modificar_autor(*_separar_id(parametros)))
+
+def _autor_ver(id):
+    from modelos.autor import ARCHIVO_AUTORES
+    return _requerir(buscar_registro(ARCHIVO_AUTORES, id), "un autor", id)
+
+def _autor_borrar(id):
+    from modelos.autor import borrar_autor
+    borrar_autor(id)
+    return {'id': id}
+
+def _categoria_crear(**parametros):
+    from modelos.categoria import registrar_categoria
+    return serializar_registro(registrar_categoria(**parametros))
+
+def _categoria_modificar(**parametros):
+    from modelos.categoria import modificar_categoria
+    return serializar_registro(modificar_categoria(*_separar_id(parametros)))
+
+def _categoria_ver(id):
+    from modelos.categoria import ARCHIVO_CATEGORIAS
+    return _requerir(buscar_registro(ARCHIVO_CATEGORIAS, id), "una categoría", id)
+
+def _categoria_borrar(id):
+    from modelos.categoria import borrar_categoria
+    borrar_categoria(id)
+    return {'id': id}
+
+def _prestamo_crear(usuario, libro):
+    from modelos.prestamo import registrar_prestamo
+    return serializar_registro(registrar_prestamo(usuario, libro))
+
+def _prestamo_devolver(id):
+    from modelos.prestamo import registrar_devolucion
+    resultado = registrar_devolucion(id)
+    return dict(resultado, prestamo=serializar_registro(resultado['prestamo']))
+
+def _prestamo_vencidos(fecha=None):
+    from modelos.prestamo import marcar_prestamos_vencidos
+    return [dict(serializar_registro(prestamo), dias_atraso=dias) for prestamo, dias in marcar_prestamos_vencidos(fecha)]
+
+def _prestamo_ver(id):
+    from modelos.prestamo import ARCHIVO_PRESTAMOS
+    return _requerir(buscar_registro(ARCHIVO_PRESTAMOS, id), "un préstamo", id)
+
+def _multa_crear(usuario, monto, concepto):
+    from modelos.usuario import ARCHIVO_USUARIOS
+    from modelos.multa import crear_multa_automatica
+    if not buscar_registro(ARCHIVO_USUARIOS, usuario):
+        raise ErrorBiblioteca("Usuario no encontrado.")
+    return serializar_registro(crear_multa_automatica(usuario, monto, concepto))
+
+def _multa_pagar(id):
+    from modelos.multa import registrar_pago_multa
+    return serializar_registro(registrar_pago_multa(id))
+
+def _multa_ver(id):
+    from modelos.multa import ARCHIVO_MULTAS
+    return _requerir(buscar_registro(ARCHIVO_MULTAS, id), "una multa", id)
+
+def _multa_cuenta(usuario):
+    from modelos.multa import obtener_cuenta_multas
+    cuenta = obtener_cuenta_multas(usuario)
+    if cuenta is None:
+        raise ErrorBiblioteca(f"No se encontró un usuario con ID {usuario}")
+    return cuenta
+
+def _multa_resumen():
+    from modelos.multa import obtener_resumen_multas
+    return obtener_resumen_multas()
+
+def _datos_importar(coleccion, archivo, bloque=importacion.TAMAÑO_BLOQUE_IMPORTACION):
+    if coleccion not in importacion.COLECCIONES_IMPORTABLES:
+        raise ErrorBiblioteca(f"Colección no importable: {coleccion}")
+    return importacion.importar(coleccion, archivo, tamaño_bloque=bloque)
+
+def _datos_conciliar(completa=False):
+    return conciliacion.conciliar(completa)
+
+def _datos_compactar(coleccion):
+    return {'coleccion': coleccion, 'compactada': compactar_coleccion(coleccion)}
+
+def _comprobar_formato(valor):
+    if valor not in formatos.FORMATOS:
+        raise ValueError(f"debe ser uno de: {', '.join(formatos.FORMATOS)}.")
+    return valor
+
+def _datos_convertir(coleccion, formato, comprimir=False):
+    antes, despues = convertir_coleccion(coleccion, formato, comprimir)
+    if despues is None:
+        raise ErrorBiblioteca(f"No se pudo convertir {coleccion}")
+    return {'coleccion': coleccion, 'formato': formato, 'comprimida': comprimir, 'bytes_antes': antes, 'bytes_despues': despues}
+
+def _reporte_circulacion(desde=None, hasta=None, limite=None):
+    from utils import circulacion
+    return circulacion.recortar(circulacion.analizar_circulacion(desde, hasta), limite)
+
+# (grupo, acción) -> (función, parámetros, descripción)
+# Cada parámetro es (nombre, función de comprobación, argumentos, obligatorio)
+COMANDOS = {
+    ('libro', 'crear'): (_libro_crear, _campos('libros'), "Registra un libro"),
+    ('libro', 'modificar'): (_libro_modificar, [_ID] + _campos('libros', False), "Modifica un libro"),
+    ('libro', 'desactivar'): (_libro_desactivar, [_ID], "Desactiva un libro"),
+    ('libro', 'ver'): (_libro_ver, [_ID], "Muestra un libro"),
+    ('libro', 'isbn'): (_libro_isbn, [('isbn', comprobar_isbn, (), True)], "Busca un libro por ISBN"),
+    ('libro', 'buscar'): (_libro_buscar, [
+        ('texto', str, (), True), ('limite', comprobar_numero_entero, (1, 1000), False),
+    ], "Busca libros por texto"),
+    ('usuario', 'crear'): (_usuario_crear, _campos('usuarios'), "Registra un usuario"),
+    ('usuario', 'modificar'): (_usuario_modificar, [_ID] + _campos('usuarios', False), "Modifica un usuario"),
+    ('usuario', 'desactivar'): (_usuario_desactivar, [_ID], "Desactiva un usuario"),
+    ('usuario', 'ver'): (_usuario_ver, [_ID], "Muestra un usuario"),
+    ('autor', 'crear'): (_autor_crear, _campos('autores'), "Registra un autor"),
+    ('autor', 'modificar'): (_autor_modificar, [_ID] + _campos('autores', False), "Modifica un autor"),
+    ('autor', 'ver'): (_autor_ver, [_ID], "Muestra un autor"),
+    ('autor', 'borrar'): (_autor_borrar, [_ID], "Elimina un autor"),
+    ('categoria', 'crear'): (_categoria_crear, _campos('categorias'), "Registra una categoría"),
+    ('categoria', 'modificar'): (_categoria_modificar, [_ID] + _campos('categorias', False), "Modifica una categoría"),
+    ('categoria', 'ver'): (_categoria_ver, [_ID], "Muestra una categoría"),
+    ('categoria', 'borrar'): (_categoria_borrar, [_ID], "Elimina una categoría"),
+    ('prestamo', 'crear'): (_prestamo_crear, [_USUARIO, ('libro', comprobar_numero_entero, (1,), True)], "Registra un préstamo"),
+    ('prestamo', 'devolver'): (_prestamo_devolver, [_ID], "Registra una devolución"),
+    ('prestamo', 'vencidos'): (_prestamo_vencidos, [('fecha', comprobar_fecha, (), False)], "Marca los préstamos vencidos"),
+    ('prestamo', 'ver'): (_prestamo_ver, [_ID], "Muestra un préstamo"),
+    ('multa', 'crear'): (_multa_crear, [
+        _USUARIO, ('monto', comprobar_numero_decimal, (0.01, 10000.00), True), ('concepto', comprobar_texto, (1, 200), True),
+    ], "Registra una multa"),
+    ('multa', 'pagar'): (_multa_pagar, [_ID], "Registra el pago de una multa"),
+    ('multa', 'ver'): (_multa_ver, [_ID], "Muestra una multa"),
+    ('multa', 'cuenta'): (_multa_cuenta, [_USUARIO], "Cuenta de multas de un usuario"),
+    ('multa', 'resumen'): (_multa_resumen, [], "Totales globales de multas"),
+    ('datos', 'importar'): (_datos_importar, [
+        ('coleccion', str, (), True), ('archivo', str, (), True), ('bloque', comprobar_numero_entero, (1,), False),
+    ], "Importa un archivo CSV o JSONL"),
+    ('datos', 'conciliar'): (_datos_conciliar, [('completa', bool, (), False)], "Concilia los contadores"),
+    ('datos', 'compactar'): (_datos_compactar, [('coleccion', str, (), True)], "Compacta el journal de una colección"),
+    ('datos', 'convertir'): (_datos_convertir, [
+        ('coleccion', str, (), True), ('formato', _comprobar_formato, (), True), ('comprimir', bool, (), False),
+    ], "Convierte el archivo de una colección a otro formato"),
+    ('reporte', 'circulacion'): (_reporte_circulacion, [
+        ('desde', comprobar_fecha, (), False), ('hasta', comprobar_fecha, (), False),
+        ('limite', comprobar_numero_entero, (1, 1000000), False),
+    ], "Préstamos por categoría, autor y mes"),
+}
+
+# Comandos que confirman o descartan por su cuenta y no entran en un lote
+FUERA_DE_LOTE = {('datos', 'conciliar'), ('datos', 'compactar'), ('datos', 'convertir')}
+
+def _comprobar_parametros(especificacion, valores):
+    """
+    Valida los parámetros de un comando
+    Args:
+        especificacion (list): Parámetros del comando (ver COMANDOS)
+        valores (dict): Nombre del parámetro -> valor recibido
+    Returns:
+        dict: Parámetros convertidos, listos para la función del comando
+    Raises:
+        ValueError: Con el parámetro y el motivo del primer valor inválido
+    """
+    conocidos = {nombre for nombre, _, _, _ in especificacion}
+    desconocidos = [nombre for nombre in valores if nombre not in conocidos]
+    if desconocidos:
+        raise ValueError(f"Parámetro desconocido: {', '.join(desconocidos)}")
+    parametros = {}
+    for nombre, comprobar, argumentos, obligatorio in especificacion:
+        valor = valores.get(nombre)
+        if valor is None or valor == "":
+            if obligatorio:
+                raise ValueError(f"{nombre}: es obligatorio.")
+            continue
+        try:
+            parametros[nombre] = comprobar(valor, *argumentos)
+        except ValueError as e:
+            raise ValueError(f"{nombre}: {e}") from None
+    return parametros
+
+def ejecutar(grupo, accion, valores):
+    """
+    Ejecuta un comando con parámetros sin validar
+    Args:
+        grupo (str): Grupo del comando ('libro', 'prestamo', ...)
+        accion (str): Acción ('crear', 'devolver', ...)
+        valores (dict): Parámetros recibidos
+    Returns:
+        dict: {'comando', 'ok', 'resultado'} o {'comando', 'ok', 'error',
+            'tipo'}; el tipo es 'comando' (no existe), 'parametros' (valor
+            inválido) u 'operacion' (la operación fue rechazada)
+    Raises:
+        ConflictoVersion: Dentro de una transacción, para que la repita
+            quien la abrió
+    """
+    comando = f"{grupo} {accion}"
+    definicion = COMANDOS.get((grupo, accion))
+    if definicion is None:
+        return {'comando': comando, 'ok': False, 'error': "Comando desconocido.", 'tipo': 'comando'}
+    funcion, especificacion, _ = definicion
+    try:
+        parametros = _comprobar_parametros(especificacion, valores)
+    except ValueError as e:
+        return {'comando': comando, 'ok': False, 'error': str(e), 'tipo': 'parametros'}
+    try:
+        resultado = funcion(**parametros)
+    except ConflictoVersion:
+        raise
+    except (ErrorBiblioteca, ValueError) as e:
+        return {'comando': comando, 'ok': False, 'error': str(e), 'tipo': 'operacion'}
+    return {'comando': comando, 'ok': True, 'resultado': resultado}
+
+def _ejecutar_orden(grupo, accion, parametros):
+    if grupo is None:
+        return {'ok': False, 'error': parametros, 'tipo': 'comando'}
+    if (grupo, accion) in FUERA_DE_LOTE:
+        return {'comando': f"{grupo} {accion}", 'ok': False, 'error': "Este comando no se puede ejecutar en un lote.", 'tipo': 'comando'}
+    return ejecutar(grupo, accion, parametros)
+
+def ejecutar_varios(ordenes):
+    """
+    Ejecuta varios comandos en una única transacción
+    Cada comando que falla se informa sin detener a los demás. Si otra
+    terminal guardó los mismos datos antes de confirmar, se repiten todos
+    con datos frescos
+    Args:
+        ordenes (list): Tuplas (grupo, acción, parámetros); con grupo None
+            la orden no se pudo leer y los parámetros son el mensaje de error
+    Returns:
+        list: Resultado de cada orden (ver ejecutar), en el mismo orden
+    Raises:
+        ErrorBiblioteca: Si choca con otras terminales en todos los intentos
+    """
+    for intento in range(INTENTOS_POR_CONFLICTO):
+        try:
+            with transaccion():
+                return [_ejecutar_orden(*orden) for orden in ordenes]
+        except ConflictoVersion:
+            time.sleep(random.uniform(0, 0.01 * (2 ** intento)))
+    raise ErrorBiblioteca("Otra terminal está modificando los mismos datos. Intente nuevamente.")
+
+def _leer_lote(archivo):
+    """
+    Yields:
+        tuple: (número de línea, grupo, acción, parámetros) o
+            (número de línea, None, None, mensaje de error)
+    """
+    for numero_linea, linea in enumerate(archivo, 1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            orden = json.loads(linea)
+            partes = orden.pop('comando').split()
+        except (ValueError, KeyError, AttributeError, TypeError):
+            yield numero_linea, None, None, "Línea inválida: se espera un objeto JSON con 'comando'."
+            continue
+        if len(partes) != 2:
+            yield numero_linea, None, None, "El comando debe tener grupo y acción, por ejemplo 'prestamo crear'."
+            continue
+        yield numero_linea, partes[0], partes[1], orden
+
+def ejecutar_lote(ruta_lote):
+    """
+    Ejecuta un archivo de comandos (JSONL) en una única transacción
+    Args:
+        ruta_lote (str): Ruta del archivo de comandos
+    Returns:
+        list: Resultado de cada comando, con su número de línea
+    Raises:
+        ErrorBiblioteca: Si el lote choca con otras terminales en todos los intentos
+    """
+    with open(ruta_lote, 'r', encoding='utf-8') as archivo:
+        lineas = list(_leer_lote(archivo))
+    resultados = ejecutar_varios([orden for _, *orden in lineas])
+    return [{'linea': numero_linea, **resultado} for (numero_linea, *_), resultado in zip(lineas, resultados)]
+
+def _crear_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description="Sistema de Gestión de Biblioteca (sin menús)")
+    parser.add_argument('--batch', metavar="ARCHIVO", help="Ejecuta un archivo JSONL de comandos")
+    grupos = parser.add_subparsers(dest='grupo', metavar="GRUPO")
+    subparsers = {}
+    for (grupo, accion), (_, especificacion, descripcion) in COMANDOS.items():
+        if grupo not in subparsers:
+            subparsers[grupo] = grupos.add_parser(grupo).add_subparsers(dest='accion', metavar="ACCION", required=True)
+        parser_accion = subparsers[grupo].add_parser(accion, help=descripcion, description=descripcion)
+        for nombre, comprobar, _, obligatorio in especificacion:
+            opciones = [f"--{nombre}"] + ([f"--{_ALIAS[nombre]}"] if nombre in _ALIAS else [])
+            if comprobar is bool:
+                parser_accion.add_argument(*opciones, dest=nombre, action='store_true')
+            else:
+                parser_accion.add_argument(*opciones, dest=nombre, required=obligatorio)
+    return parser
+
+def _escribir(salida, resultado):
+    salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+
+def main(argumentos=None):
+    """
+    Punto de entrada sin menús
+    Lo que los modelos muestran por consola (avisos, errores de guardado) va
+    a stderr, para que stdout tenga solo JSON
+    Args:
+        argumentos (list): Argumentos (None para usar sys.argv)
+    Returns:
+        int: Código de salida (0 si todos los comandos terminaron bien)
+    """
+    parser = _crear_parser()
+    opciones = parser.parse_args(argumentos)
+    salida = sys.stdout
+
+    if opciones.batch:
+        try:
+            with contextlib.redirect_stdout(sys.stderr):
+                resultados = ejecutar_lote(opciones.batch)
+        except (ErrorBiblioteca, OSError) as e:
+            _escribir(salida, {'ok': False, 'error': str(e)})
+            return 1
+        for resultado in resultados:
+            _escribir(salida, resultado)
+        return 0 if all(resultado['ok'] for resultado in resultados) else 1
+
+    if opciones.grupo is None:
+        parser.print_usage(sys.stderr)
+        return 2
+    valores = {nombre: valor for nombre, valor in vars(opciones).items() if nombre not in ('batch', 'grupo', 'accion')}
+    with contextlib.redirect_stdout(sys.stderr):
+        resultado = ejecutar(opciones.grupo, opciones.accion, valores)
+    _escribir(salida, resultado)
+    return 0 if resultado['ok'] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+"""
+Módulo de conciliación de contadores
+Recalcula los contadores que los modelos mantienen a mano a partir de los
+préstamos y las multas, y corrige los que no coinciden:
+    libros: copias_disponibles = cantidad_copias - préstamos sin devolver
+    usuarios: multas_pendientes, monto_pendiente y total_pagado
+    resumen_multas: totales globales de multas
+La conciliación completa recorre préstamos y multas una sola vez, en flujo
+(sin cargarlos si no están en caché), sumando por libro y por usuario en
+diccionarios. La incremental revisa solo los libros y usuarios tocados
+desde la última conciliación: cada guardado anota antes de escribir qué
+libros y usuarios pueden haber cambiado (anotar_cambios), así que una
+operación cortada a mitad de camino también queda anotada
+
+Uso:
+    python -m utils.conciliacion              (incremental)
+    python -m utils.conciliacion --completa
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+from utils import bloqueos, manejo_archivos
+from utils.manejo_archivos import cargar_datos, guardar_datos, buscar_registros, recorrer_coleccion
+from utils.transacciones import transaccion, con_reintentos
+from utils.instrumentacion import medido
+
+ARCHIVO_MARCAS = "conciliacion.marcas"
+
+# Estados de préstamo con el libro fuera de la biblioteca
+ESTADOS_PRESTADO = ('activo', 'vencido')
+
+# Colección guardada -> (colección cuyo contador puede cambiar, campo con su ID)
+COLECCIONES_AFECTADAS = {
+    'prestamos': ('libros', 'id_libro'),
+    'multas': ('usuarios', 'id_usuario'),
+    'libros': ('libros', 'id'),
+    'usuarios': ('usuarios', 'id'),
+}
+
+CAMPOS_CUENTA = ('multas_pendientes', 'monto_pendiente', 'total_pagado')
+
+# Las correcciones de la propia conciliación no se anotan
+_local = threading.local()
+
+def _ruta_marcas():
+    return os.path.join(manejo_archivos.RUTA_DATOS, ARCHIVO_MARCAS)
+
+def anotar_cambios(colecciones):
+    """
+    Anota los libros y usuarios que puede afectar un guardado
+    Se llama antes de escribir las colecciones. Si no se puede saber a
+    quién afecta un cambio (colección reemplazada completa o préstamos y
+    multas eliminados) se pide una conciliación completa
+    Args:
+        colecciones (dict): Nombre de la colección -> Coleccion a guardar
+    """
+    if getattr(_local, 'conciliando', False):
+        return
+    marcas = {}
+    for nombre_archivo, coleccion in colecciones.items():
+        afectada = COLECCIONES_AFECTADAS.get(nombre_archivo)
+        if afectada is None:
+            continue
+        nombre_afectada, campo = afectada
+        if coleccion.reemplazo or coleccion.tiene_claves_internas():
+            marcas['completa'] = True
+            continue
+        eliminados, modificados = coleccion.extraer_cambios()
+        if eliminados and nombre_afectada != nombre_archivo:
+            marcas['completa'] = True
+        ids = {registro.get(campo) for registro in modificados}
+        ids.discard(None)
+        if ids:
+            marcas.setdefault(nombre_afectada, set()).update(ids)
+    if not marcas:
+        return
+
+    linea = json.dumps({nombre: sorted(ids) if isinstance(ids, set) else ids for nombre, ids in marcas.items()})
+    ruta_marcas = _ruta_marcas()
+    # Bloqueo compartido entre las terminales que anotan; la conciliación
+    # lo toma exclusivo para llevarse las marcas
+    with bloqueos.bloqueo(ruta_marcas + ".lock", exclusivo=False):
+        with open(ruta_marcas, 'a', encoding='utf-8') as archivo:
+            archivo.write(linea + "\n")
+
+def _tomar_marcas():
+    """
+    Aparta las marcas anotadas hasta ahora en <marcas>.procesando, que solo
+    se borra cuando la conciliación termina bien
+    Returns:
+        dict: 'libros' y 'usuarios' (conjuntos de IDs) y 'completa' (bool)
+    """
+    ruta_marcas = _ruta_marcas()
+    ruta_procesando = ruta_marcas + ".procesando"
+    with bloqueos.bloqueo(ruta_marcas + ".lock"):
+        if os.path.exists(ruta_marcas):
+            if os.path.exists(ruta_procesando):
+                # Quedaron marcas de una conciliación que no terminó
+                with open(ruta_marcas, 'rb') as nuevas, open(ruta_procesando, 'ab') as pendientes:
+                    pendientes.write(nuevas.read())
+                os.remove(ruta_marcas)
+            else:
+                os.replace(ruta_marcas, ruta_procesando)
+
+    marcas = {'libros': set(), 'usuarios': set(), 'completa': False}
+    try:
+        with open(ruta_procesando, 'r', encoding='utf-8') as archivo:
+            for linea in archivo:
+                try:
+                    anotadas = json.loads(linea)
+                except ValueError:
+                    # Línea cortada por una caída al anotar
+                    marcas['completa'] = True
+                    continue
+                marcas['completa'] = marcas['completa'] or anotadas.get('completa', False)
+                marcas['libros'].update(anotadas.get('libros', ()))
+                marcas['usuarios'].update(anotadas.get('usuarios', ()))
+    except FileNotFoundError:
+        pass
+    return marcas
+
+def _descartar_marcas():
+    try:
+        os.remove(_ruta_marcas() + ".procesando")
+    except FileNotFoundError:
+        pass
+
+def _nueva_cuenta():
+    return {'multas_pendientes': 0, 'monto_pendiente': 0.0, 'total_pagado': 0.0}
+
+def _sumar_multa(cuenta, multa):
+    if multa.get('estado') == 'pendiente':
+        cuenta['multas_pendientes'] += 1
+        cuenta['monto_pendiente'] += multa.get('monto', 0.0)
+    elif multa.get('estado') == 'pagada':
+        cuenta['total_pagado'] += multa.get('monto', 0.0)
+
+def _redondear(cuenta):
+    cuenta['monto_pendiente'] = round(cuenta['monto_pendiente'], 2)
+    cuenta['total_pagado'] = round(cuenta['total_pagado'], 2)
+    return cuenta
+
+def _agregar_completo():
+    """
+    Recorre préstamos y multas una vez y suma por libro y por usuario
+    Returns:
+        tuple: (Counter id_libro -> préstamos sin devolver,
+            dict id_usuario -> cuenta, cuenta global)
+    """
+    prestados = Counter(
+        prestamo.get('id_libro') for prestamo in recorrer_coleccion('prestamos')
+        if prestamo.get('estado') in ESTADOS_PRESTADO
+    )
+    cuentas = {}
+    total = _nueva_cuenta()
+    for multa in recorrer_coleccion('multas'):
+        cuenta = cuentas.get(multa.get('id_usuario'))
+        if cuenta is None:
+            cuenta = cuentas[multa.get('id_usuario')] = _nueva_cuenta()
+        _sumar_multa(cuenta, multa)
+        _sumar_multa(total, multa)
+    for cuenta in cuentas.values():
+        _redondear(cuenta)
+    return prestados, cuentas, _redondear(total)
+
+def _agregar_marcados(ids_libros, ids_usuarios):
+    """
+    Suma solo los préstamos y multas de los libros y usuarios indicados,
+    usando los índices por id_libro e id_usuario
+    """
+    prestados = Counter()
+    for id_libro in ids_libros:
+        prestados[id_libro] = sum(
+            1 for prestamo in buscar_registros('prestamos', 'id_libro', id_libro)
+            if prestamo.get('estado') in ESTADOS_PRESTADO
+        )
+    cuentas = {}
+    for id_usuario in ids_usuarios:
+        cuenta = cuentas[id_usuario] = _nueva_cuenta()
+        for multa in buscar_registros('multas', 'id_usuario', id_usuario):
+            _sumar_multa(cuenta, multa)
+        _redondear(cuenta)
+    return prestados, cuentas
+
+def _distintos(anterior, nuevo):
+    if isinstance(anterior, (int, float)) and not isinstance(anterior, bool):
+        return abs(anterior - nuevo) >= 0.005
+    return True
+
+@con_reintentos
+def _conciliar(completa, marcas):
+    """
+    Compara y corrige los contadores dentro de una transacción: si otra
+    terminal guarda libros, usuarios o el resumen mientras tanto, se repite
+    """
+    from modelos.multa import ARCHIVO_RESUMEN_MULTAS, ID_RESUMEN_MULTAS
+
+    correcciones = []
+    avisos = []
+    if not completa and not marcas['libros'] and not marcas['usuarios']:
+        # Nada tocado desde la última conciliación
+        return {'modo': 'incremental', 'libros_revisados': 0, 'usuarios_revisados': 0, 'correcciones': correcciones, 'avisos': avisos}
+    with transaccion():
+        # Los contadores se cargan antes de sumar: un préstamo o una multa
+        # guardados después cambian su versión y la transacción se repite
+        libros = cargar_datos('libros')
+        usuarios = cargar_datos('usuarios')
+        resumenes = cargar_datos(ARCHIVO_RESUMEN_MULTAS)
+        if completa:
+            prestados, cuentas, total = _agregar_completo()
+            ids_libros = libros.ids()
+            ids_usuarios = usuarios.ids()
+        else:
+            ids_libros = sorted(marcas['libros'])
+            ids_usuarios = sorted(marcas['usuarios'])
+            prestados, cuentas = _agregar_marcados(ids_libros, ids_usuarios)
+            total = None
+
+        libros_corregidos = 0
+        for id_libro in ids_libros:
+            libro = libros.obtener(id_libro)
+            if libro is None:
+                continue
+            esperado = libro.get('cantidad_copias', 0) - prestados.get(id_libro, 0)
+            if esperado < 0:
+                avisos.append(f"Libro {id_libro}: {prestados[id_libro]} préstamos sin devolver y solo {libro.get('cantidad_copias', 0)} copias.")
+                esperado = 0
+            if libro.get('copias_disponibles') != esperado:
+                correcciones.append(('libros', id_libro, 'copias_disponibles', libro.get('copias_disponibles'), esperado))
+                libro['copias_disponibles'] = esperado
+                libros_corregidos += 1
+
+        usuarios_corregidos = 0
+        diferencia_total = _nueva_cuenta()
+        for id_usuario in ids_usuarios:
+            usuario = usuarios.obtener(id_usuario)
+            if usuario is None:
+                continue
+            esperada = cuentas.get(id_usuario) or _nueva_cuenta()
+            corregido = False
+            for campo in CAMPOS_CUENTA:
+                anterior = usuario.get(campo)
+                if anterior is None or _distintos(anterior, esperada[campo]):
+                    correcciones.append(('usuarios', id_usuario, campo, anterior, esperada[campo]))
+                    diferencia_total[campo] += esperada[campo] - (anterior or 0)
+                    usuario[campo] = esperada[campo]
+                    corregido = True
+            usuarios_corregidos += corregido
+
+        # La conciliación completa recalcula los totales; la incremental les
+        # suma lo corregido en los usuarios revisados
+        resumen = resumenes.obtener(ID_RESUMEN_MULTAS)
+        if resumen is not None:
+            if total is None:
+                total = {campo: resumen[campo] + diferencia_total[campo] for campo in CAMPOS_CUENTA}
+                _redondear(total)
+            resumen_corregido = False
+            for campo in CAMPOS_CUENTA:
+                if _distintos(resumen.get(campo), total[campo]):
+                    correcciones.append((ARCHIVO_RESUMEN_MULTAS, ID_RESUMEN_MULTAS, campo, resumen.get(campo), total[campo]))
+                    resumen[campo] = total[campo]
+                    resumen_corregido = True
+            if resumen_corregido:
+                guardar_datos(ARCHIVO_RESUMEN_MULTAS, resumenes)
+
+        if libros_corregidos:
+            guardar_datos('libros', libros)
+        if usuarios_corregidos:
+            guardar_datos('usuarios', usuarios)
+
+    return {
+        'modo': 'completa' if completa else 'incremental',
+        'libros_revisados': len(ids_libros),
+        'usuarios_revisados': len(ids_usuarios),
+        'correcciones': correcciones,
+        'avisos': avisos,
+    }
+
+@medido('conciliacion')
+def conciliar(completa=False):
+    """
+    Concilia los contadores de libros, usuarios y el resumen de multas
+    Sin marcas pendientes, la conciliación incremental no revisa nada.
+    Si alguna marca pide una conciliación completa, se hace completa
+    Args:
+        completa (bool): True para revisar todos los libros y usuarios
+    Returns:
+        dict: Informe con el modo, los libros y usuarios revisados, las
+            correcciones (colección, ID, campo, valor anterior, valor nuevo),
+            los avisos y los segundos que tomó
+    """
+    inicio = time.perf_counter()
+    # Los guardados diferidos anotan sus marcas al escribirse
+    manejo_archivos.forzar_escritura()
+    marcas = _tomar_marcas()
+    _local.conciliando = True
+    try:
+        informe = _conciliar(completa or marcas['completa'], marcas)
+        manejo_archivos.forzar_escritura()
+    finally:
+        _local.conciliando = False
+    # Las marcas se descartan solo si la conciliación se completó
+    _descartar_marcas()
+    informe['segundos'] = round(time.perf_counter() - inicio, 3)
+    return informe
+
+def mostrar_informe(informe):
+    """
+    Muestra el informe de una conciliación
+    Args:
+        informe (dict): Resultado de conciliar()
+    """
+    print(f"\n--- CONCILIACIÓN {informe['modo'].upper()} ---\n")
+    print(f"Libros revisados: {informe['libros_revisados']}")
+    print(f"Usuarios revisados: {informe['usuarios_revisados']}")
+    print(f"Correcciones: {len(informe['correcciones'])}")
+    print(f"Tiempo: {informe['segundos']:.3f} s")
+    if informe['correcciones']:
+        print(f"\n{'Colección':<16} {'ID':<8} {'Campo':<20} {'Anterior':<12} {'Nuevo':<12}")
+        print("-" * 70)
+        for coleccion, id_registro, campo, anterior, nuevo in informe['correcciones']:
+            print(f"{coleccion:<16} {id_registro:<8} {campo:<20} {str(anterior):<12} {str(nuevo):<12}")
+    for aviso in informe['avisos']:
+        print(f"AVISO: {aviso}")
+
+def main(argumentos=None):
+    """
+    Punto de entrada de la línea de comandos
+    Args:
+        argumentos (list): Argumentos (None para usar sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Conciliación de contadores de la biblioteca")
+    parser.add_argument('--completa', action='store_true', help="Revisar todos los libros y usuarios")
+    parser.add_argument('--json', action='store_true', help="Mostrar el informe en JSON")
+    opciones = parser.parse_args(argumentos)
+
+    informe = conciliar(opciones.completa)
+    if opciones.json:
+        print(json.dumps(informe, ensure_ascii=False, indent=2))
+    else:
+        mostrar_informe(informe)
+
+if __name__ == "__main__":
+    main()
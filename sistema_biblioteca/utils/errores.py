@@ -0,0 +1,27 @@
+"""
+Módulo de errores
+Excepciones propias del sistema de biblioteca
+"""
+
+class ErrorBiblioteca(Exception):
+    """
+    Error de una operación del sistema (usuario inactivo, sin copias, etc.)
+    Los menús lo muestran como 'ERROR: <mensaje>'
+    """
+
+class ConflictoVersion(ErrorBiblioteca):
+    """
+    Otra terminal guardó la misma colección después de que esta la cargara
+    Las operaciones de los modelos lo manejan volviendo a intentar
+    """
+
+class EscrituraRechazada(ErrorBiblioteca):
+    """
+    La escritura diferida no pudo guardar cambios ya informados al usuario
+    porque otra terminal escribió los mismos datos antes del volcado
+    Los cambios quedan en un archivo .conflicto para revisarlos a mano
+    """
+
+    def __init__(self, mensaje, ruta_conflicto):
+        super().__init__(mensaje)
+        self.ruta_conflicto = ruta_conflicto
@@ -0,0 +1,161 @@
+"""
+Módulo de fechas
+Las fechas de préstamos y multas se guardan como número de día
+(date.toordinal()): se comparan y restan como enteros y se ordenan
+cronológicamente. El formato DD/MM/AAAA solo se aplica al mostrarlas.
+Incluye operaciones por lotes sobre arreglos de días (con NumPy si está
+instalado) y la migración de los archivos con fechas en texto
+
+Uso:
+    python -m utils.fechas        (migra las fechas de préstamos y multas)
+"""
+
+from array import array
+from datetime import date
+from functools import lru_cache
+
+from utils.transacciones import con_reintentos, transaccion
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+FORMATO_FECHA = "%d/%m/%Y"
+
+# Campos de fecha de cada colección
+CAMPOS_FECHA = {
+    'prestamos': ('fecha_prestamo', 'fecha_devolucion_esperada', 'fecha_devolucion_real'),
+    'multas': ('fecha_generacion', 'fecha_pago'),
+}
+
+def hoy():
+    """
+    Returns:
+        int: Número de día de la fecha actual
+    """
+    return date.today().toordinal()
+
+@lru_cache(maxsize=8192)
+def _ordinal_desde_texto(fecha_str):
+    # Se memoriza porque muchos registros comparten la misma fecha
+    dia, mes, año = fecha_str.split("/")
+    return date(int(año), int(mes), int(dia)).toordinal()
+
+def a_ordinal(valor):
+    """
+    Convierte una fecha al número de día que se guarda en los datos
+    Acepta también el texto DD/MM/AAAA de los archivos sin migrar
+    Args:
+        valor (int, str, date or None): Fecha a convertir
+    Returns:
+        int or None: Número de día (None si no hay fecha)
+    Raises:
+        ValueError: Si el texto no tiene el formato DD/MM/AAAA
+    """
+    if valor is None or isinstance(valor, int):
+        return valor
+    if isinstance(valor, date):
+        return valor.toordinal()
+    return _ordinal_desde_texto(valor.strip())
+
+def formatear(valor):
+    """
+    Da formato DD/MM/AAAA a una fecha guardada
+    Args:
+        valor (int, str or None): Número de día (o texto sin migrar)
+    Returns:
+        str or None: Fecha con formato (None si no hay fecha)
+    """
+    if isinstance(valor, int):
+        return date.fromordinal(valor).strftime(FORMATO_FECHA)
+    return valor
+
+def arreglo_de_dias(valores):
+    """
+    Arma un arreglo compacto de números de día
+    Args:
+        valores (iterable): Fechas (números de día o texto sin migrar)
+    Returns:
+        array or numpy.ndarray: Arreglo de enteros de 64 bits
+    """
+    dias = array('q', (a_ordinal(valor) for valor in valores))
+    if numpy is not None:
+        return numpy.frombuffer(dias, dtype=numpy.int64)
+    return dias
+
+def dias_de_atraso(vencimientos, referencia):
+    """
+    Calcula en un solo paso los días de atraso de un lote de vencimientos
+    Args:
+        vencimientos (array or numpy.ndarray): Números de día de vencimiento
+        referencia (int): Número de día de referencia
+    Returns:
+        array or numpy.ndarray: Días de atraso (0 si no está vencido)
+    """
+    if numpy is not None and isinstance(vencimientos, numpy.ndarray):
+        return numpy.maximum(referencia - vencimientos, 0)
+    return array('q', [referencia - dia if dia < referencia else 0 for dia in vencimientos])
+
+def montos_por_dias(dias, monto_por_dia):
+    """
+    Calcula en un solo paso el monto de un lote de atrasos
+    Args:
+        dias (array or numpy.ndarray): Días de atraso
+        monto_por_dia (float): Monto por día de atraso
+    Returns:
+        array or numpy.ndarray: Montos redondeados a 2 decimales
+    """
+    if numpy is not None and isinstance(dias, numpy.ndarray):
+        return numpy.round(dias * monto_por_dia, 2)
+    return array('d', [round(dia * monto_por_dia, 2) for dia in dias])
+
+def fechas_a_migrar(nombre, registro):
+    """
+    Calcula el número de día de las fechas en texto de un registro
+    Las fechas inválidas se informan y se conservan como están
+    Args:
+        nombre (str): Nombre de la colección (ver CAMPOS_FECHA)
+        registro (dict): Registro a revisar
+    Returns:
+        dict: Campo -> número de día (vacío si no hay fechas en texto)
+    """
+    cambios = {}
+    for campo in CAMPOS_FECHA.get(nombre, ()):
+        valor = registro.get(campo)
+        if isinstance(valor, str):
+            try:
+                cambios[campo] = a_ordinal(valor)
+            except ValueError:
+                print(f"ERROR: Fecha inválida '{valor}' en {nombre} #{registro.get('id')}, se conserva.")
+    return cambios
+
+@con_reintentos
+def migrar_fechas():
+    """
+    Convierte a número de día las fechas en texto de préstamos y multas
+    Se puede ejecutar más de una vez: las fechas ya migradas no cambian
+    Returns:
+        dict: Colección -> cantidad de registros migrados
+    """
+    from utils.manejo_archivos import cargar_datos, guardar_datos
+
+    migrados = {}
+    with transaccion():
+        for nombre, campos in CAMPOS_FECHA.items():
+            registros = cargar_datos(nombre)
+            cantidad = 0
+            for registro in registros:
+                cambios = fechas_a_migrar(nombre, registro)
+                if cambios:
+                    registro.update(cambios)
+                    cantidad += 1
+            if cantidad:
+                guardar_datos(nombre, registros)
+            migrados[nombre] = cantidad
+    return migrados
+
+if __name__ == "__main__":
+    print("Migrando fechas a números de día ...")
+    for nombre, cantidad in migrar_fechas().items():
+        print(f"    {nombre}: {cantidad} registros")
@@ -0,0 +1,462 @@
+"""
+Módulo de formatos de las instantáneas
+Codifica y decodifica los archivos de las colecciones en los modos JSON.
+Cada archivo indica su formato en un encabezado, así que las terminales
+leen cualquiera sin configuración (los archivos conservan la extensión
+.json para no cambiar rutas, bloqueos ni firmas)
+
+Formatos:
+- 'json': la lista de registros con sangría, sin encabezado. Es el formato
+  de siempre y el que se reconoce cuando el archivo no tiene encabezado
+- 'json_compacto': la misma lista sin espacios ni sangría
+- 'binario': un registro por fila con su largo (struct) y sus valores en
+  marshal, en el orden del diccionario de campos del encabezado (los campos
+  del primer registro). Los campos que falten o sobren se guardan aparte en
+  la fila
+Cualquiera de los dos con encabezado se puede comprimir con zlib, para las
+colecciones que se leen poco (historial de préstamos, multas)
+
+El encabezado es una línea '#biblioteca {...}' con el formato en JSON.
+Las posiciones de los registros (para leer por páginas) son bytes del
+archivo; en los comprimidos, bytes de los datos ya descomprimidos
+
+Uso (conversión):
+    python -m utils.formatos --formato binario --comprimir prestamos multas
+    python -m utils.formatos --formato json
+"""
+
+import codecs
+import json
+import marshal
+import re
+import struct
+import zlib
+from itertools import chain, islice
+
+FORMATOS = ('json', 'json_compacto', 'binario')
+VERSION_FORMATO = 1
+MAGIA = b"#biblioteca "
+
+TAMAÑO_BLOQUE_LECTURA = 64 * 1024
+# Bytes que se decodifican juntos al recorrer de a lotes
+TAMAÑO_BLOQUE_LOTES = 1024 * 1024
+# Bytes que se juntan antes de escribir (o comprimir)
+TAMAÑO_BLOQUE_ESCRITURA = 256 * 1024
+NIVEL_COMPRESION = 6
+# Registros que se codifican juntos en 'json_compacto'
+_REGISTROS_POR_LOTE = 1000
+
+# Largo de cada fila del formato binario
+_LARGO_FILA = struct.Struct('<I')
+_PATRON_SEPARADORES = re.compile(r'[\s,\[]*')
+# Dentro de un texto JSON las comillas van escapadas, así que esto solo
+# coincide con la clave "id" de un registro
+_PATRON_ID = re.compile(rb'"id":[ \t]{0,8}(-?\d{1,20})')
+# Largo máximo de una coincidencia de _PATRON_ID
+_SOLAPAMIENTO_ID = 64
+
+_ENCABEZADO_JSON = {'formato': 'json', 'version': VERSION_FORMATO, 'zlib': False}
+
+def formatear_registro(registro):
+    """
+    Texto de un registro dentro de una instantánea en formato 'json'
+    Para registros planos es el mismo que produce json.dump(indent=4), pero
+    con el codificador en C (con indent se usa el de Python)
+    """
+    if any(isinstance(valor, (dict, list)) for valor in registro.values()):
+        return json.dumps(registro, ensure_ascii=False, indent=4).replace("\n", "\n    ")
+    texto = json.dumps(registro, ensure_ascii=False, separators=(",\n        ", ": "))
+    return "{\n        " + texto[1:-1] + "\n    }" if registro else "{}"
+
+class _Salida:
+    """
+    Escritura por bloques, con compresión opcional
+    """
+
+    def __init__(self, archivo, comprimir):
+        self.archivo = archivo
+        self.compresor = zlib.compressobj(NIVEL_COMPRESION) if comprimir else None
+        self.partes = []
+        self.tamaño = 0
+
+    def escribir(self, datos):
+        self.partes.append(datos)
+        self.tamaño += len(datos)
+        if self.tamaño >= TAMAÑO_BLOQUE_ESCRITURA:
+            self._volcar()
+
+    def _volcar(self):
+        datos = b"".join(self.partes)
+        self.partes, self.tamaño = [], 0
+        self.archivo.write(self.compresor.compress(datos) if self.compresor else datos)
+
+    def cerrar(self):
+        self._volcar()
+        if self.compresor:
+            self.archivo.write(self.compresor.flush())
+
+class _FlujoZlib:
+    """
+    Lectura de los datos comprimidos de un archivo como si fueran un archivo
+    Solo permite avanzar: seek descomprime y descarta hasta la posición
+    """
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.descompresor = zlib.decompressobj()
+        self.pendiente = b""
+        # Bytes de 'pendiente' ya entregados (evita copiar el resto en cada lectura)
+        self.entregado = 0
+        self.posicion = 0
+
+    def read(self, cantidad=-1):
+        while (cantidad < 0 or len(self.pendiente) - self.entregado < cantidad) and self.descompresor is not None:
+            bloque = self.archivo.read(TAMAÑO_BLOQUE_LECTURA)
+            restante = self.pendiente[self.entregado:]
+            if bloque:
+                self.pendiente = restante + self.descompresor.decompress(bloque)
+            else:
+                self.pendiente = restante + self.descompresor.flush()
+                self.descompresor = None
+            self.entregado = 0
+        fin = len(self.pendiente) if cantidad < 0 else self.entregado + cantidad
+        datos = self.pendiente[self.entregado:fin]
+        self.entregado += len(datos)
+        self.posicion += len(datos)
+        return datos
+
+    def seek(self, posicion):
+        if posicion < self.posicion:
+            raise ValueError("Los datos comprimidos solo se leen hacia adelante")
+        while self.posicion < posicion and self.read(min(posicion - self.posicion, TAMAÑO_BLOQUE_LECTURA)):
+            pass
+
+def leer_encabezado(archivo):
+    """
+    Lee el encabezado de una instantánea abierta en modo binario
+    Args:
+        archivo (file): Instantánea abierta en modo 'rb'
+    Returns:
+        tuple: (encabezado como dict, byte donde empiezan los datos)
+    Raises:
+        ValueError: Si el encabezado está dañado o es de una versión posterior
+    """
+    archivo.seek(0)
+    if archivo.read(len(MAGIA)) != MAGIA:
+        return _ENCABEZADO_JSON, 0
+    linea = archivo.readline()
+    encabezado = json.loads(linea)
+    if encabezado.get('version', 0) > VERSION_FORMATO or encabezado.get('formato') not in FORMATOS:
+        raise ValueError(f"Formato de instantánea no soportado: {encabezado}")
+    return encabezado, len(MAGIA) + len(linea)
+
+def escribir(archivo, registros, formato='json', comprimir=False):
+    """
+    Escribe una instantánea completa, a medida que llegan los registros
+    Args:
+        archivo (file): Destino abierto en modo 'wb'
+        registros (iterable): Registros de la colección
+        formato (str): Uno de FORMATOS
+        comprimir (bool): True para comprimir con zlib ('json' pasa a
+            'json_compacto', que lleva encabezado)
+    Returns:
+        int: Cantidad de registros escritos
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconocido: {formato}")
+    registros = iter(registros)
+    cantidad = 0
+    if formato == 'json' and not comprimir:
+        salida = _Salida(archivo, False)
+        salida.escribir(b"[")
+        for registro in registros:
+            salida.escribir(((",\n    " if cantidad else "\n    ") + formatear_registro(registro)).encode('utf-8'))
+            cantidad += 1
+        salida.escribir(b"\n]" if cantidad else b"]")
+        salida.cerrar()
+        return cantidad
+
+    if formato == 'json':
+        formato = 'json_compacto'
+    encabezado = {'formato': formato, 'version': VERSION_FORMATO, 'zlib': bool(comprimir)}
+    primero = next(registros, None)
+    if formato == 'binario':
+        campos = list(primero) if primero is not None else []
+        encabezado['campos'] = campos
+    archivo.write(MAGIA + json.dumps(encabezado, ensure_ascii=False).encode('utf-8') + b"\n")
+    salida = _Salida(archivo, comprimir)
+    if primero is not None:
+        if formato == 'binario':
+            cantidad = _escribir_binario(salida, campos, primero, registros)
+        else:
+            # Cada lote se codifica de una vez (el codificador en C arma la
+            # lista completa) y va en su propia línea
+            lote = [primero]
+            lote.extend(islice(registros, _REGISTROS_POR_LOTE - 1))
+            salida.escribir(b"[")
+            while lote:
+                texto = json.dumps(lote, ensure_ascii=False, separators=(',', ':'))
+                salida.escribir(((",\n" if cantidad else "\n") + texto[1:-1]).encode('utf-8'))
+                cantidad += len(lote)
+                lote = list(islice(registros, _REGISTROS_POR_LOTE))
+            salida.escribir(b"\n]")
+    else:
+        salida.escribir(b"" if formato == 'binario' else b"[]")
+    salida.cerrar()
+    return cantidad
+
+def _escribir_binario(salida, campos, primero, registros):
+    conjunto_campos = set(campos)
+    empaquetar = _LARGO_FILA.pack
+    codificar = marshal.dumps
+    cantidad = 0
+    for registro in chain((primero,), registros):
+        valores = tuple(map(registro.get, campos))
+        diferencias = None
+        if registro.keys() != conjunto_campos:
+            diferencias = (
+                tuple(campo for campo in campos if campo not in registro),
+                {campo: valor for campo, valor in registro.items() if campo not in conjunto_campos},
+            )
+        fila = codificar(valores + (diferencias,), 4)
+        salida.escribir(empaquetar(len(fila)) + fila)
+        cantidad += 1
+    return cantidad
+
+def _decodificar_fila(campos, fila):
+    valores = marshal.loads(fila)
+    # zip termina en el último campo: el valor final son las diferencias
+    registro = dict(zip(campos, valores))
+    if valores[-1] is not None:
+        _aplicar_diferencias(registro, valores[-1])
+    return registro
+
+def _aplicar_diferencias(registro, diferencias):
+    faltantes, sobrantes = diferencias
+    for campo in faltantes:
+        del registro[campo]
+    registro.update(sobrantes)
+
+def leer(archivo):
+    """
+    Lee todos los registros de una instantánea
+    Args:
+        archivo (file): Instantánea abierta en modo 'rb'
+    Returns:
+        list: Registros
+    """
+    encabezado, inicio = leer_encabezado(archivo)
+    archivo.seek(inicio)
+    datos = archivo.read()
+    if encabezado['zlib']:
+        datos = zlib.decompress(datos)
+    if encabezado['formato'] != 'binario':
+        return json.loads(datos) if datos.strip() else []
+
+    campos = encabezado['campos']
+    vista = memoryview(datos)
+    desempaquetar = _LARGO_FILA.unpack_from
+    cargar_fila = marshal.loads
+    registros = []
+    agregar = registros.append
+    posicion = 0
+    total = len(datos)
+    while posicion < total:
+        largo, = desempaquetar(datos, posicion)
+        posicion += _LARGO_FILA.size
+        valores = cargar_fila(vista[posicion:posicion + largo])
+        posicion += largo
+        registro = dict(zip(campos, valores))
+        if valores[-1] is not None:
+            _aplicar_diferencias(registro, valores[-1])
+        agregar(registro)
+    return registros
+
+def iterar(archivo, desde=0):
+    """
+    Recorre los registros de una instantánea leyendo de a bloques, en lugar
+    de cargar el archivo completo
+    Args:
+        archivo (file): Instantánea abierta en modo 'rb'
+        desde (int): Posición donde empieza un registro (0 para el principio)
+    Yields:
+        tuple: (posición donde empieza el registro, registro)
+    """
+    encabezado, inicio = leer_encabezado(archivo)
+    if encabezado['zlib']:
+        archivo.seek(inicio)
+        flujo = _FlujoZlib(archivo)
+    else:
+        flujo = archivo
+        desde = max(desde, inicio)
+    if encabezado['formato'] == 'binario':
+        yield from _iterar_binario(flujo, desde, encabezado['campos'])
+    else:
+        yield from _iterar_json(flujo, desde)
+
+def _iterar_binario(flujo, desde, campos):
+    flujo.seek(desde)
+    posicion = desde
+    while True:
+        prefijo = flujo.read(_LARGO_FILA.size)
+        if len(prefijo) < _LARGO_FILA.size:
+            return
+        largo, = _LARGO_FILA.unpack(prefijo)
+        fila = flujo.read(largo)
+        if len(fila) < largo:
+            raise ValueError("Fila incompleta al final de la instantánea")
+        yield posicion, _decodificar_fila(campos, fila)
+        posicion += _LARGO_FILA.size + largo
+
+def _iterar_json(archivo, desde):
+    decodificador = json.JSONDecoder()
+    decodificador_utf8 = codecs.getincrementaldecoder('utf-8')()
+    archivo.seek(desde)
+    texto = ""
+    indice = 0
+    # Byte del archivo que corresponde al carácter 'indice_medido' de texto
+    indice_medido = 0
+    byte_medido = desde
+    fin_archivo = False
+    while True:
+        indice = _PATRON_SEPARADORES.match(texto, indice).end()
+        if indice < len(texto):
+            if texto[indice] == "]":
+                return
+            try:
+                registro, final = decodificador.raw_decode(texto, indice)
+            except ValueError:
+                # Registro cortado por el fin del bloque (o archivo dañado)
+                if fin_archivo:
+                    raise
+            else:
+                byte_medido += len(texto[indice_medido:indice].encode('utf-8'))
+                indice_medido = indice
+                yield byte_medido, registro
+                indice = final
+                continue
+        elif fin_archivo:
+            return
+
+        bloque = archivo.read(TAMAÑO_BLOQUE_LECTURA)
+        fin_archivo = not bloque
+        byte_medido += len(texto[indice_medido:indice].encode('utf-8'))
+        texto = texto[indice:] + decodificador_utf8.decode(bloque, final=fin_archivo)
+        indice = indice_medido = 0
+
+def iterar_lotes(archivo):
+    """
+    Recorre los registros de una instantánea de a lotes, sin sus posiciones
+    Es la lectura más rápida de una colección completa: en los formatos
+    JSON cada bloque se decodifica con una sola llamada a json.loads
+    Args:
+        archivo (file): Instantánea abierta en modo 'rb'
+    Yields:
+        list: Registros, en el orden de la instantánea
+    """
+    encabezado, inicio = leer_encabezado(archivo)
+    archivo.seek(inicio)
+    flujo = _FlujoZlib(archivo) if encabezado['zlib'] else archivo
+    if encabezado['formato'] == 'binario':
+        desde = 0 if encabezado['zlib'] else inicio
+        filas = (registro for _, registro in _iterar_binario(flujo, desde, encabezado['campos']))
+        while lote := list(islice(filas, _REGISTROS_POR_LOTE)):
+            yield lote
+        return
+
+    decodificador = json.JSONDecoder()
+    decodificador_utf8 = codecs.getincrementaldecoder('utf-8')()
+    texto = ""
+    while True:
+        bloque = flujo.read(TAMAÑO_BLOQUE_LOTES)
+        texto += decodificador_utf8.decode(bloque, final=not bloque)
+        texto = texto[_PATRON_SEPARADORES.match(texto).end():]
+        if not bloque:
+            # Lo que queda son los últimos registros y el ']' final
+            lote = json.loads("[" + texto)
+            if lote:
+                yield lote
+            return
+        corte = texto.rfind("},")
+        if corte < 0:
+            continue
+        try:
+            lote = json.loads("[" + texto[:corte + 1] + "]")
+            texto = texto[corte + 2:]
+        except ValueError:
+            # El corte cayó dentro de un registro (un diccionario anidado o
+            # un texto con '},'): se decodifican de a uno hasta donde se pueda
+            lote = []
+            indice = 0
+            while True:
+                indice = _PATRON_SEPARADORES.match(texto, indice).end()
+                try:
+                    registro, final = decodificador.raw_decode(texto, indice)
+                except ValueError:
+                    break
+                lote.append(registro)
+                indice = final
+            texto = texto[indice:]
+        if lote:
+            yield lote
+
+def ids_presentes(archivo, ids_buscados):
+    """
+    Indica cuáles de los IDs buscados tiene una instantánea
+    En los JSON sin comprimir se buscan en el texto, sin decodificarlo
+    Args:
+        archivo (file): Instantánea abierta en modo 'rb'
+        ids_buscados (set): IDs a buscar
+    Returns:
+        set: IDs encontrados
+    """
+    encontrados = set()
+    if not ids_buscados:
+        return encontrados
+    encabezado, inicio = leer_encabezado(archivo)
+    if encabezado['zlib'] or encabezado['formato'] == 'binario':
+        for _, registro in iterar(archivo):
+            if registro.get('id') in ids_buscados:
+                encontrados.add(registro['id'])
+        return encontrados
+
+    archivo.seek(inicio)
+    resto = b""
+    while True:
+        bloque = archivo.read(TAMAÑO_BLOQUE_LECTURA)
+        texto = resto + bloque
+        # Una coincidencia al final del bloque podría estar cortada: las que
+        # empiezan en los últimos bytes se buscan con el bloque siguiente
+        fin = max(len(texto) - _SOLAPAMIENTO_ID, 0) if bloque else len(texto)
+        for coincidencia in _PATRON_ID.finditer(texto):
+            if coincidencia.start() >= fin:
+                break
+            id_registro = int(coincidencia.group(1))
+            if id_registro in ids_buscados:
+                encontrados.add(id_registro)
+        if not bloque:
+            return encontrados
+        resto = texto[fin:]
+
+def main(argumentos=None):
+    """
+    Convierte las instantáneas de las colecciones a otro formato
+    Args:
+        argumentos (list): Argumentos (None para usar sys.argv)
+    """
+    import argparse
+    from utils import manejo_archivos
+
+    parser = argparse.ArgumentParser(description="Convierte los archivos de datos a otro formato")
+    parser.add_argument('colecciones', nargs='*', help="Colecciones a convertir (por defecto, todas)")
+    parser.add_argument('--formato', choices=FORMATOS, required=True)
+    parser.add_argument('--comprimir', action='store_true', help="Comprime con zlib")
+    opciones = parser.parse_args(argumentos)
+
+    for nombre in opciones.colecciones or manejo_archivos.listar_colecciones():
+        antes, despues = manejo_archivos.convertir_coleccion(nombre, opciones.formato, opciones.comprimir)
+        if despues is not None:
+            print(f"    {nombre}: {antes} -> {despues} bytes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Módulo generador de datos de prueba
+Crea bibliotecas sintéticas de cualquier tamaño para medir el sistema a
+escala real. Con la misma semilla se obtienen siempre los mismos datos
+
+- La popularidad de los libros sigue una distribución de Zipf: pocos
+  títulos concentran la mayoría de los préstamos. Los lectores también
+  tienen una actividad desigual (exponente menor)
+- Los préstamos se reparten en el tiempo hasta hoy. Una proporción se
+  devuelve con retraso y genera su multa (pagada o pendiente); de los que
+  siguen prestados, los que pasaron su fecha quedan 'vencido' o todavía
+  'activo' (pendientes de marcar)
+- Los contadores de los libros y de las cuentas de los usuarios, los
+  totales de multas y los contadores de IDs quedan consistentes con los
+  préstamos y las multas generados
+
+Los préstamos se escriben a medida que se generan, sin tenerlos en memoria
+(ver manejo_archivos.reemplazar_coleccion)
+
+Uso:
+    python -m utils.generador --escala 100k --semilla 7
+    python -m utils.generador --prestamos 250000 --libros 20000 --usuarios 8000
+"""
+
+import argparse
+import random
+import time
+import unicodedata
+from array import array
+from itertools import accumulate
+
+from utils import busqueda, fechas
+from utils.manejo_archivos import reemplazar_coleccion, fijar_contador
+
+# Escala -> tamaños (se nombran por la cantidad de préstamos)
+ESCALAS = {
+    '1k': {'prestamos': 1_000, 'libros': 300, 'usuarios': 150},
+    '10k': {'prestamos': 10_000, 'libros': 2_000, 'usuarios': 1_000},
+    '100k': {'prestamos': 100_000, 'libros': 10_000, 'usuarios': 5_000},
+    '1m': {'prestamos': 1_000_000, 'libros': 50_000, 'usuarios': 25_000},
+    '10m': {'prestamos': 10_000_000, 'libros': 200_000, 'usuarios': 100_000},
+}
+
+SEMILLA = 1
+PROPORCION_ATRASOS = 0.1
+EXPONENTE_ZIPF_LIBROS = 1.1
+EXPONENTE_ZIPF_USUARIOS = 0.8
+DIAS_HISTORIA = 730
+PROPORCION_USUARIOS_INACTIVOS = 0.02
+
+# Préstamos que se sortean juntos (random.choices con k > 1 es más rápido)
+_TAMAÑO_SORTEO = 10_000
+
+NOMBRES = (
+    "Juan", "María", "Carlos", "Ana", "Luis", "Lucía", "Jorge", "Sofía", "Pedro", "Valentina",
+    "Diego", "Camila", "Andrés", "Isabel", "Miguel", "Paula", "Javier", "Elena", "Ricardo", "Julia",
+    "Fernando", "Martina", "Gabriel", "Laura", "Tomás", "Carmen", "Mateo", "Rosa", "Santiago", "Clara",
+)
+APELLIDOS = (
+    "García", "Pérez", "González", "Rodríguez", "López", "Martínez", "Sánchez", "Romero", "Díaz", "Torres",
+    "Flores", "Rivera", "Gómez", "Ruiz", "Herrera", "Medina", "Castro", "Vargas", "Rojas", "Morales",
+    "Ortiz", "Silva", "Núñez", "Mendoza", "Guerrero", "Ramos", "Molina", "Suárez", "Aguilar", "Paz",
+)
+NACIONALIDADES = (
+    "Argentina", "Chilena", "Colombiana", "Mexicana", "Peruana", "Uruguaya", "Española",
+    "Venezolana", "Cubana", "Boliviana", "Paraguaya", "Ecuatoriana",
+)
+CATEGORIAS = (
+    ("Ficción", "Novelas y cuentos de ficción"),
+    ("Ciencia", "Libros científicos y técnicos"),
+    ("Historia", "Libros de historia y biografías"),
+    ("Poesía", "Antologías y obras poéticas"),
+    ("Infantil", "Libros para niños y primeros lectores"),
+    ("Ensayo", "Ensayos y pensamiento crítico"),
+    ("Arte", "Pintura música y fotografía"),
+    ("Viajes", "Guías y crónicas de viaje"),
+    ("Filosofía", "Obras clásicas y contemporáneas de filosofía"),
+    ("Cocina", "Recetas y gastronomía"),
+    ("Teatro", "Obras de teatro y dramaturgia"),
+    ("Economía", "Economía finanzas y negocios"),
+)
+PALABRAS_TITULO = (
+    ("El", "La", "Los", "Las", "Un", "Una"),
+    ("Jardín", "Sombra", "Ciudad", "Memoria", "Río", "Noche", "Casa", "Voz", "Mar", "Tiempo",
+     "Camino", "Silencio", "Viento", "Isla", "Espejo", "Laberinto", "Invierno", "Puerta", "Fuego", "Sueño"),
+    ("de", "del", "sin", "entre"),
+    ("los Espejos", "la Luna", "Otoño", "las Horas", "Piedra", "los Abuelos", "Arena", "la Lluvia",
+     "Nadie", "las Palabras", "Medianoche", "los Mapas", "Ceniza", "la Montaña", "Cristal", "Verano"),
+)
+CALLES = ("Calle", "Avenida", "Pasaje", "Camino", "Boulevard")
+NOMBRES_CALLES = ("Mayor", "Central", "Los Álamos", "San Martín", "Del Sol", "Las Flores", "Principal", "Belgrano", "Del Puerto", "Libertad")
+
+def _ascii(texto):
+    return unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode('ascii').lower()
+
+def generar_isbn(numero):
+    """
+    ISBN-13 válido y único para un número de libro
+    """
+    base = f"978{numero:09d}"
+    suma = sum(int(digito) * (3 if posicion % 2 else 1) for posicion, digito in enumerate(base))
+    return base + str((10 - suma % 10) % 10)
+
+def _pesos_acumulados(cantidad, exponente):
+    """
+    Pesos acumulados de Zipf para los rangos 1..cantidad
+    """
+    return list(accumulate(1.0 / rango ** exponente for rango in range(1, cantidad + 1)))
+
+def _sortear(aleatorio, ids, acumulados, cantidad):
+    """
+    Yields:
+        int: IDs sorteados según los pesos, de a bloques
+    """
+    while cantidad > 0:
+        bloque = min(cantidad, _TAMAÑO_SORTEO)
+        yield from aleatorio.choices(ids, cum_weights=acumulados, k=bloque)
+        cantidad -= bloque
+
+def generar_biblioteca(prestamos, libros=None, usuarios=None, semilla=SEMILLA,
+                       proporcion_atrasos=PROPORCION_ATRASOS, dias_historia=DIAS_HISTORIA, hoy=None):
+    """
+    Genera una biblioteca completa y reemplaza todas sus colecciones
+    Args:
+        prestamos (int): Cantidad de préstamos
+        libros (int): Cantidad de libros (por defecto, uno cada 10 préstamos)
+        usuarios (int): Cantidad de usuarios (por defecto, uno cada 20 préstamos)
+        semilla (int): Semilla del generador aleatorio
+        proporcion_atrasos (float): Proporción de préstamos devueltos (o por
+            devolver) después de la fecha esperada
+        dias_historia (int): Días hacia atrás en los que se reparten los préstamos
+        hoy (int or date): Día de referencia (por defecto, hoy)
+    Returns:
+        dict: Cantidad de registros por colección y segundos empleados
+    """
+    from modelos.prestamo import DIAS_PRESTAMO, MULTA_POR_DIA
+
+    inicio_generacion = time.perf_counter()
+    aleatorio = random.Random(semilla)
+    hoy = fechas.a_ordinal(hoy) if hoy is not None else fechas.hoy()
+    libros = libros or max(3, prestamos // 10)
+    usuarios = usuarios or max(2, prestamos // 20)
+    autores = max(3, libros // 10)
+
+    # Popularidad: el rango de Zipf de cada libro se asigna al azar para que
+    # los más pedidos no sean siempre los primeros IDs
+    ids_libros = list(range(1, libros + 1))
+    aleatorio.shuffle(ids_libros)
+    copias = array('i', [0]) * (libros + 1)
+    for rango, id_libro in enumerate(ids_libros, 1):
+        copias[id_libro] = max(1, min(10, round(12 / rango ** 0.25)))
+    ids_usuarios = list(range(1, usuarios + 1))
+    aleatorio.shuffle(ids_usuarios)
+    inactivos = set(aleatorio.sample(range(1, usuarios + 1), int(usuarios * PROPORCION_USUARIOS_INACTIVOS)))
+
+    prestados = array('i', [0]) * (libros + 1)
+    # Multas como tuplas (id_usuario, días de retraso, id_préstamo,
+    # fecha de generación, fecha de pago o None)
+    multas = []
+
+    def generar_prestamos():
+        sorteo_libros = _sortear(aleatorio, ids_libros, _pesos_acumulados(libros, EXPONENTE_ZIPF_LIBROS), prestamos)
+        sorteo_usuarios = _sortear(aleatorio, ids_usuarios, _pesos_acumulados(usuarios, EXPONENTE_ZIPF_USUARIOS), prestamos)
+        inicio = hoy - dias_historia
+        for numero, id_libro, id_usuario in zip(range(prestamos), sorteo_libros, sorteo_usuarios):
+            id_prestamo = numero + 1
+            fecha_prestamo = inicio + numero * dias_historia // prestamos
+            esperada = fecha_prestamo + DIAS_PRESTAMO
+            if aleatorio.random() < proporcion_atrasos:
+                devolucion = esperada + aleatorio.randint(1, 45)
+            else:
+                devolucion = fecha_prestamo + aleatorio.randint(1, DIAS_PRESTAMO)
+
+            multa_generada = False
+            if devolucion > hoy and prestados[id_libro] < copias[id_libro] and id_usuario not in inactivos:
+                prestados[id_libro] += 1
+                estado = 'vencido' if esperada < hoy and aleatorio.random() < 0.5 else 'activo'
+                devolucion = None
+            else:
+                # Sin copias libres hoy: se da por devuelto a más tardar hoy
+                devolucion = min(devolucion, hoy)
+                estado = 'devuelto'
+                if devolucion > esperada:
+                    multa_generada = True
+                    pagada = aleatorio.random() < (0.85 if hoy - devolucion > 7 else 0.3)
+                    fecha_pago = min(hoy, devolucion + aleatorio.randint(0, 20)) if pagada else None
+                    multas.append((id_usuario, devolucion - esperada, id_prestamo, devolucion, fecha_pago))
+
+            yield {
+                'id': id_prestamo,
+                'id_usuario': id_usuario,
+                'id_libro': id_libro,
+                'fecha_prestamo': fecha_prestamo,
+                'fecha_devolucion_esperada': esperada,
+                'fecha_devolucion_real': devolucion,
+                'estado': estado,
+                'multa_generada': multa_generada,
+            }
+
+    cantidades = {'prestamos': reemplazar_coleccion('prestamos', generar_prestamos())}
+
+    # Cuentas de multas por usuario (pendientes, monto pendiente, pagado)
+    pendientes = array('i', [0]) * (usuarios + 1)
+    monto_pendiente = array('d', [0.0]) * (usuarios + 1)
+    total_pagado = array('d', [0.0]) * (usuarios + 1)
+
+    def generar_multas():
+        for id_multa, (id_usuario, dias, id_prestamo, generacion, pago) in enumerate(multas, 1):
+            monto = round(dias * MULTA_POR_DIA, 2)
+            if pago is None:
+                pendientes[id_usuario] += 1
+                monto_pendiente[id_usuario] += monto
+            else:
+                total_pagado[id_usuario] += monto
+            yield {
+                'id': id_multa,
+                'id_usuario': id_usuario,
+                'monto': monto,
+                'concepto': f"Retraso de {dias} días en préstamo #{id_prestamo}",
+                'fecha_generacion': generacion,
+                'fecha_pago': pago,
+                'estado': 'pendiente' if pago is None else 'pagada',
+            }
+
+    cantidades['multas'] = reemplazar_coleccion('multas', generar_multas())
+    multas.clear()
+    cantidades['resumen_multas'] = reemplazar_coleccion('resumen_multas', [{
+        'id': 1,
+        'multas_pendientes': sum(pendientes),
+        'monto_pendiente': round(sum(monto_pendiente), 2),
+        'total_pagado': round(sum(total_pagado), 2),
+    }])
+
+    def generar_usuarios():
+        for id_usuario in range(1, usuarios + 1):
+            nombre = aleatorio.choice(NOMBRES)
+            apellido = aleatorio.choice(APELLIDOS)
+            yield {
+                'id': id_usuario,
+                'nombre': nombre,
+                'apellido': apellido,
+                'email': f"{_ascii(nombre)}.{_ascii(apellido)}{id_usuario}@correo.com",
+                'telefono': str(aleatorio.randint(10_000_000, 9_999_999_999)),
+                'direccion': f"{aleatorio.choice(CALLES)} {aleatorio.choice(NOMBRES_CALLES)}",
+                'activo': id_usuario not in inactivos,
+                'multas_pendientes': pendientes[id_usuario],
+                'monto_pendiente': round(monto_pendiente[id_usuario], 2),
+                'total_pagado': round(total_pagado[id_usuario], 2),
+            }
+
+    def generar_libros():
+        for id_libro in range(1, libros + 1):
+            titulo = " ".join(aleatorio.choice(palabras) for palabras in PALABRAS_TITULO)
+            yield {
+                'id': id_libro,
+                'titulo': titulo,
+                'isbn': generar_isbn(id_libro),
+                'id_autor': aleatorio.randint(1, autores),
+                'id_categoria': aleatorio.randint(1, len(CATEGORIAS)),
+                'año_publicacion': aleatorio.randint(1900, 2025),
+                'cantidad_copias': copias[id_libro],
+                'copias_disponibles': copias[id_libro] - prestados[id_libro],
+                'activo': True,
+            }
+
+    def generar_autores():
+        for id_autor in range(1, autores + 1):
+            yield {
+                'id': id_autor,
+                'nombre': aleatorio.choice(NOMBRES),
+                'apellido': aleatorio.choice(APELLIDOS),
+                'nacionalidad': aleatorio.choice(NACIONALIDADES),
+            }
+
+    cantidades['usuarios'] = reemplazar_coleccion('usuarios', generar_usuarios())
+    cantidades['libros'] = reemplazar_coleccion('libros', generar_libros())
+    cantidades['autores'] = reemplazar_coleccion('autores', generar_autores())
+    cantidades['categorias'] = reemplazar_coleccion('categorias', (
+        {'id': id_categoria, 'nombre': nombre, 'descripcion': descripcion}
+        for id_categoria, (nombre, descripcion) in enumerate(CATEGORIAS, 1)
+    ))
+
+    for nombre in ('prestamos', 'multas', 'usuarios', 'libros', 'autores', 'categorias'):
+        fijar_contador(nombre, cantidades[nombre] + 1)
+    busqueda.marcar_desactualizado()
+
+    cantidades['segundos'] = round(time.perf_counter() - inicio_generacion, 3)
+    return cantidades
+
+def main(argumentos=None):
+    """
+    Punto de entrada de la línea de comandos
+    Args:
+        argumentos (list): Argumentos (None para usar sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Genera una biblioteca sintética (reemplaza los datos actuales)")
+    parser.add_argument('--escala', choices=list(ESCALAS), default='1k')
+    parser.add_argument('--prestamos', type=int, help="Cantidad de préstamos (reemplaza la de la escala)")
+    parser.add_argument('--libros', type=int)
+    parser.add_argument('--usuarios', type=int)
+    parser.add_argument('--semilla', type=int, default=SEMILLA)
+    parser.add_argument('--atrasos', type=float, default=PROPORCION_ATRASOS, help="Proporción de préstamos con retraso")
+    opciones = parser.parse_args(argumentos)
+
+    tamaños = dict(ESCALAS[opciones.escala])
+    if opciones.prestamos:
+        tamaños = {'prestamos': opciones.prestamos, 'libros': None, 'usuarios': None}
+    tamaños['libros'] = opciones.libros or tamaños['libros']
+    tamaños['usuarios'] = opciones.usuarios or tamaños['usuarios']
+
+    print(f"Generando biblioteca ({tamaños['prestamos']} préstamos, semilla {opciones.semilla}) ...")
+    resumen = generar_biblioteca(semilla=opciones.semilla, proporcion_atrasos=opciones.atrasos, **tamaños)
+    for nombre, cantidad in resumen.items():
+        if nombre != 'segundos':
+            print(f"    {nombre}: {cantidad}")
+    print(f"    Tiempo: {resumen['segundos']:.1f} s")
+
+if __name__ == "__main__":
+    main()
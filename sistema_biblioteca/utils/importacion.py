@@ -0,0 +1,249 @@
+"""
+Módulo de importación masiva
+Carga libros, autores, categorías y usuarios desde archivos CSV o JSONL sin
+pedir datos por consola. El archivo se lee en bloques: cada bloque se valida
+con las mismas reglas que los formularios (utils.validaciones), recibe sus
+IDs con una sola reserva y se agrega a la colección sin cargarla completa
+(utils.manejo_archivos.agregar_registros). Para detectar ISBN repetidos se
+mantienen en memoria los ISBN del catálogo y los del archivo, no los libros.
+Las filas inválidas se copian a un archivo de rechazos con su número de
+línea y el motivo
+
+Uso:
+    python -m utils.importacion libros catalogo.csv
+    python -m utils.importacion usuarios socios.jsonl --bloque 2000
+"""
+
+import argparse
+import csv
+import json
+import os
+
+from utils import busqueda
+from utils.manejo_archivos import agregar_registros, recorrer_lotes, reservar_ids
+from utils.validaciones import (
+    comprobar_texto, comprobar_numero_entero, comprobar_email,
+    comprobar_telefono, comprobar_isbn
+)
+
+TAMAÑO_BLOQUE_IMPORTACION = int(os.environ.get("BIBLIOTECA_BLOQUE_IMPORTACION", 5000))
+
+# Colección -> (contador, campos, valores fijos de cada registro nuevo)
+# Cada campo es (nombre, función de comprobación, argumentos) con los mismos
+# límites que se piden en los formularios de alta
+COLECCIONES_IMPORTABLES = {
+    'libros': ('libros', [
+        ('titulo', comprobar_texto, (2, 100)),
+        ('isbn', comprobar_isbn, ()),
+        ('id_autor', comprobar_numero_entero, (1,)),
+        ('id_categoria', comprobar_numero_entero, (1,)),
+        ('año_publicacion', comprobar_numero_entero, (1500, 2026)),
+        ('cantidad_copias', comprobar_numero_entero, (1, 1000)),
+    ], {'activo': True}),
+    'autores': ('autores', [
+        ('nombre', comprobar_texto, (2, 50)),
+        ('apellido', comprobar_texto, (2, 50)),
+        ('nacionalidad', comprobar_texto, (2, 30)),
+    ], {}),
+    'categorias': ('categorias', [
+        ('nombre', comprobar_texto, (3, 50)),
+        ('descripcion', comprobar_texto, (5, 200)),
+    ], {}),
+    'usuarios': ('usuarios', [
+        ('nombre', comprobar_texto, (2, 50)),
+        ('apellido', comprobar_texto, (2, 50)),
+        ('email', comprobar_email, ()),
+        ('telefono', comprobar_telefono, ()),
+        ('direccion', comprobar_texto, (5, 100)),
+    ], {'activo': True, 'multas_pendientes': 0, 'monto_pendiente': 0.0, 'total_pagado': 0.0}),
+}
+
+def detectar_formato(ruta_archivo):
+    """
+    Deduce el formato de un archivo por su extensión
+    Args:
+        ruta_archivo (str): Ruta del archivo
+    Returns:
+        str: 'csv' o 'jsonl'
+    """
+    extension = os.path.splitext(ruta_archivo)[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson', '.json') else 'csv'
+
+def leer_filas(ruta_archivo, formato=None):
+    """
+    Lee un archivo de importación fila por fila
+    Args:
+        ruta_archivo (str): Ruta del archivo CSV (con encabezado) o JSONL
+        formato (str): 'csv' o 'jsonl' (None para deducirlo de la extensión)
+    Yields:
+        tuple: (número de línea, fila como dict o None si no se pudo leer,
+            texto del error de lectura o None)
+    """
+    formato = formato or detectar_formato(ruta_archivo)
+    # utf-8-sig acepta archivos exportados desde planillas con BOM
+    with open(ruta_archivo, 'r', encoding='utf-8-sig', newline='') as archivo:
+        if formato == 'csv':
+            lector = csv.DictReader(archivo)
+            for fila in lector:
+                yield lector.line_num, fila, None
+            return
+
+        for numero_linea, linea in enumerate(archivo, 1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                fila = json.loads(linea)
+            except ValueError:
+                yield numero_linea, None, "Línea JSON inválida."
+                continue
+            if not isinstance(fila, dict):
+                yield numero_linea, None, "La línea no es un objeto JSON."
+                continue
+            yield numero_linea, fila, None
+
+def convertir_fila(nombre_coleccion, fila):
+    """
+    Valida una fila y la convierte en un registro (todavía sin ID)
+    Args:
+        nombre_coleccion (str): Colección de destino
+        fila (dict): Valores leídos del archivo
+    Returns:
+        dict: Registro con los valores normalizados
+    Raises:
+        ValueError: Con el campo y el motivo del primer valor inválido
+    """
+    _, campos, fijos = COLECCIONES_IMPORTABLES[nombre_coleccion]
+    registro = {}
+    for campo, comprobar, argumentos in campos:
+        valor = fila.get(campo)
+        if valor is None or valor == "":
+            raise ValueError(f"{campo}: falta el valor.")
+        try:
+            registro[campo] = comprobar(valor, *argumentos)
+        except ValueError as e:
+            raise ValueError(f"{campo}: {e}") from None
+    if nombre_coleccion == 'libros':
+        registro['copias_disponibles'] = registro['cantidad_copias']
+    registro.update(fijos)
+    return registro
+
+def _isbns_registrados():
+    """
+    Returns:
+        dict: ISBN -> ID de cada libro ya guardado
+    """
+    return {libro['isbn']: libro['id'] for lote in recorrer_lotes('libros') for libro in lote if 'isbn' in libro}
+
+def _confirmar_bloque(nombre_coleccion, registros):
+    """
+    Asigna IDs con una sola reserva y actualiza el índice de búsqueda
+    Returns:
+        list: Registros con su ID, listos para guardar
+    """
+    nombre_contador = COLECCIONES_IMPORTABLES[nombre_coleccion][0]
+    ids = reservar_ids(nombre_contador, len(registros))
+    # El ID va primero, igual que en los registros creados por formulario
+    registros = [{'id': id_registro, **registro} for id_registro, registro in zip(ids, registros)]
+    if nombre_coleccion == 'libros':
+        busqueda.actualizar_libros(registros)
+    elif nombre_coleccion in ('autores', 'categorias'):
+        busqueda.marcar_desactualizado()
+    return registros
+
+def importar(nombre_coleccion, ruta_archivo, formato=None, ruta_rechazos=None, tamaño_bloque=None):
+    """
+    Importa un archivo CSV o JSONL completo a una colección
+    Args:
+        nombre_coleccion (str): 'libros', 'autores', 'categorias' o 'usuarios'
+        ruta_archivo (str): Ruta del archivo a importar
+        formato (str): 'csv' o 'jsonl' (None para deducirlo de la extensión)
+        ruta_rechazos (str): Archivo JSONL para las filas rechazadas
+            (por defecto <archivo>.rechazos.jsonl, solo si hay rechazos)
+        tamaño_bloque (int): Filas por bloque
+    Returns:
+        dict: Cantidad de filas leídas, importadas y rechazadas, y la ruta
+            del archivo de rechazos (None si no hubo)
+    """
+    if nombre_coleccion not in COLECCIONES_IMPORTABLES:
+        raise ValueError(f"No se puede importar la colección '{nombre_coleccion}'.")
+    tamaño_bloque = tamaño_bloque or TAMAÑO_BLOQUE_IMPORTACION
+    ruta_rechazos = ruta_rechazos or f"{ruta_archivo}.rechazos.jsonl"
+
+    resumen = {'leidas': 0, 'importadas': 0, 'rechazadas': 0, 'rechazos': None}
+    archivo_rechazos = None
+
+    def rechazar(numero_linea, fila, motivo):
+        nonlocal archivo_rechazos
+        if archivo_rechazos is None:
+            archivo_rechazos = open(ruta_rechazos, 'w', encoding='utf-8')
+            resumen['rechazos'] = ruta_rechazos
+        rechazo = {'linea': numero_linea, 'motivo': motivo, 'fila': fila}
+        archivo_rechazos.write(json.dumps(rechazo, ensure_ascii=False) + "\n")
+        resumen['rechazadas'] += 1
+
+    # ISBN ya guardados (-> ID) y leídos en el archivo (-> línea)
+    registrados = _isbns_registrados() if nombre_coleccion == 'libros' else {}
+    claves_vistas = {}
+
+    def bloques():
+        bloque = []
+        for numero_linea, fila, error in leer_filas(ruta_archivo, formato):
+            resumen['leidas'] += 1
+            if error is None:
+                try:
+                    registro = convertir_fila(nombre_coleccion, fila)
+                except ValueError as e:
+                    error = str(e)
+            if error is None and nombre_coleccion == 'libros':
+                if registro['isbn'] in registrados:
+                    error = f"isbn: ya está registrado en el libro con ID {registrados[registro['isbn']]}."
+                else:
+                    linea_anterior = claves_vistas.setdefault(registro['isbn'], numero_linea)
+                    if linea_anterior != numero_linea:
+                        error = f"isbn: repetido en la línea {linea_anterior}."
+            if error is not None:
+                rechazar(numero_linea, fila, error)
+                continue
+
+            bloque.append(registro)
+            if len(bloque) >= tamaño_bloque:
+                yield _confirmar_bloque(nombre_coleccion, bloque)
+                resumen['importadas'] += len(bloque)
+                bloque = []
+
+        if bloque:
+            yield _confirmar_bloque(nombre_coleccion, bloque)
+            resumen['importadas'] += len(bloque)
+
+    try:
+        agregar_registros(nombre_coleccion, bloques())
+    finally:
+        if archivo_rechazos is not None:
+            archivo_rechazos.close()
+    return resumen
+
+def main(argumentos=None):
+    """
+    Punto de entrada de la línea de comandos
+    Args:
+        argumentos (list): Argumentos (None para usar sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Importación masiva de datos de la biblioteca")
+    parser.add_argument('coleccion', choices=sorted(COLECCIONES_IMPORTABLES))
+    parser.add_argument('archivo', help="Archivo CSV (con encabezado) o JSONL")
+    parser.add_argument('--formato', choices=['csv', 'jsonl'])
+    parser.add_argument('--rechazos', help="Archivo JSONL para las filas rechazadas")
+    parser.add_argument('--bloque', type=int, default=TAMAÑO_BLOQUE_IMPORTACION, help="Filas por bloque")
+    opciones = parser.parse_args(argumentos)
+
+    print(f"Importando {opciones.archivo} en '{opciones.coleccion}' ...")
+    resumen = importar(opciones.coleccion, opciones.archivo, opciones.formato, opciones.rechazos, opciones.bloque)
+    print(f"    Filas leídas: {resumen['leidas']}")
+    print(f"    Importadas: {resumen['importadas']}")
+    print(f"    Rechazadas: {resumen['rechazadas']}")
+    if resumen['rechazos']:
+        print(f"    Detalle de rechazos: {resumen['rechazos']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Módulo de instrumentación
+Mide dónde se va el tiempo de las operaciones de almacenamiento y de los
+modelos, y cuántos bytes se leen y escriben en disco
+
+- BIBLIOTECA_METRICAS=1 activa la medición: cada función marcada con
+  @medido registra sus llamadas, errores y un histograma de latencias por
+  colección, y el almacenamiento suma los bytes leídos y escritos
+- BIBLIOTECA_PERFIL=cpu, memoria o cpu,memoria captura un perfil de todo el
+  proceso con cProfile y/o tracemalloc, que se guarda al terminar en la
+  carpeta BIBLIOTECA_PERFIL_CARPETA (por defecto, la carpeta actual)
+- BIBLIOTECA_METRICAS_SALIDA=ruta guarda las métricas al terminar el
+  proceso (formato Prometheus si la ruta termina en .prom, JSON si no)
+
+La activación se decide al importar: desactivada, @medido devuelve la
+misma función sin envolver y contar_bytes retorna en la primera línea
+
+Uso:
+    BIBLIOTECA_METRICAS=1 BIBLIOTECA_METRICAS_SALIDA=metricas.prom python main.py prestamo devolver --id 3
+    BIBLIOTECA_PERFIL=cpu,memoria python main.py
+"""
+
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+ACTIVA = os.environ.get("BIBLIOTECA_METRICAS", "").strip().lower() in ("1", "si", "true")
+PERFIL = tuple(modo.strip() for modo in os.environ.get("BIBLIOTECA_PERFIL", "").lower().split(",") if modo.strip())
+CARPETA_PERFIL = os.environ.get("BIBLIOTECA_PERFIL_CARPETA", ".")
+SALIDA_METRICAS = os.environ.get("BIBLIOTECA_METRICAS_SALIDA")
+
+# Límites superiores de los intervalos del histograma, en segundos
+LIMITES_HISTOGRAMA = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Bloques de memoria que se informan en el perfil de tracemalloc
+LINEAS_PERFIL_MEMORIA = 30
+
+_candado = threading.Lock()
+# (capa, operación, colección) -> [llamadas, errores, segundos, conteos por intervalo]
+_operaciones = {}
+# (colección, tipo de archivo) -> [bytes leídos, bytes escritos]
+_bytes = {}
+_perfilador = None
+
+def _registrar(clave, segundos, error):
+    with _candado:
+        operacion = _operaciones.get(clave)
+        if operacion is None:
+            operacion = _operaciones[clave] = [0, 0, 0.0, [0] * (len(LIMITES_HISTOGRAMA) + 1)]
+        operacion[0] += 1
+        operacion[1] += error
+        operacion[2] += segundos
+        operacion[3][bisect.bisect_left(LIMITES_HISTOGRAMA, segundos)] += 1
+
+def medido(capa):
+    """
+    Decorador que mide cada llamada de una función (si la medición está activa)
+    La colección se toma del primer argumento cuando es un nombre; en las
+    funciones generadoras se mide el recorrido completo
+    Args:
+        capa (str): 'almacenamiento', 'modelo', ...
+    Returns:
+        callable: Decorador
+    """
+    def decorador(funcion):
+        if not ACTIVA:
+            return funcion
+        import inspect
+        operacion = funcion.__name__
+
+        def clave(args):
+            return (capa, operacion, args[0] if args and isinstance(args[0], str) else "")
+
+        if inspect.isgeneratorfunction(funcion):
+            @functools.wraps(funcion)
+            def envoltura_generador(*args, **kwargs):
+                inicio = time.perf_counter()
+                error = 1
+                try:
+                    yield from funcion(*args, **kwargs)
+                    error = 0
+                finally:
+                    _registrar(clave(args), time.perf_counter() - inicio, error)
+            return envoltura_generador
+
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            error = 1
+            try:
+                resultado = funcion(*args, **kwargs)
+                error = 0
+                return resultado
+            finally:
+                _registrar(clave(args), time.perf_counter() - inicio, error)
+        return envoltura
+    return decorador
+
+def contar_bytes(coleccion, tipo, leidos=0, escritos=0):
+    """
+    Suma bytes leídos o escritos de disco
+    Args:
+        coleccion (str): Nombre de la colección
+        tipo (str): Archivo: 'instantanea', 'journal', 'indices', 'redo', ...
+        leidos (int): Bytes leídos
+        escritos (int): Bytes escritos
+    """
+    if not ACTIVA:
+        return
+    with _candado:
+        contadores = _bytes.setdefault((coleccion, tipo), [0, 0])
+        contadores[0] += leidos
+        contadores[1] += escritos
+
+def _percentil(conteos, total, punto):
+    """
+    Estima un percentil a partir del histograma (límite superior del intervalo)
+    """
+    objetivo = total * punto / 100
+    acumulado = 0
+    for limite, conteo in zip(LIMITES_HISTOGRAMA + (float('inf'),), conteos):
+        acumulado += conteo
+        if acumulado >= objetivo:
+            return limite
+    return float('inf')
+
+def obtener_metricas():
+    """
+    Copia de las métricas acumuladas
+    Returns:
+        dict: 'operaciones' (lista con capa, operación, colección, llamadas,
+            errores, tiempo total y medio, p50/p90/p99 estimados en ms y
+            conteos por intervalo) y 'bytes' (lista con colección, tipo,
+            bytes leídos y escritos)
+    """
+    with _candado:
+        operaciones = {clave: (valor[0], valor[1], valor[2], list(valor[3])) for clave, valor in _operaciones.items()}
+        contadores = {clave: list(valor) for clave, valor in _bytes.items()}
+    resultado = {'activa': ACTIVA, 'operaciones': [], 'bytes': []}
+    for (capa, operacion, coleccion), (llamadas, errores, segundos, conteos) in sorted(operaciones.items()):
+        fila = {
+            'capa': capa,
+            'operacion': operacion,
+            'coleccion': coleccion,
+            'llamadas': llamadas,
+            'errores': errores,
+            'segundos_total': round(segundos, 6),
+            'media_ms': round(segundos / llamadas * 1000, 4),
+        }
+        for punto in (50, 90, 99):
+            limite = _percentil(conteos, llamadas, punto)
+            fila[f"p{punto}_ms"] = round(limite * 1000, 4) if limite != float('inf') else None
+        fila['histograma'] = dict(zip([str(limite) for limite in LIMITES_HISTOGRAMA] + ['+Inf'], conteos))
+        resultado['operaciones'].append(fila)
+    for (coleccion, tipo), (leidos, escritos) in sorted(contadores.items()):
+        resultado['bytes'].append({'coleccion': coleccion, 'tipo': tipo, 'leidos': leidos, 'escritos': escritos})
+    return resultado
+
+def exportar_json():
+    """
+    Returns:
+        str: Métricas en JSON
+    """
+    return json.dumps(obtener_metricas(), ensure_ascii=False, indent=2)
+
+def _etiquetas(**valores):
+    """
+    Etiquetas de una muestra de Prometheus, con las comillas escapadas
+    """
+    texto = ",".join('{}="{}"'.format(nombre, str(valor).replace("\\", "\\\\").replace('"', '\\"'))
+                     for nombre, valor in valores.items())
+    return "{" + texto + "}"
+
+def exportar_prometheus():
+    """
+    Returns:
+        str: Métricas en el formato de texto de Prometheus
+    """
+    metricas = obtener_metricas()
+    lineas = [
+        "# HELP biblioteca_operacion_segundos Duración de las operaciones de almacenamiento y de los modelos",
+        "# TYPE biblioteca_operacion_segundos histogram",
+    ]
+    for fila in metricas['operaciones']:
+        etiquetas = {'capa': fila['capa'], 'operacion': fila['operacion'], 'coleccion': fila['coleccion']}
+        acumulado = 0
+        for limite, conteo in fila['histograma'].items():
+            acumulado += conteo
+            lineas.append(f"biblioteca_operacion_segundos_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}")
+        lineas.append(f"biblioteca_operacion_segundos_sum{_etiquetas(**etiquetas)} {fila['segundos_total']}")
+        lineas.append(f"biblioteca_operacion_segundos_count{_etiquetas(**etiquetas)} {fila['llamadas']}")
+    lineas += [
+        "# HELP biblioteca_operacion_errores_total Llamadas que terminaron con una excepción",
+        "# TYPE biblioteca_operacion_errores_total counter",
+    ]
+    for fila in metricas['operaciones']:
+        etiquetas = _etiquetas(capa=fila['capa'], operacion=fila['operacion'], coleccion=fila['coleccion'])
+        lineas.append(f"biblioteca_operacion_errores_total{etiquetas} {fila['errores']}")
+    lineas += [
+        "# HELP biblioteca_bytes_total Bytes leídos y escritos en disco",
+        "# TYPE biblioteca_bytes_total counter",
+    ]
+    for fila in metricas['bytes']:
+        for sentido in ('leidos', 'escritos'):
+            etiquetas = _etiquetas(coleccion=fila['coleccion'], tipo=fila['tipo'], sentido=sentido)
+            lineas.append(f"biblioteca_bytes_total{etiquetas} {fila[sentido]}")
+    return "\n".join(lineas) + "\n"
+
+def reiniciar():
+    """
+    Descarta las métricas acumuladas
+    """
+    with _candado:
+        _operaciones.clear()
+        _bytes.clear()
+
+def guardar_metricas(ruta):
+    """
+    Guarda las métricas en un archivo (Prometheus si termina en .prom, JSON si no)
+    Args:
+        ruta (str): Ruta del archivo
+    """
+    contenido = exportar_prometheus() if ruta.endswith(".prom") else exportar_json()
+    try:
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(contenido)
+    except OSError as e:
+        print(f"ERROR: No se pudieron guardar las métricas en {ruta}: {e}")
+
+def iniciar_perfil(modos=('cpu',)):
+    """
+    Empieza a capturar un perfil del proceso
+    Args:
+        modos (tuple): 'cpu' (cProfile) y/o 'memoria' (tracemalloc)
+    """
+    global _perfilador
+    if 'memoria' in modos:
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    if 'cpu' in modos and _perfilador is None:
+        import cProfile
+        _perfilador = cProfile.Profile()
+        _perfilador.enable()
+
+def detener_perfil(carpeta=None):
+    """
+    Termina la captura y guarda los perfiles
+    El de CPU se guarda en formato pstats (python -m pstats ARCHIVO) y el de
+    memoria como texto con las líneas que más memoria reservaron
+    Args:
+        carpeta (str): Carpeta de destino (por defecto, CARPETA_PERFIL)
+    Returns:
+        list: Rutas de los archivos guardados
+    """
+    global _perfilador
+    import tracemalloc
+
+    carpeta = carpeta or CARPETA_PERFIL
+    marca = f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+    rutas = []
+    try:
+        if _perfilador is not None:
+            _perfilador.disable()
+            ruta = os.path.join(carpeta, f"perfil_cpu_{marca}.pstats")
+            _perfilador.dump_stats(ruta)
+            _perfilador = None
+            rutas.append(ruta)
+        if tracemalloc.is_tracing():
+            instantanea = tracemalloc.take_snapshot()
+            actual, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            ruta = os.path.join(carpeta, f"perfil_memoria_{marca}.txt")
+            with open(ruta, 'w', encoding='utf-8') as archivo:
+                archivo.write(f"Memoria actual: {actual / 1024:.1f} KiB, pico: {pico / 1024:.1f} KiB\n\n")
+                for estadistica in instantanea.statistics('lineno')[:LINEAS_PERFIL_MEMORIA]:
+                    archivo.write(f"{estadistica}\n")
+            rutas.append(ruta)
+    except OSError as e:
+        print(f"ERROR: No se pudo guardar el perfil en {carpeta}: {e}")
+    return rutas
+
+def _al_terminar():
+    if PERFIL:
+        detener_perfil()
+    if ACTIVA and SALIDA_METRICAS:
+        guardar_metricas(SALIDA_METRICAS)
+
+if PERFIL:
+    iniciar_perfil(PERFIL)
+if PERFIL or (ACTIVA and SALIDA_METRICAS):
+    atexit.register(_al_terminar)
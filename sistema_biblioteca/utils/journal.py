@@ -0,0 +1,122 @@
+"""
+Módulo de journal de cambios
+En el modo de almacenamiento 'journal' cada guardado agrega una línea JSON
+compacta por registro modificado o eliminado, en lugar de reescribir la
+colección completa. Al cargar se reproduce el journal sobre la última
+instantánea (el archivo .json de siempre) y, al superar un umbral, el
+journal se compacta de nuevo en la instantánea
+"""
+
+import json
+import os
+
+# El journal se compacta cuando supera este tamaño y a la vez una fracción
+# del tamaño de la instantánea
+UMBRAL_COMPACTACION_BYTES = int(os.environ.get("BIBLIOTECA_JOURNAL_BYTES", 256 * 1024))
+FACTOR_COMPACTACION = 0.5
+
+def agregar_cambios(ruta_journal, eliminados, modificados):
+    """
+    Agrega al journal una línea por cada cambio en una sola escritura
+    Args:
+        ruta_journal (str): Ruta del archivo de journal
+        eliminados (list): IDs de registros eliminados
+        modificados (list): Registros agregados o modificados
+    Returns:
+        int: Cantidad de bytes escritos
+    """
+    lineas = [json.dumps({'op': 'del', 'id': id_registro}, separators=(',', ':')) for id_registro in eliminados]
+    lineas.extend(
+        json.dumps({'op': 'put', 'registro': registro}, ensure_ascii=False, separators=(',', ':'))
+        for registro in modificados
+    )
+    if not lineas:
+        return 0
+    contenido = ("\n".join(lineas) + "\n").encode('utf-8')
+
+    with open(ruta_journal, 'ab+') as archivo:
+        # Si una escritura anterior quedó a medias, se cierra esa línea para
+        # que no se mezcle con la siguiente
+        if archivo.tell() > 0:
+            archivo.seek(-1, os.SEEK_END)
+            if archivo.read(1) != b"\n":
+                contenido = b"\n" + contenido
+        archivo.write(contenido)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    return len(contenido)
+
+def leer_cambios(ruta_journal):
+    """
+    Lee los cambios registrados en el journal, en orden
+    Una última línea incompleta (escritura interrumpida) se ignora
+    Args:
+        ruta_journal (str): Ruta del archivo de journal
+    Yields:
+        tuple: ('put', registro) o ('del', ID del registro eliminado)
+    """
+    if not os.path.exists(ruta_journal):
+        return
+
+    with open(ruta_journal, 'r', encoding='utf-8') as archivo:
+        for numero_linea, linea in enumerate(archivo, 1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                cambio = json.loads(linea)
+            except ValueError:
+                print(f"ERROR: Línea {numero_linea} del journal {os.path.basename(ruta_journal)} dañada, se omite.")
+                continue
+            if cambio.get('op') == 'put':
+                yield 'put', cambio['registro']
+            elif cambio.get('op') == 'del':
+                yield 'del', cambio['id']
+
+def reproducir(ruta_journal, coleccion):
+    """
+    Aplica sobre la colección los cambios registrados en el journal
+    Args:
+        ruta_journal (str): Ruta del archivo de journal
+        coleccion (Coleccion): Colección cargada desde la instantánea
+    Returns:
+        int: Cantidad de cambios aplicados
+    """
+    aplicados = 0
+    for operacion, valor in leer_cambios(ruta_journal):
+        if operacion == 'put':
+            coleccion.aplicar_registro(valor)
+        else:
+            coleccion.aplicar_eliminacion(valor)
+        aplicados += 1
+    return aplicados
+
+def necesita_compactar(ruta_instantanea, ruta_journal):
+    """
+    Indica si el journal ya es lo bastante grande como para compactarlo
+    Args:
+        ruta_instantanea (str): Ruta del archivo JSON completo
+        ruta_journal (str): Ruta del archivo de journal
+    Returns:
+        bool: True si conviene compactar
+    """
+    try:
+        tamaño_journal = os.path.getsize(ruta_journal)
+    except OSError:
+        return False
+    try:
+        tamaño_instantanea = os.path.getsize(ruta_instantanea)
+    except OSError:
+        tamaño_instantanea = 0
+    return tamaño_journal > max(UMBRAL_COMPACTACION_BYTES, tamaño_instantanea * FACTOR_COMPACTACION)
+
+def descartar(ruta_journal):
+    """
+    Elimina el journal una vez que sus cambios están en la instantánea
+    Args:
+        ruta_journal (str): Ruta del archivo de journal
+    """
+    try:
+        os.remove(ruta_journal)
+    except FileNotFoundError:
+        pass
@@ -1,65 +1,1230 @@
 """
 Módulo de manejo de archivos
-Funciones para guardar y cargar datos en archivos JSON locales
+Funciones para guardar y cargar datos en archivos JSON locales o en SQLite
 """
 
+import atexit
 import json
 import os
+import pickle
+import signal
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import ExitStack
+from itertools import chain, dropwhile, islice
+
+from utils import bloqueos, cache, fechas, formatos, instrumentacion, journal, transacciones
+from utils import almacenamiento_sqlite
+from utils.coleccion import Coleccion
+from utils.coleccion_compacta import ColeccionCompacta, ESQUEMAS_COMPACTOS
+from utils.errores import ConflictoVersion, EscrituraRechazada
+from utils.instrumentacion import medido
 
 # Ruta de la carpeta de datos
 RUTA_DATOS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "datos")
 
+# Modos de almacenamiento disponibles (variable de entorno BIBLIOTECA_ALMACENAMIENTO)
+MODOS_ALMACENAMIENTO = {
+    'json': "JSON Local",
+    'journal': "JSON Local + Journal",
+    'sqlite': "SQLite",
+}
+MODO_ALMACENAMIENTO = os.environ.get("BIBLIOTECA_ALMACENAMIENTO", "json").strip().lower()
+if MODO_ALMACENAMIENTO not in MODOS_ALMACENAMIENTO:
+    print(f"ERROR: Modo de almacenamiento desconocido '{MODO_ALMACENAMIENTO}', se usa 'json'.")
+    MODO_ALMACENAMIENTO = 'json'
+
+# Tamaño máximo de los bloques de IDs que reserva cada proceso. Los bloques
+# empiezan en 1 y se duplican con cada reserva, así una sesión interactiva
+# desperdicia pocos IDs y una carga masiva escribe el contador pocas veces
+TAMAÑO_MAXIMO_BLOQUE_IDS = int(os.environ.get("BIBLIOTECA_BLOQUE_IDS", 1000))
+
+# nombre_contador -> [siguiente ID, límite (excluido), tamaño del último bloque]
+_bloques_ids = {}
+_candado_ids = threading.Lock()
+
+# Índices secundarios de cada colección (campo -> valor -> IDs). En los
+# modos JSON se guardan junto a la instantánea en <coleccion>.indices; en
+# SQLite los cubren los índices de las tablas
+INDICES_SECUNDARIOS = {
+    'libros': ('isbn',),
+    'prestamos': ('id_usuario', 'id_libro', 'estado'),
+    'multas': ('id_usuario', 'estado'),
+}
+
+# Índices ordenados por fecha (nombre -> (campo de fecha, (campo, valor) que
+# deben cumplir los registros indexados)). Se guardan en el mismo archivo
+# .indices; en SQLite los cubre un índice compuesto de la tabla
+INDICES_ORDENADOS = {
+    'prestamos': {'vencimiento_activos': ('fecha_devolucion_esperada', ('estado', 'activo'))},
+}
+
+def _calculo_ordenado(campo_fecha, filtro):
+    """
+    Función que calcula el valor de un registro en un índice ordenado
+    Returns:
+        callable: Registro -> número de día, o None si no cumple el filtro o
+            la fecha es inválida
+    """
+    campo_filtro, valor_filtro = filtro
+
+    def calcular(registro):
+        if registro.get(campo_filtro) != valor_filtro:
+            return None
+        try:
+            return fechas.a_ordinal(registro.get(campo_fecha))
+        except (AttributeError, ValueError):
+            return None
+    return calcular
+
+def _declarar_indices(nombre_archivo, coleccion, persistidos=None):
+    """
+    Declara en una colección sus índices secundarios y ordenados
+    Args:
+        persistidos (dict): Contenido del archivo .indices vigente (opcional)
+    """
+    persistidos = persistidos or {}
+    coleccion.indexar(INDICES_SECUNDARIOS.get(nombre_archivo, ()), persistidos.get('indices'))
+    ordenados = persistidos.get('ordenados') or {}
+    for nombre, (campo_fecha, filtro) in INDICES_ORDENADOS.get(nombre_archivo, {}).items():
+        coleccion.indexar_ordenado(nombre, _calculo_ordenado(campo_fecha, filtro), ordenados.get(nombre))
+
+# Colecciones que se guardan en memoria por columnas (ver
+# utils/coleccion_compacta); con BIBLIOTECA_LIBROS_COMPACTOS=1 los libros
+COLECCIONES_COMPACTAS = ('libros',) if os.environ.get("BIBLIOTECA_LIBROS_COMPACTOS") == "1" else ()
+
+# Formato de las instantáneas nuevas en los modos JSON (ver utils/formatos)
+# y colecciones que se crean comprimidas ('*': todas). Las existentes conservan el suyo
+# hasta que se conviertan (convertir_coleccion)
+FORMATO_INSTANTANEAS = os.environ.get("BIBLIOTECA_FORMATO", "json").strip().lower()
+COLECCIONES_COMPRIMIDAS = tuple(
+    nombre.strip() for nombre in os.environ.get("BIBLIOTECA_COMPRIMIR", "").split(",") if nombre.strip()
+)
+
+# Caché en disco de las instantáneas ya decodificadas (<coleccion>.cache, en
+# pickle): se usa mientras la instantánea conserve la firma (mtime, tamaño e
+# inodo) con que se creó. BIBLIOTECA_CACHE_INSTANTANEAS=0 la desactiva
+CACHE_INSTANTANEAS = os.environ.get("BIBLIOTECA_CACHE_INSTANTANEAS", "1").strip() != "0"
+VERSION_CACHE_INSTANTANEA = 1
+
+# Registros por lote al recorrer de a lotes la copia en caché o una tabla
+# de SQLite (en los modos JSON los lotes son los bloques decodificados)
+TAMAÑO_LOTE_RECORRIDO = 1000
+
+# Escritura diferida: con BIBLIOTECA_ESCRITURA_DIFERIDA=segundos los
+# guardados no escriben en disco, las colecciones quedan pendientes en
+# memoria y se escriben juntas al vencer esa ventana de durabilidad, al
+# acumular BIBLIOTECA_ESCRITURA_UMBRAL guardados, al salir del menú o del
+# proceso, o con forzar_escritura(). 0 (por defecto) escribe en cada guardado
+VENTANA_ESCRITURA_DIFERIDA = float(os.environ.get("BIBLIOTECA_ESCRITURA_DIFERIDA", 0) or 0)
+UMBRAL_ESCRITURA_DIFERIDA = int(os.environ.get("BIBLIOTECA_ESCRITURA_UMBRAL", 200))
+ESCRITURA_DIFERIDA = VENTANA_ESCRITURA_DIFERIDA > 0
+
+# Intentos de un volcado que choca con los guardados de otra terminal
+INTENTOS_VOLCADO = 3
+
+# nombre -> Coleccion pendiente de escribir y nombre -> sus cambios al
+# último guardado (con el formato del registro de rehacer)
+_pendientes = {}
+_sellados = {}
+# Operaciones (transacciones.Operacion) que produjeron los cambios
+# pendientes, en orden, y si hubo guardados fuera de una operación (no se
+# pueden repetir)
+_operaciones = []
+_guardados_sin_operacion = False
+_candado_pendientes = threading.RLock()
+_guardados_pendientes = 0
+_primer_guardado_pendiente = None
+_hilo_volcado = None
+_vigia = None
+_estadisticas_escritura = {
+    'guardados_diferidos': 0, 'volcados': 0, 'colecciones_escritas': 0,
+    'reaplicados': 0, 'operaciones_rechazadas': 0, 'conflictos': 0, 'errores': 0,
+}
+
+# Numeración de los registros de rehacer de este proceso
+_secuencia_redo = 0
+_candado_redo = threading.Lock()
+
 # Crear carpeta de datos si no existe
 if not os.path.exists(RUTA_DATOS):
     os.makedirs(RUTA_DATOS)
 
+def _ruta_coleccion(nombre_archivo):
+    return os.path.join(RUTA_DATOS, f"{nombre_archivo}.json")
+
+def _ruta_journal(nombre_archivo):
+    return os.path.join(RUTA_DATOS, f"{nombre_archivo}.journal.jsonl")
+
+def _ruta_indices(nombre_archivo):
+    return os.path.join(RUTA_DATOS, f"{nombre_archivo}.indices")
+
+def _ruta_cache_instantanea(nombre_archivo):
+    return os.path.join(RUTA_DATOS, f"{nombre_archivo}.cache")
+
+def _ruta_bloqueo(nombre_archivo):
+    return os.path.join(RUTA_DATOS, f".{nombre_archivo}.lock")
+
+def _leer_version(archivo_bloqueo):
+    """
+    Lee la versión de una colección guardada en su archivo de bloqueo
+    Cada confirmación incrementa la versión en uno
+    """
+    archivo_bloqueo.seek(0)
+    contenido = archivo_bloqueo.read().strip()
+    return int(contenido) if contenido else 0
+
+def _escribir_version(archivo_bloqueo, version):
+    archivo_bloqueo.seek(0)
+    archivo_bloqueo.truncate()
+    archivo_bloqueo.write(str(version).encode('ascii'))
+    archivo_bloqueo.flush()
+
+def _firma_coleccion(nombre_archivo):
+    """
+    Calcula la firma en disco de una colección según el modo de almacenamiento
+    Returns:
+        tuple or None: Firma para la caché o None si la colección no existe
+    """
+    if MODO_ALMACENAMIENTO == 'sqlite':
+        version = almacenamiento_sqlite.obtener_version(nombre_archivo)
+        if version is None:
+            return None
+        return ('sqlite', version[1] * almacenamiento_sqlite.TAMAÑO_ESTIMADO_REGISTRO, version[0])
+    firma = cache.obtener_firma(_ruta_coleccion(nombre_archivo))
+    if MODO_ALMACENAMIENTO == 'journal':
+        firma_journal = cache.obtener_firma(_ruta_journal(nombre_archivo))
+        if firma is None and firma_journal is None:
+            return None
+        # El tamaño total (posición 1) es el que cuenta para el límite de la caché
+        tamaño = (firma[1] if firma else 0) + (firma_journal[1] if firma_journal else 0)
+        return (firma, tamaño, firma_journal)
+    return firma
+
+def _formato_instantanea(nombre_archivo):
+    """
+    Formato en que se reescribe una instantánea: el del archivo actual (una
+    colección convertida sigue en su formato) o el configurado si no existe
+    Returns:
+        tuple: (formato, comprimir)
+    """
+    try:
+        with open(_ruta_coleccion(nombre_archivo), 'rb') as archivo:
+            encabezado, _ = formatos.leer_encabezado(archivo)
+        return encabezado['formato'], encabezado['zlib']
+    except (OSError, ValueError):
+        return FORMATO_INSTANTANEAS, nombre_archivo in COLECCIONES_COMPRIMIDAS or '*' in COLECCIONES_COMPRIMIDAS
+
+def _preparar_instantanea(nombre_archivo, coleccion, formato=None):
+    """
+    Escribe la colección completa en un archivo temporal forzado a disco
+    El temporal reemplaza luego al original, para que un corte a mitad de
+    escritura nunca deje el archivo truncado
+    Args:
+        formato (tuple): (formato, comprimir); por defecto, el de la instantánea actual
+    Returns:
+        str: Ruta del archivo temporal
+    """
+    formato, comprimir = formato or _formato_instantanea(nombre_archivo)
+    ruta_temporal = f"{_ruta_coleccion(nombre_archivo)}.{os.getpid()}.tmp"
+    with open(ruta_temporal, 'wb') as archivo:
+        formatos.escribir(archivo, coleccion.copy(), formato, comprimir)
+        instrumentacion.contar_bytes(nombre_archivo, 'instantanea', escritos=archivo.tell())
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    return ruta_temporal
+
+def _guardar_indices(nombre_archivo, coleccion):
+    """
+    Guarda los índices secundarios construidos junto a la instantánea
+    El archivo lleva la firma de la instantánea: si esta cambia sin que se
+    actualicen los índices (otra versión del programa, edición manual), al
+    cargar se descartan y se reconstruyen. No se fuerza a disco porque
+    siempre se puede reconstruir
+    """
+    ruta_indices = _ruta_indices(nombre_archivo)
+    indices = ordenados = None
+    if nombre_archivo in INDICES_SECUNDARIOS or nombre_archivo in INDICES_ORDENADOS:
+        _declarar_indices(nombre_archivo, coleccion)
+        indices = coleccion.exportar_indices()
+        ordenados = coleccion.exportar_ordenados()
+    if not indices and not ordenados:
+        if os.path.exists(ruta_indices):
+            os.remove(ruta_indices)
+        return
+    contenido = {
+        'instantanea': cache.obtener_firma(_ruta_coleccion(nombre_archivo)),
+        'indices': indices,
+        'ordenados': ordenados,
+    }
+    ruta_temporal = f"{ruta_indices}.{os.getpid()}.tmp"
+    try:
+        with open(ruta_temporal, 'w', encoding='utf-8') as archivo:
+            # json.dumps usa el codificador en C; json.dump escribe por partes
+            archivo.write(json.dumps(contenido, ensure_ascii=False, separators=(',', ':')))
+            instrumentacion.contar_bytes(nombre_archivo, 'indices', escritos=archivo.tell())
+        os.replace(ruta_temporal, ruta_indices)
+    except OSError as e:
+        print(f"ERROR: No se pudieron guardar los índices de {nombre_archivo}: {e}")
+
+def _leer_indices(nombre_archivo, firma_instantanea):
+    """
+    Lee los índices guardados si corresponden a la instantánea actual
+    Returns:
+        dict or None: 'indices' (campo -> lista de [valor, [IDs]]) y
+            'ordenados' (nombre -> lista de [valor, [IDs]])
+    """
+    try:
+        with open(_ruta_indices(nombre_archivo), 'r', encoding='utf-8') as archivo:
+            contenido = json.load(archivo)
+            instrumentacion.contar_bytes(nombre_archivo, 'indices', leidos=archivo.tell())
+    except (OSError, ValueError):
+        return None
+    if firma_instantanea is None or contenido.get('instantanea') != list(firma_instantanea):
+        return None
+    return contenido
+
+class _LectorCache(pickle.Unpickler):
+    """
+    Lector de la caché de instantáneas que solo acepta tipos básicos: un
+    archivo ajeno en la carpeta de datos no puede ejecutar código al leerse
+    """
+
+    def find_class(self, modulo, nombre):
+        raise pickle.UnpicklingError(f"Tipo no permitido en la caché: {modulo}.{nombre}")
+
+def _guardar_cache_instantanea(nombre_archivo, firma_instantanea, registros):
+    """
+    Guarda los registros de una instantánea ya decodificados
+    Como los índices, no se fuerza a disco: siempre se puede reconstruir
+    Args:
+        firma_instantanea (tuple): Firma de la instantánea de la que salen
+        registros (list): Diccionarios con tipos de JSON
+    """
+    ruta_cache = _ruta_cache_instantanea(nombre_archivo)
+    ruta_temporal = f"{ruta_cache}.{os.getpid()}.tmp"
+    try:
+        with open(ruta_temporal, 'wb') as archivo:
+            # La firma va aparte para descartar una caché vieja sin leerla completa
+            pickle.dump((VERSION_CACHE_INSTANTANEA, firma_instantanea), archivo, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(registros, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+            instrumentacion.contar_bytes(nombre_archivo, 'cache', escritos=archivo.tell())
+        os.replace(ruta_temporal, ruta_cache)
+    except (OSError, pickle.PicklingError) as e:
+        print(f"ERROR: No se pudo guardar la caché de {nombre_archivo}: {e}")
+
+def _leer_cache_instantanea(nombre_archivo, firma_instantanea):
+    """
+    Lee los registros de la caché si corresponde a la instantánea actual
+    Returns:
+        list or None: Registros o None si no hay caché vigente
+    """
+    try:
+        with open(_ruta_cache_instantanea(nombre_archivo), 'rb') as archivo:
+            # Un lector por cada pickle: cada uno lleva su propia memoria de objetos
+            if _LectorCache(archivo).load() != (VERSION_CACHE_INSTANTANEA, firma_instantanea):
+                return None
+            registros = _LectorCache(archivo).load()
+            instrumentacion.contar_bytes(nombre_archivo, 'cache', leidos=archivo.tell())
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        return None
+    return registros
+
+def estado_cache_instantanea(nombre_archivo):
+    """
+    Estado de la caché en disco de la instantánea de una colección
+    Returns:
+        str: 'vigente', 'desactualizada', 'ausente' o 'no aplica' (SQLite,
+            colecciones compactas, caché desactivada o colección sin instantánea)
+    """
+    firma_instantanea = cache.obtener_firma(_ruta_coleccion(nombre_archivo))
+    if (MODO_ALMACENAMIENTO == 'sqlite' or not CACHE_INSTANTANEAS
+            or nombre_archivo in COLECCIONES_COMPACTAS or firma_instantanea is None):
+        return 'no aplica'
+    try:
+        with open(_ruta_cache_instantanea(nombre_archivo), 'rb') as archivo:
+            vigente = _LectorCache(archivo).load() == (VERSION_CACHE_INSTANTANEA, firma_instantanea)
+    except FileNotFoundError:
+        return 'ausente'
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        vigente = False
+    return 'vigente' if vigente else 'desactualizada'
+
+def _escribir_colecciones(colecciones):
+    """
+    Escribe en disco los cambios de un grupo de colecciones
+    En modo JSON todas las instantáneas se escriben primero en temporales y
+    después se renombran juntas, con una sola sincronización del directorio
+    Args:
+        colecciones (dict): Nombre de la colección -> Coleccion
+    """
+    if MODO_ALMACENAMIENTO == 'sqlite':
+        almacenamiento_sqlite.guardar_varias(colecciones)
+        return
+
+    renombres = []
+    for nombre_archivo, coleccion in colecciones.items():
+        if MODO_ALMACENAMIENTO == 'journal' and not coleccion.reemplazo and not coleccion.tiene_claves_internas():
+            eliminados, modificados = coleccion.extraer_cambios()
+            escritos = journal.agregar_cambios(_ruta_journal(nombre_archivo), eliminados, modificados)
+            instrumentacion.contar_bytes(nombre_archivo, 'journal', escritos=escritos)
+            if not journal.necesita_compactar(_ruta_coleccion(nombre_archivo), _ruta_journal(nombre_archivo)):
+                continue
+        renombres.append((nombre_archivo, _preparar_instantanea(nombre_archivo, coleccion)))
+
+    for nombre_archivo, ruta_temporal in renombres:
+        os.replace(ruta_temporal, _ruta_coleccion(nombre_archivo))
+        # Si el proceso se corta antes de descartar el journal, al cargar se
+        # reproduce sobre la instantánea nueva y el resultado es el mismo
+        journal.descartar(_ruta_journal(nombre_archivo))
+    if renombres:
+        bloqueos.sincronizar_directorio(RUTA_DATOS)
+    for nombre_archivo, _ in renombres:
+        _guardar_indices(nombre_archivo, colecciones[nombre_archivo])
+        if CACHE_INSTANTANEAS and nombre_archivo not in COLECCIONES_COMPACTAS:
+            registros = [dict(registro) for registro in colecciones[nombre_archivo]]
+            _guardar_cache_instantanea(nombre_archivo, cache.obtener_firma(_ruta_coleccion(nombre_archivo)), registros)
+
+def _describir_cambios(nombre_archivo, coleccion):
+    """
+    Describe los cambios sin guardar de una colección
+    Returns:
+        dict: 'nombre', 'reemplazo' y 'registros' (colección completa) o
+            'eliminados' y 'modificados'
+    """
+    if coleccion.reemplazo or coleccion.tiene_claves_internas():
+        return {'nombre': nombre_archivo, 'reemplazo': True, 'registros': coleccion.copy()}
+    eliminados, modificados = coleccion.extraer_cambios()
+    return {'nombre': nombre_archivo, 'reemplazo': False, 'eliminados': eliminados, 'modificados': modificados}
+
+def _aplicar_cambios(cambio, base):
+    """
+    Aplica cambios descritos con _describir_cambios
+    Args:
+        cambio (dict): Cambios de una colección
+        base (callable): Recibe el nombre y devuelve la colección sobre la
+            que se aplican (no se llama si la colección se reemplaza)
+    Returns:
+        Coleccion: Colección con los cambios marcados como sin guardar
+    """
+    if cambio['reemplazo']:
+        return Coleccion(cambio['registros'], reemplazo=True)
+    coleccion = base(cambio['nombre'])
+    for id_eliminado in cambio['eliminados']:
+        coleccion.eliminar(id_eliminado)
+    for registro in cambio['modificados']:
+        coleccion.poner(registro)
+    return coleccion
+
+def _escribir_redo(colecciones):
+    """
+    Escribe de forma durable el registro de rehacer de una transacción
+    Returns:
+        str: Ruta del registro de rehacer
+    """
+    global _secuencia_redo
+    cambios = [_describir_cambios(nombre_archivo, coleccion) for nombre_archivo, coleccion in colecciones.items()]
+
+    with _candado_redo:
+        _secuencia_redo += 1
+        ruta_redo = os.path.join(RUTA_DATOS, f"transaccion_{os.getpid()}_{_secuencia_redo}.redo")
+    contenido = json.dumps({'colecciones': cambios}, ensure_ascii=False, separators=(',', ':'))
+    contenido = contenido.encode('utf-8')
+    bloqueos.escribir_durable(ruta_redo, contenido)
+    instrumentacion.contar_bytes(",".join(sorted(colecciones)), 'redo', escritos=len(contenido))
+    return ruta_redo
+
+@medido('almacenamiento')
+def guardar_colecciones(colecciones):
+    """
+    Guarda un grupo de colecciones como una sola unidad
+    Toma el bloqueo exclusivo de cada colección solo durante la escritura y
+    comprueba que nadie la haya guardado desde que se cargó (control de
+    versiones optimista). Con más de una colección en los modos JSON se
+    escribe antes un registro de rehacer: una vez escrito, la transacción se
+    considera confirmada y, si el proceso se corta, se completa en el próximo
+    inicio. En SQLite se usa una única transacción de la base de datos
+    Con la escritura diferida activa solo deja las colecciones pendientes
+    Args:
+        colecciones (dict): Nombre de la colección -> Coleccion
+    Raises:
+        ConflictoVersion: Si otra terminal guardó alguna de las colecciones
+    """
+    if not colecciones or _diferir(colecciones):
+        return
+    from utils import busqueda, conciliacion
+    try:
+        if MODO_ALMACENAMIENTO == 'sqlite':
+            conciliacion.anotar_cambios(colecciones)
+            almacenamiento_sqlite.guardar_varias(
+                colecciones, lambda versiones: busqueda.anotar_cambios(colecciones, versiones)
+            )
+            _confirmar_en_cache(colecciones)
+            return
+
+        with ExitStack() as pila:
+            # Orden fijo de bloqueo para que dos terminales no se esperen mutuamente
+            archivos_bloqueo = {
+                nombre_archivo: pila.enter_context(bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo)))
+                for nombre_archivo in sorted(colecciones)
+            }
+            versiones = {nombre_archivo: _leer_version(archivo) for nombre_archivo, archivo in archivos_bloqueo.items()}
+            conflictos = [
+                nombre_archivo for nombre_archivo, coleccion in colecciones.items()
+                if not coleccion.reemplazo and coleccion.version is not None and coleccion.version != versiones[nombre_archivo]
+            ]
+            if conflictos:
+                raise ConflictoVersion(f"Otra terminal modificó {', '.join(conflictos)}")
+
+            # Antes de escribir: si el proceso se corta, la marca ya está
+            conciliacion.anotar_cambios(colecciones)
+            busqueda.anotar_cambios(colecciones, {nombre: version + 1 for nombre, version in versiones.items()})
+
+            ruta_redo = None
+            if len(colecciones) > 1:
+                ruta_redo = _escribir_redo(colecciones)
+            _escribir_colecciones(colecciones)
+            for nombre_archivo, coleccion in colecciones.items():
+                _escribir_version(archivos_bloqueo[nombre_archivo], versiones[nombre_archivo] + 1)
+                coleccion.version = versiones[nombre_archivo] + 1
+            _confirmar_en_cache(colecciones)
+            if ruta_redo is not None:
+                os.remove(ruta_redo)
+                bloqueos.sincronizar_directorio(RUTA_DATOS)
+    except Exception:
+        # Los datos en memoria ya no coinciden con el disco
+        for nombre_archivo in colecciones:
+            cache.invalidar(nombre_archivo)
+        cache.descartar_modificadas()
+        raise
+
+def _confirmar_en_cache(colecciones):
+    for nombre_archivo, coleccion in colecciones.items():
+        coleccion.confirmar_cambios()
+        # Una lista común guardada llega sin índices declarados
+        _declarar_indices(nombre_archivo, coleccion)
+        # La colección guardada pasa a ser la copia vigente en memoria
+        cache.guardar(nombre_archivo, _firma_coleccion(nombre_archivo), coleccion)
+
+@medido('almacenamiento')
 def guardar_datos(nombre_archivo, lista_datos):
     """
     Guarda una lista de diccionarios en archivo JSON local
+    En modo 'journal' solo se agregan al journal los registros que cambiaron
+    desde el último guardado; una lista común reemplaza la colección completa.
+    Dentro de una transacción solo se registra la colección y se guarda al
+    confirmarla
     Args:
         nombre_archivo (str): Nombre del archivo (sin extensión)
-        lista_datos (list): Lista de diccionarios a guardar
+        lista_datos (list or Coleccion): Registros a guardar
+    Raises:
+        ConflictoVersion: Si otra terminal guardó la colección antes
     """
-    ruta_archivo = os.path.join(RUTA_DATOS, f"{nombre_archivo}.json")
+    activa = transacciones.transaccion_activa()
+    if activa is not None:
+        activa.preparar(nombre_archivo, lista_datos)
+        return
     try:
-        with open(ruta_archivo, 'w', encoding='utf-8') as archivo:
-            json.dump(lista_datos, archivo, ensure_ascii=False, indent=4)
+        if not isinstance(lista_datos, Coleccion):
+            lista_datos = Coleccion(lista_datos, reemplazo=True)
+        guardar_colecciones({nombre_archivo: lista_datos})
+    except ConflictoVersion:
+        raise
     except Exception as e:
         print(f"ERROR: Error al guardar datos en {nombre_archivo}: {e}")
 
+# --- Escritura diferida ---
+
+def _sellar(nombre_archivo, coleccion):
+    """
+    Copia los cambios sin guardar de una colección pendiente, para poder
+    rehacerla si una operación anulada o la escritura de otra terminal
+    invalidan la copia en memoria
+    """
+    cambio = _describir_cambios(nombre_archivo, coleccion)
+    if cambio['reemplazo']:
+        cambio['registros'] = [dict(registro) for registro in cambio['registros']]
+    else:
+        cambio['eliminados'] = set(cambio['eliminados'])
+        cambio['modificados'] = [dict(registro) for registro in cambio['modificados']]
+    return cambio
+
+def _retener_en_cache(nombre_archivo, coleccion):
+    firma = _firma_coleccion(nombre_archivo)
+    if firma is not None:
+        cache.guardar(nombre_archivo, firma, coleccion)
+
+def _diferir(colecciones):
+    """
+    Deja las colecciones pendientes en lugar de escribirlas, si la
+    escritura diferida está activa
+    Returns:
+        bool: True si quedaron pendientes
+    """
+    global _guardados_pendientes, _primer_guardado_pendiente, _guardados_sin_operacion
+    if not ESCRITURA_DIFERIDA or _hilo_volcado == threading.get_ident():
+        return False
+    with _candado_pendientes:
+        operacion = transacciones.operacion_actual()
+        if operacion is None:
+            _guardados_sin_operacion = True
+        elif not _operaciones or _operaciones[-1] is not operacion:
+            _operaciones.append(operacion)
+        for nombre_archivo, coleccion in colecciones.items():
+            _declarar_indices(nombre_archivo, coleccion)
+            _pendientes[nombre_archivo] = coleccion
+            _sellados[nombre_archivo] = _sellar(nombre_archivo, coleccion)
+            _retener_en_cache(nombre_archivo, coleccion)
+        _guardados_pendientes += 1
+        _estadisticas_escritura['guardados_diferidos'] += 1
+        if _primer_guardado_pendiente is None:
+            _primer_guardado_pendiente = time.monotonic()
+        _iniciar_vigia()
+        completo = _guardados_pendientes >= UMBRAL_ESCRITURA_DIFERIDA
+    if completo:
+        forzar_escritura()
+    return True
+
+def _reconstruir_pendiente(nombre_archivo):
+    """
+    Vuelve a armar una colección pendiente: los datos de disco más los
+    cambios de su último guardado
+    Conserva la versión de la carga original, así el volcado sigue
+    detectando los guardados de otras terminales posteriores a ella
+    """
+    anterior = _pendientes[nombre_archivo]
+    coleccion = _aplicar_cambios(_sellados[nombre_archivo], lambda nombre: _cargar_de_disco(nombre)[0])
+    _declarar_indices(nombre_archivo, coleccion)
+    coleccion.version = anterior.version
+    _pendientes[nombre_archivo] = coleccion
+    _retener_en_cache(nombre_archivo, coleccion)
+
+def restaurar_pendientes():
+    """
+    Devuelve las colecciones pendientes de la escritura diferida al estado
+    de su último guardado
+    Se usa al anular una operación: sus cambios en memoria no se escriben
+    """
+    if not _pendientes:
+        return
+    with _candado_pendientes:
+        for nombre_archivo, coleccion in list(_pendientes.items()):
+            if _sellar(nombre_archivo, coleccion) != _sellados[nombre_archivo]:
+                _reconstruir_pendiente(nombre_archivo)
+            else:
+                _retener_en_cache(nombre_archivo, coleccion)
+
+def _guardar_conflicto(operaciones, con_cambios=True):
+    """
+    Deja en la carpeta de datos lo que no se pudo escribir, para revisarlo
+    a mano: los cambios pendientes, con el formato del registro de rehacer,
+    y las operaciones con sus argumentos y los IDs que se informaron
+    Args:
+        operaciones (list): Operaciones descritas (ver Operacion.describir)
+        con_cambios (bool): Si se incluyen los cambios pendientes
+    Returns:
+        str: Ruta del archivo escrito
+    """
+    global _secuencia_redo
+    cambios = []
+    for cambio in (_sellados.values() if con_cambios else ()):
+        cambio = dict(cambio)
+        if not cambio['reemplazo']:
+            cambio['eliminados'] = sorted(cambio['eliminados'])
+        cambios.append(cambio)
+    with _candado_redo:
+        _secuencia_redo += 1
+        ruta_conflicto = os.path.join(RUTA_DATOS, f"escritura_diferida_{os.getpid()}_{_secuencia_redo}.conflicto")
+    contenido = json.dumps({'colecciones': cambios, 'operaciones': operaciones}, ensure_ascii=False, separators=(',', ':'), default=str)
+    bloqueos.escribir_durable(ruta_conflicto, contenido.encode('utf-8'))
+    return ruta_conflicto
+
+def _limpiar_pendientes():
+    global _guardados_pendientes, _primer_guardado_pendiente, _guardados_sin_operacion
+    _pendientes.clear()
+    _sellados.clear()
+    _operaciones.clear()
+    _guardados_sin_operacion = False
+    _guardados_pendientes = 0
+    _primer_guardado_pendiente = None
+
+def _rechazar_volcado(fallidas):
+    """
+    Descarta los cambios pendientes que no se pueden escribir por chocar con
+    los guardados de otra terminal y los deja en un archivo .conflicto
+    Args:
+        fallidas (list): Operaciones descritas que ya no se pudieron repetir
+            en intentos anteriores del volcado
+    Raises:
+        EscrituraRechazada: Siempre, con la ruta del archivo
+    """
+    colecciones = ', '.join(sorted(_pendientes))
+    ruta_conflicto = _guardar_conflicto([operacion.describir() for operacion in _operaciones] + fallidas)
+    _estadisticas_escritura['conflictos'] += 1
+    _limpiar_pendientes()
+    raise EscrituraRechazada(
+        f"Otra terminal modificó {colecciones} antes de escribir los cambios pendientes. "
+        f"No se escribieron; quedaron en {ruta_conflicto}",
+        ruta_conflicto,
+    )
+
+def _repetir_operaciones(operaciones):
+    """
+    Repite en orden operaciones cuyos cambios pendientes se descartaron,
+    sobre los datos actuales, con sus validaciones y con los mismos IDs
+    Args:
+        operaciones (list): Operaciones a repetir
+    Returns:
+        list: Operaciones descritas que ya no son válidas (por ejemplo, un
+            préstamo del último ejemplar que otra terminal ya prestó), cada
+            una con su error
+    """
+    fallidas = []
+    for operacion in operaciones:
+        try:
+            transacciones.repetir(operacion)
+        except Exception as e:
+            _estadisticas_escritura['operaciones_rechazadas'] += 1
+            fallidas.append(dict(operacion.describir(), error=str(e)))
+    return fallidas
+
+def _rechazar_operaciones(fallidas):
+    """
+    Deja en un archivo .conflicto las operaciones que no se pudieron repetir
+    Args:
+        fallidas (list): Operaciones descritas, cada una con su error
+    Raises:
+        EscrituraRechazada: Siempre, con la ruta del archivo
+    """
+    ruta_conflicto = _guardar_conflicto(fallidas, con_cambios=False)
+    detalle = "; ".join(f"{operacion['funcion']}: {operacion['error']}" for operacion in fallidas)
+    raise EscrituraRechazada(
+        f"No se pudieron repetir sobre los datos de otra terminal ({detalle}). "
+        f"No se escribieron; quedaron en {ruta_conflicto}",
+        ruta_conflicto,
+    )
+
+@medido('almacenamiento')
+def forzar_escritura():
+    """
+    Escribe en disco las colecciones pendientes de la escritura diferida,
+    juntas como en una transacción
+    Espera a que terminen las operaciones en curso de los demás hilos.
+    Dentro de una operación la escritura se hace cuando esta termina. Si
+    otra terminal guardó las mismas colecciones, los cambios pendientes se
+    descartan y las operaciones que los produjeron se repiten sobre los
+    datos actuales con los mismos IDs (sus guardados vuelven a quedar
+    pendientes y se escriben en el intento siguiente)
+    Returns:
+        bool: True si no quedaron cambios pendientes
+    Raises:
+        EscrituraRechazada: Si algún cambio no vino de una operación, se
+            agotan los intentos o una operación ya no se puede repetir; lo
+            que no se escribió queda en un archivo .conflicto de la carpeta
+            de datos
+    """
+    global _hilo_volcado
+    fallidas = []
+    for intento in range(INTENTOS_VOLCADO):
+        if not _pendientes:
+            break
+        if transacciones.operacion_en_curso():
+            transacciones.volcar_al_terminar()
+            break
+        with transacciones.sin_operaciones(), _candado_pendientes:
+            if not _pendientes:
+                break
+            _hilo_volcado = threading.get_ident()
+            try:
+                guardar_colecciones(dict(_pendientes))
+            except ConflictoVersion:
+                # guardar_colecciones ya descartó de la caché las colecciones pendientes
+                if _guardados_sin_operacion or intento == INTENTOS_VOLCADO - 1:
+                    _rechazar_volcado(fallidas)
+                operaciones = list(_operaciones)
+                _limpiar_pendientes()
+                _estadisticas_escritura['reaplicados'] += 1
+            except Exception as e:
+                _estadisticas_escritura['errores'] += 1
+                print(f"ERROR: No se pudieron escribir los cambios pendientes ({', '.join(_pendientes)}): {e}")
+                break
+            else:
+                _estadisticas_escritura['volcados'] += 1
+                _estadisticas_escritura['colecciones_escritas'] += len(_pendientes)
+                _limpiar_pendientes()
+                break
+            finally:
+                _hilo_volcado = None
+        # Fuera del bloqueo: las operaciones repetidas se ejecutan como
+        # cualquier otra y sus guardados vuelven a quedar pendientes
+        fallidas.extend(_repetir_operaciones(operaciones))
+    if fallidas:
+        _rechazar_operaciones(fallidas)
+    return not _pendientes
+
+def _volcar_al_salir():
+    """
+    Escribe los pendientes al terminar el proceso, informando lo rechazado
+    """
+    try:
+        forzar_escritura()
+    except EscrituraRechazada as e:
+        print(f"ERROR: {e}")
+
+def _vigilar():
+    """
+    Hilo que escribe los pendientes cuando vence la ventana de durabilidad
+    """
+    while True:
+        primero = _primer_guardado_pendiente
+        restante = VENTANA_ESCRITURA_DIFERIDA if primero is None else primero + VENTANA_ESCRITURA_DIFERIDA - time.monotonic()
+        if restante > 0:
+            time.sleep(restante)
+            continue
+        try:
+            escrito = forzar_escritura()
+        except EscrituraRechazada as e:
+            print(f"ERROR: {e}")
+            continue
+        if not escrito:
+            # Error de escritura: se reintenta en la próxima ventana
+            time.sleep(VENTANA_ESCRITURA_DIFERIDA)
+
+def _iniciar_vigia():
+    global _vigia
+    if _vigia is None:
+        _vigia = threading.Thread(target=_vigilar, name="escritura-diferida", daemon=True)
+        _vigia.start()
+
+def obtener_estadisticas_escritura():
+    """
+    Retorna el estado de la escritura diferida
+    Returns:
+        dict: Configuración, colecciones y guardados pendientes, y totales
+            de guardados diferidos, volcados, colecciones escritas,
+            volcados rehechos sobre datos de otra terminal, operaciones
+            que no se pudieron repetir, volcados rechazados y errores
+    """
+    with _candado_pendientes:
+        estadisticas = {
+            'activa': ESCRITURA_DIFERIDA,
+            'ventana_segundos': VENTANA_ESCRITURA_DIFERIDA,
+            'umbral': UMBRAL_ESCRITURA_DIFERIDA,
+            'pendientes': sorted(_pendientes),
+            'guardados_pendientes': _guardados_pendientes,
+        }
+        estadisticas.update(_estadisticas_escritura)
+    return estadisticas
+
+def _terminar_por_senal(numero, marco):
+    # SystemExit en lugar de la terminación inmediata: así corre atexit
+    raise SystemExit(128 + numero)
+
+if ESCRITURA_DIFERIDA:
+    atexit.register(_volcar_al_salir)
+    if threading.current_thread() is threading.main_thread():
+        for nombre_senal in ('SIGTERM', 'SIGHUP'):
+            numero_senal = getattr(signal, nombre_senal, None)
+            if numero_senal is not None and signal.getsignal(numero_senal) == signal.SIG_DFL:
+                signal.signal(numero_senal, _terminar_por_senal)
+
+@medido('almacenamiento')
+def recuperar_transacciones():
+    """
+    Completa las transacciones que quedaron a medias por un corte
+    Aplica cada registro de rehacer pendiente sobre los datos en disco;
+    como reaplicar los mismos cambios da el mismo resultado, es seguro
+    aunque parte de la transacción ya se hubiera escrito
+    Returns:
+        int: Cantidad de transacciones recuperadas
+    """
+    rutas = sorted(
+        (os.path.join(RUTA_DATOS, archivo) for archivo in os.listdir(RUTA_DATOS) if archivo.endswith(".redo")),
+        key=os.path.getmtime,
+    )
+    recuperadas = 0
+    for ruta_redo in rutas:
+        try:
+            with open(ruta_redo, 'r', encoding='utf-8') as archivo:
+                cambios = json.load(archivo)['colecciones']
+        except FileNotFoundError:
+            # Otra terminal terminó de confirmarla o ya la recuperó
+            continue
+
+        with ExitStack() as pila:
+            archivos_bloqueo = {
+                nombre_archivo: pila.enter_context(bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo)))
+                for nombre_archivo in sorted(cambio['nombre'] for cambio in cambios)
+            }
+            if not os.path.exists(ruta_redo):
+                continue
+
+            colecciones = {cambio['nombre']: _aplicar_cambios(cambio, _leer_coleccion) for cambio in cambios}
+
+            _escribir_colecciones(colecciones)
+            for nombre_archivo, coleccion in colecciones.items():
+                archivo = archivos_bloqueo[nombre_archivo]
+                _escribir_version(archivo, _leer_version(archivo) + 1)
+                cache.invalidar(nombre_archivo)
+            os.remove(ruta_redo)
+            bloqueos.sincronizar_directorio(RUTA_DATOS)
+            recuperadas += 1
+            print(f"Transacción pendiente recuperada: {os.path.basename(ruta_redo)}")
+    return recuperadas
+
+def _nueva_coleccion(nombre_archivo, registros=()):
+    """
+    Crea la colección en memoria que corresponde a un archivo
+    """
+    if nombre_archivo in COLECCIONES_COMPACTAS:
+        return ColeccionCompacta(registros, esquema=ESQUEMAS_COMPACTOS[nombre_archivo])
+    return Coleccion(registros)
+
+def _leer_coleccion(nombre_archivo):
+    """
+    Lee una colección de disco en los modos JSON, sin la caché en memoria ni bloqueos
+    La instantánea se toma de la caché en disco si está vigente. En modo
+    'journal' reproduce el journal sobre la instantánea
+    """
+    ruta_archivo = _ruta_coleccion(nombre_archivo)
+    firma_instantanea = cache.obtener_firma(ruta_archivo)
+    leidos_instantanea = firma_instantanea[1] if firma_instantanea else 0
+    if firma_instantanea is None:
+        datos = _nueva_coleccion(nombre_archivo)
+    elif nombre_archivo in COLECCIONES_COMPACTAS:
+        # Se decodifica de a un registro para no tener la lista completa
+        # de diccionarios en memoria junto a las columnas
+        with open(ruta_archivo, 'rb') as archivo:
+            datos = _nueva_coleccion(nombre_archivo, (registro for _, registro in formatos.iterar(archivo)))
+    else:
+        registros = _leer_cache_instantanea(nombre_archivo, firma_instantanea) if CACHE_INSTANTANEAS else None
+        if registros is None:
+            with open(ruta_archivo, 'rb') as archivo:
+                registros = formatos.leer(archivo)
+            if CACHE_INSTANTANEAS:
+                _guardar_cache_instantanea(nombre_archivo, firma_instantanea, registros)
+        else:
+            leidos_instantanea = 0
+        datos = Coleccion(registros)
+    if nombre_archivo in INDICES_SECUNDARIOS or nombre_archivo in INDICES_ORDENADOS:
+        # Los índices se declaran antes de reproducir el journal para que
+        # cada cambio reproducido los actualice
+        _declarar_indices(nombre_archivo, datos, _leer_indices(nombre_archivo, firma_instantanea))
+    if MODO_ALMACENAMIENTO == 'journal':
+        journal.reproducir(_ruta_journal(nombre_archivo), datos)
+    if instrumentacion.ACTIVA:
+        instrumentacion.contar_bytes(nombre_archivo, 'instantanea', leidos=leidos_instantanea)
+        firma_journal = cache.obtener_firma(_ruta_journal(nombre_archivo)) if MODO_ALMACENAMIENTO == 'journal' else None
+        if firma_journal is not None:
+            instrumentacion.contar_bytes(nombre_archivo, 'journal', leidos=firma_journal[1])
+    return datos
+
+def _sin_escribir(nombre_archivo):
+    """
+    Colección que la transacción abierta ya preparó para guardar, o que
+    espera la escritura diferida, o None
+    Cada operación debe ver los cambios de las anteriores aunque la
+    colección todavía no exista en disco (sin firma no queda en la caché)
+    """
+    activa = transacciones.transaccion_activa()
+    preparada = activa.colecciones.get(nombre_archivo) if activa is not None else None
+    return preparada if preparada is not None else _pendientes.get(nombre_archivo)
+
+def _cargar_de_disco(nombre_archivo):
+    """
+    Lee una colección del almacenamiento, sin pasar por la caché
+    Returns:
+        tuple: (Coleccion, firma de lo leído o None si no existe)
+    """
+    if MODO_ALMACENAMIENTO == 'sqlite':
+        datos = almacenamiento_sqlite.cargar(nombre_archivo, lambda registros: _nueva_coleccion(nombre_archivo, registros))
+        _declarar_indices(nombre_archivo, datos)
+        return datos, _firma_coleccion(nombre_archivo)
+    with bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo), exclusivo=False) as archivo_bloqueo:
+        version = _leer_version(archivo_bloqueo)
+        firma = _firma_coleccion(nombre_archivo)
+        datos = _leer_coleccion(nombre_archivo)
+    datos.version = version
+    return datos, firma
+
+def obtener_version(nombre_archivo):
+    """
+    Obtiene la versión confirmada de una colección (cambia con cada guardado)
+    Si la transacción abierta o la escritura diferida tienen la colección
+    preparada, es la versión sobre la que se hicieron esos cambios
+    Args:
+        nombre_archivo (str): Nombre de la colección
+    Returns:
+        int: Versión (0 si la colección nunca se guardó)
+    """
+    preparada = _sin_escribir(nombre_archivo)
+    if preparada is not None:
+        return preparada.version or 0
+    if MODO_ALMACENAMIENTO == 'sqlite':
+        version = almacenamiento_sqlite.obtener_version(nombre_archivo)
+        return version[0] if version else 0
+    with bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo), exclusivo=False) as archivo_bloqueo:
+        return _leer_version(archivo_bloqueo)
+
+@medido('almacenamiento')
 def cargar_datos(nombre_archivo):
     """
     Carga datos desde archivo JSON local
+    La colección se mantiene en caché y solo se vuelve a leer si el archivo
+    cambió en disco (mtime, tamaño o inodo distintos). La lectura se hace
+    con un bloqueo compartido: varias terminales pueden leer a la vez y
+    ninguna ve una confirmación a medias
     Args:
         nombre_archivo (str): Nombre del archivo (sin extensión)
     Returns:
-        list: Lista de diccionarios con los datos
+        Coleccion: Registros indexados por ID (compartidos con la caché)
     """
-    ruta_archivo = os.path.join(RUTA_DATOS, f"{nombre_archivo}.json")
+    preparada = _sin_escribir(nombre_archivo)
+    if preparada is not None:
+        return preparada
     try:
-        if os.path.exists(ruta_archivo):
-            with open(ruta_archivo, 'r', encoding='utf-8') as archivo:
-                return json.load(archivo)
-        else:
-            return []
+        firma = _firma_coleccion(nombre_archivo)
+        if firma is not None:
+            datos = cache.obtener(nombre_archivo, firma)
+            if datos is not None:
+                return datos
+
+        datos, firma = _cargar_de_disco(nombre_archivo)
+        if firma is not None:
+            cache.guardar(nombre_archivo, firma, datos)
+        return datos
     except Exception as e:
         print(f"ERROR: Error al cargar datos desde {nombre_archivo}: {e}")
-        return []
+        return Coleccion()
+
+@medido('almacenamiento')
+def compactar_coleccion(nombre_archivo):
+    """
+    Compacta manualmente el journal de una colección en su instantánea
+    Args:
+        nombre_archivo (str): Nombre del archivo (sin extensión)
+    Returns:
+        bool: True si había journal y se compactó
+    """
+    forzar_escritura()
+    if not os.path.exists(_ruta_journal(nombre_archivo)):
+        return False
+    try:
+        with bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo)) as archivo_bloqueo:
+            # Se relee bajo el bloqueo para incluir lo que otras terminales agregaron
+            coleccion = _leer_coleccion(nombre_archivo)
+            coleccion.version = _leer_version(archivo_bloqueo)
+            os.replace(_preparar_instantanea(nombre_archivo, coleccion), _ruta_coleccion(nombre_archivo))
+            journal.descartar(_ruta_journal(nombre_archivo))
+            bloqueos.sincronizar_directorio(RUTA_DATOS)
+            _guardar_indices(nombre_archivo, coleccion)
+            cache.guardar(nombre_archivo, _firma_coleccion(nombre_archivo), coleccion)
+        return True
+    except Exception as e:
+        cache.invalidar(nombre_archivo)
+        print(f"ERROR: Error al compactar {nombre_archivo}: {e}")
+        return False
 
+def listar_colecciones():
+    """
+    Colecciones con datos guardados
+    Returns:
+        list: Nombres de las colecciones, en orden alfabético
+    """
+    if MODO_ALMACENAMIENTO == 'sqlite':
+        return almacenamiento_sqlite.listar()
+    return sorted(
+        archivo[:-len(".json")] for archivo in os.listdir(RUTA_DATOS)
+        if archivo.endswith(".json") and not archivo.startswith("contador_")
+    )
+
+@medido('almacenamiento')
+def convertir_coleccion(nombre_archivo, formato=None, comprimir=None):
+    """
+    Reescribe la instantánea de una colección en otro formato
+    Incluye los cambios del journal; las demás terminales leen el formato
+    nuevo sin configuración. En SQLite no hay instantáneas que convertir
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        formato (str): Uno de formatos.FORMATOS (None: el actual)
+        comprimir (bool): True para comprimir con zlib (None: como está)
+    Returns:
+        tuple: (bytes antes, bytes después), con None si no se convirtió
+    """
+    forzar_escritura()
+    if MODO_ALMACENAMIENTO == 'sqlite':
+        print(f"ERROR: En modo sqlite no hay archivos de {nombre_archivo} para convertir")
+        return None, None
+    formato_actual, comprimida = _formato_instantanea(nombre_archivo)
+    formato = formato or formato_actual
+    comprimir = comprimida if comprimir is None else comprimir
+    if formato not in formatos.FORMATOS:
+        print(f"ERROR: Formato desconocido: {formato}")
+        return None, None
+    ruta_archivo = _ruta_coleccion(nombre_archivo)
+    if not os.path.exists(ruta_archivo) and not os.path.exists(_ruta_journal(nombre_archivo)):
+        print(f"ERROR: La colección {nombre_archivo} no tiene datos")
+        return None, None
+    try:
+        with bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo)) as archivo_bloqueo:
+            antes = sum(os.path.getsize(ruta) for ruta in (ruta_archivo, _ruta_journal(nombre_archivo)) if os.path.exists(ruta))
+            coleccion = _leer_coleccion(nombre_archivo)
+            coleccion.version = _leer_version(archivo_bloqueo)
+            os.replace(_preparar_instantanea(nombre_archivo, coleccion, (formato, comprimir)), ruta_archivo)
+            journal.descartar(_ruta_journal(nombre_archivo))
+            bloqueos.sincronizar_directorio(RUTA_DATOS)
+            _guardar_indices(nombre_archivo, coleccion)
+            cache.guardar(nombre_archivo, _firma_coleccion(nombre_archivo), coleccion)
+        return antes, os.path.getsize(ruta_archivo)
+    except Exception as e:
+        cache.invalidar(nombre_archivo)
+        print(f"ERROR: Error al convertir {nombre_archivo}: {e}")
+        return None, None
+
+@medido('almacenamiento')
+def reemplazar_coleccion(nombre_archivo, registros):
+    """
+    Reemplaza una colección completa escribiendo los registros a medida que
+    llegan, sin armarla en memoria (cargas masivas y datos generados)
+    No participa de las transacciones ni anota marcas de conciliación: quien
+    la usa entrega datos ya consistentes. Sí marca para el índice de
+    búsqueda que la colección cambió completa
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        registros (iterable): Registros completos, con su ID
+    Returns:
+        int: Cantidad de registros escritos
+    """
+    from utils import busqueda
+
+    forzar_escritura()
+    cache.invalidar(nombre_archivo)
+    if MODO_ALMACENAMIENTO == 'sqlite':
+        return almacenamiento_sqlite.reemplazar(
+            nombre_archivo, registros, lambda version: busqueda.anotar(nombre_archivo, version, None)
+        )
+
+    ruta_archivo = _ruta_coleccion(nombre_archivo)
+    with bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo)) as archivo_bloqueo:
+        ruta_temporal = f"{ruta_archivo}.{os.getpid()}.tmp"
+        with open(ruta_temporal, 'wb') as archivo:
+            cantidad = formatos.escribir(archivo, registros, *_formato_instantanea(nombre_archivo))
+            instrumentacion.contar_bytes(nombre_archivo, 'instantanea', escritos=archivo.tell())
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        busqueda.anotar(nombre_archivo, _leer_version(archivo_bloqueo) + 1, None)
+        os.replace(ruta_temporal, ruta_archivo)
+        journal.descartar(_ruta_journal(nombre_archivo))
+        for ruta_derivada in (_ruta_indices(nombre_archivo), _ruta_cache_instantanea(nombre_archivo)):
+            if os.path.exists(ruta_derivada):
+                os.remove(ruta_derivada)
+        bloqueos.sincronizar_directorio(RUTA_DATOS)
+        # Las terminales con la colección cargada verán un conflicto de versión
+        _escribir_version(archivo_bloqueo, _leer_version(archivo_bloqueo) + 1)
+    cache.invalidar(nombre_archivo)
+    return cantidad
+
+def agregar_registros(nombre_archivo, bloques):
+    """
+    Agrega bloques de registros nuevos a una colección sin cargarla en memoria
+    (importaciones masivas)
+    En modo 'journal' cada bloque se agrega al journal y en SQLite se inserta
+    en su propia transacción. En modo JSON la instantánea se reescribe una
+    sola vez al final: los registros existentes se copian a medida que se
+    leen y después se escriben los bloques, todo bajo el bloqueo exclusivo
+    Como reemplazar_coleccion, no anota marcas de conciliación (sí las del
+    índice de búsqueda, con los IDs agregados)
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        bloques (iterable): Listas de registros completos, con su ID
+    Returns:
+        int: Cantidad de registros agregados
+    """
+    from utils import busqueda
+
+    forzar_escritura()
+    cache.invalidar(nombre_archivo)
+    cantidad = 0
+    try:
+        if MODO_ALMACENAMIENTO == 'sqlite':
+            for bloque in bloques:
+                ids = [registro['id'] for registro in bloque]
+                almacenamiento_sqlite.agregar(
+                    nombre_archivo, bloque, lambda version: busqueda.anotar(nombre_archivo, version, ids)
+                )
+                cantidad += len(bloque)
+            return cantidad
+
+        if MODO_ALMACENAMIENTO == 'journal':
+            for bloque in bloques:
+                with bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo)) as archivo_bloqueo:
+                    version = _leer_version(archivo_bloqueo) + 1
+                    busqueda.anotar(nombre_archivo, version, [registro['id'] for registro in bloque])
+                    escritos = journal.agregar_cambios(_ruta_journal(nombre_archivo), [], bloque)
+                    instrumentacion.contar_bytes(nombre_archivo, 'journal', escritos=escritos)
+                    _escribir_version(archivo_bloqueo, version)
+                cantidad += len(bloque)
+            return cantidad
+
+        ids = []
+
+        def nuevos():
+            nonlocal cantidad
+            for bloque in bloques:
+                cantidad += len(bloque)
+                ids.extend(registro['id'] for registro in bloque)
+                yield from bloque
+
+        ruta_archivo = _ruta_coleccion(nombre_archivo)
+        with bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo)) as archivo_bloqueo:
+            ruta_temporal = f"{ruta_archivo}.{os.getpid()}.tmp"
+            try:
+                with ExitStack() as pila:
+                    existentes = ()
+                    if os.path.exists(ruta_archivo):
+                        anterior = pila.enter_context(open(ruta_archivo, 'rb'))
+                        existentes = chain.from_iterable(formatos.iterar_lotes(anterior))
+                    with open(ruta_temporal, 'wb') as archivo:
+                        formatos.escribir(archivo, chain(existentes, nuevos()), *_formato_instantanea(nombre_archivo))
+                        instrumentacion.contar_bytes(nombre_archivo, 'instantanea', escritos=archivo.tell())
+                        archivo.flush()
+                        os.fsync(archivo.fileno())
+            except BaseException:
+                if os.path.exists(ruta_temporal):
+                    os.remove(ruta_temporal)
+                raise
+            busqueda.anotar(nombre_archivo, _leer_version(archivo_bloqueo) + 1, ids)
+            os.replace(ruta_temporal, ruta_archivo)
+            for ruta_derivada in (_ruta_indices(nombre_archivo), _ruta_cache_instantanea(nombre_archivo)):
+                if os.path.exists(ruta_derivada):
+                    os.remove(ruta_derivada)
+            bloqueos.sincronizar_directorio(RUTA_DATOS)
+            _escribir_version(archivo_bloqueo, _leer_version(archivo_bloqueo) + 1)
+        return cantidad
+    finally:
+        cache.invalidar(nombre_archivo)
+
+def _ruta_contador(nombre_contador):
+    return os.path.join(RUTA_DATOS, f"contador_{nombre_contador}.json")
+
+@medido('almacenamiento')
 def guardar_contador(nombre_contador, valor):
     """
     Guarda el valor de un contador en archivo JSON local
+    La escritura es atómica y se fuerza a disco
     Args:
         nombre_contador (str): Nombre del contador
         valor (int): Valor del contador
     """
-    ruta_archivo = os.path.join(RUTA_DATOS, f"contador_{nombre_contador}.json")
+    ruta_archivo = _ruta_contador(nombre_contador)
     try:
-        with open(ruta_archivo, 'w', encoding='utf-8') as archivo:
-            json.dump({"contador": valor}, archivo)
+        bloqueos.escribir_durable(ruta_archivo, json.dumps({"contador": valor}).encode('utf-8'))
     except Exception as e:
         print(f"ERROR: Error al guardar contador {nombre_contador}: {e}")
+        raise
 
+@medido('almacenamiento')
 def cargar_contador(nombre_contador):
     """
     Carga el valor de un contador desde archivo JSON local
@@ -68,7 +1233,7 @@ def cargar_contador(nombre_contador):
     Returns:
         int: Valor del contador (1 si no existe)
     """
-    ruta_archivo = os.path.join(RUTA_DATOS, f"contador_{nombre_contador}.json")
+    ruta_archivo = _ruta_contador(nombre_contador)
     try:
         if os.path.exists(ruta_archivo):
             with open(ruta_archivo, 'r', encoding='utf-8') as archivo:
@@ -80,43 +1245,468 @@ def cargar_contador(nombre_contador):
         print(f"ERROR: Error al cargar contador {nombre_contador}: {e}")
         return 1
 
+@medido('almacenamiento')
+def reservar_ids(nombre_contador, cantidad):
+    """
+    Reserva un rango de IDs consecutivos para este proceso
+    El contador se lee y se avanza bajo un bloqueo exclusivo del sistema
+    operativo, por lo que dos procesos nunca reciben el mismo ID
+    Args:
+        nombre_contador (str): Nombre del contador
+        cantidad (int): Cantidad de IDs a reservar
+    Returns:
+        range: IDs reservados
+    """
+    ruta_bloqueo = os.path.join(RUTA_DATOS, f".contador_{nombre_contador}.lock")
+    with bloqueos.bloqueo(ruta_bloqueo):
+        inicio = cargar_contador(nombre_contador)
+        # Se persiste la marca máxima antes de entregar cualquier ID
+        guardar_contador(nombre_contador, inicio + cantidad)
+    return range(inicio, inicio + cantidad)
+
+@medido('almacenamiento')
+def fijar_contador(nombre_contador, siguiente):
+    """
+    Fija el próximo ID de un contador después de una carga masiva
+    Descarta el bloque de IDs que este proceso tenía reservado
+    Args:
+        nombre_contador (str): Nombre del contador
+        siguiente (int): Próximo ID a entregar
+    """
+    with _candado_ids:
+        _bloques_ids.pop(nombre_contador, None)
+        guardar_contador(nombre_contador, siguiente)
+
+@medido('almacenamiento')
 def obtener_siguiente_id(nombre_contador):
     """
-    Obtiene el siguiente ID disponible e incrementa el contador
+    Obtiene el siguiente ID disponible
+    Los IDs se entregan desde un bloque reservado en memoria; el archivo del
+    contador solo se escribe al reservar un bloque nuevo. Los IDs de un
+    bloque que no se llegan a usar quedan sin asignar. Una operación que se
+    repite (por un conflicto o al rehacer un volcado diferido) recibe los
+    mismos IDs que en su intento anterior
     Args:
         nombre_contador (str): Nombre del contador
     Returns:
         int: Siguiente ID disponible
     """
-    contador_actual = cargar_contador(nombre_contador)
-    guardar_contador(nombre_contador, contador_actual + 1)
-    return contador_actual
+    operacion = transacciones.operacion_actual()
+    siguiente = operacion.id_a_repetir(nombre_contador) if operacion is not None else None
+    if siguiente is None:
+        with _candado_ids:
+            bloque = _bloques_ids.get(nombre_contador)
+            if bloque is None or bloque[0] >= bloque[1]:
+                tamaño = min(TAMAÑO_MAXIMO_BLOQUE_IDS, bloque[2] * 2) if bloque else 1
+                reservados = reservar_ids(nombre_contador, tamaño)
+                bloque = [reservados.start, reservados.stop, tamaño]
+                _bloques_ids[nombre_contador] = bloque
+            siguiente = bloque[0]
+            bloque[0] += 1
+    if operacion is not None:
+        operacion.ids.append((nombre_contador, siguiente))
+    return siguiente
 
+@medido('almacenamiento')
 def buscar_por_id(lista_datos, id_buscar, campo_id='id'):
     """
     Busca un elemento por su ID en una lista de diccionarios
+    Si recibe una Coleccion indexada por ese campo la búsqueda es O(1)
     Args:
-        lista_datos (list): Lista de diccionarios
+        lista_datos (list or Coleccion): Registros donde buscar
         id_buscar (int): ID a buscar
         campo_id (str): Nombre del campo ID
     Returns:
         dict or None: Diccionario encontrado o None
     """
+    if isinstance(lista_datos, Coleccion) and lista_datos.campo_id == campo_id:
+        return lista_datos.obtener(id_buscar)
     for item in lista_datos:
         if item.get(campo_id) == id_buscar:
             return item
     return None
 
+@medido('almacenamiento')
+def buscar_registro(nombre_archivo, id_buscar):
+    """
+    Busca un registro de una colección por su ID
+    En modo 'sqlite' hace una consulta puntual si la colección no está en
+    caché, sin cargar la tabla completa
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        id_buscar (int): ID a buscar
+    Returns:
+        dict or None: Registro encontrado o None
+    """
+    if MODO_ALMACENAMIENTO == 'sqlite' and _sin_escribir(nombre_archivo) is None:
+        firma = _firma_coleccion(nombre_archivo)
+        datos = cache.obtener(nombre_archivo, firma) if firma else None
+        if datos is None:
+            return almacenamiento_sqlite.buscar_por_id(nombre_archivo, id_buscar)
+        return datos.obtener(id_buscar)
+    return buscar_por_id(cargar_datos(nombre_archivo), id_buscar)
+
+@medido('almacenamiento')
+def buscar_registros(nombre_archivo, campo, valor):
+    """
+    Busca todos los registros de una colección cuyo campo tiene un valor
+    Usa el índice secundario del campo si la colección lo tiene (ver
+    INDICES_SECUNDARIOS); en modo 'sqlite', si la colección no está en
+    caché, consulta directamente los índices de la tabla
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        campo (str): Nombre del campo
+        valor: Valor buscado
+    Returns:
+        list: Registros encontrados
+    """
+    if MODO_ALMACENAMIENTO == 'sqlite' and _sin_escribir(nombre_archivo) is None:
+        firma = _firma_coleccion(nombre_archivo)
+        datos = cache.obtener(nombre_archivo, firma) if firma else None
+        if datos is None:
+            return almacenamiento_sqlite.buscar_por_campo(nombre_archivo, campo, valor)
+    else:
+        datos = cargar_datos(nombre_archivo)
+    return datos.buscar_por_campo(campo, valor)
+
+@medido('almacenamiento')
+def actualizar_menores(nombre_archivo, nombre_indice, limite, cambios):
+    """
+    Modifica con un único guardado los registros de un índice ordenado (ver
+    INDICES_ORDENADOS) cuya fecha es anterior a un día límite, sin recorrer
+    el resto de la colección
+    En modo 'sqlite', si la colección no está en caché ni en una
+    transacción, lee y modifica las filas con una consulta por rango sobre
+    el índice compuesto de la tabla (salvo que queden fechas en texto sin
+    migrar, que se resuelven con el índice en memoria)
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        nombre_indice (str): Nombre del índice ordenado
+        limite (int): Número de día límite (excluido)
+        cambios (dict): Campo -> valor nuevo
+    Returns:
+        list: Tuplas (número de día, registro modificado) en orden de fecha
+    Raises:
+        ConflictoVersion: Si otra terminal guardó la colección antes
+    """
+    campo_fecha, filtro = INDICES_ORDENADOS[nombre_archivo][nombre_indice]
+    if (MODO_ALMACENAMIENTO == 'sqlite' and transacciones.transaccion_activa() is None
+            and _sin_escribir(nombre_archivo) is None):
+        firma = _firma_coleccion(nombre_archivo)
+        if firma is None or cache.obtener(nombre_archivo, firma) is None:
+            from utils import conciliacion
+
+            def anotar(registros):
+                modificados = Coleccion()
+                modificados.extend(registros)
+                conciliacion.anotar_cambios({nombre_archivo: modificados})
+
+            registros = almacenamiento_sqlite.actualizar_menores(
+                nombre_archivo, campo_fecha, limite, filtro, cambios, anotar
+            )
+            if registros is not None:
+                cache.invalidar(nombre_archivo)
+                return [(registro[campo_fecha], registro) for registro in registros]
+
+    datos = cargar_datos(nombre_archivo)
+    encontrados = datos.buscar_menores(nombre_indice, limite)
+    if encontrados:
+        for _, registro in encontrados:
+            registro.update(cambios)
+        guardar_datos(nombre_archivo, datos)
+    return encontrados
+
+# --- Lectura por páginas ---
+
+# Posición de un registro para leer una colección por páginas. En los modos
+# JSON 'desplazamiento' es el byte de la instantánea donde empieza el
+# registro (de los datos descomprimidos, si está comprimida) (None si el registro está solo en el journal) y 'firma' la de la
+# colección al leerlo: si la colección cambió, el registro se vuelve a
+# ubicar por su ID. En modo 'sqlite' la posición es solo el ID
+Posicion = namedtuple('Posicion', ['firma', 'desplazamiento', 'id_registro'])
+
+# nombre -> (firma, cambios, cola) del último journal resumido
+_superposiciones = {}
+
+def _superposicion_journal(nombre_archivo, firma):
+    """
+    Resume el journal de una colección para recorrerla sin cargarla
+    Reproduce el mismo orden que Coleccion al aplicar el journal: un
+    registro de la instantánea se modifica en su lugar y uno nuevo (o
+    eliminado y vuelto a agregar) pasa al final
+    Returns:
+        tuple: (cambios, cola) donde cambios es ID -> registro nuevo, o None
+            si se eliminó, para los registros de la instantánea; y cola es
+            ID -> registro de los que quedan al final, en orden
+    """
+    guardada = _superposiciones.get(nombre_archivo)
+    if guardada is not None and guardada[0] == firma:
+        return guardada[1], guardada[2]
+
+    operaciones = list(journal.leer_cambios(_ruta_journal(nombre_archivo)))
+    ids_journal = {valor.get('id') if operacion == 'put' else valor for operacion, valor in operaciones}
+    try:
+        with open(_ruta_coleccion(nombre_archivo), 'rb') as archivo:
+            en_instantanea = formatos.ids_presentes(archivo, ids_journal)
+    except FileNotFoundError:
+        en_instantanea = set()
+    cambios = {}
+    cola = {}
+    for operacion, valor in operaciones:
+        id_registro = valor.get('id') if operacion == 'put' else valor
+        registro = valor if operacion == 'put' else None
+        if id_registro in en_instantanea and cambios.get(id_registro, True) is not None:
+            cambios[id_registro] = registro
+        elif registro is not None:
+            cola[id_registro] = registro
+        else:
+            cola.pop(id_registro, None)
+    _superposiciones[nombre_archivo] = (firma, cambios, cola)
+    return cambios, cola
+
+def _abrir_para_recorrer(nombre_archivo):
+    """
+    Abre la instantánea de una colección de los modos JSON para recorrerla
+    Returns:
+        tuple: (firma, cambios, cola, archivo abierto o None si no existe);
+            cambios y cola son los del journal (ver _superposicion_journal)
+    """
+    # El bloqueo compartido evita leer una confirmación a medias; una vez
+    # abierto, el archivo se sigue leyendo aunque otra terminal lo reemplace
+    with bloqueos.bloqueo(_ruta_bloqueo(nombre_archivo), exclusivo=False):
+        firma = _firma_coleccion(nombre_archivo)
+        if MODO_ALMACENAMIENTO == 'journal':
+            cambios, cola = _superposicion_journal(nombre_archivo, firma)
+        else:
+            cambios, cola = {}, {}
+        try:
+            archivo = open(_ruta_coleccion(nombre_archivo), 'rb')
+        except FileNotFoundError:
+            archivo = None
+    return firma, cambios, cola, archivo
+
+def _recorrer_json(nombre_archivo, posicion):
+    """
+    Recorre una colección de los modos JSON desde una posición vigente
+    Yields:
+        tuple: (Posicion, registro)
+    """
+    firma, cambios, cola, archivo = _abrir_para_recorrer(nombre_archivo)
+
+    if posicion is not None and posicion.firma != firma:
+        # La colección cambió: se vuelve a ubicar el registro por su ID
+        if archivo is not None:
+            archivo.close()
+        recorrido = _recorrer_json(nombre_archivo, None)
+        yield from dropwhile(lambda par: par[0].id_registro != posicion.id_registro, recorrido)
+        return
+
+    en_cola = posicion is not None and posicion.desplazamiento is None
+    if archivo is not None:
+        with archivo:
+            if not en_cola:
+                desde = posicion.desplazamiento if posicion is not None else 0
+                for desplazamiento, registro in formatos.iterar(archivo, desde):
+                    id_registro = registro.get('id')
+                    registro = cambios.get(id_registro, registro)
+                    if registro is not None:
+                        yield Posicion(firma, desplazamiento, id_registro), registro
+
+    ids_cola = list(cola)
+    inicio = ids_cola.index(posicion.id_registro) if en_cola and posicion.id_registro in cola else 0
+    for id_registro in ids_cola[inicio:]:
+        yield Posicion(firma, None, id_registro), cola[id_registro]
+
+def _recorrer(nombre_archivo, posicion=None):
+    """
+    Recorre una colección en su orden, desde una posición, sin cargarla
+    Los cambios pendientes de la escritura diferida se escriben antes
+    Yields:
+        tuple: (Posicion, registro)
+    """
+    if nombre_archivo in _pendientes:
+        forzar_escritura()
+    if MODO_ALMACENAMIENTO == 'sqlite':
+        desde_id = posicion.id_registro if posicion is not None else None
+        for registro in almacenamiento_sqlite.recorrer(nombre_archivo, desde_id):
+            yield Posicion(None, None, registro.get('id')), registro
+    else:
+        yield from _recorrer_json(nombre_archivo, posicion)
+
+@medido('almacenamiento')
+def recorrer_coleccion(nombre_archivo):
+    """
+    Recorre los registros de una colección una sola vez
+    Usa la copia en caché si está vigente; si no, lee en flujo la
+    instantánea y el journal (o la tabla en SQLite) sin cargarlos
+    Args:
+        nombre_archivo (str): Nombre de la colección
+    Yields:
+        dict: Registros en el orden de la colección
+    """
+    firma = _firma_coleccion(nombre_archivo)
+    datos = cache.obtener(nombre_archivo, firma) if firma is not None else None
+    if datos is not None:
+        yield from datos
+        return
+    for _, registro in _recorrer(nombre_archivo):
+        yield registro
+
+def _lotes_json(nombre_archivo):
+    """
+    Recorre de a lotes una colección de los modos JSON
+    Yields:
+        list: Registros en el orden de la colección
+    """
+    if nombre_archivo in _pendientes:
+        forzar_escritura()
+    _, cambios, cola, archivo = _abrir_para_recorrer(nombre_archivo)
+    if archivo is not None:
+        with archivo:
+            for lote in formatos.iterar_lotes(archivo):
+                if cambios:
+                    lote = [registro for registro in (cambios.get(registro.get('id'), registro) for registro in lote)
+                            if registro is not None]
+                if lote:
+                    yield lote
+    if cola:
+        yield list(cola.values())
+
+@medido('almacenamiento')
+def recorrer_lotes(nombre_archivo):
+    """
+    Recorre los registros de una colección una sola vez, de a lotes
+    Para informes que leen la colección completa: es más rápido que
+    recorrer_coleccion porque la instantánea se decodifica de a bloques, sin
+    llevar la posición de cada registro
+    Args:
+        nombre_archivo (str): Nombre de la colección
+    Yields:
+        list: Registros en el orden de la colección
+    """
+    firma = _firma_coleccion(nombre_archivo)
+    datos = cache.obtener(nombre_archivo, firma) if firma is not None else None
+    if datos is not None:
+        registros = iter(datos)
+    elif MODO_ALMACENAMIENTO == 'sqlite':
+        registros = (registro for _, registro in _recorrer(nombre_archivo))
+    else:
+        yield from _lotes_json(nombre_archivo)
+        return
+    while lote := list(islice(registros, TAMAÑO_LOTE_RECORRIDO)):
+        yield lote
+
+@medido('almacenamiento')
+def leer_pagina(nombre_archivo, posicion=None, cantidad=20):
+    """
+    Lee una página de una colección sin cargarla completa
+    La memoria usada depende del tamaño de la página, no de la colección
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        posicion (Posicion): Primer registro de la página (None: el primero)
+        cantidad (int): Registros por página
+    Returns:
+        tuple: (lista de (Posicion, registro) de la página, Posicion del
+            primer registro de la página siguiente o None si no hay más)
+    """
+    try:
+        recorrido = _recorrer(nombre_archivo, posicion)
+        try:
+            pagina = list(islice(recorrido, cantidad + 1))
+        finally:
+            recorrido.close()
+        if not pagina and posicion is not None and posicion.firma != _firma_coleccion(nombre_archivo):
+            # El registro de la posición ya no existe: se vuelve al principio
+            return leer_pagina(nombre_archivo, None, cantidad)
+    except Exception as e:
+        print(f"ERROR: Error al leer una página de {nombre_archivo}: {e}")
+        return [], None
+    siguiente = pagina.pop()[0] if len(pagina) > cantidad else None
+    return pagina, siguiente
+
+@medido('almacenamiento')
+def ubicar_registro(nombre_archivo, id_buscar):
+    """
+    Obtiene la posición de un registro para empezar una página en él
+    En los modos JSON recorre la colección en orden (sin cargarla)
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        id_buscar (int): ID del registro
+    Returns:
+        Posicion or None: Posición del registro o None si no existe
+    """
+    try:
+        if MODO_ALMACENAMIENTO == 'sqlite':
+            if almacenamiento_sqlite.buscar_por_id(nombre_archivo, id_buscar) is None:
+                return None
+            return Posicion(None, None, id_buscar)
+        for posicion, _ in _recorrer(nombre_archivo):
+            if posicion.id_registro == id_buscar:
+                return posicion
+    except Exception as e:
+        print(f"ERROR: Error al buscar en {nombre_archivo}: {e}")
+    return None
+
+@medido('almacenamiento')
+def posicion_anterior(nombre_archivo, posicion, cantidad=20):
+    """
+    Obtiene el inicio de la página que termina justo antes de una posición
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        posicion (Posicion): Primer registro de la página actual
+        cantidad (int): Registros por página
+    Returns:
+        Posicion or None: Inicio de la página anterior (None: el principio)
+    """
+    if posicion is None:
+        return None
+    try:
+        if MODO_ALMACENAMIENTO == 'sqlite':
+            ids = almacenamiento_sqlite.ids_anteriores(nombre_archivo, posicion.id_registro, cantidad)
+            return Posicion(None, None, ids[0]) if ids else None
+        ventana = deque(maxlen=cantidad)
+        for actual, _ in _recorrer(nombre_archivo):
+            if actual.id_registro == posicion.id_registro:
+                break
+            ventana.append(actual)
+        return ventana[0] if ventana else None
+    except Exception as e:
+        print(f"ERROR: Error al leer {nombre_archivo}: {e}")
+        return None
+
+@medido('almacenamiento')
+def contar_registros(nombre_archivo):
+    """
+    Cantidad de registros de una colección, si se conoce sin recorrerla
+    Returns:
+        int or None: Cantidad o None si habría que leer la colección
+    """
+    pendiente = _pendientes.get(nombre_archivo)
+    if pendiente is not None:
+        return len(pendiente)
+    if MODO_ALMACENAMIENTO == 'sqlite':
+        version = almacenamiento_sqlite.obtener_version(nombre_archivo)
+        return version[1] if version else 0
+    firma = _firma_coleccion(nombre_archivo)
+    if firma is None:
+        return 0
+    datos = cache.obtener(nombre_archivo, firma)
+    return len(datos) if datos is not None else None
+
+@medido('almacenamiento')
 def eliminar_por_id(lista_datos, id_eliminar, campo_id='id'):
     """
     Elimina un elemento por su ID de una lista de diccionarios
+    Si recibe una Coleccion indexada por ese campo la eliminación es O(1)
     Args:
-        lista_datos (list): Lista de diccionarios
+        lista_datos (list or Coleccion): Registros de donde eliminar
         id_eliminar (int): ID a eliminar
         campo_id (str): Nombre del campo ID
     Returns:
         bool: True si se eliminó, False si no se encontró
     """
+    if isinstance(lista_datos, Coleccion) and lista_datos.campo_id == campo_id:
+        return lista_datos.eliminar(id_eliminar) is not None
     for i, item in enumerate(lista_datos):
         if item.get(campo_id) == id_eliminar:
             lista_datos.pop(i)
@@ -127,6 +1717,9 @@ def obtener_modo_almacenamiento():
     """
     Retorna el modo de almacenamiento actual
     Returns:
-        str: Siempre retorna 'JSON Local'
+        str: Descripción del modo (por ejemplo 'JSON Local')
     """
-    return "JSON Local"
+    return MODOS_ALMACENAMIENTO[MODO_ALMACENAMIENTO]
+
+# Completar transacciones interrumpidas antes de la primera operación
+recuperar_transacciones()
@@ -0,0 +1,110 @@
+"""
+Módulo de paginación
+Muestra una colección por páginas sin cargarla completa: cada página se lee
+con manejo_archivos.leer_pagina (lectura en bloques desde la posición del
+primer registro) y se escribe en la consola de una sola vez. Permite
+avanzar, retroceder, saltar a un ID y cambiar el tamaño de la página
+"""
+
+import os
+import sys
+
+from utils.manejo_archivos import leer_pagina, ubicar_registro, posicion_anterior, contar_registros
+
+TAMAÑO_PAGINA = int(os.environ.get("BIBLIOTECA_PAGINA", 20))
+
+OPCIONES_PAGINA = "[Enter] Siguiente  [A] Anterior  [I] Ir a ID  [T] Tamaño de página  [0] Volver"
+
+def _pedir_entero(mensaje, minimo=1):
+    """
+    Pide un entero; devuelve None si la entrada no es válida
+    """
+    try:
+        numero = int(input(mensaje).strip())
+    except ValueError:
+        return None
+    return numero if numero >= minimo else None
+
+def mostrar_paginado(nombre_archivo, encabezado, formatear_fila, vacio, tamaño_pagina=None):
+    """
+    Muestra una colección por páginas y atiende la navegación
+    Args:
+        nombre_archivo (str): Nombre de la colección
+        encabezado (list): Líneas de encabezado de la tabla
+        formatear_fila (callable): Recibe un registro y devuelve su línea
+        vacio (str): Mensaje si la colección no tiene registros
+        tamaño_pagina (int): Registros por página (por defecto TAMAÑO_PAGINA)
+    """
+    tamaño_pagina = tamaño_pagina or TAMAÑO_PAGINA
+    posicion = None
+    # Inicios de las páginas ya vistas, para volver atrás sin releer desde
+    # el principio. Después de un salto se calcula con posicion_anterior
+    anteriores = []
+    # Número (desde 1) del primer registro de la página; None tras un salto
+    numero_primero = 1
+
+    while True:
+        pagina, siguiente = leer_pagina(nombre_archivo, posicion, tamaño_pagina)
+        if not pagina and posicion is None:
+            print(vacio)
+            return
+
+        lineas = list(encabezado)
+        lineas.extend(formatear_fila(registro) for _, registro in pagina)
+        total = contar_registros(nombre_archivo)
+        if numero_primero is not None and pagina:
+            rango = f"Registros {numero_primero} a {numero_primero + len(pagina) - 1}"
+        else:
+            rango = f"Desde el ID {pagina[0][1].get('id')}" if pagina else "Sin registros"
+        if total is not None:
+            rango += f" de {total}"
+        lineas.append("")
+        lineas.append(rango + ("" if siguiente else " (fin de la lista)"))
+        lineas.append(OPCIONES_PAGINA)
+        # Una sola escritura por página en lugar de un print por fila
+        sys.stdout.write("\n" + "\n".join(lineas) + "\n")
+        sys.stdout.flush()
+
+        try:
+            opcion = input("Opción: ").strip().upper()
+        except EOFError:
+            return
+
+        if opcion == "":
+            if siguiente is None:
+                return
+            anteriores.append(posicion)
+            posicion = siguiente
+            if numero_primero is not None:
+                numero_primero += len(pagina)
+        elif opcion == "A":
+            if posicion is None:
+                print("\nYa está en la primera página.")
+            elif anteriores:
+                posicion = anteriores.pop()
+                if numero_primero is not None:
+                    numero_primero = max(numero_primero - tamaño_pagina, 1)
+            else:
+                posicion = posicion_anterior(nombre_archivo, posicion, tamaño_pagina)
+                numero_primero = 1 if posicion is None else None
+        elif opcion == "I":
+            id_buscar = _pedir_entero("ID: ")
+            destino = ubicar_registro(nombre_archivo, id_buscar) if id_buscar is not None else None
+            if destino is None:
+                print("\nERROR: No se encontró un registro con ese ID.")
+            else:
+                posicion = destino
+                anteriores = []
+                numero_primero = None
+        elif opcion == "T":
+            nuevo_tamaño = _pedir_entero("Registros por página: ")
+            if nuevo_tamaño is None:
+                print("\nERROR: Debe ingresar un número entero mayor a 0.")
+            else:
+                tamaño_pagina = nuevo_tamaño
+                anteriores = []
+                numero_primero = 1 if posicion is None else None
+        elif opcion == "0":
+            return
+        else:
+            print("\nERROR: Opción inválida.")
@@ -0,0 +1,354 @@
+"""
+Módulo de pruebas de rendimiento
+Genera bibliotecas de distintos tamaños (utils/generador.py) y mide las
+operaciones de los modelos y del almacenamiento en cada modo de
+almacenamiento y escala
+
+Cada combinación de modo y escala se mide en un proceso aparte, con una
+carpeta de datos temporal (el modo se elige al importar manejo_archivos).
+Los resultados se guardan en JSON y se muestran en una tabla por escala.
+Con --comparar se indica cuánto cambió cada operación respecto de una
+medición anterior y se marcan las que empeoraron más que el umbral
+
+Las operaciones que cargan todos los préstamos se omiten cuando hay más
+préstamos que BIBLIOTECA_RENDIMIENTO_LIMITE
+
+Además de los modos se pueden medir los formatos de archivo del modo JSON
+y la escritura diferida (VARIANTES: json_compacto, binario, binario_zlib,
+diferida)
+
+Uso:
+    python -m utils.rendimiento --escalas 1k 10k 100k --salida base.json
+    python -m utils.rendimiento --escalas 10k --comparar base.json
+    python -m utils.rendimiento --modos json json_compacto binario binario_zlib --escalas 100k
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from utils.generador import ESCALAS, SEMILLA
+
+MODOS = ('json', 'journal', 'sqlite')
+# Variantes medibles además de los modos: formato de los archivos (ver
+# utils/formatos.py) -> variables de entorno del proceso de medición
+VARIANTES = {
+    'json_compacto': {'BIBLIOTECA_ALMACENAMIENTO': 'json', 'BIBLIOTECA_FORMATO': 'json_compacto'},
+    'binario': {'BIBLIOTECA_ALMACENAMIENTO': 'json', 'BIBLIOTECA_FORMATO': 'binario'},
+    'binario_zlib': {'BIBLIOTECA_ALMACENAMIENTO': 'json', 'BIBLIOTECA_FORMATO': 'binario', 'BIBLIOTECA_COMPRIMIR': '*'},
+    # Las escrituras se hacen cada UMBRAL guardados (la ventana no llega a vencer)
+    'diferida': {'BIBLIOTECA_ALMACENAMIENTO': 'json', 'BIBLIOTECA_ESCRITURA_DIFERIDA': '3600'},
+}
+REPETICIONES = 200
+
+# Préstamos a partir de los cuales se omiten las operaciones con carga completa
+LIMITE_CARGA_COMPLETA = int(os.environ.get("BIBLIOTECA_RENDIMIENTO_LIMITE", 2_000_000))
+
+# Porcentaje de empeoramiento que se marca al comparar
+UMBRAL_REGRESION = 20.0
+
+def _estadisticas(duraciones, errores=0):
+    """
+    Resume las duraciones de una operación
+    Args:
+        duraciones (list): Duraciones en segundos
+        errores (int): Repeticiones rechazadas por el modelo
+    Returns:
+        dict: Repeticiones, media, p50, p99 y máximo en microsegundos y
+            operaciones por segundo
+    """
+    ordenadas = sorted(duraciones)
+    cantidad = len(ordenadas)
+    if not cantidad:
+        return {'repeticiones': 0, 'errores': errores}
+    total = sum(ordenadas)
+    return {
+        'repeticiones': cantidad,
+        'errores': errores,
+        'media_us': round(total / cantidad * 1e6, 1),
+        'p50_us': round(ordenadas[cantidad // 2] * 1e6, 1),
+        'p99_us': round(ordenadas[min(cantidad - 1, cantidad * 99 // 100)] * 1e6, 1),
+        'max_us': round(ordenadas[-1] * 1e6, 1),
+        'ops_s': round(cantidad / total, 1) if total else None,
+    }
+
+class Medicion:
+    """
+    Operaciones medidas en un proceso
+    """
+
+    def __init__(self, prestamos):
+        self.prestamos = prestamos
+        self.resultados = {}
+
+    def medir(self, nombre, operacion, argumentos, carga_completa=False):
+        """
+        Mide una operación con cada uno de los argumentos
+        Args:
+            nombre (str): Nombre de la operación en los resultados
+            operacion (callable): Función a medir
+            argumentos (iterable): Tuplas de argumentos, una por repetición
+            carga_completa (bool): True si carga todos los préstamos
+        Returns:
+            list: Resultados de las repeticiones que no fallaron
+        """
+        from utils.errores import ErrorBiblioteca
+
+        if carga_completa and self.prestamos > LIMITE_CARGA_COMPLETA:
+            self.resultados[nombre] = {'omitida': f"más de {LIMITE_CARGA_COMPLETA} préstamos"}
+            return []
+        duraciones, devueltos, errores = [], [], 0
+        for args in argumentos:
+            inicio = time.perf_counter()
+            try:
+                devuelto = operacion(*args)
+            except ErrorBiblioteca:
+                errores += 1
+                continue
+            duraciones.append(time.perf_counter() - inicio)
+            devueltos.append(devuelto)
+        self.resultados[nombre] = _estadisticas(duraciones, errores)
+        return devueltos
+
+def _medir_proceso(escala, semilla, repeticiones):
+    """
+    Genera la biblioteca y mide todas las operaciones en el proceso actual
+    (el modo y la carpeta de datos ya están configurados)
+    Returns:
+        dict: Nombre de la operación -> estadísticas
+    """
+    from modelos.prestamo import registrar_prestamo, registrar_devolucion, marcar_prestamos_vencidos
+    from modelos.multa import registrar_pago_multa, obtener_cuenta_multas
+    from modelos.libro import obtener_libro_por_isbn
+    from utils import busqueda, cache, circulacion, generador, manejo_archivos
+    from utils.conciliacion import conciliar
+    from utils.manejo_archivos import (cargar_datos, buscar_por_id, buscar_registro, buscar_registros,
+                                       leer_pagina, ubicar_registro, recorrer_coleccion, recorrer_lotes)
+
+    tamaños = ESCALAS[escala]
+    aleatorio = random.Random(semilla)
+    medicion = Medicion(tamaños['prestamos'])
+    medir = medicion.medir
+
+    medir('generar', lambda: generador.generar_biblioteca(semilla=semilla, **tamaños), [()])
+    medicion.resultados['tamaño de los datos'] = {'kib': round(sum(
+        os.path.getsize(os.path.join(manejo_archivos.RUTA_DATOS, archivo)) for archivo in os.listdir(manejo_archivos.RUTA_DATOS)
+    ) / 1024, 1)}
+
+    ids_prestamos = [(aleatorio.randint(1, tamaños['prestamos']),) for _ in range(repeticiones)]
+    ids_libros = [(aleatorio.randint(1, tamaños['libros']),) for _ in range(repeticiones)]
+    ids_usuarios = [(aleatorio.randint(1, tamaños['usuarios']),) for _ in range(repeticiones)]
+
+    # Lecturas directas, antes de tener las colecciones en caché
+    medir('buscar_registro prestamos (frío)', lambda id_prestamo: buscar_registro('prestamos', id_prestamo), ids_prestamos[:5])
+    medir('leer_pagina prestamos', lambda: leer_pagina('prestamos', None, 20), [()] * repeticiones)
+    medir('ubicar_registro prestamos', lambda id_prestamo: ubicar_registro('prestamos', id_prestamo),
+          ids_prestamos[:5], carga_completa=True)
+    medir('recorrer_coleccion prestamos', lambda: sum(1 for _ in recorrer_coleccion('prestamos')), [()], carga_completa=True)
+    medir('recorrer_lotes prestamos', lambda: sum(len(lote) for lote in recorrer_lotes('prestamos')), [()])
+    medir('analizar_circulacion', circulacion.analizar_circulacion, [()])
+    medir('analizar_circulacion (sin NumPy)', lambda: circulacion.analizar_circulacion(usar_numpy=False), [()])
+
+    # Carga completa de cada colección, sin caché y desde la caché
+    for nombre in ('libros', 'usuarios', 'multas', 'prestamos'):
+        def cargar_en_frio(nombre=nombre):
+            cache.invalidar(nombre)
+            return cargar_datos(nombre)
+        completa = nombre == 'prestamos'
+        medir(f"cargar_datos {nombre} (frío)", cargar_en_frio, [()] * 3, carga_completa=completa)
+        medir(f"cargar_datos {nombre} (caché)", lambda nombre=nombre: cargar_datos(nombre), [()] * repeticiones,
+              carga_completa=completa)
+
+    if manejo_archivos.MODO_ALMACENAMIENTO != 'sqlite':
+        # Reescritura completa de la instantánea en su mismo formato
+        for nombre in ('libros', 'prestamos'):
+            medir(f"reescribir instantánea {nombre}", lambda nombre=nombre: manejo_archivos.convertir_coleccion(nombre),
+                  [()] * 3, carga_completa=nombre == 'prestamos')
+
+    libros = cargar_datos('libros')
+    medir('buscar_por_id libros', lambda id_libro: buscar_por_id(libros, id_libro), ids_libros)
+    medir('obtener_libro_por_isbn', lambda id_libro: obtener_libro_por_isbn(generador.generar_isbn(id_libro)), ids_libros)
+    medir('buscar_registro prestamos', lambda id_prestamo: buscar_registro('prestamos', id_prestamo), ids_prestamos,
+          carga_completa=True)
+    medir('buscar_registros prestamos por usuario', lambda id_usuario: buscar_registros('prestamos', 'id_usuario', id_usuario),
+          ids_usuarios, carga_completa=True)
+    medir('obtener_cuenta_multas', obtener_cuenta_multas, ids_usuarios)
+
+    # Búsqueda de texto: la primera consulta construye el índice
+    palabras = [(aleatorio.choice(generador.PALABRAS_TITULO[1]),) for _ in range(repeticiones)]
+    medir('buscar_libros (índice nuevo)', busqueda.buscar_libros, palabras[:1])
+    medir('buscar_libros', busqueda.buscar_libros, palabras)
+
+    # Escrituras: préstamos de usuarios sin multas, luego sus devoluciones
+    # (el mismo día, sin multa) y pagos de multas pendientes
+    usuarios = cargar_datos('usuarios')
+    habilitados = [usuario['id'] for usuario in usuarios if usuario['activo'] and not usuario['multas_pendientes']]
+    con_copias = [libro['id'] for libro in libros if libro['copias_disponibles'] > 0]
+    pedidos = [(aleatorio.choice(habilitados), aleatorio.choice(con_copias)) for _ in range(repeticiones)] if habilitados and con_copias else []
+    nuevos = medir('registrar_prestamo', registrar_prestamo, pedidos, carga_completa=True)
+    medir('registrar_devolucion', registrar_devolucion, [(prestamo['id'],) for prestamo in nuevos], carga_completa=True)
+
+    pendientes = [(multa['id'],) for multa in buscar_registros('multas', 'estado', 'pendiente')]
+    aleatorio.shuffle(pendientes)
+    medir('registrar_pago_multa', registrar_pago_multa, pendientes[:repeticiones])
+    medir('marcar_prestamos_vencidos', marcar_prestamos_vencidos, [()] * 3, carga_completa=True)
+
+    medir('conciliar (incremental)', conciliar, [()] * 3, carga_completa=True)
+    medir('conciliar (completa)', lambda: conciliar(completa=True), [()], carga_completa=True)
+    return medicion.resultados
+
+def _medir_en_proceso(modo, escala, semilla, repeticiones):
+    """
+    Mide una combinación de modo y escala en un proceso nuevo
+    Returns:
+        dict: Nombre de la operación -> estadísticas (o {'error': ...})
+    """
+    carpeta = tempfile.mkdtemp(prefix=f"biblioteca_{modo}_{escala}_")
+    salida = os.path.join(carpeta, "resultados.json")
+    entorno = dict(os.environ, **VARIANTES.get(modo, {'BIBLIOTECA_ALMACENAMIENTO': modo}))
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    entorno['PYTHONPATH'] = os.pathsep.join(filter(None, [raiz, entorno.get('PYTHONPATH')]))
+    try:
+        proceso = subprocess.run(
+            [sys.executable, "-m", "utils.rendimiento", "--proceso", carpeta, "--escalas", escala,
+             "--semilla", str(semilla), "--repeticiones", str(repeticiones), "--salida", salida],
+            cwd=raiz, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        if proceso.returncode != 0:
+            return {'error': proceso.stderr.strip().splitlines()[-1] if proceso.stderr.strip() else f"código {proceso.returncode}"}
+        with open(salida, 'r', encoding='utf-8') as archivo:
+            return json.load(archivo)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+def _celda(estadisticas, anterior=None):
+    """
+    Texto de una celda de la tabla: media en microsegundos y, si hay una
+    medición anterior, el cambio porcentual (con '!' si empeoró más que el umbral)
+    """
+    if estadisticas and 'kib' in estadisticas:
+        return f"{estadisticas['kib']:,.0f} KiB"
+    if not estadisticas or 'media_us' not in estadisticas:
+        return "omitida" if estadisticas and 'omitida' in estadisticas else "-"
+    texto = f"{estadisticas['media_us']:,.1f}"
+    if anterior and anterior.get('media_us'):
+        cambio = (estadisticas['media_us'] / anterior['media_us'] - 1) * 100
+        texto += f" ({cambio:+.0f}%{'!' if cambio > UMBRAL_REGRESION else ''})"
+    return texto
+
+def formatear_tabla(resultados, base=None):
+    """
+    Tabla ASCII con la media de cada operación (µs) por modo, una por escala
+    Args:
+        resultados (dict): Modo -> escala -> operación -> estadísticas
+        base (dict): Resultados anteriores con la misma forma (opcional)
+    Returns:
+        str: Tablas listas para mostrar
+    """
+    modos = list(resultados)
+    escalas = [escala for escala in ESCALAS if any(escala in resultados[modo] for modo in modos)]
+    bloques = []
+    for escala in escalas:
+        operaciones = []
+        for modo in modos:
+            for operacion in resultados[modo].get(escala, {}):
+                if operacion not in operaciones and operacion != 'error':
+                    operaciones.append(operacion)
+        filas = [["Operación (media µs)"] + modos]
+        for operacion in operaciones:
+            fila = [operacion]
+            for modo in modos:
+                anterior = ((base or {}).get(modo) or {}).get(escala, {}).get(operacion)
+                fila.append(_celda(resultados[modo].get(escala, {}).get(operacion), anterior))
+            filas.append(fila)
+        for modo in modos:
+            error = resultados[modo].get(escala, {}).get('error')
+            if error:
+                filas.append([f"ERROR ({modo})", error] + [""] * (len(modos) - 1))
+
+        anchos = [max(len(fila[columna]) for fila in filas) for columna in range(len(filas[0]))]
+        separador = "+" + "+".join("-" * (ancho + 2) for ancho in anchos) + "+"
+        lineas = [f"Escala {escala} ({ESCALAS[escala]['prestamos']:,} préstamos)", separador]
+        for numero, fila in enumerate(filas):
+            celdas = [fila[0].ljust(anchos[0])] + [celda.rjust(ancho) for celda, ancho in zip(fila[1:], anchos[1:])]
+            lineas.append("| " + " | ".join(celdas) + " |")
+            if numero == 0:
+                lineas.append(separador)
+        lineas.append(separador)
+        bloques.append("\n".join(lineas))
+    return "\n\n".join(bloques)
+
+def ejecutar_pruebas(modos=MODOS, escalas=('1k', '10k'), semilla=SEMILLA, repeticiones=REPETICIONES):
+    """
+    Mide todas las combinaciones de modo y escala
+    Returns:
+        dict: Entorno de la medición y resultados (modo -> escala -> operación)
+    """
+    resultados = {}
+    for modo in modos:
+        resultados[modo] = {}
+        for escala in escalas:
+            print(f"Midiendo {modo} / {escala} ...", file=sys.stderr)
+            resultados[modo][escala] = _medir_en_proceso(modo, escala, semilla, repeticiones)
+    return {
+        'fecha': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'semilla': semilla,
+        'repeticiones': repeticiones,
+        'resultados': resultados,
+    }
+
+def main(argumentos=None):
+    """
+    Punto de entrada de la línea de comandos
+    Args:
+        argumentos (list): Argumentos (None para usar sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Mide las operaciones de la biblioteca en cada modo y escala")
+    parser.add_argument('--modos', nargs='+', choices=MODOS + tuple(VARIANTES), default=list(MODOS),
+                        help="Modos de almacenamiento y formatos de archivo a medir")
+    parser.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=['1k', '10k'])
+    parser.add_argument('--semilla', type=int, default=SEMILLA)
+    parser.add_argument('--repeticiones', type=int, default=REPETICIONES)
+    parser.add_argument('--salida', help="Archivo JSON donde guardar los resultados")
+    parser.add_argument('--comparar', help="Resultados JSON anteriores con los que comparar")
+    parser.add_argument('--proceso', help=argparse.SUPPRESS)
+    opciones = parser.parse_args(argumentos)
+
+    if opciones.proceso:
+        # Proceso de medición: una escala, con el modo tomado del entorno
+        from utils import manejo_archivos
+        manejo_archivos.RUTA_DATOS = opciones.proceso
+        with contextlib.redirect_stdout(sys.stderr):
+            resultados = _medir_proceso(opciones.escalas[0], opciones.semilla, opciones.repeticiones)
+        with open(opciones.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, ensure_ascii=False)
+        return 0
+
+    base = None
+    if opciones.comparar:
+        try:
+            with open(opciones.comparar, 'r', encoding='utf-8') as archivo:
+                base = json.load(archivo)['resultados']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ERROR: No se pudo leer {opciones.comparar}: {e}")
+            return 1
+
+    informe = ejecutar_pruebas(opciones.modos, opciones.escalas, opciones.semilla, opciones.repeticiones)
+    if opciones.salida:
+        with open(opciones.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, ensure_ascii=False, indent=2)
+    print(formatear_tabla(informe['resultados'], base))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
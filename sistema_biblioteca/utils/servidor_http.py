@@ -0,0 +1,522 @@
+"""
+Módulo del servidor HTTP
+API JSON para los kioscos de autoservicio y el catálogo web, sobre los
+mismos datos que usan las terminales. Solo usa la biblioteca estándar
+(asyncio)
+
+Las colecciones quedan en la caché del proceso, así que las lecturas se
+resuelven en memoria y se atienden intercaladas entre todas las conexiones.
+Las escrituras se encolan y las aplica una única tarea escritora: toma todas
+las pendientes y las confirma juntas en una transacción
+(comandos.ejecutar_varios), con una sola escritura por colección. Mientras
+la tarea escritora trabaja el lazo de eventos espera, de modo que ninguna
+lectura ve una operación a medias
+
+Rutas (los IDs van en la ruta; los demás parámetros van en la consulta en
+GET y en un cuerpo JSON en POST y PATCH, con los nombres de utils/comandos.py):
+    GET    /libros?desde=CURSOR&cantidad=N   (igual para las demás colecciones)
+    GET    /libros?isbn=...   GET /libros?texto=...&limite=N
+    GET    /libros/ID   POST /libros   PATCH /libros/ID   DELETE /libros/ID
+    GET    /usuarios/ID   POST /usuarios   PATCH /usuarios/ID   DELETE /usuarios/ID
+    GET    /usuarios/ID/multas
+    GET    /autores/ID   POST /autores   PATCH /autores/ID   DELETE /autores/ID
+    GET    /categorias/ID   POST /categorias   PATCH /categorias/ID   DELETE /categorias/ID
+    GET    /prestamos/ID   POST /prestamos   POST /prestamos/ID/devolucion
+    POST   /prestamos/vencidos
+    GET    /multas/ID   POST /multas   POST /multas/ID/pago   GET /multas/resumen
+    GET    /estado   (solicitudes atendidas, latencias p50/p90/p99 y escritura diferida)
+    GET    /metricas   (utils/instrumentacion.py; ?formato=prometheus para texto)
+
+Uso:
+    python -m utils.servidor_http --puerto 8080
+    python -m utils.servidor_http --carga 20000 --conexiones 32 --ids 500
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import signal
+import time
+from collections import deque
+from urllib.parse import urlsplit, parse_qsl
+
+from utils import comandos, instrumentacion
+from utils.manejo_archivos import leer_pagina, Posicion, obtener_modo_almacenamiento, obtener_estadisticas_escritura
+from utils.paginacion import TAMAÑO_PAGINA
+
+PUERTO_HTTP = int(os.environ.get("BIBLIOTECA_PUERTO_HTTP", 8080))
+
+# Escrituras que la tarea escritora confirma juntas como máximo
+LOTE_MAXIMO_ESCRITURAS = 256
+
+# Latencias guardadas para calcular percentiles (las más recientes)
+MUESTRAS_LATENCIA = 100000
+
+LIMITE_CUERPO = 1024 * 1024
+LIMITE_ENCABEZADOS = 100
+LIMITE_PAGINA = 500
+
+# (método, ruta con '#' en lugar del ID) -> (grupo, acción, parámetro del ID)
+RUTAS = {
+    ('GET', '/libros/#'): ('libro', 'ver', 'id'),
+    ('POST', '/libros'): ('libro', 'crear', None),
+    ('PATCH', '/libros/#'): ('libro', 'modificar', 'id'),
+    ('DELETE', '/libros/#'): ('libro', 'desactivar', 'id'),
+    ('GET', '/usuarios/#'): ('usuario', 'ver', 'id'),
+    ('POST', '/usuarios'): ('usuario', 'crear', None),
+    ('PATCH', '/usuarios/#'): ('usuario', 'modificar', 'id'),
+    ('DELETE', '/usuarios/#'): ('usuario', 'desactivar', 'id'),
+    ('GET', '/usuarios/#/multas'): ('multa', 'cuenta', 'usuario'),
+    ('GET', '/autores/#'): ('autor', 'ver', 'id'),
+    ('POST', '/autores'): ('autor', 'crear', None),
+    ('PATCH', '/autores/#'): ('autor', 'modificar', 'id'),
+    ('DELETE', '/autores/#'): ('autor', 'borrar', 'id'),
+    ('GET', '/categorias/#'): ('categoria', 'ver', 'id'),
+    ('POST', '/categorias'): ('categoria', 'crear', None),
+    ('PATCH', '/categorias/#'): ('categoria', 'modificar', 'id'),
+    ('DELETE', '/categorias/#'): ('categoria', 'borrar', 'id'),
+    ('GET', '/prestamos/#'): ('prestamo', 'ver', 'id'),
+    ('POST', '/prestamos'): ('prestamo', 'crear', None),
+    ('POST', '/prestamos/#/devolucion'): ('prestamo', 'devolver', 'id'),
+    ('POST', '/prestamos/vencidos'): ('prestamo', 'vencidos', None),
+    ('GET', '/multas/#'): ('multa', 'ver', 'id'),
+    ('POST', '/multas'): ('multa', 'crear', None),
+    ('POST', '/multas/#/pago'): ('multa', 'pagar', 'id'),
+    ('GET', '/multas/resumen'): ('multa', 'resumen', None),
+}
+
+# Ruta -> colección que se lista por páginas con GET
+LISTADOS = {f"/{nombre}": nombre for nombre in ('libros', 'usuarios', 'autores', 'categorias', 'prestamos', 'multas')}
+
+# Acciones de consulta: si fallan es porque el registro no existe
+_ACCIONES_CONSULTA = {'ver', 'isbn', 'cuenta'}
+
+_TEXTOS_ESTADO = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    409: "Conflict", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+class ErrorSolicitud(Exception):
+    """
+    Solicitud HTTP que no se puede atender (se responde con su código)
+    """
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+def _a_tupla(valor):
+    return tuple(_a_tupla(elemento) for elemento in valor) if isinstance(valor, list) else valor
+
+def codificar_cursor(posicion):
+    """
+    Convierte la posición de una página en un texto para la URL
+    Args:
+        posicion (Posicion): Posición devuelta por leer_pagina
+    Returns:
+        str or None: Cursor opaco (None si no hay más páginas)
+    """
+    if posicion is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(list(posicion)).encode()).decode().rstrip("=")
+
+def decodificar_cursor(cursor):
+    """
+    Args:
+        cursor (str): Cursor recibido en la consulta
+    Returns:
+        Posicion: Posición para leer_pagina
+    Raises:
+        ErrorSolicitud: Si el cursor no es válido
+    """
+    try:
+        firma, desplazamiento, id_registro = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise ErrorSolicitud(400, "Cursor inválido.") from None
+    return Posicion(_a_tupla(firma), desplazamiento, id_registro)
+
+def percentiles(muestras, puntos=(50, 90, 99)):
+    """
+    Calcula percentiles de una serie de latencias
+    Args:
+        muestras (iterable): Latencias en segundos
+        puntos (tuple): Percentiles a calcular
+    Returns:
+        dict: 'p50', 'p90', ... y 'max', en milisegundos (vacío sin muestras)
+    """
+    ordenadas = sorted(muestras)
+    if not ordenadas:
+        return {}
+    resultado = {f"p{punto}": round(ordenadas[min(len(ordenadas) - 1, len(ordenadas) * punto // 100)] * 1000, 3) for punto in puntos}
+    resultado['max'] = round(ordenadas[-1] * 1000, 3)
+    return resultado
+
+class Metricas:
+    """
+    Cantidad de solicitudes y latencias recientes, separadas en lecturas y
+    escrituras
+    """
+
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.latencias = {'lectura': deque(maxlen=MUESTRAS_LATENCIA), 'escritura': deque(maxlen=MUESTRAS_LATENCIA)}
+        self.solicitudes = {'lectura': 0, 'escritura': 0}
+        self.estados = {}
+        self.lotes_escritura = 0
+        self.lote_mayor = 0
+
+    def registrar(self, tipo, estado, segundos):
+        self.solicitudes[tipo] += 1
+        self.estados[estado] = self.estados.get(estado, 0) + 1
+        self.latencias[tipo].append(segundos)
+
+    def registrar_lote(self, tamaño):
+        self.lotes_escritura += 1
+        self.lote_mayor = max(self.lote_mayor, tamaño)
+
+    def resumen(self):
+        """
+        Returns:
+            dict: Totales, solicitudes por segundo y latencias por tipo
+        """
+        segundos = time.monotonic() - self.inicio
+        total = sum(self.solicitudes.values())
+        return {
+            'almacenamiento': obtener_modo_almacenamiento(),
+            'segundos_activo': round(segundos, 1),
+            'solicitudes': total,
+            'solicitudes_por_segundo': round(total / segundos, 1) if segundos else 0.0,
+            'por_tipo': dict(self.solicitudes),
+            'por_estado': {str(estado): cantidad for estado, cantidad in sorted(self.estados.items())},
+            'lotes_escritura': self.lotes_escritura,
+            'lote_mayor': self.lote_mayor,
+            'latencia_ms': {tipo: percentiles(muestras) for tipo, muestras in self.latencias.items()},
+            'escritura_diferida': obtener_estadisticas_escritura(),
+        }
+
+class ServidorBiblioteca:
+    """
+    Servidor HTTP/1.1 con conexiones persistentes y una tarea escritora
+    """
+
+    def __init__(self):
+        self.metricas = Metricas()
+        self.cola_escrituras = None
+        self._tarea_escritora = None
+
+    # --- Resolución de rutas ---
+
+    def _resolver(self, metodo, ruta, consulta):
+        """
+        Returns:
+            tuple: (grupo, acción, parámetros) o (None, colección, consulta)
+                para un listado
+        Raises:
+            ErrorSolicitud: Si la ruta no existe
+        """
+        if metodo == 'GET' and ruta in LISTADOS:
+            if ruta == '/libros' and 'isbn' in consulta:
+                return 'libro', 'isbn', consulta
+            if ruta == '/libros' and 'texto' in consulta:
+                return 'libro', 'buscar', consulta
+            return None, LISTADOS[ruta], consulta
+
+        segmentos = ruta.rstrip('/').split('/')
+        id_ruta = None
+        for posicion, segmento in enumerate(segmentos):
+            if segmento.isdigit():
+                segmentos[posicion] = '#'
+                id_ruta = segmento
+        destino = RUTAS.get((metodo, '/'.join(segmentos)))
+        if destino is None:
+            if any(clave[1] == '/'.join(segmentos) for clave in RUTAS) or ruta in LISTADOS:
+                raise ErrorSolicitud(405, "Método no permitido en esta ruta.")
+            raise ErrorSolicitud(404, "Ruta desconocida.")
+        grupo, accion, parametro_id = destino
+        if parametro_id is not None:
+            consulta[parametro_id] = id_ruta
+        return grupo, accion, consulta
+
+    def _listar(self, nombre_coleccion, consulta):
+        desde = consulta.get('desde')
+        posicion = decodificar_cursor(desde) if desde else None
+        try:
+            cantidad = int(consulta.get('cantidad', TAMAÑO_PAGINA))
+        except ValueError:
+            raise ErrorSolicitud(400, "cantidad: debe ser un número entero.") from None
+        cantidad = max(1, min(cantidad, LIMITE_PAGINA))
+        pagina, siguiente = leer_pagina(nombre_coleccion, posicion, cantidad)
+        return {
+            'comando': f"{nombre_coleccion} listar", 'ok': True,
+            'resultado': {
+                'registros': [comandos.serializar_registro(registro) for _, registro in pagina],
+                'siguiente': codificar_cursor(siguiente),
+            },
+        }
+
+    # --- Tarea escritora ---
+
+    async def _escribir(self, grupo, accion, parametros):
+        futuro = asyncio.get_running_loop().create_future()
+        await self.cola_escrituras.put(((grupo, accion, parametros), futuro))
+        return await futuro
+
+    async def _escritora(self):
+        """
+        Aplica las escrituras encoladas de a lotes, una transacción por lote
+        """
+        while True:
+            pendientes = [await self.cola_escrituras.get()]
+            while len(pendientes) < LOTE_MAXIMO_ESCRITURAS and not self.cola_escrituras.empty():
+                pendientes.append(self.cola_escrituras.get_nowait())
+            try:
+                resultados = comandos.ejecutar_varios([orden for orden, _ in pendientes])
+            except Exception as e:
+                resultados = [{'ok': False, 'error': str(e), 'tipo': 'servidor'}] * len(pendientes)
+            self.metricas.registrar_lote(len(pendientes))
+            for (_, futuro), resultado in zip(pendientes, resultados):
+                if not futuro.done():
+                    futuro.set_result(resultado)
+                self.cola_escrituras.task_done()
+
+    # --- HTTP ---
+
+    async def atender(self, metodo, objetivo, cuerpo):
+        """
+        Atiende una solicitud ya leída
+        Args:
+            metodo (str): Método HTTP
+            objetivo (str): Ruta con la consulta
+            cuerpo (bytes): Cuerpo de la solicitud
+        Returns:
+            tuple: (código de estado, respuesta como dict (o texto), tipo 'lectura' o 'escritura')
+        """
+        partes = urlsplit(objetivo)
+        consulta = dict(parse_qsl(partes.query))
+        tipo = 'lectura' if metodo == 'GET' else 'escritura'
+        try:
+            if partes.path == '/estado' and metodo == 'GET':
+                return 200, {'ok': True, 'resultado': self.metricas.resumen()}, tipo
+            if partes.path == '/metricas' and metodo == 'GET':
+                if consulta.get('formato') == 'prometheus':
+                    return 200, instrumentacion.exportar_prometheus(), tipo
+                return 200, {'ok': True, 'resultado': instrumentacion.obtener_metricas()}, tipo
+            if cuerpo:
+                try:
+                    datos = json.loads(cuerpo)
+                except ValueError:
+                    raise ErrorSolicitud(400, "El cuerpo no es JSON válido.") from None
+                if not isinstance(datos, dict):
+                    raise ErrorSolicitud(400, "El cuerpo debe ser un objeto JSON.")
+                consulta.update(datos)
+            grupo, accion, parametros = self._resolver(metodo, partes.path, consulta)
+            if grupo is None:
+                return 200, self._listar(accion, parametros), tipo
+            if tipo == 'lectura':
+                resultado = comandos.ejecutar(grupo, accion, parametros)
+            else:
+                resultado = await self._escribir(grupo, accion, parametros)
+        except ErrorSolicitud as e:
+            return e.estado, {'ok': False, 'error': str(e)}, tipo
+
+        if resultado['ok']:
+            return (201 if accion == 'crear' else 200), resultado, tipo
+        if resultado.get('tipo') == 'parametros':
+            return 400, resultado, tipo
+        if resultado.get('tipo') == 'operacion':
+            return (404 if accion in _ACCIONES_CONSULTA else 409), resultado, tipo
+        return 500, resultado, tipo
+
+    async def _leer_solicitud(self, lector):
+        """
+        Returns:
+            tuple or None: (método, objetivo, versión, encabezados, cuerpo) o
+                None si el cliente cerró la conexión
+        Raises:
+            ErrorSolicitud: Si la solicitud está mal formada o es muy grande
+        """
+        linea = await lector.readline()
+        if not linea:
+            return None
+        try:
+            metodo, objetivo, version = linea.decode('latin-1').split()
+        except ValueError:
+            raise ErrorSolicitud(400, "Línea de solicitud inválida.") from None
+        encabezados = {}
+        while True:
+            linea = await lector.readline()
+            if linea in (b'\r\n', b'\n', b''):
+                break
+            if len(encabezados) >= LIMITE_ENCABEZADOS:
+                raise ErrorSolicitud(431, "Demasiados encabezados.")
+            nombre, _, valor = linea.decode('latin-1').partition(':')
+            encabezados[nombre.strip().lower()] = valor.strip()
+        try:
+            largo = int(encabezados.get('content-length') or 0)
+        except ValueError:
+            raise ErrorSolicitud(400, "Content-Length inválido.") from None
+        if largo > LIMITE_CUERPO:
+            raise ErrorSolicitud(413, "Cuerpo demasiado grande.")
+        cuerpo = await lector.readexactly(largo) if largo > 0 else b''
+        return metodo.upper(), objetivo, version, encabezados, cuerpo
+
+    def _responder(self, escritor, estado, respuesta, mantener):
+        # Las respuestas de texto son las métricas en formato Prometheus
+        if isinstance(respuesta, str):
+            cuerpo, tipo_contenido = respuesta.encode('utf-8'), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            cuerpo, tipo_contenido = json.dumps(respuesta, ensure_ascii=False).encode('utf-8'), "application/json; charset=utf-8"
+        escritor.write(
+            f"HTTP/1.1 {estado} {_TEXTOS_ESTADO.get(estado, '')}\r\n"
+            f"Content-Type: {tipo_contenido}\r\n"
+            f"Content-Length: {len(cuerpo)}\r\n"
+            f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode('latin-1') + cuerpo
+        )
+
+    async def _atender_conexion(self, lector, escritor):
+        try:
+            while True:
+                try:
+                    solicitud = await self._leer_solicitud(lector)
+                except ErrorSolicitud as e:
+                    self._responder(escritor, e.estado, {'ok': False, 'error': str(e)}, False)
+                    await escritor.drain()
+                    break
+                if solicitud is None:
+                    break
+                inicio = time.perf_counter()
+                metodo, objetivo, version, encabezados, cuerpo = solicitud
+                conexion = encabezados.get('connection', '').lower()
+                mantener = conexion == 'keep-alive' if version == 'HTTP/1.0' else conexion != 'close'
+                try:
+                    estado, respuesta, tipo = await self.atender(metodo, objetivo, cuerpo)
+                except Exception as e:
+                    print(f"ERROR: Error al atender {metodo} {objetivo}: {e}")
+                    estado, respuesta, tipo = 500, {'ok': False, 'error': "Error interno del servidor."}, 'lectura'
+                self._responder(escritor, estado, respuesta, mantener)
+                await escritor.drain()
+                self.metricas.registrar(tipo, estado, time.perf_counter() - inicio)
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            escritor.close()
+
+    async def ejecutar(self, host='127.0.0.1', puerto=PUERTO_HTTP, detener=None):
+        """
+        Atiende solicitudes hasta que se complete 'detener'
+        Al detenerse espera a que se confirmen las escrituras encoladas
+        Args:
+            host (str): Dirección donde escuchar
+            puerto (int): Puerto
+            detener (asyncio.Event): Evento de parada (None: SIGINT/SIGTERM)
+        """
+        self.cola_escrituras = asyncio.Queue()
+        self._tarea_escritora = asyncio.create_task(self._escritora())
+        if detener is None:
+            detener = asyncio.Event()
+            for señal in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    asyncio.get_running_loop().add_signal_handler(señal, detener.set)
+                except (NotImplementedError, RuntimeError):
+                    pass
+        servidor = await asyncio.start_server(self._atender_conexion, host, puerto, reuse_address=True)
+        print(f"Servidor de la biblioteca en http://{host}:{puerto} (almacenamiento: {obtener_modo_almacenamiento()})")
+        try:
+            await detener.wait()
+        finally:
+            servidor.close()
+            await servidor.wait_closed()
+            await self.cola_escrituras.join()
+            self._tarea_escritora.cancel()
+
+# --- Prueba de carga ---
+
+async def _cliente_carga(host, puerto, rutas, cantidad, latencias, estados):
+    lector, escritor = await asyncio.open_connection(host, puerto)
+    try:
+        for _ in range(cantidad):
+            ruta = random.choice(rutas)
+            inicio = time.perf_counter()
+            escritor.write(f"GET {ruta} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('latin-1'))
+            estado = int((await lector.readline()).split()[1])
+            largo = 0
+            while True:
+                linea = await lector.readline()
+                if linea in (b'\r\n', b''):
+                    break
+                nombre, _, valor = linea.partition(b':')
+                if nombre.lower() == b'content-length':
+                    largo = int(valor)
+            await lector.readexactly(largo)
+            latencias.append(time.perf_counter() - inicio)
+            estados[estado] = estados.get(estado, 0) + 1
+    finally:
+        escritor.close()
+
+async def medir_carga(host, puerto, rutas, solicitudes, conexiones):
+    """
+    Envía lecturas a un servidor ya iniciado y mide latencias desde el cliente
+    Args:
+        host (str): Dirección del servidor
+        puerto (int): Puerto del servidor
+        rutas (list): Rutas GET a pedir (se eligen al azar)
+        solicitudes (int): Total de solicitudes
+        conexiones (int): Conexiones persistentes simultáneas
+    Returns:
+        dict: Solicitudes por segundo, cantidad por código y percentiles
+    """
+    latencias, estados = [], {}
+    por_conexion = max(1, solicitudes // conexiones)
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        _cliente_carga(host, puerto, rutas, por_conexion, latencias, estados) for _ in range(conexiones)
+    ))
+    segundos = time.perf_counter() - inicio
+    return {
+        'solicitudes': len(latencias),
+        'segundos': round(segundos, 3),
+        'solicitudes_por_segundo': round(len(latencias) / segundos, 1),
+        'por_estado': {str(estado): cantidad for estado, cantidad in sorted(estados.items())},
+        'latencia_ms': percentiles(latencias),
+    }
+
+def main(argumentos=None):
+    """
+    Punto de entrada de la línea de comandos
+    Args:
+        argumentos (list): Argumentos (None para usar sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Servidor HTTP/JSON de la biblioteca")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=PUERTO_HTTP)
+    parser.add_argument('--carga', type=int, metavar="SOLICITUDES",
+                        help="En lugar de servir, mide un servidor ya iniciado con esta cantidad de lecturas")
+    parser.add_argument('--conexiones', type=int, default=16, help="Conexiones simultáneas de la prueba de carga")
+    parser.add_argument('--ruta', action='append',
+                        help="Ruta a pedir en la prueba de carga; {id} se reemplaza por un ID al azar (por defecto /libros/{id})")
+    parser.add_argument('--ids', type=int, default=100, help="IDs de 1 a N para reemplazar {id}")
+    opciones = parser.parse_args(argumentos)
+
+    if opciones.carga:
+        plantillas = opciones.ruta or ['/libros/{id}']
+        rutas = [plantilla.replace('{id}', str(id_registro)) for plantilla in plantillas for id_registro in range(1, opciones.ids + 1)]
+        rutas = list(dict.fromkeys(rutas))
+        informe = asyncio.run(medir_carga(opciones.host, opciones.puerto, rutas, opciones.carga, opciones.conexiones))
+        print(json.dumps(informe, ensure_ascii=False, indent=2))
+        return
+
+    servidor = ServidorBiblioteca()
+    try:
+        asyncio.run(servidor.ejecutar(opciones.host, opciones.puerto))
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(servidor.metricas.resumen(), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
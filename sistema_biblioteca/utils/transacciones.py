@@ -0,0 +1,295 @@
+"""
+Módulo de transacciones
+Permite agrupar los guardados de varias colecciones en una única unidad de
+trabajo. Dentro de un bloque 'with transaccion():' las llamadas a
+guardar_datos no escriben en disco: solo registran la colección, y al salir
+del bloque todas se confirman juntas. En los modos JSON primero se escribe
+un registro de rehacer (redo) con todos los cambios, de modo que un corte a
+mitad de la confirmación se completa al iniciar el sistema
+
+También lleva la cuenta de las operaciones en curso (transacciones y
+funciones con reintentos): la escritura diferida solo vuelca los cambios
+pendientes cuando ninguna operación está a medias, y recuerda qué
+operación produjo cada guardado, con los IDs que recibió, para repetirla
+igual si otra terminal escribió los mismos datos antes del volcado
+"""
+
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from utils import cache
+from utils.coleccion import Coleccion
+from utils.errores import ConflictoVersion, ErrorBiblioteca
+
+# Cantidad de intentos de una operación que choca con otra terminal
+INTENTOS_POR_CONFLICTO = 8
+
+_local = threading.local()
+
+# Operaciones en curso en todos los hilos y volcado que espera que terminen
+_condicion = threading.Condition()
+_en_curso = 0
+_hilo_exclusivo = None
+_volcar_al_terminar = False
+
+class Transaccion:
+    """
+    Unidad de trabajo con las colecciones pendientes de guardar
+    """
+
+    def __init__(self):
+        self.colecciones = {}
+
+    def preparar(self, nombre_archivo, lista_datos):
+        """
+        Registra una colección para guardarla al confirmar la transacción
+        Args:
+            nombre_archivo (str): Nombre de la colección
+            lista_datos (list or Coleccion): Registros a guardar
+        """
+        if not isinstance(lista_datos, Coleccion):
+            lista_datos = Coleccion(lista_datos, reemplazo=True)
+        anterior = self.colecciones.get(nombre_archivo)
+        if anterior is not None and anterior is not lista_datos and anterior.reemplazo:
+            lista_datos.reemplazo = True
+        self.colecciones[nombre_archivo] = lista_datos
+
+class Operacion:
+    """
+    Llamada a una operación con reintentos y los IDs que se le entregaron
+    Al repetirla recibe los mismos IDs, así el registro que se informó al
+    usuario (por ejemplo, el préstamo 254) se guarda con ese número
+    """
+
+    def __init__(self, funcion, args, kwargs, ids_a_repetir=None):
+        self.funcion = funcion
+        self.args = args
+        self.kwargs = kwargs
+        # (contador, ID) entregados en el intento actual, en orden
+        self.ids = []
+        self._a_repetir = list(ids_a_repetir or [])
+
+    def nuevo_intento(self):
+        """
+        Empieza otro intento: los IDs del anterior no llegaron a guardarse
+        y se vuelven a entregar
+        """
+        self._a_repetir = self.ids + self._a_repetir
+        self.ids = []
+
+    def id_a_repetir(self, nombre_contador):
+        """
+        Args:
+            nombre_contador (str): Nombre del contador
+        Returns:
+            int or None: ID ya entregado a esta operación que corresponde
+                volver a entregar, o None si hay que reservar uno nuevo
+        """
+        for posicion, (contador, id_registro) in enumerate(self._a_repetir):
+            if contador == nombre_contador:
+                del self._a_repetir[posicion]
+                return id_registro
+        return None
+
+    def describir(self):
+        """
+        Returns:
+            dict: Función, argumentos e IDs entregados, para dejarlos en un
+                archivo .conflicto
+        """
+        return {
+            'funcion': self.funcion.__name__,
+            'args': list(self.args),
+            'kwargs': self.kwargs,
+            'ids': [list(entregado) for entregado in self.ids],
+        }
+
+    def __str__(self):
+        argumentos = ", ".join([*map(repr, self.args), *(f"{clave}={valor!r}" for clave, valor in self.kwargs.items())])
+        return f"{self.funcion.__name__}({argumentos})"
+
+def transaccion_activa():
+    """
+    Returns:
+        Transaccion or None: Transacción abierta en el hilo actual
+    """
+    return getattr(_local, 'transaccion', None)
+
+def operacion_actual():
+    """
+    Returns:
+        Operacion or None: Operación con reintentos más externa en curso
+            en el hilo actual
+    """
+    return getattr(_local, 'operacion', None)
+
+def repetir(operacion):
+    """
+    Vuelve a ejecutar una operación con sus argumentos, entregándole los
+    mismos IDs que recibió la primera vez
+    Args:
+        operacion (Operacion): Operación a repetir
+    Returns:
+        Lo que retorne la operación
+    """
+    _local.ids_a_repetir = operacion.ids
+    try:
+        return operacion.funcion(*operacion.args, **operacion.kwargs)
+    finally:
+        _local.ids_a_repetir = None
+
+def operacion_en_curso():
+    """
+    Returns:
+        bool: True si el hilo actual está dentro de una operación
+    """
+    return getattr(_local, 'profundidad', 0) > 0
+
+@contextmanager
+def en_operacion():
+    """
+    Marca el bloque como una operación en curso (las anidadas cuentan una vez)
+    Si un volcado está esperando, la operación empieza cuando este termine
+    """
+    global _en_curso, _volcar_al_terminar
+    profundidad = getattr(_local, 'profundidad', 0)
+    if profundidad == 0:
+        with _condicion:
+            _condicion.wait_for(lambda: _hilo_exclusivo in (None, threading.get_ident()))
+            _en_curso += 1
+    _local.profundidad = profundidad + 1
+    try:
+        yield
+    finally:
+        _local.profundidad = profundidad
+        if profundidad == 0:
+            with _condicion:
+                _en_curso -= 1
+                _condicion.notify_all()
+                volcar = _volcar_al_terminar and _en_curso == 0
+                if volcar:
+                    _volcar_al_terminar = False
+            if volcar:
+                from utils.manejo_archivos import forzar_escritura
+                forzar_escritura()
+
+@contextmanager
+def sin_operaciones():
+    """
+    Espera a que terminen las operaciones en curso de los demás hilos y no
+    deja empezar otras hasta salir del bloque
+    """
+    global _hilo_exclusivo
+    with _condicion:
+        _condicion.wait_for(lambda: _hilo_exclusivo is None)
+        _hilo_exclusivo = threading.get_ident()
+        try:
+            _condicion.wait_for(lambda: _en_curso == 0)
+        except BaseException:
+            _hilo_exclusivo = None
+            _condicion.notify_all()
+            raise
+    try:
+        yield
+    finally:
+        with _condicion:
+            _hilo_exclusivo = None
+            _condicion.notify_all()
+
+def volcar_al_terminar():
+    """
+    Pide que la escritura diferida vuelque sus pendientes cuando termine la
+    última operación en curso
+    """
+    global _volcar_al_terminar
+    with _condicion:
+        _volcar_al_terminar = True
+
+@contextmanager
+def transaccion():
+    """
+    Abre una transacción; si ya hay una abierta en el hilo se suma a ella
+    Si el bloque termina con una excepción no se guarda nada y las
+    colecciones modificadas se descartan de la caché
+    Raises:
+        ConflictoVersion: Si otra terminal guardó antes alguna colección
+    Yields:
+        Transaccion: Transacción abierta
+    """
+    activa = transaccion_activa()
+    if activa is not None:
+        yield activa
+        return
+
+    with en_operacion():
+        nueva = Transaccion()
+        _local.transaccion = nueva
+        try:
+            yield nueva
+        except BaseException:
+            _local.transaccion = None
+            anular(nueva)
+            raise
+        _local.transaccion = None
+
+        from utils.manejo_archivos import guardar_colecciones
+        try:
+            guardar_colecciones(nueva.colecciones)
+        except ConflictoVersion:
+            raise
+        except Exception as e:
+            print(f"ERROR: Error al confirmar la transacción ({', '.join(nueva.colecciones)}): {e}")
+
+def anular(transaccion_anulada):
+    """
+    Descarta los cambios en memoria de una transacción
+    Args:
+        transaccion_anulada (Transaccion): Transacción a descartar
+    """
+    for nombre in transaccion_anulada.colecciones:
+        cache.invalidar(nombre)
+    cache.descartar_modificadas()
+    from utils.manejo_archivos import restaurar_pendientes
+    restaurar_pendientes()
+
+def con_reintentos(funcion):
+    """
+    Decorador para operaciones de los modelos que cargan, modifican y
+    guardan datos: si otra terminal guardó las mismas colecciones entre la
+    carga y el guardado, la operación se repite completa con datos frescos
+    Args:
+        funcion (callable): Operación a proteger
+    Returns:
+        callable: Operación con reintentos
+    """
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with en_operacion():
+            # La operación termina antes de salir de en_operacion, donde
+            # puede volcarse la escritura diferida
+            exterior = operacion_actual() is None
+            if exterior:
+                # Con la escritura diferida, la operación se repite completa
+                # si otra terminal guarda los mismos datos antes del volcado
+                _local.operacion = Operacion(envoltura, args, kwargs, getattr(_local, 'ids_a_repetir', None))
+                _local.ids_a_repetir = None
+            try:
+                for intento in range(INTENTOS_POR_CONFLICTO):
+                    if exterior:
+                        _local.operacion.nuevo_intento()
+                    try:
+                        return funcion(*args, **kwargs)
+                    except ConflictoVersion:
+                        if transaccion_activa() is not None:
+                            # La reintenta quien abrió la transacción exterior
+                            raise
+                        # Espera breve y aleatoria para no volver a chocar
+                        time.sleep(random.uniform(0, 0.01 * (2 ** intento)))
+            finally:
+                if exterior:
+                    _local.operacion = None
+        raise ErrorBiblioteca("Otra terminal está modificando los mismos datos. Intente nuevamente.")
+    return envoltura
@@ -1,12 +1,17 @@
 """
 Módulo de validaciones
 Contiene funciones para validar entrada de datos del usuario
+Las funciones comprobar_* aplican las reglas sobre un valor ya leído (por
+ejemplo desde un archivo de importación) y lanzan ValueError con el motivo;
+las funciones validar_* piden el dato por consola hasta que sea válido
 """
 
 import os
 import re
 from datetime import datetime
 
+PATRON_EMAIL = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 def limpiar_pantalla():
     """
     Limpia la pantalla de la consola
@@ -14,6 +19,190 @@ def limpiar_pantalla():
     """
     os.system('cls' if os.name == 'nt' else 'clear')
 
+def comprobar_texto(texto, min_longitud=1, max_longitud=100):
+    """
+    Comprueba que un valor sea texto válido
+    Args:
+        texto (str): Valor a comprobar
+        min_longitud (int): Longitud mínima del texto
+        max_longitud (int): Longitud máxima del texto
+    Returns:
+        str: Texto sin espacios al inicio ni al final
+    Raises:
+        ValueError: Si el texto no cumple las reglas
+    """
+    texto = str(texto).strip()
+    if len(texto) < min_longitud:
+        raise ValueError(f"El texto debe tener al menos {min_longitud} caracteres.")
+    if len(texto) > max_longitud:
+        raise ValueError(f"El texto no puede exceder {max_longitud} caracteres.")
+    if not texto.replace(" ", "").isalpha():
+        raise ValueError("El texto solo debe contener letras y espacios.")
+    return texto
+
+def comprobar_numero_entero(valor, minimo=0, maximo=999999):
+    """
+    Comprueba que un valor sea un número entero dentro del rango
+    Args:
+        valor (str or int): Valor a comprobar
+        minimo (int): Valor mínimo permitido
+        maximo (int): Valor máximo permitido
+    Returns:
+        int: Número validado
+    Raises:
+        ValueError: Si el valor no es un entero o está fuera del rango
+    """
+    try:
+        numero = int(str(valor).strip())
+    except ValueError:
+        raise ValueError("Debe ingresar un número entero válido.") from None
+    if numero < minimo:
+        raise ValueError(f"El número debe ser mayor o igual a {minimo}.")
+    if numero > maximo:
+        raise ValueError(f"El número no puede ser mayor a {maximo}.")
+    return numero
+
+def comprobar_numero_decimal(valor, minimo=0.0, maximo=999999.99):
+    """
+    Comprueba que un valor sea un número decimal dentro del rango
+    Args:
+        valor (str or float): Valor a comprobar
+        minimo (float): Valor mínimo permitido
+        maximo (float): Valor máximo permitido
+    Returns:
+        float: Número redondeado a 2 decimales
+    Raises:
+        ValueError: Si el valor no es un número o está fuera del rango
+    """
+    try:
+        numero = float(str(valor).strip())
+    except ValueError:
+        raise ValueError("Debe ingresar un número decimal válido.") from None
+    if numero < minimo:
+        raise ValueError(f"El número debe ser mayor o igual a {minimo}.")
+    if numero > maximo:
+        raise ValueError(f"El número no puede ser mayor a {maximo}.")
+    return round(numero, 2)
+
+def comprobar_fecha(fecha_str):
+    """
+    Comprueba que un valor sea una fecha en formato DD/MM/AAAA
+    Args:
+        fecha_str (str): Valor a comprobar
+    Returns:
+        str: Fecha validada en formato DD/MM/AAAA
+    Raises:
+        ValueError: Si la fecha no tiene el formato correcto
+    """
+    fecha_str = str(fecha_str).strip()
+    try:
+        datetime.strptime(fecha_str, "%d/%m/%Y")
+    except ValueError:
+        raise ValueError("Formato de fecha inválido. Use DD/MM/AAAA (ejemplo: 15/03/2024)") from None
+    return fecha_str
+
+def comprobar_email(email):
+    """
+    Comprueba que un valor sea un correo electrónico válido
+    Args:
+        email (str): Valor a comprobar
+    Returns:
+        str: Email validado
+    Raises:
+        ValueError: Si el correo no es válido
+    """
+    email = str(email).strip()
+    if not PATRON_EMAIL.match(email):
+        raise ValueError("Correo electrónico inválido. Ejemplo: usuario@dominio.com")
+    return email
+
+def comprobar_telefono(telefono):
+    """
+    Comprueba que un valor sea un número de teléfono válido
+    Args:
+        telefono (str): Valor a comprobar
+    Returns:
+        str: Teléfono validado
+    Raises:
+        ValueError: Si el teléfono no es válido
+    """
+    telefono = str(telefono).strip()
+    if not (telefono.isdigit() and 8 <= len(telefono) <= 15):
+        raise ValueError("Teléfono inválido. Debe contener entre 8 y 15 dígitos.")
+    return telefono
+
+def comprobar_booleano(respuesta):
+    """
+    Comprueba que un valor sea S/N (Sí/No)
+    Args:
+        respuesta (str or bool): Valor a comprobar
+    Returns:
+        bool: True para Sí, False para No
+    Raises:
+        ValueError: Si la respuesta no es válida
+    """
+    if isinstance(respuesta, bool):
+        return respuesta
+    respuesta = str(respuesta).strip().upper()
+    if respuesta in ['S', 'SI', 'SÍ']:
+        return True
+    if respuesta in ['N', 'NO']:
+        return False
+    raise ValueError("Respuesta inválida. Ingrese S para Sí o N para No.")
+
+def _digito_control_isbn13(base):
+    suma = sum(int(digito) * (3 if posicion % 2 else 1) for posicion, digito in enumerate(base))
+    return (10 - suma % 10) % 10
+
+def normalizar_isbn(isbn):
+    """
+    Quita guiones y espacios de un ISBN y convierte los ISBN-10 al ISBN-13
+    equivalente (prefijo 978), de modo que las dos formas de un mismo libro
+    coincidan. No comprueba el dígito de control
+    Args:
+        isbn (str): ISBN tal como se ingresó o se leyó del código de barras
+    Returns:
+        str: ISBN normalizado (o los caracteres limpios si no tiene 10 dígitos)
+    """
+    isbn = str(isbn).strip().replace("-", "").replace(" ", "").upper()
+    if len(isbn) == 10 and isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == "X"):
+        base = "978" + isbn[:9]
+        return base + str(_digito_control_isbn13(base))
+    return isbn
+
+def comprobar_isbn(isbn):
+    """
+    Comprueba que un valor sea un ISBN válido (10 o 13 dígitos con su
+    dígito de control; el de un ISBN-10 puede ser X)
+    Args:
+        isbn (str): Valor a comprobar
+    Returns:
+        str: ISBN-13 sin guiones ni espacios (los ISBN-10 se convierten)
+    Raises:
+        ValueError: Si el ISBN no es válido
+    """
+    limpio = str(isbn).strip().replace("-", "").replace(" ", "").upper()
+    if len(limpio) == 10 and limpio[:9].isdigit() and (limpio[9].isdigit() or limpio[9] == "X"):
+        suma = sum((10 - posicion) * (10 if digito == "X" else int(digito)) for posicion, digito in enumerate(limpio))
+        if suma % 11:
+            raise ValueError("ISBN inválido. El dígito de control no coincide.")
+        return normalizar_isbn(limpio)
+    if not (limpio.isdigit() and len(limpio) == 13):
+        raise ValueError("ISBN inválido. Debe contener 10 o 13 dígitos.")
+    if _digito_control_isbn13(limpio[:12]) != int(limpio[12]):
+        raise ValueError("ISBN inválido. El dígito de control no coincide.")
+    return limpio
+
+def _pedir(mensaje, comprobar, *args):
+    """
+    Pide un dato por consola hasta que la función de comprobación lo acepte
+    """
+    while True:
+        try:
+            return comprobar(input(mensaje), *args)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+
 def validar_texto(mensaje, min_longitud=1, max_longitud=100):
     """
     Valida que la entrada sea texto válido
@@ -24,16 +213,7 @@ def validar_texto(mensaje, min_longitud=1, max_longitud=100):
     Returns:
         str: Texto validado
     """
-    while True:
-        texto = input(mensaje).strip()
-        if len(texto) < min_longitud:
-            print(f"ERROR: El texto debe tener al menos {min_longitud} caracteres.")
-        elif len(texto) > max_longitud:
-            print(f"ERROR: El texto no puede exceder {max_longitud} caracteres.")
-        elif not texto.replace(" ", "").isalpha():
-            print("ERROR: El texto solo debe contener letras y espacios.")
-        else:
-            return texto
+    return _pedir(mensaje, comprobar_texto, min_longitud, max_longitud)
 
 def validar_numero_entero(mensaje, minimo=0, maximo=999999):
     """
@@ -45,17 +225,7 @@ def validar_numero_entero(mensaje, minimo=0, maximo=999999):
     Returns:
         int: Número validado
     """
-    while True:
-        try:
-            numero = int(input(mensaje).strip())
-            if numero < minimo:
-                print(f"ERROR: El número debe ser mayor o igual a {minimo}.")
-            elif numero > maximo:
-                print(f"ERROR: El número no puede ser mayor a {maximo}.")
-            else:
-                return numero
-        except ValueError:
-            print("ERROR: Debe ingresar un número entero válido.")
+    return _pedir(mensaje, comprobar_numero_entero, minimo, maximo)
 
 def validar_numero_decimal(mensaje, minimo=0.0, maximo=999999.99):
     """
@@ -67,17 +237,7 @@ def validar_numero_decimal(mensaje, minimo=0.0, maximo=999999.99):
     Returns:
         float: Número decimal validado
     """
-    while True:
-        try:
-            numero = float(input(mensaje).strip())
-            if numero < minimo:
-                print(f"ERROR: El número debe ser mayor o igual a {minimo}.")
-            elif numero > maximo:
-                print(f"ERROR: El número no puede ser mayor a {maximo}.")
-            else:
-                return round(numero, 2)
-        except ValueError:
-            print("ERROR: Debe ingresar un número decimal válido.")
+    return _pedir(mensaje, comprobar_numero_decimal, minimo, maximo)
 
 def validar_fecha(mensaje):
     """
@@ -87,13 +247,17 @@ def validar_fecha(mensaje):
     Returns:
         str: Fecha validada en formato DD/MM/AAAA
     """
-    while True:
-        fecha_str = input(mensaje).strip()
-        try:
-            fecha = datetime.strptime(fecha_str, "%d/%m/%Y")
-            return fecha_str
-        except ValueError:
-            print("ERROR: Formato de fecha inválido. Use DD/MM/AAAA (ejemplo: 15/03/2024)")
+    return _pedir(mensaje, comprobar_fecha)
+
+def validar_fecha_opcional(mensaje):
+    """
+    Valida una fecha en formato DD/MM/AAAA que se puede dejar vacía
+    Args:
+        mensaje (str): Mensaje a mostrar al usuario
+    Returns:
+        str or None: Fecha validada (None si se dejó vacía)
+    """
+    return _pedir(mensaje, lambda valor: comprobar_fecha(valor) if valor.strip() else None)
 
 def validar_email(mensaje):
     """
@@ -103,13 +267,7 @@ def validar_email(mensaje):
     Returns:
         str: Email validado
     """
-    patron = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    while True:
-        email = input(mensaje).strip()
-        if re.match(patron, email):
-            return email
-        else:
-            print("ERROR: Correo electrónico inválido. Ejemplo: usuario@dominio.com")
+    return _pedir(mensaje, comprobar_email)
 
 def validar_telefono(mensaje):
     """
@@ -119,12 +277,7 @@ def validar_telefono(mensaje):
     Returns:
         str: Teléfono validado
     """
-    while True:
-        telefono = input(mensaje).strip()
-        if telefono.isdigit() and len(telefono) >= 8 and len(telefono) <= 15:
-            return telefono
-        else:
-            print("ERROR: Teléfono inválido. Debe contener entre 8 y 15 dígitos.")
+    return _pedir(mensaje, comprobar_telefono)
 
 def validar_booleano(mensaje):
     """
@@ -134,14 +287,7 @@ def validar_booleano(mensaje):
     Returns:
         bool: True para Sí, False para No
     """
-    while True:
-        respuesta = input(f"{mensaje} (S/N): ").strip().upper()
-        if respuesta in ['S', 'SI', 'SÍ']:
-            return True
-        elif respuesta in ['N', 'NO']:
-            return False
-        else:
-            print("ERROR: Respuesta inválida. Ingrese S para Sí o N para No.")
+    return _pedir(f"{mensaje} (S/N): ", comprobar_booleano)
 
 def validar_isbn(mensaje):
     """
@@ -149,14 +295,9 @@ def validar_isbn(mensaje):
     Args:
         mensaje (str): Mensaje a mostrar al usuario
     Returns:
-        str: ISBN validado
+        str: ISBN-13 validado
     """
-    while True:
-        isbn = input(mensaje).strip().replace("-", "").replace(" ", "")
-        if isbn.isdigit() and (len(isbn) == 10 or len(isbn) == 13):
-            return isbn
-        else:
-            print("ERROR: ISBN inválido. Debe contener 10 o 13 dígitos.")
+    return _pedir(mensaje, comprobar_isbn)
 
 def pausar():
     """